@@ -7,9 +7,13 @@ New flow (v2):
   3. User taps "Start Monitoring" → POST /live-trading/start starts agent (monitoring-only)
   4. User confirms each position → POST /live-trading/register-position injects it
   5. Agent monitors positions:
-       - P&L updates every 5 s via KiteTicker (falls back to REST API polling)
-       - GTT fill detection every 30 s
-       - Trailing stop-loss adjustment every 30 s
+       - Tick-driven: each position arms a price band with the shared
+         position_monitor; SL/target crossings, target exits and trailing-SL
+         steps are evaluated on the tick that crosses it (positions without a
+         live feed fall back to REST API polling every 5 s)
+       - Limit-order fills and GTT exits arrive as KiteTicker order postbacks
+         (order_updates); REST order/GTT polling only while that feed is down
+       - Trailing stop-loss adjustment at most every 30 s per position
        - Auto squareoff of MIS positions at 3:10 PM IST
 
 NO auto-scanning. NO auto-execution. The agent never places entry orders on its own.
@@ -22,13 +26,19 @@ Stop behaviour:
 import asyncio
 import os
 import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, IO, List, Optional
+from typing import Dict, IO, List, Optional, Tuple
 import pytz
 
 from app.core.logging import logger
+from app.core.executors import executors, Priority
 from app.services.analysis_service import AnalysisService
+from app.services.bar_aggregator import bar_aggregator
+from app.services.instrument_master import instrument_master
+from app.services.order_updates import order_updates, TERMINAL_STATUSES
+from app.services.position_monitor import position_monitor
 from app.engines.strategy_engine import strategy_engine
 from app.agents.execution_agent import ExecutionAgent
 from kiteconnect import KiteConnect
@@ -48,6 +58,19 @@ def _is_market_open() -> bool:
     return 9 * 60 + 15 <= t <= 15 * 60 + 30
 
 
+def _order_time(order: Dict) -> Optional[datetime]:
+    """IST time of an order update (REST gives datetimes, postbacks strings)."""
+    ts = order.get("order_timestamp") or order.get("exchange_timestamp")
+    if isinstance(ts, str):
+        try:
+            ts = datetime.strptime(ts[:19], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return None
+    if not isinstance(ts, datetime):
+        return None
+    return ts if ts.tzinfo else IST.localize(ts)
+
+
 def _minutes_until_squareoff() -> int:
     now = _ist_now()
     sq = now.replace(hour=15, minute=10, second=0, microsecond=0)
@@ -137,9 +160,15 @@ class _TickerManager:
 
         def on_ticks(ws, ticks):
             self._cache.update(ticks)
+            bar_aggregator.on_ticks(ticks)
+            position_monitor.on_ticks(ticks)
+
+        def on_order_update(ws, data):
+            order_updates.on_order_update(self._api_key, data)
 
         def on_connect(ws, response):
             self._connected = True
+            order_updates.connected(self._api_key, self, self._fetch_orders)
             logger.info("[Ticker] WebSocket connected — live price streaming active")
             if self._subscribed:
                 tokens = list(self._subscribed)
@@ -149,6 +178,7 @@ class _TickerManager:
 
         def on_close(ws, code, reason):
             self._connected = False
+            order_updates.disconnected(self._api_key, self)
             logger.info(f"[Ticker] WebSocket closed: {code} {reason}")
 
         def on_error(ws, code, reason):
@@ -160,6 +190,7 @@ class _TickerManager:
                 # immediately — don't let KiteConnect's internal thread retry.
                 self._forbidden = True
                 self._connected = False
+                order_updates.disconnected(self._api_key, self)
                 logger.warning(
                     "[Ticker] 403 Forbidden — WebSocket not allowed. "
                     "Will fall back to REST API polling. "
@@ -176,6 +207,7 @@ class _TickerManager:
         self._ticker.on_connect = on_connect
         self._ticker.on_close = on_close
         self._ticker.on_error = on_error
+        self._ticker.on_order_update = on_order_update
 
         # Runs in a background thread — non-blocking.
         # Mark _started before connect() so any re-entry attempt is blocked.
@@ -190,6 +222,13 @@ class _TickerManager:
                 pass
         self._connected = False
         self._ticker = None
+        order_updates.disconnected(self._api_key, self)
+
+    def _fetch_orders(self) -> List[Dict]:
+        """REST order book — replayed into order_updates after each (re)connect."""
+        kite = KiteConnect(api_key=self._api_key)
+        kite.set_access_token(self._access_token)
+        return kite.orders()
 
     def subscribe(self, token: int):
         self._subscribed.add(token)
@@ -252,6 +291,15 @@ class PositionState:
         # GTT cooldown: skip GTT-fill detection for this many check cycles after
         # a GTT is placed or updated (Zerodha API may not reflect it immediately).
         self.gtt_skip_checks: int = 0
+        # time.monotonic() of the last GTT re-issue — throttles trailing-SL churn
+        self.last_exit_update: float = 0.0
+        # True once price crossed SL/target and the GTT exit hasn't been confirmed
+        self.exit_crossed = False
+        # time.monotonic() of the last POS_UPDATE log entry
+        self.last_logged: float = 0.0
+        # Serialises broker calls for this position only — trigger handling
+        # holds it instead of the agent-wide _position_lock
+        self.io_lock = asyncio.Lock()
 
     def to_dict(self) -> Dict:
         return {
@@ -341,6 +389,16 @@ class UserTradingAgent:
     MAX_LOGS = 200
     MAX_COMMENTARY = 100
 
+    # Housekeeping cadence — price-driven work runs on position_monitor triggers
+    POLL_MONITOR_SECONDS = 5         # pending orders / positions without a live feed
+    IDLE_MONITOR_SECONDS = 30
+    GTT_CHECK_SECONDS = 30
+    GTT_RECONCILE_SECONDS = 300      # ticked positions: GTT book sanity check
+    TRAIL_MIN_INTERVAL = 30          # min seconds between GTT re-issues for a trail
+    POS_LOG_INTERVAL = 30            # min seconds between POS_UPDATE entries per position
+    WATERMARK_STEP_ATR = 0.1         # re-evaluate on each new high/low of this size
+    GTT_CONFIRM_DELAYS = (1, 2, 4)   # GTT book checks after an SL/target crossing
+
     def __init__(
         self,
         user_id: str,
@@ -390,6 +448,14 @@ class UserTradingAgent:
         self._ticker_manager: Optional[_TickerManager] = None
         self._trade_log: Optional[IO] = None   # daily trade journal file handle
 
+        # Tick-driven position evaluation (see _arm_triggers / _handle_trigger)
+        self._position_lock = asyncio.Lock()
+        self._rechecks: Dict[str, asyncio.TimerHandle] = {}
+        self._trigger_tasks: set = set()
+        # Exit orders the agent placed itself — any other filled exit for a held
+        # symbol is its GTT (or a manual exit)
+        self._exit_order_ids: set = set()
+
     # ── Trade journal (daily .txt file) ───────────────────────────────────────
 
     def _init_trade_log(self):
@@ -540,7 +606,7 @@ class UserTradingAgent:
         try:
             kite = self._get_kite()
             loop = asyncio.get_running_loop()
-            margins = await loop.run_in_executor(None, kite.margins)
+            margins = await loop.run_in_executor(executors.pool("broker-data"), kite.margins)
             equity = margins.get("equity", {})
             available = float(
                 equity.get("available", {}).get("live_balance")
@@ -565,6 +631,7 @@ class UserTradingAgent:
         self._ticker_manager = _TickerManager(
             self.api_key, self.access_token, self._price_cache
         )
+        order_updates.add_listener(self.api_key, self._on_order_update, asyncio.get_running_loop())
         self._log(
             "TICKER",
             "KiteTicker ready — will connect when a position is registered",
@@ -599,7 +666,8 @@ class UserTradingAgent:
                     "SQUAREOFF",
                     f"Squaring off {len(self.positions)} position(s): {pos_summary}",
                 )
-                await self._force_squareoff()
+                async with self._position_lock:
+                    await self._force_squareoff()
             else:
                 self._log(
                     "GTT_CANCEL",
@@ -611,9 +679,16 @@ class UserTradingAgent:
 
         self.status = "STOPPED"
 
+        order_updates.remove_listener(self.api_key, self._on_order_update)
+        for sym in list(self.positions):
+            position_monitor.disarm((self.user_id, sym))
+        for handle in self._rechecks.values():
+            handle.cancel()
+        self._rechecks.clear()
+
         # Cancel tasks and await them so they fully terminate before we return.
         tasks_to_cancel = [
-            t for t in [self._scan_task, self._monitor_task]
+            t for t in [self._scan_task, self._monitor_task, *self._trigger_tasks]
             if t and not t.done()
         ]
         logger.info(f"[Agent:{self.user_id}] Cancelling {len(tasks_to_cancel)} background task(s)")
@@ -768,6 +843,7 @@ class UserTradingAgent:
                 limit=20,
                 user_api_key=self.api_key,
                 user_access_token=self.access_token,
+                incremental=True,
             )
             logger.info(f"[Agent:{self.user_id}] Screener returned {len(candidates) if candidates else 0} candidates")
 
@@ -827,7 +903,7 @@ class UserTradingAgent:
             try:
                 kite = self._get_kite()
                 loop = asyncio.get_running_loop()
-                margins = await loop.run_in_executor(None, kite.margins)
+                margins = await loop.run_in_executor(executors.pool("broker-data"), kite.margins)
                 equity = margins.get("equity", {})
                 available = float(
                     equity.get("available", {}).get("live_balance")
@@ -1071,7 +1147,7 @@ class UserTradingAgent:
         # Place MARKET exit order for the partial quantity
         try:
             order_id = await loop.run_in_executor(
-                None,
+                executors.pool("broker-orders", Priority.HIGH),
                 lambda: kite.place_order(
                     variety="regular",
                     exchange="NSE",
@@ -1085,6 +1161,7 @@ class UserTradingAgent:
         except Exception as e:
             self._log("ERROR", f"{symbol}: Partial exit order failed: {e}", symbol=symbol)
             return
+        self._exit_order_ids.add(str(order_id))
 
         # Mark target hit and update remaining quantity
         target_info["hit"] = True
@@ -1121,13 +1198,10 @@ class UserTradingAgent:
             if pos.gtt_id:
                 try:
                     gtt_id = pos.gtt_id
-                    await loop.run_in_executor(None, lambda: kite.delete_gtt(gtt_id))
+                    await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.delete_gtt(gtt_id))
                 except Exception:
                     pass
-            if pos.instrument_token and self._ticker_manager:
-                self._ticker_manager.unsubscribe(pos.instrument_token)
-            self._price_cache.remove_symbol(symbol)
-            self.positions.pop(symbol, None)
+            self._drop_position(symbol)
             self._log("POSITION_CLOSED", f"{symbol}: All targets hit — position fully closed", symbol=symbol)
             self._add_commentary(
                 "POSITION_CLOSED",
@@ -1145,7 +1219,7 @@ class UserTradingAgent:
         if pos.gtt_id:
             try:
                 gtt_id = pos.gtt_id
-                await loop.run_in_executor(None, lambda: kite.delete_gtt(gtt_id))
+                await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.delete_gtt(gtt_id))
                 pos.gtt_id = None
             except Exception:
                 pass
@@ -1162,7 +1236,7 @@ class UserTradingAgent:
         ]
         try:
             new_gtt_id = await loop.run_in_executor(
-                None,
+                executors.pool("broker-orders", Priority.HIGH),
                 lambda: kite.place_gtt(
                     trigger_type="single",
                     tradingsymbol=symbol,
@@ -1174,6 +1248,7 @@ class UserTradingAgent:
             )
             pos.gtt_id = new_gtt_id
             pos.gtt_skip_checks = 2
+            pos.last_exit_update = time.monotonic()
             self._log(
                 "GTT_UPDATED",
                 f"{symbol}: SL moved to ₹{new_sl:.2f} "
@@ -1207,23 +1282,31 @@ class UserTradingAgent:
             return
         try:
             from app.services.zerodha_service import ZerodhaService
-            svc = ZerodhaService()
-            svc.set_credentials(self.api_key, self.access_token)
             token = None
 
-            # Primary: kite.ltp() — fast, returns instrument_token + last_price
+            # Primary: process-wide instrument master — O(1), no API call once loaded
             try:
-                ltp_data = await svc.get_ltp([symbol])
-                token = ltp_data.get(f"NSE:{symbol}", {}).get("instrument_token")
+                await instrument_master.ensure_loaded(self._get_kite())
+                token = instrument_master.token(symbol, "NSE")
             except Exception:
                 pass
 
-            # Fallback: kite.positions() also returns instrument_token for open positions
+            # Fallback: kite.ltp() — returns instrument_token + last_price
+            if not token:
+                try:
+                    svc = ZerodhaService()
+                    svc.set_credentials(self.api_key, self.access_token)
+                    ltp_data = await svc.get_ltp([symbol])
+                    token = ltp_data.get(f"NSE:{symbol}", {}).get("instrument_token")
+                except Exception:
+                    pass
+
+            # Last resort: kite.positions() also returns instrument_token for open positions
             if not token:
                 try:
                     kite = self._get_kite()
                     loop = asyncio.get_running_loop()
-                    pos_data = await loop.run_in_executor(None, kite.positions)
+                    pos_data = await loop.run_in_executor(executors.pool("broker-data"), kite.positions)
                     all_pos = pos_data.get("day", []) + pos_data.get("net", [])
                     for p in all_pos:
                         if p.get("tradingsymbol") == symbol and p.get("exchange") == "NSE":
@@ -1238,6 +1321,7 @@ class UserTradingAgent:
                     pos.instrument_token = token
                 self._price_cache.register_symbol(symbol, token)
                 self._ticker_manager.subscribe(token)
+                self._arm_triggers(symbol)
                 self._log(
                     "TICKER_SUB",
                     f"{symbol}: Subscribed to live price feed (token: {token})",
@@ -1254,9 +1338,10 @@ class UserTradingAgent:
 
     # ── Pending order fill detection ──────────────────────────────────────────
 
-    async def _check_pending_order_fills(self):
+    async def _check_pending_order_fills(self, orders_list: Optional[List[Dict]] = None):
         """
-        Poll Zerodha for the status of each pending limit order.
+        Check the status of each pending limit order — from `orders_list`
+        (an order postback) or, when not given, by polling Zerodha's order book.
         When an order fills (COMPLETE), promote it to a full PositionState
         and begin active monitoring.
         """
@@ -1266,13 +1351,14 @@ class UserTradingAgent:
         kite = self._get_kite()
         loop = asyncio.get_running_loop()
 
-        try:
-            orders_list = await loop.run_in_executor(None, kite.orders)
-            # Build a fast lookup: order_id → order dict
-            orders_map: Dict[str, Dict] = {str(o["order_id"]): o for o in (orders_list or [])}
-        except Exception as e:
-            logger.warning(f"[Agent:{self.user_id}] Pending fill check: kite.orders() failed: {e}")
-            return
+        if orders_list is None:
+            try:
+                orders_list = await loop.run_in_executor(executors.pool("broker-data"), kite.orders)
+            except Exception as e:
+                logger.warning(f"[Agent:{self.user_id}] Pending fill check: kite.orders() failed: {e}")
+                return
+        # Build a fast lookup: order_id → order dict
+        orders_map: Dict[str, Dict] = {str(o["order_id"]): o for o in (orders_list or [])}
 
         filled_ids = []
         for oid, pending in list(self.pending_orders.items()):
@@ -1360,7 +1446,7 @@ class UserTradingAgent:
                         }
                     ]
                     gtt_id = await loop.run_in_executor(
-                        None,
+                        executors.pool("broker-orders", Priority.URGENT),
                         lambda: kite.place_gtt(
                             trigger_type="single",
                             tradingsymbol=_sym,
@@ -1442,15 +1528,25 @@ class UserTradingAgent:
 
     async def _monitor_loop(self):
         """
-        Runs every 5 seconds.
-        - Price updates: reads from KiteTicker cache (no API call), falls back to kite.quote() on cache miss
-        - Fill detection for pending limit orders: every 5 seconds (every iteration)
-        - GTT fill detection + trailing SL: API call every 30 seconds (every 6th iteration)
+        Housekeeping loop — SL/target/trailing evaluation for positions with a
+        live tick feed runs on position_monitor triggers (see _handle_trigger).
+        Wakes every 5 s while a pending limit order or a position without a
+        live feed needs polling, otherwise every 30 s:
+        - Lazily connects KiteTicker once the market opens
+        - Fill detection for pending limit orders: every wake-up, while the
+          order-update feed is down (otherwise see _handle_order_update)
+        - Polled positions: prices via kite.quote()/positions() every 5 s,
+          GTT fill detection + trailing SL every 30 s
+        - Ticked positions: P&L refresh from the tick cache; while the order
+          feed is down, GTT reconcile every 5 min, or every 30 s while a
+          crossed SL/target awaits its GTT fill
+        - 3:10 PM auto-squareoff
         """
-        gtt_check_counter = 0
+        last_gtt_check = 0.0
+        last_reconcile = time.monotonic()
         while self.is_running:
             try:
-                await asyncio.sleep(5)
+                await asyncio.sleep(self._monitor_interval())
 
                 # Lazily connect KiteTicker once market opens (if not already connected
                 # and no 403 was received)
@@ -1468,21 +1564,21 @@ class UserTradingAgent:
                         for sym, pos in self.positions.items():
                             if pos.instrument_token:
                                 self._ticker_manager.subscribe(pos.instrument_token)
+                                self._arm_triggers(sym)
                     except Exception as e:
                         logger.warning(f"[Agent:{self.user_id}] KiteTicker lazy-start failed: {e}")
 
                 if not _is_market_open():
                     continue
 
-                # ── Pending order fill detection (every iteration = every 5s) ──
+                # ── Pending order fill detection (every wake-up = every 5s) ──
                 # Runs independently so GTT is placed as soon as the limit order fills,
-                # not delayed by the 30-second GTT check cadence.
-                if self.pending_orders:
-                    await self._check_pending_order_fills()
-
-                # ── GTT / trailing SL checks (every ~30s) ─────────────────
-                gtt_check_counter += 1
-                check_gtts = (gtt_check_counter % 6 == 0)  # every ~30 seconds
+                # not delayed by the 30-second GTT check cadence. Only while the
+                # order-update feed is down — otherwise fills arrive as postbacks.
+                orders_live = order_updates.is_live(self.api_key)
+                if self.pending_orders and not orders_live:
+                    async with self._position_lock:
+                        await self._check_pending_order_fills()
 
                 if not self.positions:
                     continue
@@ -1501,10 +1597,31 @@ class UserTradingAgent:
                         f"3:10 PM aa gaya — {len(self.positions)} position(s) auto square off ho rahe hain: {pos_list}. "
                         f"Saare MIS trades market band hone se pehle close hone chahiye.",
                     )
-                    await self._force_squareoff()
+                    async with self._position_lock:
+                        await self._force_squareoff()
                     continue
 
-                await self._monitor_positions(check_gtts=check_gtts)
+                now = time.monotonic()
+                check_gtts = now - last_gtt_check >= self.GTT_CHECK_SECONDS
+                if check_gtts:
+                    last_gtt_check = now
+
+                async with self._position_lock:
+                    polled = [s for s, p in self.positions.items() if not self._has_live_feed(p)]
+                    ticked = [s for s in self.positions if s not in polled]
+                    if polled:
+                        await self._monitor_positions(check_gtts=check_gtts, symbols=polled)
+                    if ticked:
+                        # GTT exits arrive as order postbacks while that feed is live
+                        reconcile = check_gtts and not orders_live and (
+                            now - last_reconcile >= self.GTT_RECONCILE_SECONDS
+                            or any(self.positions[s].exit_crossed for s in ticked if s in self.positions)
+                        )
+                        if reconcile:
+                            last_reconcile = now
+                            await self._monitor_positions(check_gtts=True, symbols=ticked)
+                        else:
+                            self._refresh_pnl(ticked)
 
             except asyncio.CancelledError:
                 logger.info(f"[Agent:{self.user_id}] Monitor loop cancelled")
@@ -1513,13 +1630,39 @@ class UserTradingAgent:
                 logger.exception(f"[Agent:{self.user_id}] Monitor loop unhandled error")
                 self._log("ERROR", f"Monitor loop error: {e}")
 
-    async def _monitor_positions(self, check_gtts: bool = False):
+    def _monitor_interval(self) -> int:
+        needs_polling = (self.pending_orders and not order_updates.is_live(self.api_key)) or any(
+            not self._has_live_feed(p) for p in self.positions.values()
+        )
+        return self.POLL_MONITOR_SECONDS if needs_polling else self.IDLE_MONITOR_SECONDS
+
+    def _has_live_feed(self, pos: PositionState) -> bool:
+        return bool(
+            pos.instrument_token
+            and self._ticker_manager
+            and self._ticker_manager.is_connected
+            and self._price_cache.get_ltp(pos.symbol) is not None
+        )
+
+    def _refresh_pnl(self, symbols: List[str]):
+        """P&L from the tick cache — no API call."""
+        for symbol in symbols:
+            pos = self.positions.get(symbol)
+            ltp = self._price_cache.get_ltp(symbol)
+            if pos is None or ltp is None:
+                continue
+            if pos.action == "BUY":
+                pos.current_pnl = (ltp - pos.entry_price) * pos.remaining_quantity
+            else:
+                pos.current_pnl = (pos.entry_price - ltp) * pos.remaining_quantity
+
+    async def _monitor_positions(self, check_gtts: bool = False, symbols: Optional[List[str]] = None):
         """
-        Check live prices → update P&L → trail SL continuously → detect GTT fills.
-        Trailing SL and GTT operations only happen when check_gtts=True (every 30s)
-        to avoid hammering the Zerodha API.
+        Check live prices → update P&L → trail SL continuously → detect GTT fills
+        for `symbols` (default: every position). Trailing SL and GTT operations
+        only happen when check_gtts=True to avoid hammering the Zerodha API.
         """
-        symbols = list(self.positions.keys())
+        symbols = [s for s in (self.positions if symbols is None else symbols) if s in self.positions]
         if not symbols:
             return
 
@@ -1544,7 +1687,7 @@ class UserTradingAgent:
                 quote_ok = False
                 try:
                     quotes = await loop.run_in_executor(
-                        None, lambda: kite.quote([f"NSE:{s}" for s in cache_miss_symbols])
+                        executors.pool("broker-data"), lambda: kite.quote([f"NSE:{s}" for s in cache_miss_symbols])
                     )
                     for symbol in cache_miss_symbols:
                         ltp = quotes.get(f"NSE:{symbol}", {}).get("last_price")
@@ -1563,7 +1706,7 @@ class UserTradingAgent:
                     still_missing = [s for s in cache_miss_symbols if s not in prices]
                     if still_missing:
                         try:
-                            pos_data = await loop.run_in_executor(None, kite.positions)
+                            pos_data = await loop.run_in_executor(executors.pool("broker-data"), kite.positions)
                             all_pos = pos_data.get("day", []) + pos_data.get("net", [])
                             pos_map = {
                                 p["tradingsymbol"]: p.get("last_price")
@@ -1587,7 +1730,7 @@ class UserTradingAgent:
                 try:
                     kite = self._get_kite()
                     loop = asyncio.get_running_loop()
-                    gtts = await loop.run_in_executor(None, kite.get_gtts)
+                    gtts = await loop.run_in_executor(executors.pool("broker-data"), kite.get_gtts)
                     active_gtt_ids = {
                         str(g.get("id"))
                         for g in gtts
@@ -1599,236 +1742,520 @@ class UserTradingAgent:
                 except Exception as e:
                     logger.warning(f"[Agent:{self.user_id}] GTT fetch failed: {e}")
 
-            # ── Multi-target check (every 5 s) ────────────────────────────
+            # ── Multi-target check ────────────────────────────────────────
             # Must run before P&L update so remaining_quantity is already correct.
             if prices:
                 kite_for_targets = self._get_kite()
                 loop_for_targets = asyncio.get_running_loop()
-                for symbol, pos in list(self.positions.items()):
-                    if symbol not in self.positions:  # may have been removed above
+                for symbol in symbols:
+                    pos = self.positions.get(symbol)
+                    if pos is None:  # may have been removed above
                         continue
                     ltp_t = prices.get(symbol)
                     if ltp_t and pos.targets:
-                        await self._check_targets(pos, symbol, ltp_t, kite_for_targets, loop_for_targets)
+                        async with pos.io_lock:
+                            if self.positions.get(symbol) is pos:
+                                await self._check_targets(pos, symbol, ltp_t, kite_for_targets, loop_for_targets)
 
             filled_symbols = []
 
-            for symbol, pos in list(self.positions.items()):
+            for symbol in symbols:
+                pos = self.positions.get(symbol)
+                if pos is None:
+                    continue
                 ltp = prices.get(symbol, pos.entry_price)
+                async with pos.io_lock:
+                    if self.positions.get(symbol) is not pos:  # booked while waiting
+                        continue
+                    closed = await self._evaluate_position(
+                        symbol, pos, ltp, check_gtts, active_gtt_ids if check_gtts else None
+                    )
+                if closed:
+                    filled_symbols.append(symbol)
 
-                # ── P&L update (use remaining_quantity after partial exits) ──
-                if pos.action == "BUY":
-                    pos.current_pnl = (ltp - pos.entry_price) * pos.remaining_quantity
-                else:
-                    pos.current_pnl = (pos.entry_price - ltp) * pos.remaining_quantity
+            # Clean up closed positions and unsubscribe from ticker
+            for sym in filled_symbols:
+                self._drop_position(sym)
 
-                # Log position update at reduced frequency (every 30s)
-                if check_gtts:
-                    move_done = (ltp - pos.entry_price) if pos.action == "BUY" else (pos.entry_price - ltp)
-                    move_total = (pos.target - pos.entry_price) if pos.action == "BUY" else (pos.entry_price - pos.target)
-                    progress = (move_done / move_total * 100) if move_total > 0 else 0
-                    self._log(
-                        "POS_UPDATE",
-                        f"{symbol}: LTP=₹{ltp:.2f} entry=₹{pos.entry_price:.2f} "
-                        f"P&L=₹{pos.current_pnl:+.2f} ({progress:.0f}% to TGT) "
-                        f"SL=₹{pos.stop_loss:.2f} TGT=₹{pos.target:.2f}"
-                        + (f" [trail×{pos.trail_count}]" if pos.trail_activated else ""),
-                        symbol=symbol,
-                    )
+            for sym in symbols:
+                self._arm_triggers(sym)
 
-                # ── Continuous Trailing Stop-Loss (every 30s only) ────────
-                # Only trail when price has moved favourably by at least 1 ATR.
-                # New SL trails 1.5 ATR behind the best price seen (watermark).
-                if check_gtts and pos.atr > 0:
-                    if pos.action == "BUY":
-                        # Update high watermark
-                        if ltp > pos.watermark:
-                            pos.watermark = ltp
-                        profit_from_peak = pos.watermark - pos.entry_price
-                        if profit_from_peak >= pos.atr:
-                            new_sl = round(pos.watermark - 1.5 * pos.atr, 2)
-                            if new_sl > pos.stop_loss + 0.05:  # meaningful improvement
-                                old_sl = pos.stop_loss
-                                pos.stop_loss = new_sl
-                                pos.trail_activated = True
-                                pos.trail_count += 1
-                                await self._update_gtt_exits(pos, new_sl, pos.target, ltp, reason="trail SL")
-                                self._log(
-                                    "TRAIL_SL",
-                                    f"{symbol}: SL trailed ₹{old_sl:.2f} → ₹{new_sl:.2f} "
-                                    f"(peak: ₹{pos.watermark:.2f}, trail #{pos.trail_count})",
-                                    symbol=symbol,
-                                )
-                                self._add_commentary(
-                                    "TRAIL_SL",
-                                    f"{symbol}: Stop-loss trailed up to ₹{new_sl:.2f} "
-                                    f"(was ₹{old_sl:.2f}). Price peaked at ₹{pos.watermark:.2f} — "
-                                    f"protecting profits. Trail #{pos.trail_count}.",
-                                    f"{symbol}: Stop-loss trail karke ₹{new_sl:.2f} pe aa gaya "
-                                    f"(pehle ₹{old_sl:.2f} tha). Price ₹{pos.watermark:.2f} tak gayi — "
-                                    f"profit protect ho raha hai. Trail #{pos.trail_count}.",
-                                    symbol=symbol,
-                                )
-                    else:  # SELL (short)
-                        # Update low watermark
-                        if ltp < pos.watermark:
-                            pos.watermark = ltp
-                        profit_from_trough = pos.entry_price - pos.watermark
-                        if profit_from_trough >= pos.atr:
-                            new_sl = round(pos.watermark + 1.5 * pos.atr, 2)
-                            if new_sl < pos.stop_loss - 0.05:  # meaningful improvement (lower = tighter)
-                                old_sl = pos.stop_loss
-                                pos.stop_loss = new_sl
-                                pos.trail_activated = True
-                                pos.trail_count += 1
-                                await self._update_gtt_exits(pos, new_sl, pos.target, ltp, reason="trail SL")
-                                self._log(
-                                    "TRAIL_SL",
-                                    f"{symbol}: SL trailed ₹{old_sl:.2f} → ₹{new_sl:.2f} "
-                                    f"(trough: ₹{pos.watermark:.2f}, trail #{pos.trail_count})",
-                                    symbol=symbol,
-                                )
-                                self._add_commentary(
-                                    "TRAIL_SL",
-                                    f"{symbol}: Stop-loss trailed down to ₹{new_sl:.2f} "
-                                    f"(was ₹{old_sl:.2f}). Short position trough ₹{pos.watermark:.2f} — "
-                                    f"protecting short profits. Trail #{pos.trail_count}.",
-                                    f"{symbol}: Short ka stop-loss trail karke ₹{new_sl:.2f} pe aa gaya "
-                                    f"(pehle ₹{old_sl:.2f} tha). Trough ₹{pos.watermark:.2f} — "
-                                    f"short ka profit protect ho raha hai. Trail #{pos.trail_count}.",
-                                    symbol=symbol,
-                                )
-
-                # ── Dynamic Target Adjustment on Trend Reversal (every 30s) ──
-                # Skipped for multi-target positions — exit levels are fixed (T1/T2/runner).
-                # When a position was moving favourably but price has since reversed
-                # by ≥ 0.5 ATR from the watermark (and we're still in profit), lower
-                # the target so the GTT fires sooner and locks in the remaining gain.
-                # Only done once per position to avoid GTT-churn.
-                if check_gtts and pos.atr > 0 and not pos.target_adjusted and not pos.targets:
-                    if pos.action == "BUY":
-                        reversal = pos.watermark - ltp  # how far price has dropped from peak
-                        in_profit = ltp > pos.entry_price
-                        if reversal >= 0.5 * pos.atr and in_profit:
-                            # Set new target just above current price (+0.3 ATR) so GTT fires quickly
-                            new_target = round(ltp + 0.3 * pos.atr, 2)
-                            # Only lower — and must still be profitable (above entry)
-                            if new_target < pos.target and new_target > pos.entry_price:
-                                old_target = pos.target
-                                pos.target = new_target
-                                pos.target_adjusted = True
-                                await self._update_gtt_exits(pos, pos.stop_loss, new_target, ltp, reason="target revision")
-                                self._log(
-                                    "TARGET_ADJ",
-                                    f"{symbol}: Target revised ₹{old_target:.2f} → ₹{new_target:.2f} "
-                                    f"(bearish reversal — price dropped ₹{reversal:.2f} from peak ₹{pos.watermark:.2f})",
-                                    symbol=symbol,
-                                )
-                                self._add_commentary(
-                                    "TARGET_ADJ",
-                                    f"{symbol}: Target revised down to ₹{new_target:.2f} "
-                                    f"(was ₹{old_target:.2f}). Price reversed ₹{reversal:.2f} from peak — "
-                                    f"locking in profits before they shrink further.",
-                                    f"{symbol}: Target ghatake ₹{new_target:.2f} kar diya "
-                                    f"(pehle ₹{old_target:.2f} tha). Price peak se ₹{reversal:.2f} neeche aayi — "
-                                    f"profit lock karne ke liye target adjust kiya.",
-                                    symbol=symbol,
-                                )
-                    else:  # SELL (short)
-                        reversal = ltp - pos.watermark  # how far price has risen from trough
-                        in_profit = ltp < pos.entry_price
-                        if reversal >= 0.5 * pos.atr and in_profit:
-                            # Set new target just below current price (−0.3 ATR)
-                            new_target = round(ltp - 0.3 * pos.atr, 2)
-                            # Only raise (closer to entry) — must still be profitable (below entry)
-                            if new_target > pos.target and new_target < pos.entry_price:
-                                old_target = pos.target
-                                pos.target = new_target
-                                pos.target_adjusted = True
-                                await self._update_gtt_exits(pos, pos.stop_loss, new_target, ltp, reason="target revision")
-                                self._log(
-                                    "TARGET_ADJ",
-                                    f"{symbol}: Target revised ₹{old_target:.2f} → ₹{new_target:.2f} "
-                                    f"(bullish reversal on short — price rose ₹{reversal:.2f} from trough ₹{pos.watermark:.2f})",
-                                    symbol=symbol,
-                                )
-                                self._add_commentary(
-                                    "TARGET_ADJ",
-                                    f"{symbol}: Short target revised to ₹{new_target:.2f} "
-                                    f"(was ₹{old_target:.2f}). Bullish reversal of ₹{reversal:.2f} from trough — "
-                                    f"securing short profits while we can.",
-                                    f"{symbol}: Short ka target ₹{new_target:.2f} kar diya "
-                                    f"(pehle ₹{old_target:.2f} tha). Price trough se ₹{reversal:.2f} upar aayi — "
-                                    f"short ka profit abhi secure kar rahe hain.",
-                                    symbol=symbol,
-                                )
-
-                # ── GTT fill detection (only when we fetched GTTs this iteration) ──
-                # Skip for gtt_skip_checks cycles after a GTT is placed/updated so
-                # the Zerodha API has time to show the new GTT as "active".
-                if check_gtts and pos.gtt_id:
-                    if pos.gtt_skip_checks > 0:
-                        pos.gtt_skip_checks -= 1
-                        logger.debug(
-                            f"[Agent:{self.user_id}] {symbol}: GTT settle cooldown "
-                            f"({pos.gtt_skip_checks} cycles left)"
+        except Exception as e:
+            self._log("ERROR", f"Monitor positions error: {e}")
+
+    async def _evaluate_position(
+        self,
+        symbol: str,
+        pos: PositionState,
+        ltp: float,
+        check_gtts: bool,
+        active_gtt_ids: Optional[set] = None,
+    ) -> bool:
+        """
+        P&L, trailing SL, target revision and daily-limit checks for one position
+        at `ltp`. GTT fill detection runs when `active_gtt_ids` (the GTT book) is
+        given. Returns True when the position's GTT has fired.
+        """
+        # ── P&L update (use remaining_quantity after partial exits) ──
+        if pos.action == "BUY":
+            pos.current_pnl = (ltp - pos.entry_price) * pos.remaining_quantity
+        else:
+            pos.current_pnl = (pos.entry_price - ltp) * pos.remaining_quantity
+
+        # Log position update at reduced frequency — tick-driven band crossings
+        # also run full evaluations, so cap it at one per POS_LOG_INTERVAL
+        if check_gtts and time.monotonic() - pos.last_logged >= self.POS_LOG_INTERVAL:
+            pos.last_logged = time.monotonic()
+            move_done = (ltp - pos.entry_price) if pos.action == "BUY" else (pos.entry_price - ltp)
+            move_total = (pos.target - pos.entry_price) if pos.action == "BUY" else (pos.entry_price - pos.target)
+            progress = (move_done / move_total * 100) if move_total > 0 else 0
+            self._log(
+                "POS_UPDATE",
+                f"{symbol}: LTP=₹{ltp:.2f} entry=₹{pos.entry_price:.2f} "
+                f"P&L=₹{pos.current_pnl:+.2f} ({progress:.0f}% to TGT) "
+                f"SL=₹{pos.stop_loss:.2f} TGT=₹{pos.target:.2f}"
+                + (f" [trail×{pos.trail_count}]" if pos.trail_activated else ""),
+                symbol=symbol,
+            )
+
+        # ── Continuous Trailing Stop-Loss ─────────────────────────
+        # Only trail when price has moved favourably by at least 1 ATR.
+        # New SL trails 1.5 ATR behind the best price seen (watermark).
+        # GTT re-issues are throttled to one per TRAIL_MIN_INTERVAL; a
+        # step that arrives sooner is re-checked once the interval is up.
+        if check_gtts and pos.atr > 0:
+            trail_wait = self.TRAIL_MIN_INTERVAL - (time.monotonic() - pos.last_exit_update)
+            if pos.action == "BUY":
+                # Update high watermark
+                if ltp > pos.watermark:
+                    pos.watermark = ltp
+                profit_from_peak = pos.watermark - pos.entry_price
+                if profit_from_peak >= pos.atr:
+                    new_sl = round(pos.watermark - 1.5 * pos.atr, 2)
+                    if new_sl > pos.stop_loss + 0.05 and trail_wait > 0:
+                        self._schedule_recheck(symbol, trail_wait)
+                    elif new_sl > pos.stop_loss + 0.05:  # meaningful improvement
+                        old_sl = pos.stop_loss
+                        pos.stop_loss = new_sl
+                        pos.trail_activated = True
+                        pos.trail_count += 1
+                        await self._update_gtt_exits(pos, new_sl, pos.target, ltp, reason="trail SL")
+                        self._log(
+                            "TRAIL_SL",
+                            f"{symbol}: SL trailed ₹{old_sl:.2f} → ₹{new_sl:.2f} "
+                            f"(peak: ₹{pos.watermark:.2f}, trail #{pos.trail_count})",
+                            symbol=symbol,
+                        )
+                        self._add_commentary(
+                            "TRAIL_SL",
+                            f"{symbol}: Stop-loss trailed up to ₹{new_sl:.2f} "
+                            f"(was ₹{old_sl:.2f}). Price peaked at ₹{pos.watermark:.2f} — "
+                            f"protecting profits. Trail #{pos.trail_count}.",
+                            f"{symbol}: Stop-loss trail karke ₹{new_sl:.2f} pe aa gaya "
+                            f"(pehle ₹{old_sl:.2f} tha). Price ₹{pos.watermark:.2f} tak gayi — "
+                            f"profit protect ho raha hai. Trail #{pos.trail_count}.",
+                            symbol=symbol,
+                        )
+            else:  # SELL (short)
+                # Update low watermark
+                if ltp < pos.watermark:
+                    pos.watermark = ltp
+                profit_from_trough = pos.entry_price - pos.watermark
+                if profit_from_trough >= pos.atr:
+                    new_sl = round(pos.watermark + 1.5 * pos.atr, 2)
+                    if new_sl < pos.stop_loss - 0.05 and trail_wait > 0:
+                        self._schedule_recheck(symbol, trail_wait)
+                    elif new_sl < pos.stop_loss - 0.05:  # meaningful improvement (lower = tighter)
+                        old_sl = pos.stop_loss
+                        pos.stop_loss = new_sl
+                        pos.trail_activated = True
+                        pos.trail_count += 1
+                        await self._update_gtt_exits(pos, new_sl, pos.target, ltp, reason="trail SL")
+                        self._log(
+                            "TRAIL_SL",
+                            f"{symbol}: SL trailed ₹{old_sl:.2f} → ₹{new_sl:.2f} "
+                            f"(trough: ₹{pos.watermark:.2f}, trail #{pos.trail_count})",
+                            symbol=symbol,
+                        )
+                        self._add_commentary(
+                            "TRAIL_SL",
+                            f"{symbol}: Stop-loss trailed down to ₹{new_sl:.2f} "
+                            f"(was ₹{old_sl:.2f}). Short position trough ₹{pos.watermark:.2f} — "
+                            f"protecting short profits. Trail #{pos.trail_count}.",
+                            f"{symbol}: Short ka stop-loss trail karke ₹{new_sl:.2f} pe aa gaya "
+                            f"(pehle ₹{old_sl:.2f} tha). Trough ₹{pos.watermark:.2f} — "
+                            f"short ka profit protect ho raha hai. Trail #{pos.trail_count}.",
+                            symbol=symbol,
                         )
-                if check_gtts and pos.gtt_id and pos.gtt_skip_checks == 0 \
-                        and str(pos.gtt_id) not in active_gtt_ids:
-                    self._log(
-                        "POSITION_CLOSED",
-                        f"{symbol}: GTT {pos.gtt_id} triggered — position closed | "
-                        f"P&L ≈ ₹{pos.current_pnl:+.2f} | "
-                        f"entry=₹{pos.entry_price:.2f} exit≈₹{ltp:.2f}",
-                        symbol=symbol,
-                    )
-                    self.daily_pnl += pos.current_pnl
-                    logger.info(
-                        f"[Agent:{self.user_id}] {symbol} closed — "
-                        f"P&L=₹{pos.current_pnl:+.2f}, daily_pnl=₹{self.daily_pnl:+.2f}"
-                    )
-                    _closed_pnl = pos.current_pnl
-                    _closed_direction = "profit" if _closed_pnl >= 0 else "loss"
-                    self._add_commentary(
-                        "POSITION_CLOSED",
-                        f"{symbol}: Position closed via GTT (SL or target hit). "
-                        f"P&L: ₹{_closed_pnl:+.2f} — a {_closed_direction} of ₹{abs(_closed_pnl):.2f}. "
-                        f"Entry ₹{pos.entry_price:.2f}, exit ≈₹{ltp:.2f}.",
-                        f"{symbol}: Position GTT se band hua (SL ya target hit). "
-                        f"P&L: ₹{_closed_pnl:+.2f} — {'fayda' if _closed_pnl >= 0 else 'nuksan'} ₹{abs(_closed_pnl):.2f}. "
-                        f"Entry ₹{pos.entry_price:.2f}, exit ≈₹{ltp:.2f}.",
-                        symbol=symbol,
-                    )
-                    filled_symbols.append(symbol)
-                    continue
 
-                # ── Check daily loss limit ────────────────────────────────
-                if self.starting_capital > 0:
-                    total_unrealised = sum(p.current_pnl for p in self.positions.values())
-                    loss_pct = abs(min(self.daily_pnl + total_unrealised, 0)) / self.starting_capital * 100
-                    if loss_pct >= self.max_daily_loss_pct and not self.daily_loss_limit_hit:
-                        self.daily_loss_limit_hit = True
+        # ── Dynamic Target Adjustment on Trend Reversal ────────────
+        # Skipped for multi-target positions — exit levels are fixed (T1/T2/runner).
+        # When a position was moving favourably but price has since reversed
+        # by ≥ 0.5 ATR from the watermark (and we're still in profit), lower
+        # the target so the GTT fires sooner and locks in the remaining gain.
+        # Only done once per position to avoid GTT-churn.
+        if check_gtts and pos.atr > 0 and not pos.target_adjusted and not pos.targets:
+            if pos.action == "BUY":
+                reversal = pos.watermark - ltp  # how far price has dropped from peak
+                in_profit = ltp > pos.entry_price
+                if reversal >= 0.5 * pos.atr and in_profit:
+                    # Set new target just above current price (+0.3 ATR) so GTT fires quickly
+                    new_target = round(ltp + 0.3 * pos.atr, 2)
+                    # Only lower — and must still be profitable (above entry)
+                    if new_target < pos.target and new_target > pos.entry_price:
+                        old_target = pos.target
+                        pos.target = new_target
+                        pos.target_adjusted = True
+                        await self._update_gtt_exits(pos, pos.stop_loss, new_target, ltp, reason="target revision")
+                        self._log(
+                            "TARGET_ADJ",
+                            f"{symbol}: Target revised ₹{old_target:.2f} → ₹{new_target:.2f} "
+                            f"(bearish reversal — price dropped ₹{reversal:.2f} from peak ₹{pos.watermark:.2f})",
+                            symbol=symbol,
+                        )
+                        self._add_commentary(
+                            "TARGET_ADJ",
+                            f"{symbol}: Target revised down to ₹{new_target:.2f} "
+                            f"(was ₹{old_target:.2f}). Price reversed ₹{reversal:.2f} from peak — "
+                            f"locking in profits before they shrink further.",
+                            f"{symbol}: Target ghatake ₹{new_target:.2f} kar diya "
+                            f"(pehle ₹{old_target:.2f} tha). Price peak se ₹{reversal:.2f} neeche aayi — "
+                            f"profit lock karne ke liye target adjust kiya.",
+                            symbol=symbol,
+                        )
+            else:  # SELL (short)
+                reversal = ltp - pos.watermark  # how far price has risen from trough
+                in_profit = ltp < pos.entry_price
+                if reversal >= 0.5 * pos.atr and in_profit:
+                    # Set new target just below current price (−0.3 ATR)
+                    new_target = round(ltp - 0.3 * pos.atr, 2)
+                    # Only raise (closer to entry) — must still be profitable (below entry)
+                    if new_target > pos.target and new_target < pos.entry_price:
+                        old_target = pos.target
+                        pos.target = new_target
+                        pos.target_adjusted = True
+                        await self._update_gtt_exits(pos, pos.stop_loss, new_target, ltp, reason="target revision")
                         self._log(
-                            "DAILY_LIMIT",
-                            f"Daily loss limit {self.max_daily_loss_pct}% hit — no more new trades today",
+                            "TARGET_ADJ",
+                            f"{symbol}: Target revised ₹{old_target:.2f} → ₹{new_target:.2f} "
+                            f"(bullish reversal on short — price rose ₹{reversal:.2f} from trough ₹{pos.watermark:.2f})",
+                            symbol=symbol,
                         )
                         self._add_commentary(
-                            "DAILY_LIMIT",
-                            f"Daily loss limit of {self.max_daily_loss_pct}% has been reached. "
-                            f"No new positions will be opened today. Protect the remaining capital.",
-                            f"Aaj ka loss limit {self.max_daily_loss_pct}% ho gaya. "
-                            f"Aaj koi nayi position open nahi hogi. Bacha hua capital protect karo.",
+                            "TARGET_ADJ",
+                            f"{symbol}: Short target revised to ₹{new_target:.2f} "
+                            f"(was ₹{old_target:.2f}). Bullish reversal of ₹{reversal:.2f} from trough — "
+                            f"securing short profits while we can.",
+                            f"{symbol}: Short ka target ₹{new_target:.2f} kar diya "
+                            f"(pehle ₹{old_target:.2f} tha). Price trough se ₹{reversal:.2f} upar aayi — "
+                            f"short ka profit abhi secure kar rahe hain.",
+                            symbol=symbol,
                         )
 
-            # Clean up closed positions and unsubscribe from ticker
-            for sym in filled_symbols:
-                pos = self.positions.pop(sym, None)
-                if pos and pos.instrument_token and self._ticker_manager:
-                    self._ticker_manager.unsubscribe(pos.instrument_token)
-                self._price_cache.remove_symbol(sym)
+        # ── GTT fill detection (only when we fetched GTTs this iteration) ──
+        # Skip for gtt_skip_checks cycles after a GTT is placed/updated so
+        # the Zerodha API has time to show the new GTT as "active".
+        if active_gtt_ids is not None and pos.gtt_id:
+            if pos.gtt_skip_checks > 0:
+                pos.gtt_skip_checks -= 1
+                logger.debug(
+                    f"[Agent:{self.user_id}] {symbol}: GTT settle cooldown "
+                    f"({pos.gtt_skip_checks} cycles left)"
+                )
+            elif str(pos.gtt_id) not in active_gtt_ids:
+                self._record_gtt_exit(symbol, pos, ltp)
+                return True
+            elif not self._exit_level_crossed(pos, ltp):
+                pos.exit_crossed = False
+
+        # ── Check daily loss limit ────────────────────────────────
+        if self.starting_capital > 0:
+            total_unrealised = sum(p.current_pnl for p in self.positions.values())
+            loss_pct = abs(min(self.daily_pnl + total_unrealised, 0)) / self.starting_capital * 100
+            if loss_pct >= self.max_daily_loss_pct and not self.daily_loss_limit_hit:
+                self.daily_loss_limit_hit = True
+                self._log(
+                    "DAILY_LIMIT",
+                    f"Daily loss limit {self.max_daily_loss_pct}% hit — no more new trades today",
+                )
+                self._add_commentary(
+                    "DAILY_LIMIT",
+                    f"Daily loss limit of {self.max_daily_loss_pct}% has been reached. "
+                    f"No new positions will be opened today. Protect the remaining capital.",
+                    f"Aaj ka loss limit {self.max_daily_loss_pct}% ho gaya. "
+                    f"Aaj koi nayi position open nahi hogi. Bacha hua capital protect karo.",
+                )
+
+        return False
 
+    # ── Tick-driven triggers ──────────────────────────────────────────────────
+
+    def _trigger_band(self, pos: PositionState) -> Tuple[Optional[float], Optional[float]]:
+        """
+        (lower, upper) prices between which evaluating `pos` can change nothing:
+        the stop-loss, the next target (or the GTT target leg), the next
+        watermark step and trail level, and the reversal level that revises
+        the target.
+        """
+        buy = pos.action == "BUY"
+        adverse = [pos.stop_loss]
+        favourable = []
+        next_target = next((t["price"] for t in pos.targets if not t["hit"]), None)
+        if next_target is not None:
+            favourable.append(next_target)
+        if not pos.targets:
+            favourable.append(pos.target)
+
+        if pos.atr > 0:
+            step = self.WATERMARK_STEP_ATR * pos.atr
+            if buy:
+                favourable.append(pos.watermark + step)
+                trail_at = max(pos.entry_price + pos.atr, pos.stop_loss + 1.5 * pos.atr + 0.05)
+                if trail_at > pos.watermark:
+                    favourable.append(trail_at)
+                reversal_at = pos.watermark - 0.5 * pos.atr
+                if not pos.target_adjusted and not pos.targets and reversal_at > pos.entry_price:
+                    adverse.append(reversal_at)
+            else:
+                favourable.append(pos.watermark - step)
+                trail_at = min(pos.entry_price - pos.atr, pos.stop_loss - 1.5 * pos.atr - 0.05)
+                if trail_at < pos.watermark:
+                    favourable.append(trail_at)
+                reversal_at = pos.watermark + 0.5 * pos.atr
+                if not pos.target_adjusted and not pos.targets and reversal_at < pos.entry_price:
+                    adverse.append(reversal_at)
+
+        if buy:
+            return max(adverse), (min(favourable) if favourable else None)
+        return (max(favourable) if favourable else None), min(adverse)
+
+    @staticmethod
+    def _exit_level_crossed(pos: PositionState, ltp: float) -> bool:
+        """True when `ltp` is through a level the position's GTT exits at."""
+        if pos.action == "BUY":
+            return ltp <= pos.stop_loss or (not pos.targets and ltp >= pos.target)
+        return ltp >= pos.stop_loss or (not pos.targets and ltp <= pos.target)
+
+    def _arm_triggers(self, symbol: str):
+        """(Re)arm `symbol`'s price band with the shared position_monitor."""
+        key = (self.user_id, symbol)
+        pos = self.positions.get(symbol)
+        if pos is None or not pos.instrument_token or not self.is_running:
+            position_monitor.disarm(key)
+            return
+        lower, upper = self._trigger_band(pos)
+
+        # A side the price is already through (SL hit but GTT not filled yet, a
+        # failed exit order) would re-fire on every tick — look again on the
+        # polling cadence instead.
+        ltp = self._price_cache.get_ltp(symbol)
+        if ltp is not None:
+            if upper is not None and ltp >= upper:
+                upper = None
+                self._schedule_recheck(symbol, self.POLL_MONITOR_SECONDS)
+            if lower is not None and ltp <= lower:
+                lower = None
+                self._schedule_recheck(symbol, self.POLL_MONITOR_SECONDS)
+
+        position_monitor.arm(
+            key, pos.instrument_token, lower, upper,
+            lambda price: self._on_trigger(symbol, price),
+            asyncio.get_running_loop(),
+        )
+
+    def _schedule_recheck(self, symbol: str, delay: float):
+        """Evaluate `symbol` again after `delay` seconds (keeps an earlier pending recheck)."""
+        loop = asyncio.get_running_loop()
+        handle = self._rechecks.get(symbol)
+        if handle is not None:
+            if handle.when() <= loop.time() + delay:
+                return
+            handle.cancel()
+        self._rechecks[symbol] = loop.call_later(delay, self._recheck, symbol)
+
+    def _recheck(self, symbol: str):
+        self._rechecks.pop(symbol, None)
+        self._on_trigger(symbol, None)
+
+    def _on_trigger(self, symbol: str, price: Optional[float]):
+        """position_monitor callback — runs on this agent's event loop."""
+        task = asyncio.ensure_future(self._handle_trigger(symbol, price))
+        self._trigger_tasks.add(task)
+        task.add_done_callback(self._trigger_tasks.discard)
+
+    async def _handle_trigger(self, symbol: str, price: Optional[float]):
+        """
+        A band was crossed (or a recheck came due): run the full evaluation for
+        this one position at the tick price, then re-arm. Crossing the SL or the
+        GTT target leg starts a short GTT-book poll so the exit is booked
+        within seconds.
+
+        Holds only the position's own io_lock, so a slow Kite call here does
+        not hold up triggers for the agent's other positions.
+        """
+        confirm = False
+        try:
+            pos = self.positions.get(symbol)
+            if pos is None or not self.is_running:
+                return
+            async with pos.io_lock:
+                if self.positions.get(symbol) is not pos or not self.is_running:
+                    return
+                if price is None:
+                    price = self._price_cache.get_ltp(symbol)
+                if price is None or not _is_market_open():
+                    self._arm_triggers(symbol)
+                    return
+
+                if pos.targets:
+                    await self._check_targets(pos, symbol, price, self._get_kite(), asyncio.get_running_loop())
+                    if symbol not in self.positions:  # all targets hit
+                        return
+                await self._evaluate_position(symbol, pos, price, check_gtts=True)
+                if pos.gtt_id and not pos.exit_crossed and self._exit_level_crossed(pos, price):
+                    pos.exit_crossed = True
+                    confirm = True
+                    sl_hit = price <= pos.stop_loss if pos.action == "BUY" else price >= pos.stop_loss
+                    self._log(
+                        "EXIT_CROSSED",
+                        f"{symbol}: LTP ₹{price:.2f} crossed {'SL' if sl_hit else 'target'} — "
+                        f"confirming GTT {pos.gtt_id}",
+                        symbol=symbol,
+                    )
+                self._arm_triggers(symbol)
+
+            if confirm and not order_updates.is_live(self.api_key):
+                await self._confirm_gtt_exit(symbol)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            self._log("ERROR", f"Monitor positions error: {e}")
+            logger.exception(f"[Agent:{self.user_id}] {symbol}: trigger evaluation failed")
+            self._log("ERROR", f"{symbol}: Trigger evaluation error: {e}", symbol=symbol)
+
+    async def _confirm_gtt_exit(self, symbol: str):
+        """Poll the GTT book a few times after an SL/target crossing; book the exit once it fires."""
+        kite = self._get_kite()
+        loop = asyncio.get_running_loop()
+        for delay in self.GTT_CONFIRM_DELAYS:
+            await asyncio.sleep(delay)
+            pos = self.positions.get(symbol)
+            if pos is None or not pos.gtt_id or pos.gtt_skip_checks > 0:
+                return
+            try:
+                gtts = await loop.run_in_executor(executors.pool("broker-data"), kite.get_gtts)
+            except Exception as e:
+                logger.warning(f"[Agent:{self.user_id}] {symbol}: GTT confirm fetch failed: {e}")
+                continue
+            active = {str(g.get("id")) for g in gtts if g.get("status", "").lower() == "active"}
+            if str(pos.gtt_id) in active:
+                continue
+            async with self._position_lock:
+                if self.positions.get(symbol) is not pos:
+                    return
+                ltp = self._price_cache.get_ltp(symbol) or pos.entry_price
+                self._refresh_pnl([symbol])
+                self._record_gtt_exit(symbol, pos, ltp)
+                self._drop_position(symbol)
+            return
+        # Still active (limit leg not filled yet) — the 30 s reconcile keeps watching
+        # while exit_crossed is set.
+
+    # ── Order postbacks ───────────────────────────────────────────────────────
+
+    def _on_order_update(self, order: Dict):
+        """order_updates listener — runs on this agent's event loop."""
+        task = asyncio.ensure_future(self._handle_order_update(order))
+        self._trigger_tasks.add(task)
+        task.add_done_callback(self._trigger_tasks.discard)
+
+    async def _handle_order_update(self, order: Dict):
+        """
+        Promote a pending limit order that just filled (and place its SL GTT),
+        or book a position whose exit filled outside the agent — its GTT, or a
+        manual exit from the broker app. Only exits placed after the position
+        was entered count: every (re)connect replays the day's order book, which
+        includes exits of earlier round trips on the same symbol.
+        """
+        oid = str(order.get("order_id"))
+        status = (order.get("status") or "").upper()
+        try:
+            async with self._position_lock:
+                if not self.is_running:
+                    return
+                if oid in self.pending_orders:
+                    if status in TERMINAL_STATUSES:
+                        await self._check_pending_order_fills([order])
+                    return
+
+                symbol = order.get("tradingsymbol")
+                pos = self.positions.get(symbol)
+                if (
+                    pos is None
+                    or status != "COMPLETE"
+                    or oid in self._exit_order_ids
+                    or order.get("transaction_type") != ("SELL" if pos.action == "BUY" else "BUY")
+                    or int(order.get("filled_quantity") or 0) < pos.remaining_quantity
+                ):
+                    return
+                placed_at = _order_time(order)
+                entered_at = datetime.fromisoformat(pos.entered_at).replace(microsecond=0)
+                if placed_at is None or placed_at < entered_at:
+                    logger.debug(
+                        f"[Agent:{self.user_id}] {symbol}: ignoring exit order {oid} "
+                        f"placed {placed_at} — before position entry {pos.entered_at}"
+                    )
+                    return
+
+                exit_price = float(order.get("average_price") or 0) or (
+                    self._price_cache.get_ltp(symbol) or pos.entry_price
+                )
+                if pos.action == "BUY":
+                    pos.current_pnl = (exit_price - pos.entry_price) * pos.remaining_quantity
+                else:
+                    pos.current_pnl = (pos.entry_price - exit_price) * pos.remaining_quantity
+                self._record_gtt_exit(symbol, pos, exit_price)
+                self._drop_position(symbol)
+        except Exception as e:
+            logger.exception(f"[Agent:{self.user_id}] Order update {oid} handling failed")
+            self._log("ERROR", f"Order update {oid} handling failed: {e}")
+
+    def _record_gtt_exit(self, symbol: str, pos: PositionState, ltp: float):
+        """Book a position whose GTT has fired (caller removes it)."""
+        self._log(
+            "POSITION_CLOSED",
+            f"{symbol}: GTT {pos.gtt_id} triggered — position closed | "
+            f"P&L ≈ ₹{pos.current_pnl:+.2f} | "
+            f"entry=₹{pos.entry_price:.2f} exit≈₹{ltp:.2f}",
+            symbol=symbol,
+        )
+        self.daily_pnl += pos.current_pnl
+        logger.info(
+            f"[Agent:{self.user_id}] {symbol} closed — "
+            f"P&L=₹{pos.current_pnl:+.2f}, daily_pnl=₹{self.daily_pnl:+.2f}"
+        )
+        _closed_pnl = pos.current_pnl
+        _closed_direction = "profit" if _closed_pnl >= 0 else "loss"
+        self._add_commentary(
+            "POSITION_CLOSED",
+            f"{symbol}: Position closed via GTT (SL or target hit). "
+            f"P&L: ₹{_closed_pnl:+.2f} — a {_closed_direction} of ₹{abs(_closed_pnl):.2f}. "
+            f"Entry ₹{pos.entry_price:.2f}, exit ≈₹{ltp:.2f}.",
+            f"{symbol}: Position GTT se band hua (SL ya target hit). "
+            f"P&L: ₹{_closed_pnl:+.2f} — {'fayda' if _closed_pnl >= 0 else 'nuksan'} ₹{abs(_closed_pnl):.2f}. "
+            f"Entry ₹{pos.entry_price:.2f}, exit ≈₹{ltp:.2f}.",
+            symbol=symbol,
+        )
+
+    def _drop_position(self, symbol: str):
+        """Forget a closed position: disarm its triggers and unsubscribe from ticker."""
+        pos = self.positions.pop(symbol, None)
+        position_monitor.disarm((self.user_id, symbol))
+        handle = self._rechecks.pop(symbol, None)
+        if handle is not None:
+            handle.cancel()
+        if pos and pos.instrument_token and self._ticker_manager:
+            self._ticker_manager.unsubscribe(pos.instrument_token)
+        self._price_cache.remove_symbol(symbol)
 
     # ── Update exits: cancel GTT + re-issue with new SL and/or target ────────
 
@@ -1848,7 +2275,7 @@ class UserTradingAgent:
             if pos.gtt_id:
                 try:
                     gtt_id = pos.gtt_id
-                    await loop.run_in_executor(None, lambda: kite.delete_gtt(gtt_id))
+                    await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.delete_gtt(gtt_id))
                     self._log("GTT_CANCEL", f"{pos.symbol}: GTT {pos.gtt_id} cancelled ({reason})", symbol=pos.symbol)
                 except Exception as e:
                     self._log("WARN", f"{pos.symbol}: Could not cancel GTT: {e}", symbol=pos.symbol)
@@ -1868,7 +2295,7 @@ class UserTradingAgent:
                     }
                 ]
                 new_gtt_id = await loop.run_in_executor(
-                    None,
+                    executors.pool("broker-orders", Priority.HIGH),
                     lambda: kite.place_gtt(
                         trigger_type="single",
                         tradingsymbol=pos.symbol,
@@ -1898,7 +2325,7 @@ class UserTradingAgent:
                         {"transaction_type": "SELL", "quantity": qty, "order_type": "LIMIT", "product": "MIS", "price": new_target},
                     ]
                 new_gtt_id = await loop.run_in_executor(
-                    None,
+                    executors.pool("broker-orders", Priority.HIGH),
                     lambda: kite.place_gtt(
                         trigger_type="two-leg",
                         tradingsymbol=pos.symbol,
@@ -1916,6 +2343,7 @@ class UserTradingAgent:
 
             pos.gtt_id = new_gtt_id
             pos.gtt_skip_checks = 2  # allow Zerodha API to reflect new GTT before checking fill
+            pos.last_exit_update = time.monotonic()
 
         except Exception as e:
             self._log("ERROR", f"{pos.symbol}: GTT update failed: {e}", symbol=pos.symbol)
@@ -1932,7 +2360,7 @@ class UserTradingAgent:
             if pos.gtt_id:
                 try:
                     gtt_id = pos.gtt_id
-                    await loop.run_in_executor(None, lambda: kite.delete_gtt(gtt_id))
+                    await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.delete_gtt(gtt_id))
                     pos.gtt_id = None
                     self._log("GTT_CANCEL", f"{symbol}: GTT cancelled on agent stop", symbol=symbol)
                 except Exception as e:
@@ -1950,53 +2378,55 @@ class UserTradingAgent:
         loop = asyncio.get_running_loop()
 
         for symbol, pos in list(self.positions.items()):
-            try:
-                # Cancel GTT first to avoid double-fill
-                if pos.gtt_id:
-                    try:
-                        gtt_id = pos.gtt_id
-                        await loop.run_in_executor(None, lambda: kite.delete_gtt(gtt_id))
-                        self._log("GTT_CANCEL", f"{symbol}: GTT cancelled before squareoff", symbol=symbol)
-                    except Exception:
-                        pass
-
-                # Close remaining position at market
-                close_txn = "SELL" if pos.action == "BUY" else "BUY"
-                qty = pos.remaining_quantity  # partial exits may have already reduced this
-                logger.info(
-                    f"[Agent:{self.user_id}] Placing squareoff — {symbol} {close_txn} {qty} MIS MARKET"
-                )
-                order_id = await loop.run_in_executor(
-                    None,
-                    lambda: kite.place_order(
-                        variety="regular",
-                        exchange="NSE",
-                        tradingsymbol=symbol,
-                        transaction_type=close_txn,
-                        quantity=qty,
-                        product="MIS",
-                        order_type="MARKET",
-                    ),
-                )
-                self._log(
-                    "SQUAREOFF",
-                    f"{symbol}: ✓ Squareoff placed — {close_txn} {qty} MIS MARKET | "
-                    f"order_id={order_id} | P&L≈₹{pos.current_pnl:+.2f}",
-                    symbol=symbol,
-                )
-                self.daily_pnl += pos.current_pnl
+            async with pos.io_lock:  # let an in-flight trigger's GTT change finish
+                if self.positions.get(symbol) is pos:
+                    await self._squareoff_position(symbol, pos, kite, loop)
 
-                # Unsubscribe from ticker
-                if pos.instrument_token and self._ticker_manager:
-                    self._ticker_manager.unsubscribe(pos.instrument_token)
-                self._price_cache.remove_symbol(symbol)
-                self.positions.pop(symbol, None)
+        self.status = "MONITORING"
 
-            except Exception as e:
-                logger.exception(f"[Agent:{self.user_id}] {symbol}: Squareoff raised exception")
-                self._log("ERROR", f"{symbol}: Squareoff failed — {e}", symbol=symbol)
+    async def _squareoff_position(self, symbol: str, pos: PositionState, kite, loop):
+        """Cancel the position's GTT and close what remains at market."""
+        try:
+            # Cancel GTT first to avoid double-fill
+            if pos.gtt_id:
+                try:
+                    gtt_id = pos.gtt_id
+                    await loop.run_in_executor(executors.pool("broker-orders", Priority.URGENT), lambda: kite.delete_gtt(gtt_id))
+                    self._log("GTT_CANCEL", f"{symbol}: GTT cancelled before squareoff", symbol=symbol)
+                except Exception:
+                    pass
 
-        self.status = "MONITORING"
+            # Close remaining position at market
+            close_txn = "SELL" if pos.action == "BUY" else "BUY"
+            qty = pos.remaining_quantity  # partial exits may have already reduced this
+            logger.info(
+                f"[Agent:{self.user_id}] Placing squareoff — {symbol} {close_txn} {qty} MIS MARKET"
+            )
+            order_id = await loop.run_in_executor(
+                executors.pool("broker-orders", Priority.URGENT),
+                lambda: kite.place_order(
+                    variety="regular",
+                    exchange="NSE",
+                    tradingsymbol=symbol,
+                    transaction_type=close_txn,
+                    quantity=qty,
+                    product="MIS",
+                    order_type="MARKET",
+                ),
+            )
+            self._exit_order_ids.add(str(order_id))
+            self._log(
+                "SQUAREOFF",
+                f"{symbol}: ✓ Squareoff placed — {close_txn} {qty} MIS MARKET | "
+                f"order_id={order_id} | P&L≈₹{pos.current_pnl:+.2f}",
+                symbol=symbol,
+            )
+            self.daily_pnl += pos.current_pnl
+            self._drop_position(symbol)
+
+        except Exception as e:
+            logger.exception(f"[Agent:{self.user_id}] {symbol}: Squareoff raised exception")
+            self._log("ERROR", f"{symbol}: Squareoff failed — {e}", symbol=symbol)
 
     # ── Manual position registration ──────────────────────────────────────────
 
@@ -3,6 +3,8 @@ import asyncio
 from app.core.logging import logger
 from app.services.zerodha_service import zerodha_service
 from app.services.order_service import order_service, MarketClosedException, AmoOrderPlaced
+from app.services.order_updates import order_updates
+from app.services.ticker_service import ticker_service
 from app.models.analysis_models import ExecutionUpdate
 from typing import List, Dict, Callable, Tuple
 
@@ -13,7 +15,8 @@ class ExecutionAgent:
 
     Workflow:
       1. Place entry order  (BUY for long / SELL for short-sell) via MIS or CNC
-      2. Wait for order fill — captures actual fill price
+      2. Wait for order fill — order-update postbacks when the user's ticker
+         feed is live, REST polling otherwise; captures actual fill price
       3. Recalculate SL/target if fill price deviates from expected entry price
       4. Fetch live LTP for accurate GTT last_price
       5. Validate GTT trigger prices make sense vs current market price
@@ -62,6 +65,13 @@ class ExecutionAgent:
 
         # Reinitialize kite with this user's api_key + access_token.
         self.zs.set_credentials(api_key, access_token)
+        # Order postbacks for the fill wait (connects in the background; the
+        # wait polls until the feed is live)
+        holds_order_stream = False
+        try:
+            holds_order_stream = ticker_service.acquire_order_stream(api_key, access_token)
+        except Exception as e:
+            logger.warning(f"{stock_symbol}: order-update stream unavailable ({e}) — polling for fill")
 
         try:
             # ── Step 1: Place LIMIT entry order ────────────────────────────
@@ -163,7 +173,7 @@ class ExecutionAgent:
             fill_timeout = 300  # 5 minutes for both modes
 
             is_filled, fill_info = await self._wait_for_order_fill(
-                entry_order_id, timeout=fill_timeout
+                entry_order_id, timeout=fill_timeout, api_key=api_key
             )
 
             if not is_filled:
@@ -199,15 +209,19 @@ class ExecutionAgent:
                         f"may have filled just at timeout edge; verifying status…"
                     )
 
-                # Wait 1 s for Zerodha to process cancel/fill, then check truth
-                await asyncio.sleep(1)
-                try:
-                    verify = await self.zs.get_order_status(entry_order_id)
-                    verified_status = verify.get("status", "").upper()
-                except Exception as verify_err:
-                    logger.error(f"{stock_symbol}: could not verify order status: {verify_err}")
-                    verified_status = "UNKNOWN"
-                    verify = {}
+                # Wait for Zerodha to process cancel/fill, then check truth —
+                # the cancel/fill postback when the feed is live, else 1 s + REST
+                verify = None
+                if order_updates.is_live(api_key):
+                    verify = await order_updates.wait(api_key, entry_order_id, timeout=5)
+                if verify is None:
+                    await asyncio.sleep(1)
+                    try:
+                        verify = await self.zs.get_order_status(entry_order_id)
+                    except Exception as verify_err:
+                        logger.error(f"{stock_symbol}: could not verify order status: {verify_err}")
+                        verify = {}
+                verified_status = (verify.get("status") or "UNKNOWN").upper()
 
                 if verified_status == "COMPLETE":
                     # Order filled at the timeout edge — proceed to GTT placement
@@ -305,7 +319,7 @@ class ExecutionAgent:
             except Exception:
                 # kite.ltp() needs paid plan — try kite.quote() instead
                 try:
-                    quote_data = await self.zs.get_quote([stock_symbol])
+                    quote_data = await self.zs.get_quote([stock_symbol], max_age=0)  # GTT last_price must be live
                     quote_key = f"NSE:{stock_symbol}"
                     live_quote = quote_data.get(quote_key, {}).get("last_price", 0.0)
                     if live_quote > 0:
@@ -559,6 +573,10 @@ class ExecutionAgent:
             execution_log["error"] = str(e)
             return execution_log
 
+        finally:
+            if holds_order_stream:
+                ticker_service.release_order_stream(api_key)
+
     # ── GTT price validation ───────────────────────────────────────────────────
 
     def _validate_and_fix_gtt_prices(
@@ -725,22 +743,33 @@ class ExecutionAgent:
     # ── Order monitoring ──────────────────────────────────────────────────────
 
     async def _wait_for_order_fill(
-        self, order_id: str, timeout: int = 300
+        self, order_id: str, timeout: int = 300, api_key: str = ""
     ) -> Tuple[bool, dict]:
         """
-        Poll until order is COMPLETE, CANCELLED, or REJECTED, or timeout.
+        Wait until order is COMPLETE, CANCELLED, or REJECTED, or timeout.
+
+        While the user's order-update feed is live the terminal postback is
+        awaited directly; otherwise (no feed yet, disconnected, reconciling)
+        the order is polled over REST every 2 s.
 
         Returns:
             (True,  {"average_price": float, "status": "COMPLETE", ...})  on fill
             (False, {"status": "CANCELLED"/"REJECTED"/"TIMEOUT", "status_message": str})  otherwise
         """
-        start_time = asyncio.get_event_loop().time()
+        loop = asyncio.get_event_loop()
+        start_time = loop.time()
         poll_interval = 2
         last_order_detail: dict = {}
 
-        while asyncio.get_event_loop().time() - start_time < timeout:
+        while (remaining := timeout - (loop.time() - start_time)) > 0:
             try:
-                order_detail = await self.zs.get_order_status(order_id)
+                order_detail = None
+                if api_key and order_updates.is_live(api_key):
+                    order_detail = await order_updates.wait(api_key, order_id, remaining)
+                    if order_detail is None:
+                        continue  # timed out, or the feed dropped → poll
+                else:
+                    order_detail = await self.zs.get_order_status(order_id)
                 last_order_detail = order_detail
                 status = order_detail.get("status", "").upper()
                 logger.info(f"Order {order_id} status: {status}")
@@ -12,6 +12,7 @@ from app.agents.llm_agent import llm_agent
 from app.agents.execution_agent import execution_agent
 from app.engines.risk_engine import risk_engine
 from app.core.logging import logger
+from app.core.executors import executors
 from typing import List
 from datetime import datetime
 import uuid
@@ -59,7 +60,7 @@ async def get_sector_activity():
     try:
         loop = __import__("asyncio").get_event_loop()
         sectors = await loop.run_in_executor(
-            None, nse_sector_service.get_sector_activity
+            executors.pool("market-data-download"), nse_sector_service.get_sector_activity
         )
         return {
             "sectors": sectors,
@@ -8,6 +8,7 @@ from app.models.auth_models import (
 )
 from app.services.zerodha_service import zerodha_service
 from app.core.logging import logger
+from app.core.executors import executors
 from app.core.config import get_settings
 from app.core.limiter import limiter
 
@@ -196,7 +197,7 @@ async def validate_token(
         kite = KiteConnect(api_key=api_key)
         kite.set_access_token(access_token)
         loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, kite.profile)
+        await loop.run_in_executor(executors.pool("broker-data"), kite.profile)
         return {"valid": True}
     except Exception as e:
         logger.warning(f"Token validation failed: {e}")
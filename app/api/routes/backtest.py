@@ -1,11 +1,25 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from app.engines.backtest_engine import backtest_engine, BacktestRequest, NIFTY_UNIVERSE
+from app.engines.backtest_engine import (
+    backtest_engine, BacktestRequest, SweepRequest, WalkForwardRequest, PortfolioBacktestRequest,
+    IntradayBacktestRequest, NIFTY_UNIVERSE, SWEEP_RANK_KEYS,
+)
+from app.services.backtest_results import backtest_results
+from app.services.backtest_jobs import backtest_jobs
 from app.core.logging import logger
 
 router = APIRouter()
 
+_BACKGROUND = Query(
+    default=False,
+    description="Queue as a background job and return its job id at once "
+                "(progress: GET /backtest/jobs/{job_id}/events)",
+)
+
 
 class BacktestRequestBody(BaseModel):
     symbols: Optional[List[str]] = Field(
@@ -55,12 +69,24 @@ class BacktestRequestBody(BaseModel):
     )
     include_trades_detail: bool = Field(
         default=True,
-        description="Include per-trade detail rows in the response",
+        description="Include the first page of per-trade rows in the response "
+                    "(all trades: GET /backtest/runs/{run_id}/trades)",
+    )
+    robustness_paths: int = Field(
+        default=10000,
+        ge=0,
+        le=200000,
+        description="Monte Carlo bootstrap / permutation paths for the risk bands (0 = skip)",
+    )
+    ruin_pct: float = Field(
+        default=50.0,
+        gt=0,
+        description="Equity drop from the start (% of capital) counted as ruin",
     )
 
 
 @router.post("/run")
-async def run_backtest(body: BacktestRequestBody):
+async def run_backtest(body: BacktestRequestBody, background: bool = _BACKGROUND):
     """
     Run a full backtest of the current strategy on historical daily data.
 
@@ -79,6 +105,17 @@ async def run_backtest(body: BacktestRequestBody):
 
     **Report includes**: win rate, profit factor, expected value, max drawdown,
     Sharpe ratio, breakdown by signal type, signal strength, and per-symbol stats.
+
+    Trades are stored under the returned `run_id`; page through them with
+    `GET /backtest/runs/{run_id}/trades`. The run id is derived from the
+    request, engine code and input bars: repeating a request returns the stored
+    result, and extending `end_date` only simulates the new bars (`cache` in
+    the response says what was reused).
+
+    `robustness` holds percentile bands for max drawdown and terminal P&L over
+    bootstrap-resampled and shuffled trade sequences, plus risk of ruin. On
+    large runs the path count is capped by trade count (`paths_requested`
+    shows the original); POST /backtest/runs/{run_id}/robustness runs more.
     """
     try:
         req = BacktestRequest(
@@ -92,6 +129,8 @@ async def run_backtest(body: BacktestRequestBody):
             no_timeout=body.no_timeout,
             include_short=body.include_short,
             include_trades_detail=body.include_trades_detail,
+            robustness_paths=body.robustness_paths,
+            ruin_pct=body.ruin_pct,
         )
 
         logger.info(
@@ -101,15 +140,413 @@ async def run_backtest(body: BacktestRequestBody):
             f"| min_strength={req.min_signal_strength}"
         )
 
+        if background:
+            return backtest_jobs.submit("run", req)
         report = await backtest_engine.run_backtest(req)
         return report
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"[Backtest-API] Failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Backtest failed: {str(e)}")
 
 
+class SweepRequestBody(BaseModel):
+    symbols: Optional[List[str]] = Field(
+        default=None,
+        description="Stock symbols to test. Leave empty to use full Nifty 50 universe.",
+    )
+    start_date: str = Field(default="2024-01-01", description="Backtest start date (YYYY-MM-DD)")
+    end_date: Optional[str] = Field(
+        default=None,
+        description="Backtest end date (YYYY-MM-DD). Defaults to yesterday.",
+    )
+    sl_atr_multiplier_values: List[float] = Field(
+        default=[1.0],
+        description="SL ATR multipliers to try (the structural EMA50 stop currently ignores this)",
+    )
+    target_rr_values: List[float] = Field(
+        default=[1.5, 2.0, 2.5, 3.0],
+        description="Risk-reward ratios to try",
+    )
+    min_signal_strength_values: List[int] = Field(
+        default=[3, 4, 5],
+        description="Minimum signal strengths to try",
+    )
+    max_hold_bars_values: List[int] = Field(
+        default=[5, 10, 15, 20],
+        description="Max holding periods (days) to try — ignored when no_timeout=true",
+    )
+    no_timeout: bool = Field(default=False, description="Only SL or target can close a trade")
+    include_short: bool = Field(default=True, description="Backtest SELL signals too")
+    rank_by: str = Field(
+        default="profit_factor",
+        description=f"Ranking metric: one of {', '.join(SWEEP_RANK_KEYS)}",
+    )
+    min_trades: int = Field(
+        default=20,
+        ge=0,
+        description="Combinations with fewer trades are ranked below all others",
+    )
+    top_n: int = Field(default=50, ge=1, le=1000, description="Rows returned")
+
+
+@router.post("/sweep")
+async def run_sweep(body: SweepRequestBody, background: bool = _BACKGROUND):
+    """
+    Grid-search the backtest parameters in one run.
+
+    Data is fetched and indicators/signals are computed once per symbol; every
+    combination of `target_rr_values` × `min_signal_strength_values` ×
+    `max_hold_bars_values` × `sl_atr_multiplier_values` is then replayed on the
+    worker processes. Returns one row per combination (profit factor, Sharpe,
+    max drawdown, win rate, total P&L), ranked by `rank_by`.
+    """
+    req = SweepRequest(
+        symbols=body.symbols or [],
+        start_date=body.start_date,
+        end_date=body.end_date or "",
+        sl_atr_multiplier_values=body.sl_atr_multiplier_values,
+        target_rr_values=body.target_rr_values,
+        min_signal_strength_values=body.min_signal_strength_values,
+        max_hold_bars_values=body.max_hold_bars_values,
+        no_timeout=body.no_timeout,
+        include_short=body.include_short,
+        rank_by=body.rank_by,
+        min_trades=body.min_trades,
+        top_n=body.top_n,
+    )
+    try:
+        if background:
+            return backtest_jobs.submit("sweep", req)
+        return await backtest_engine.run_sweep(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"[Backtest-API] Sweep failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Sweep failed: {str(e)}")
+
+
+class WalkForwardRequestBody(BaseModel):
+    symbols: Optional[List[str]] = Field(
+        default=None,
+        description="Stock symbols to test. Leave empty to use full Nifty 50 universe.",
+    )
+    start_date: str = Field(default="2020-01-01", description="First train window starts here (YYYY-MM-DD)")
+    end_date: Optional[str] = Field(
+        default=None,
+        description="Last test window ends here (YYYY-MM-DD). Defaults to yesterday.",
+    )
+    train_months: int = Field(default=12, ge=1, le=120, description="Train (optimisation) window length")
+    test_months: int = Field(default=3, ge=1, le=60, description="Test window length and roll step")
+    target_rr_values: List[float] = Field(default=[1.5, 2.0, 2.5, 3.0], description="Risk-reward ratios to try")
+    min_signal_strength_values: List[int] = Field(default=[3, 4, 5], description="Minimum signal strengths to try")
+    max_hold_bars_values: List[int] = Field(
+        default=[5, 10, 15, 20],
+        description="Max holding periods (days) to try — ignored when no_timeout=true",
+    )
+    no_timeout: bool = Field(default=False, description="Only SL or target can close a trade")
+    include_short: bool = Field(default=True, description="Backtest SELL signals too")
+    rank_by: str = Field(
+        default="profit_factor",
+        description=f"Metric optimised on each train window: one of {', '.join(SWEEP_RANK_KEYS)}",
+    )
+    min_trades: int = Field(
+        default=20,
+        ge=0,
+        description="Combinations with fewer train trades are only picked if nothing else qualifies",
+    )
+
+
+@router.post("/walk-forward")
+async def run_walk_forward(body: WalkForwardRequestBody, background: bool = _BACKGROUND):
+    """
+    Walk-forward optimisation with out-of-sample evaluation.
+
+    History is split into rolling folds (`train_months` train → `test_months`
+    test, rolled by `test_months`). For each fold the parameter grid is ranked
+    on the train window and the winner is traded on the test window. The
+    response has per-fold parameters and metrics, out-of-sample metrics and
+    the stitched out-of-sample equity curve (cumulative % P&L by exit date).
+    """
+    req = WalkForwardRequest(
+        symbols=body.symbols or [],
+        start_date=body.start_date,
+        end_date=body.end_date or "",
+        train_months=body.train_months,
+        test_months=body.test_months,
+        target_rr_values=body.target_rr_values,
+        min_signal_strength_values=body.min_signal_strength_values,
+        max_hold_bars_values=body.max_hold_bars_values,
+        no_timeout=body.no_timeout,
+        include_short=body.include_short,
+        rank_by=body.rank_by,
+        min_trades=body.min_trades,
+    )
+    try:
+        if background:
+            return backtest_jobs.submit("walk_forward", req)
+        return await backtest_engine.run_walk_forward(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"[Backtest-API] Walk-forward failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Walk-forward failed: {str(e)}")
+
+
+class PortfolioBacktestRequestBody(BaseModel):
+    symbols: Optional[List[str]] = Field(
+        default=None,
+        description="Stock symbols to test. Leave empty to use full Nifty 50 universe.",
+    )
+    start_date: str = Field(default="2024-01-01", description="Backtest start date (YYYY-MM-DD)")
+    end_date: Optional[str] = Field(
+        default=None,
+        description="Backtest end date (YYYY-MM-DD). Defaults to yesterday.",
+    )
+    target_rr: float = Field(default=2.0, ge=0.5, le=10.0, description="Target = SL_distance × RR ratio")
+    min_signal_strength: int = Field(default=3, ge=1, le=8, description="Minimum signal strength")
+    max_hold_bars: int = Field(default=15, ge=1, le=60, description="Exit at close after N days")
+    no_timeout: bool = Field(default=False, description="Only SL or target can close a trade")
+    include_short: bool = Field(default=True, description="Trade SELL signals too")
+    initial_capital: float = Field(default=100000.0, gt=0, description="Starting capital (₹)")
+    max_positions: int = Field(default=2, ge=1, le=100, description="Max concurrent open positions")
+    max_trades_per_day: int = Field(default=3, ge=1, le=100, description="Max new entries per session")
+    risk_percent: float = Field(default=1.0, gt=0, le=10.0, description="% of capital × leverage risked per trade")
+    leverage: int = Field(default=1, ge=1, le=5, description="Leverage multiplier (1–5)")
+    capital_cap_pct: float = Field(
+        default=10.0,
+        gt=0,
+        le=100.0,
+        description="Max position notional as % of available capital",
+    )
+    include_trades_detail: bool = Field(default=True, description="Include per-trade rows in the response")
+
+
+@router.post("/portfolio")
+async def run_portfolio_backtest(body: PortfolioBacktestRequestBody, background: bool = _BACKGROUND):
+    """
+    Portfolio-level backtest on one shared capital pool.
+
+    All symbols' signals are merged into a single time-ordered stream and
+    traded the way the autonomous agent does: highest score first, at most
+    `max_positions` open and `max_trades_per_day` new entries, risk-based
+    position sizing capped at `capital_cap_pct` of available capital. Returns
+    a rupee equity curve, drawdown, CAGR and counts of signals skipped per limit.
+    """
+    req = PortfolioBacktestRequest(
+        symbols=body.symbols or [],
+        start_date=body.start_date,
+        end_date=body.end_date or "",
+        target_rr=body.target_rr,
+        min_signal_strength=body.min_signal_strength,
+        max_hold_bars=body.max_hold_bars,
+        no_timeout=body.no_timeout,
+        include_short=body.include_short,
+        initial_capital=body.initial_capital,
+        max_positions=body.max_positions,
+        max_trades_per_day=body.max_trades_per_day,
+        risk_percent=body.risk_percent,
+        leverage=body.leverage,
+        capital_cap_pct=body.capital_cap_pct,
+        include_trades_detail=body.include_trades_detail,
+    )
+    try:
+        if background:
+            return backtest_jobs.submit("portfolio", req)
+        return await backtest_engine.run_portfolio_backtest(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"[Backtest-API] Portfolio backtest failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Portfolio backtest failed: {str(e)}")
+
+
+class IntradayBacktestRequestBody(BaseModel):
+    symbols: Optional[List[str]] = Field(
+        default=None,
+        description="Stock symbols to test. Leave empty to use full Nifty 50 universe.",
+    )
+    start_date: str = Field(default="2024-01-01", description="Backtest start date (YYYY-MM-DD)")
+    end_date: Optional[str] = Field(
+        default=None,
+        description="Backtest end date (YYYY-MM-DD). Defaults to yesterday.",
+    )
+    min_signal_strength: int = Field(default=2, ge=1, le=5, description="Minimum intraday signal strength to enter")
+    include_short: bool = Field(default=True, description="Trade SELL signals too")
+    initial_capital: float = Field(default=100000.0, gt=0, description="Starting capital (₹)")
+    max_positions: int = Field(default=2, ge=1, le=20, description="Positions opened by the entering scan")
+    max_trades_per_day: int = Field(default=3, ge=1, le=20, description="Max new entries per session")
+    risk_percent: float = Field(default=1.0, gt=0, le=10.0, description="% of capital × leverage risked per trade")
+    leverage: int = Field(default=1, ge=1, le=5, description="Leverage multiplier (1–5)")
+    scan_interval_minutes: int = Field(default=5, ge=5, le=60, description="Minutes between scans (multiple of 5)")
+    include_trades_detail: bool = Field(default=True, description="Include per-trade rows in the response")
+
+
+@router.post("/intraday")
+async def run_intraday_backtest(body: IntradayBacktestRequestBody, background: bool = _BACKGROUND):
+    """
+    Intraday equity backtest on stored 5-minute candles.
+
+    Replays each session the way the autonomous agent trades it: intraday
+    indicators and signal on the bars so far, scans from 10:00, ATR-based
+    SL / T1 / T2 with 50% / 25% scale-out, trailing stop and 15:10 squareoff.
+    Only sessions already in the 5-minute candle store (or within yfinance's
+    last 60 days) can be replayed.
+    """
+    req = IntradayBacktestRequest(
+        symbols=body.symbols or [],
+        start_date=body.start_date,
+        end_date=body.end_date or "",
+        min_signal_strength=body.min_signal_strength,
+        include_short=body.include_short,
+        initial_capital=body.initial_capital,
+        max_positions=body.max_positions,
+        max_trades_per_day=body.max_trades_per_day,
+        risk_percent=body.risk_percent,
+        leverage=body.leverage,
+        scan_interval_minutes=body.scan_interval_minutes,
+        include_trades_detail=body.include_trades_detail,
+    )
+    try:
+        if background:
+            return backtest_jobs.submit("intraday", req)
+        return await backtest_engine.run_intraday_backtest(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"[Backtest-API] Intraday backtest failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Intraday backtest failed: {str(e)}")
+
+
 @router.get("/universe")
 async def get_universe():
     """Returns the default Nifty 50 universe used when no symbols are specified."""
     return {"symbols": NIFTY_UNIVERSE, "count": len(NIFTY_UNIVERSE)}
+
+
+@router.get("/runs/{run_id}")
+async def get_backtest_run(run_id: str):
+    """Summary report of a stored /run result set."""
+    report = backtest_results.report(run_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Backtest run {run_id} not found")
+    return report
+
+
+@router.get("/runs/{run_id}/trades")
+async def get_backtest_trades(
+    run_id: str,
+    offset: int = Query(default=0, ge=0, description="Index of the first trade to return"),
+    limit: int = Query(default=100, ge=1, le=1000, description="Trades per page"),
+    symbol: Optional[str] = Query(default=None, description="Only trades for this symbol"),
+    outcome: Optional[str] = Query(default=None, description="Only WIN, LOSS or TIMEOUT trades"),
+):
+    """
+    One page of per-trade rows from a stored /run result set, in simulation
+    order. Follow `next_offset` until it is null.
+    """
+    try:
+        page = backtest_results.trades_page(run_id, offset, limit, symbol, outcome)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"Backtest run {run_id} not found")
+    return page
+
+
+class RobustnessRequestBody(BaseModel):
+    paths: int = Field(default=10000, ge=1, le=200000, description="Paths per method")
+    ruin_pct: float = Field(
+        default=50.0,
+        gt=0,
+        description="Equity drop from the start (% of capital) counted as ruin",
+    )
+    position_size_pct: float = Field(
+        default=100.0,
+        gt=0,
+        le=100.0,
+        description="Share of capital each trade's P&L applies to",
+    )
+    seed: Optional[int] = Field(default=None, description="RNG seed for repeatable bands")
+
+
+@router.post("/runs/{run_id}/robustness")
+async def run_backtest_robustness(run_id: str, body: RobustnessRequestBody):
+    """
+    Monte Carlo risk bands for a stored /run result set with custom settings:
+    bootstrap (trades resampled with replacement) and permutation (same trades,
+    shuffled order) percentiles for max drawdown and terminal P&L, plus risk of ruin.
+    """
+    try:
+        result = await backtest_engine.run_robustness(
+            run_id, body.paths, body.ruin_pct, body.position_size_pct, body.seed
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"[Backtest-API] Robustness failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Robustness analysis failed: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Backtest run {run_id} not found")
+    return result
+
+
+# ── Background jobs ───────────────────────────────────────────────────────────
+
+@router.get("/jobs")
+async def list_backtest_jobs(limit: int = Query(default=50, ge=1, le=500)):
+    """Recently submitted background jobs, newest first (status and progress, no results)."""
+    return {"jobs": backtest_jobs.recent(limit)}
+
+
+@router.get("/jobs/{job_id}")
+async def get_backtest_job(job_id: str):
+    """Status, per-stage progress and — once done — the result of a background job."""
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Backtest job {job_id} not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_backtest_job(job_id: str):
+    """
+    SSE stream of a background job's events, replayed from submission:
+
+      data: {"type": "status", "status": "running", ...}
+      data: {"type": "progress", "stage": "simulate", "symbols": ["TCS"], "done": 12, "total": 50, ...}
+
+    Heartbeat every 15s while nothing happens. The stream ends after the
+    final status event (done, failed or cancelled); fetch the result from
+    GET /backtest/jobs/{job_id}.
+    """
+    if backtest_jobs.get(job_id, include_result=False) is None:
+        raise HTTPException(status_code=404, detail=f"Backtest job {job_id} not found")
+
+    async def event_generator():
+        try:
+            async for event in backtest_jobs.events(job_id):
+                yield f"data: {json.dumps(event)}\n\n"
+        except asyncio.CancelledError:
+            logger.info(f"[BacktestJobsSSE] Client disconnected: {job_id}")
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Connection": "keep-alive",
+        },
+    )
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_backtest_job(job_id: str):
+    """Cancel a queued or running job; its final status arrives on the event stream."""
+    job = backtest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Backtest job {job_id} not found")
+    return job
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Query, Header, HTTPException
 from app.services.zerodha_service import zerodha_service
 from app.core.logging import logger
+from app.core.executors import executors
 from datetime import datetime
 import asyncio
 from typing import List, Dict, Any
@@ -97,19 +98,19 @@ async def get_dashboard_summary(
         # Create async wrappers for kite methods
         async def get_margins():
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, kite.margins)
+            return await loop.run_in_executor(executors.pool("broker-data"), kite.margins)
 
         async def get_positions():
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, kite.positions)
+            return await loop.run_in_executor(executors.pool("broker-data"), kite.positions)
 
         async def get_orders():
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, kite.orders)
+            return await loop.run_in_executor(executors.pool("broker-data"), kite.orders)
 
         async def get_gtts():
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, kite.get_gtts)
+            return await loop.run_in_executor(executors.pool("broker-data"), kite.get_gtts)
 
         margins_data, positions_data, orders_data, gtts_data = await asyncio.gather(
             get_margins(),
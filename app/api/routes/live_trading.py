@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from typing import Optional, List
 from app.agents.autonomous_agent import autonomous_agent_manager
 from app.core.logging import logger
+from app.core.executors import executors
 
 router = APIRouter()
 
@@ -196,7 +197,7 @@ async def place_limit_order(req: PlaceLimitOrderRequest):
         import asyncio
         loop = asyncio.get_running_loop()
         try:
-            margins = await loop.run_in_executor(None, kite.margins)
+            margins = await loop.run_in_executor(executors.pool("broker-data"), kite.margins)
             equity = margins.get("equity", {})
             available = float(
                 equity.get("available", {}).get("live_balance")
@@ -235,7 +236,7 @@ async def place_limit_order(req: PlaceLimitOrderRequest):
         if otype == "LIMIT":
             order_kwargs["price"] = req.limit_price
 
-        order_id = str(await loop.run_in_executor(None, lambda: kite.place_order(**order_kwargs)))
+        order_id = str(await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.place_order(**order_kwargs)))
 
         logger.info(f"[place_limit_order] Order placed: {order_id} for {req.symbol} qty={quantity}")
 
@@ -389,7 +390,7 @@ async def get_balance(
         kite.set_access_token(access_token)
 
         loop = asyncio.get_running_loop()
-        margins = await loop.run_in_executor(None, kite.margins)
+        margins = await loop.run_in_executor(executors.pool("broker-data"), kite.margins)
 
         equity = margins.get("equity", {})
         available = float(
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Query, HTTPException
 from app.models.response_models import MonthlyPerformanceResponse
 from app.core.logging import logger
+from app.core.executors import executors
 from datetime import datetime
 from typing import Optional, List
 import asyncio
@@ -69,8 +70,8 @@ async def _fetch_today_raw_metrics(access_token: str, api_key: str) -> Optional[
         loop = asyncio.get_event_loop()
 
         positions_raw, trades_raw = await asyncio.gather(
-            loop.run_in_executor(None, kite.positions),
-            loop.run_in_executor(None, kite.trades),
+            loop.run_in_executor(executors.pool("broker-data"), kite.positions),
+            loop.run_in_executor(executors.pool("broker-data"), kite.trades),
             return_exceptions=True,
         )
 
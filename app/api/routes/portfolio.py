@@ -14,6 +14,7 @@ from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 from app.services.zerodha_service import zerodha_service
 from app.core.logging import logger
+from app.core.executors import executors
 from typing import List, Optional
 import asyncio
 import json
@@ -121,8 +122,8 @@ async def get_holdings(
         # Fetch holdings, active GTTs, and swing expiry data in parallel
         from app.storage.database import db
         raw, raw_gtts, swing_expiry = await asyncio.gather(
-            loop.run_in_executor(None, kite.holdings),
-            loop.run_in_executor(None, kite.get_gtts),
+            loop.run_in_executor(executors.pool("broker-data"), kite.holdings),
+            loop.run_in_executor(executors.pool("broker-data"), kite.get_gtts),
             db.get_swing_expiry_by_api_key(api_key),
             return_exceptions=True,
         )
@@ -280,7 +281,7 @@ async def _cancel_gtts_for_symbols(kite, symbols: set, loop) -> tuple[dict, dict
     cancelled: dict = {}
     errors: dict    = {}
     try:
-        raw_gtts = await loop.run_in_executor(None, kite.get_gtts)
+        raw_gtts = await loop.run_in_executor(executors.pool("broker-data"), kite.get_gtts)
     except Exception as e:
         logger.warning(f"[GTT Cancel] Could not fetch GTTs: {e}")
         return cancelled, errors
@@ -295,7 +296,7 @@ async def _cancel_gtts_for_symbols(kite, symbols: set, loop) -> tuple[dict, dict
             continue
         try:
             _id = gtt_id  # capture for lambda
-            await loop.run_in_executor(None, lambda: kite.delete_gtt(_id))
+            await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.delete_gtt(_id))
             cancelled[sym] = str(gtt_id)
             logger.info(f"[GTT Cancel] Deleted GTT {gtt_id} for {sym}")
         except Exception as e:
@@ -323,7 +324,7 @@ async def exit_holding(
         kite.set_access_token(access_token)
 
         loop = asyncio.get_event_loop()
-        holdings = await loop.run_in_executor(None, kite.holdings)
+        holdings = await loop.run_in_executor(executors.pool("broker-data"), kite.holdings)
 
         target = next(
             (h for h in holdings if h.get("tradingsymbol", "").upper() == symbol.upper()),
@@ -355,7 +356,7 @@ async def exit_holding(
             )
         limit_price = round(ltp, 2)
 
-        order_id = await loop.run_in_executor(None, lambda: kite.place_order(
+        order_id = await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.place_order(
             variety=kite.VARIETY_REGULAR,
             exchange=exch,
             tradingsymbol=symbol.upper(),
@@ -416,12 +417,12 @@ async def exit_all_holdings(
         kite.set_access_token(access_token)
 
         loop = asyncio.get_event_loop()
-        holdings = await loop.run_in_executor(None, kite.holdings)
+        holdings = await loop.run_in_executor(executors.pool("broker-data"), kite.holdings)
 
         # Build symbol → [gtt_id] map from active GTTs upfront (one API call for all)
         gtt_symbol_map: dict = {}
         try:
-            raw_gtts = await loop.run_in_executor(None, kite.get_gtts)
+            raw_gtts = await loop.run_in_executor(executors.pool("broker-data"), kite.get_gtts)
             for g in (raw_gtts or []):
                 if str(g.get("status", "")).lower() != "active":
                     continue
@@ -451,7 +452,7 @@ async def exit_all_holdings(
             limit_price = round(ltp, 2)
             try:
                 _sym = sym; _exch = exch; _qty = qty; _price = limit_price
-                order_id = await loop.run_in_executor(None, lambda: kite.place_order(
+                order_id = await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.place_order(
                     variety=kite.VARIETY_REGULAR,
                     exchange=_exch,
                     tradingsymbol=_sym,
@@ -468,7 +469,7 @@ async def exit_all_holdings(
                 for gtt_id in gtt_symbol_map.get(sym.upper(), []):
                     try:
                         _gid = gtt_id
-                        await loop.run_in_executor(None, lambda: kite.delete_gtt(_gid))
+                        await loop.run_in_executor(executors.pool("broker-orders"), lambda: kite.delete_gtt(_gid))
                         gtt_cancelled_ids.append(str(gtt_id))
                         logger.info(f"[ExitAll] Deleted GTT {gtt_id} for {sym}")
                     except Exception as ge:
@@ -865,7 +866,7 @@ async def create_gtt(request: GttCreateRequest):
             try:
                 loop = asyncio.get_event_loop()
                 instrument = f"{request.exchange.upper()}:{request.symbol.upper()}"
-                quote_raw = await loop.run_in_executor(None, lambda: kite.quote([instrument]))
+                quote_raw = await loop.run_in_executor(executors.pool("broker-data"), lambda: kite.quote([instrument]))
                 ltp = float(quote_raw.get(instrument, {}).get("last_price", 0))
             except Exception:
                 pass
@@ -912,7 +913,7 @@ async def create_gtt(request: GttCreateRequest):
 
         loop = asyncio.get_event_loop()
         raw_result = await loop.run_in_executor(
-            None,
+            executors.pool("broker-orders"),
             lambda: kite.place_gtt(
                 trigger_type=kite.GTT_TYPE_OCO,
                 tradingsymbol=request.symbol.upper(),
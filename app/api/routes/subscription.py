@@ -11,6 +11,7 @@ from datetime import datetime, timedelta
 
 from fastapi import APIRouter, HTTPException, Query, Header
 from app.core.logging import logger
+from app.core.executors import executors
 from app.core.config import get_settings
 from app.models.subscription_models import UsageStatusResponse, CreateSubscriptionRequest
 
@@ -164,7 +165,7 @@ async def activate_subscription(
 
     loop = asyncio.get_event_loop()
     try:
-        await loop.run_in_executor(None, _sync)
+        await loop.run_in_executor(executors.pool("db"), _sync)
     except Exception as e:
         logger.error(f"[Subscription] activate failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to activate subscription: {e}")
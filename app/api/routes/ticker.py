@@ -13,6 +13,7 @@ from fastapi import APIRouter, Query, HTTPException
 from fastapi.responses import StreamingResponse
 from app.services.ticker_service import ticker_service, INDEX_TOKENS
 from app.core.logging import logger
+from app.core.executors import executors
 from typing import Optional, List
 
 router = APIRouter()
@@ -98,7 +99,7 @@ async def get_price_snapshot(
     try:
         loop = asyncio.get_event_loop()
         snapshot = await loop.run_in_executor(
-            None,
+            executors.pool("broker-data"),
             lambda: ticker_service.get_snapshot(api_key, access_token, token_list),
         )
         return {
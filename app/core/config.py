@@ -33,6 +33,34 @@ class Settings(BaseSettings):
     DEFAULT_TIMEFRAME: str = "day"
     DEFAULT_RISK_PERCENT: float = 1.0
 
+    # Local market-data store (empty → <repo>/data/candles, <repo>/data/instruments, <repo>/data/features)
+    CANDLE_STORE_DIR: str = ""
+    INSTRUMENT_MASTER_DIR: str = ""
+    DAILY_FEATURES_DIR: str = ""
+
+    # Stored /backtest/run result sets (empty → <repo>/data/backtest_results); newest N kept
+    BACKTEST_RESULTS_DIR: str = ""
+    BACKTEST_RESULTS_KEEP: int = 50
+    # Background backtest jobs (empty dir → <repo>/data/backtest_jobs); concurrent jobs, finished jobs kept
+    BACKTEST_JOBS_DIR: str = ""
+    BACKTEST_JOB_WORKERS: int = 1
+    BACKTEST_JOBS_KEEP: int = 100
+    # Backtest worker processes all jobs together may occupy (0 → half the process pool)
+    BACKTEST_JOB_PROCESSES: int = 0
+
+    # Screener fan-out — concurrent kite.quote / yfinance batches, retries per batch
+    SCREEN_QUOTE_CONCURRENCY: int = 4
+    SCREEN_YF_CONCURRENCY: int = 4
+    SCREEN_BATCH_RETRIES: int = 2
+
+    # Executor pools for blocking calls — threads per pool (see app/core/executors.py)
+    EXECUTOR_BROKER_ORDERS_WORKERS: int = 8
+    EXECUTOR_BROKER_DATA_WORKERS: int = 16
+    EXECUTOR_DOWNLOAD_WORKERS: int = 6
+    EXECUTOR_DB_WORKERS: int = 10
+    # CPU-bound backtest simulation — worker processes (0 → one per core)
+    EXECUTOR_BACKTEST_PROCESSES: int = 0
+
     # Database Config
     DB_SERVER: Optional[str] = None
     DB_NAME: Optional[str] = None
@@ -0,0 +1,226 @@
+"""
+Named, separately sized thread pools for blocking calls.
+
+Everything used to run on the event loop's default executor, so a slow
+yfinance batch could leave squareoff / GTT calls queued behind it. Blocking
+work now goes to the pool that matches its kind:
+
+    broker-orders          place/modify/cancel orders, GTT place/modify/delete
+    broker-data            kiteconnect reads: quotes, positions, orders, margins, history
+    market-data-download   yfinance, NSE CSV, instrument dumps, feature builds
+    db                     pyodbc queries
+
+Each pool is a drop-in concurrent.futures.Executor, so call sites keep the
+familiar pattern:
+
+    await loop.run_in_executor(executors.pool("broker-orders", Priority.URGENT), fn)
+
+Within a pool, queued work is served by priority (URGENT before HIGH before
+NORMAL before BULK before BACKGROUND), then FIFO. Per-pool metrics — queue depth and queue wait
+time — are available from `executors.stats()`.
+
+CPU-bound work that would hold the GIL (backtest simulation) goes to a
+separate process pool instead, created on first use:
+
+    await loop.run_in_executor(executors.process_pool(), fn, *args)
+"""
+
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+from app.core.config import get_settings
+from app.core.logging import logger
+
+
+class Priority:
+    URGENT = 0     # squareoff / protective exits
+    HIGH = 1       # order placement, GTT changes
+    NORMAL = 2
+    BULK = 3       # batch downloads
+    BACKGROUND = 4  # background backtest jobs — yield to live screening downloads
+
+
+class _BoundedPool(Executor):
+    """Fixed-size thread pool fed from a priority queue, with wait-time metrics."""
+
+    def __init__(self, name: str, max_workers: int, default_priority: int = Priority.NORMAL):
+        self.name = name
+        self.max_workers = max_workers
+        self.default_priority = default_priority
+        # One condition guards the heap, worker bookkeeping and metrics, so the
+        # spawn decision in submit sees exactly the workers waiting for work
+        self._cond = threading.Condition()
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+        self._active = 0
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.max_queue_depth = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self.submit_with_priority(self.default_priority, fn, *args, **kwargs)
+
+    def submit_with_priority(self, priority: int, fn: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError(f"executor pool '{self.name}' is shut down")
+            heapq.heappush(self._heap, (priority, next(self._seq), time.monotonic(), future, fn, args, kwargs))
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._heap))
+            self._ensure_worker()
+            self._cond.notify()
+        return future
+
+    def _ensure_worker(self) -> None:
+        """Spawn a worker if queued work outnumbers idle workers. Caller holds _cond."""
+        if len(self._threads) < self.max_workers and len(self._heap) > self._idle:
+            t = threading.Thread(
+                target=self._worker, name=f"{self.name}-{len(self._threads)}", daemon=True
+            )
+            self._threads.append(t)
+            t.start()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                item = heapq.heappop(self._heap)
+                if item[3] is None:
+                    return
+                _, _, enqueued, future, fn, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                waited = time.monotonic() - enqueued
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                self._active += 1
+            if waited > 1.0:
+                logger.warning(f"[Executors] {self.name}: task waited {waited:.2f}s in queue")
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self.completed += 1
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._cond:
+            self._shutdown = True
+            threads = list(self._threads)
+            for _ in threads:
+                # Sorts after every real item, so queued work drains first
+                heapq.heappush(self._heap, (float("inf"), next(self._seq), 0.0, None, None, (), {}))
+            self._cond.notify_all()
+        if wait:
+            for t in threads:
+                t.join()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            done = max(self.completed, 1)
+            return {
+                "workers": len(self._threads),
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queue_depth": len(self._heap),
+                "max_queue_depth": self.max_queue_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "avg_wait_ms": round(self._wait_total / done * 1000, 1),
+                "max_wait_ms": round(self._wait_max * 1000, 1),
+            }
+
+
+class _PriorityView(Executor):
+    """Executor facade that submits to a pool at a fixed priority."""
+
+    def __init__(self, pool: _BoundedPool, priority: int):
+        self._pool = pool
+        self._priority = priority
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self._pool.submit_with_priority(self._priority, fn, *args, **kwargs)
+
+
+class ExecutorPools:
+
+    def __init__(self):
+        settings = get_settings()
+        # name → (max_workers, default priority)
+        pools = {
+            "broker-orders": (settings.EXECUTOR_BROKER_ORDERS_WORKERS, Priority.HIGH),
+            "broker-data": (settings.EXECUTOR_BROKER_DATA_WORKERS, Priority.NORMAL),
+            "market-data-download": (settings.EXECUTOR_DOWNLOAD_WORKERS, Priority.BULK),
+            "db": (settings.EXECUTOR_DB_WORKERS, Priority.NORMAL),
+        }
+        self._pools: Dict[str, _BoundedPool] = {
+            name: _BoundedPool(name, max(workers, 1), priority)
+            for name, (workers, priority) in pools.items()
+        }
+        self._process_workers = settings.EXECUTOR_BACKTEST_PROCESSES or os.cpu_count() or 1
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._process_lock = threading.Lock()
+
+    def pool(self, name: str, priority: Optional[int] = None) -> Executor:
+        """Executor for `name`; pass `priority` to override the pool's default."""
+        pool = self._pools[name]
+        if priority is None or priority == pool.default_priority:
+            return pool
+        return _PriorityView(pool, priority)
+
+    def process_pool(self) -> ProcessPoolExecutor:
+        """Shared worker-process pool for CPU-bound jobs (spawned, not forked)."""
+        with self._process_lock:
+            if self._process_pool is None:
+                # spawn: forking a process that already runs executor threads is unsafe
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self._process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info(f"[Executors] Started process pool ({self._process_workers} workers)")
+            return self._process_pool
+
+    def reset_process_pool(self) -> None:
+        """Drop a broken process pool so the next call starts a fresh one."""
+        with self._process_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
+
+    @property
+    def process_workers(self) -> int:
+        return self._process_workers
+
+    def stats(self) -> Dict[str, Dict]:
+        stats = {name: pool.stats() for name, pool in self._pools.items()}
+        stats["process"] = {
+            "workers": self._process_workers,
+            "started": self._process_pool is not None,
+        }
+        return stats
+
+    def shutdown(self, wait: bool = False) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+        self.reset_process_pool()
+
+
+executors = ExecutorPools()
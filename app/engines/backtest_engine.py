@@ -5,22 +5,57 @@ Uses yfinance daily OHLCV data and applies the same indicator logic as the live
 strategy (VWAP-proxy, RSI, MACD, BB, Stochastic, EMA). Signals are generated
 bar-by-bar without lookahead. Trades are entered at the next bar's open and
 exited when SL or target is hit or after max_hold_bars.
+
+Simulation runs on contiguous NumPy columns: the daily signal is evaluated
+for all bars at once (strategy_engine.generate_daily_signals), and exits are found with a single
+vectorized first-crossing search per trade.
+
+run_sweep() grid-searches exit/threshold parameters on top of the same
+per-symbol arrays, so a whole grid costs about as much as a single run.
+run_walk_forward() reuses that machinery per rolling train/test fold and
+reports stitched out-of-sample results. run_portfolio_backtest() replays all
+symbols' signals against one capital pool with the live agent's limits.
+
+run_intraday_backtest() replays stored 5-minute sessions through the live
+agent's intraday indicators, signal, T1/T2 scale-out and trailing stop, with
+indicators evaluated for whole sessions × bars panels at once.
+
+run_backtest() stores its trades as a columnar result set under a run id
+(app.services.backtest_results); the response carries the aggregates and at
+most one page of trades, the rest is paged from the store. The run id is a
+hash of the request, this engine's code and the input bars, so an identical
+request is served from the store; per-symbol trade lists are cached too, and
+a run that only extends end_date walks just the new bars (plus any trade
+still open at the old boundary). Each run also carries Monte Carlo risk bands
+(bootstrap / permutation drawdown, terminal P&L, risk of ruin) from
+app.engines.robustness_engine.
 """
 
 from __future__ import annotations
 
 import asyncio
-import math
-from dataclasses import dataclass, field, asdict
+import hashlib
+import heapq
+import itertools
+import json
+from concurrent.futures.process import BrokenProcessPool
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
 from datetime import date, datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-import yfinance as yf
 
 from app.core.logging import logger
+from app.core.executors import executors, Priority
+from app.services.backtest_results import backtest_results, symbol_trade_cache, TradeTable
+from app.services.candle_store import candle_store, yfinance_5minute_fetcher
 from app.engines.strategy_engine import strategy_engine
+from app.engines.risk_engine import risk_engine
+from app.engines.indicator_engine import indicator_engine
+from app.engines.robustness_engine import robustness_engine
 
 
 # ── Default universe (Nifty 50 + a few Nifty Next 50 liquid stocks) ──────────
@@ -52,6 +87,8 @@ class BacktestRequest:
     no_timeout: bool = False                                # True → only SL/target exits; never force-close on time
     include_short: bool = True                              # backtest SELL signals too
     include_trades_detail: bool = True                      # include per-trade rows in report
+    robustness_paths: int = 10000                           # Monte Carlo paths for risk bands (0 → skip)
+    ruin_pct: float = 50.0                                  # drawdown from start that counts as ruin
 
 
 @dataclass
@@ -71,6 +108,135 @@ class TradeResult:
     hold_bars: int
 
 
+@dataclass
+class SweepRequest:
+    """Grid of BacktestRequest parameters evaluated over one shared data/indicator pass."""
+    symbols: List[str] = field(default_factory=list)        # empty → NIFTY_UNIVERSE
+    start_date: str = "2024-01-01"
+    end_date: str = ""
+    sl_atr_multiplier_values: List[float] = field(default_factory=lambda: [1.0])
+    target_rr_values: List[float] = field(default_factory=lambda: [1.5, 2.0, 2.5, 3.0])
+    min_signal_strength_values: List[int] = field(default_factory=lambda: [3, 4, 5])
+    max_hold_bars_values: List[int] = field(default_factory=lambda: [5, 10, 15, 20])
+    no_timeout: bool = False
+    include_short: bool = True
+    rank_by: str = "profit_factor"                          # see SWEEP_RANK_KEYS
+    min_trades: int = 20                                    # combos with fewer trades rank last
+    top_n: int = 50
+
+
+@dataclass
+class WalkForwardRequest:
+    """Rolling train/test folds: optimise on each train window, trade the next test window."""
+    symbols: List[str] = field(default_factory=list)        # empty → NIFTY_UNIVERSE
+    start_date: str = "2020-01-01"                           # first train window starts here
+    end_date: str = ""                                       # empty → yesterday
+    train_months: int = 12
+    test_months: int = 3                                     # also the roll step
+    target_rr_values: List[float] = field(default_factory=lambda: [1.5, 2.0, 2.5, 3.0])
+    min_signal_strength_values: List[int] = field(default_factory=lambda: [3, 4, 5])
+    max_hold_bars_values: List[int] = field(default_factory=lambda: [5, 10, 15, 20])
+    no_timeout: bool = False
+    include_short: bool = True
+    rank_by: str = "profit_factor"                          # see SWEEP_RANK_KEYS
+    min_trades: int = 20                                    # per train fold
+
+
+@dataclass
+class PortfolioBacktestRequest:
+    """All symbols trade one capital pool under the live agent's position rules."""
+    symbols: List[str] = field(default_factory=list)        # empty → NIFTY_UNIVERSE
+    start_date: str = "2024-01-01"
+    end_date: str = ""                                       # empty → yesterday
+    target_rr: float = 2.0
+    min_signal_strength: int = 3
+    max_hold_bars: int = 15
+    no_timeout: bool = False
+    include_short: bool = True
+    initial_capital: float = 100000.0                       # ₹
+    max_positions: int = 2                                  # concurrent open positions
+    max_trades_per_day: int = 3                             # new entries per session
+    risk_percent: float = 1.0                               # % of capital × leverage risked per trade
+    leverage: int = 1
+    capital_cap_pct: float = 10.0                           # max notional per trade, % of available capital
+    include_trades_detail: bool = True
+
+
+@dataclass
+class IntradayBacktestRequest:
+    """5-minute replay of the autonomous agent's scan, scale-out and trailing-stop rules."""
+    symbols: List[str] = field(default_factory=list)        # empty → NIFTY_UNIVERSE
+    start_date: str = "2024-01-01"
+    end_date: str = ""                                       # empty → yesterday
+    min_signal_strength: int = 2                            # live agent enters at strength ≥ 2
+    include_short: bool = True
+    initial_capital: float = 100000.0                       # ₹
+    max_positions: int = 2
+    max_trades_per_day: int = 3
+    risk_percent: float = 1.0
+    leverage: int = 1
+    scan_interval_minutes: int = 5                          # multiple of the 5-minute bar
+    include_trades_detail: bool = True
+
+
+# Rank key → True when higher is better
+SWEEP_RANK_KEYS = {
+    "profit_factor": True,
+    "sharpe_ratio": True,
+    "total_pnl_pct": True,
+    "win_rate_pct": True,
+    "max_drawdown_pct": False,
+}
+
+MAX_SWEEP_COMBINATIONS = 1000
+
+_OUTCOME_CODES = {"WIN": 1, "LOSS": -1, "TIMEOUT": 0}
+_OUTCOME_NAMES = {code: name for name, code in _OUTCOME_CODES.items()}
+
+# Progress listener for the current run (set by app.services.backtest_jobs):
+# called as listener(stage, total, symbols) whenever symbols finish a stage
+# ("fetch", then "simulate").
+backtest_progress: ContextVar[Optional[Callable[[str, int, List[str]], None]]] = ContextVar(
+    "backtest_progress", default=None
+)
+# Set for background jobs: the run's downloads queue at Priority.BACKGROUND
+# behind live screening, and each process-pool task holds one of these slots
+# so jobs never occupy the whole pool the synchronous endpoints share.
+backtest_background: ContextVar[bool] = ContextVar("backtest_background", default=False)
+backtest_process_slots: ContextVar[Optional[asyncio.Semaphore]] = ContextVar(
+    "backtest_process_slots", default=None
+)
+
+# Intraday session clock (minutes after midnight, IST) — same as UserTradingAgent
+_SESSION_OPEN_MIN = 9 * 60 + 15
+_SESSION_CLOSE_MIN = 15 * 60 + 30
+_FIRST_SCAN_MIN = 10 * 60               # 45-minute opening cooldown
+_LAST_SCAN_MIN = 14 * 60 + 50           # no new entries within 20 minutes of squareoff
+_SQUAREOFF_MIN = 15 * 60 + 10
+
+
+@dataclass
+class _PreparedSymbol:
+    """Per-symbol arrays shared by every parameter combination of a run."""
+    ind: pd.DataFrame
+    a: Dict[str, np.ndarray]
+    days: np.ndarray          # "YYYY-MM-DD" per bar
+    direction: np.ndarray     # +1 BUY / -1 SELL / 0 NEUTRAL
+    strength: np.ndarray
+    score: np.ndarray
+
+    def head(self, n: int) -> "_PreparedSymbol":
+        """First n bars as views — the same data a run ending there would see."""
+        return _PreparedSymbol(
+            ind=self.ind.iloc[:n],
+            a={k: v[:n] for k, v in self.a.items()},
+            days=self.days[:n],
+            direction=self.direction[:n],
+            strength=self.strength[:n],
+            score=self.score[:n],
+        )
+
+
 # ── Engine ────────────────────────────────────────────────────────────────────
 
 class BacktestEngine:
@@ -78,9 +244,62 @@ class BacktestEngine:
     # Warmup: EMA50 needs ~100 bars to stabilise; ADX needs 28 bars
     _WARMUP_BARS = 60
 
+    # Trades returned inline by run_backtest; the rest via backtest_results pages
+    TRADES_PAGE_SIZE = 100
+
+    # Robustness bands computed inline by run_backtest are capped at this many
+    # paths × trades (but never below ROBUSTNESS_MIN_PATHS paths), so large
+    # runs stay inside the request timeout. POST /runs/{id}/robustness runs
+    # the full count on request.
+    ROBUSTNESS_RUN_CELLS = 30_000_000
+    ROBUSTNESS_MIN_PATHS = 1000
+
     # ── Public entry point ────────────────────────────────────────────────────
 
+    def validate(self, req) -> None:
+        """
+        Raise ValueError for a request its runner would reject. Background
+        jobs call this at submit time, so a bad request is a 400 rather than
+        a failed job.
+        """
+        for name in ("start_date", "end_date"):
+            value = getattr(req, name, "")
+            if value:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    raise ValueError(f"{name} must be YYYY-MM-DD, got {value!r}")
+
+        if isinstance(req, (SweepRequest, WalkForwardRequest)) and req.rank_by not in SWEEP_RANK_KEYS:
+            raise ValueError(f"rank_by must be one of {sorted(SWEEP_RANK_KEYS)}")
+
+        if isinstance(req, SweepRequest):
+            combos = self._sweep_combos(req)
+            if not combos:
+                raise ValueError("Sweep grid is empty")
+            if len(combos) > MAX_SWEEP_COMBINATIONS:
+                raise ValueError(f"Sweep grid has {len(combos)} combinations (max {MAX_SWEEP_COMBINATIONS})")
+
+        elif isinstance(req, WalkForwardRequest):
+            if req.train_months < 1 or req.test_months < 1:
+                raise ValueError("train_months and test_months must be >= 1")
+            end_date = req.end_date or (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+            if not self._walk_forward_folds(req.start_date, end_date, req.train_months, req.test_months):
+                raise ValueError(
+                    f"{req.start_date} → {end_date} is shorter than one train window ({req.train_months} months)"
+                )
+            combos = self._walk_forward_combos(req)
+            if not combos:
+                raise ValueError("Parameter grid is empty")
+            if len(combos) > MAX_SWEEP_COMBINATIONS:
+                raise ValueError(f"Parameter grid has {len(combos)} combinations (max {MAX_SWEEP_COMBINATIONS})")
+
+        elif isinstance(req, IntradayBacktestRequest):
+            if req.scan_interval_minutes <= 0 or req.scan_interval_minutes % 5:
+                raise ValueError("scan_interval_minutes must be a positive multiple of 5")
+
     async def run_backtest(self, req: BacktestRequest) -> Dict:
+        self.validate(req)
         symbols = req.symbols if req.symbols else NIFTY_UNIVERSE
         end_date = req.end_date or (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
         start_date = req.start_date
@@ -97,22 +316,1123 @@ class BacktestEngine:
             f"min_strength={req.min_signal_strength}"
         )
 
-        # Download all symbols in parallel
+        frames, failed_symbols = await self._fetch_frames(symbols, fetch_start, end_date)
+
+        # Identical request + engine code + input data → stored result, no simulation
+        digests = {sym: _frame_digest(df) for sym, df in frames}
+        run_key = _run_key(req, symbols, start_date, end_date, digests, failed_symbols)
+        report = backtest_results.report(run_key)
+        if report is not None:
+            logger.info(f"[Backtest] Result cache hit: run {run_key[:12]}")
+            report = dict(report, cache={"run": True})
+        else:
+            all_trades, cache_stats = await self._simulate_cached(frames, start_date, req, digests)
+
+            logger.info(
+                f"[Backtest] Simulation done: {len(all_trades)} trades from "
+                f"{len(symbols) - len(failed_symbols)} symbols "
+                f"(cached {cache_stats['symbols_cached']}, extended {cache_stats['symbols_extended']}, "
+                f"simulated {cache_stats['symbols_simulated']}). "
+                f"Failed: {failed_symbols}"
+            )
+
+            # Trades are kept as a stored columnar result set; the response carries
+            # the aggregates, the run id and (optionally) the first page of trades
+            table = TradeTable.from_trades(all_trades)
+            report = self._build_report(table, req, symbols, end_date, failed_symbols)
+            if req.robustness_paths > 0 and len(table) >= 2:
+                paths = min(
+                    req.robustness_paths,
+                    max(self.ROBUSTNESS_MIN_PATHS, self.ROBUSTNESS_RUN_CELLS // len(table)),
+                )
+                report["robustness"] = await self._robustness(
+                    table, paths, req.ruin_pct, 100.0, seed=int(run_key[:8], 16)
+                )
+                if paths < req.robustness_paths:
+                    logger.info(
+                        f"[Backtest] Robustness capped at {paths} paths for {len(table)} trades "
+                        f"(requested {req.robustness_paths})"
+                    )
+                    report["robustness"]["paths_requested"] = req.robustness_paths
+            backtest_results.save(report, table, run_id=run_key)
+            report["cache"] = {"run": False, **cache_stats}
+
+        run_id = report["run_id"]
+        if req.include_trades_detail:
+            page = backtest_results.trades_page(run_id, limit=self.TRADES_PAGE_SIZE)
+            report["trades"] = page.pop("trades")
+            report["trades_page"] = page
+        return report
+
+    async def run_robustness(
+        self,
+        run_id: str,
+        paths: int = 10000,
+        ruin_pct: float = 50.0,
+        position_size_pct: float = 100.0,
+        seed: Optional[int] = None,
+    ) -> Optional[Dict]:
+        """Monte Carlo bands for a stored run with caller-chosen settings; None if unknown."""
+        table = backtest_results.table(run_id)
+        if table is None:
+            return None
+        result = await self._robustness(table, paths, ruin_pct, position_size_pct, seed)
+        return {"run_id": run_id, **result}
+
+    async def _robustness(
+        self, table: TradeTable, paths: int, ruin_pct: float, position_size_pct: float, seed: Optional[int]
+    ) -> Dict:
+        # Paths follow the order trades were realised (exit date), not the table's symbol order
+        order = np.argsort(table["exit_date"], kind="stable")
+        return await self._in_process_pool(
+            robustness_engine.analyze, table["pnl_pct"][order], paths, ruin_pct, position_size_pct, seed,
+        )
+
+    # ── Parameter sweep ───────────────────────────────────────────────────────
+
+    async def run_sweep(self, req: SweepRequest) -> Dict:
+        """
+        Evaluate every combination of the sweep grid in one pass.
+
+        Data is fetched and indicators/signals are computed once per symbol;
+        each worker process then replays only the cheap entry/exit walk for
+        every combination of its symbols. Combinations that differ only in
+        parameters the simulation ignores (sl_atr_multiplier — the stop is
+        structural — and max_hold_bars when no_timeout) share one evaluation.
+        """
+        self.validate(req)
+        combos = self._sweep_combos(req)
+
+        symbols = req.symbols if req.symbols else NIFTY_UNIVERSE
+        end_date = req.end_date or (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+        fetch_start = (
+            datetime.strptime(req.start_date, "%Y-%m-%d") - timedelta(days=self._WARMUP_BARS * 2)
+        ).strftime("%Y-%m-%d")
+
+        exit_keys = sorted({self._exit_key(c, req.no_timeout) for c in combos})
+        logger.info(
+            f"[Backtest] Sweep: {len(symbols)} symbols | {req.start_date} → {end_date} | "
+            f"{len(combos)} combinations ({len(exit_keys)} distinct)"
+        )
+
+        frames, failed_symbols = await self._fetch_frames(symbols, fetch_start, end_date)
+        base = BacktestRequest(
+            start_date=req.start_date,
+            end_date=end_date,
+            no_timeout=req.no_timeout,
+            include_short=req.include_short,
+            include_trades_detail=False,
+        )
+        shards = await self._run_sharded(frames, _sweep_shard, req.start_date, base, exit_keys)
+        by_symbol = {sym: results for shard in shards for sym, results in shard}
+
+        # Per distinct exit key: trades concatenated in symbol order (as run_backtest reports them)
+        metrics_by_key = {}
+        for k, key in enumerate(exit_keys):
+            parts = [by_symbol[sym][k] for sym, _ in frames if sym in by_symbol]
+            pnls = np.concatenate([p for p, _ in parts]) if parts else np.empty(0)
+            outcomes = np.concatenate([o for _, o in parts]) if parts else np.empty(0, np.int8)
+            metrics_by_key[key] = self._sweep_metrics(pnls, outcomes)
+
+        rows = []
+        for sl_mult, rr, strength, hold in combos:
+            rows.append({
+                "sl_atr_multiplier": sl_mult,
+                "target_rr": rr,
+                "min_signal_strength": strength,
+                "max_hold_bars": hold,
+                **metrics_by_key[self._exit_key((sl_mult, rr, strength, hold), req.no_timeout)],
+            })
+
+        self._rank_rows(rows, req.rank_by, req.min_trades)
+
+        logger.info(
+            f"[Backtest] Sweep done: best {req.rank_by}={rows[0][req.rank_by]} "
+            f"(RR {rows[0]['target_rr']}, strength {rows[0]['min_signal_strength']}, "
+            f"hold {rows[0]['max_hold_bars']})"
+        )
+
+        return {
+            "parameters": {
+                "symbols": symbols,
+                "start_date": req.start_date,
+                "end_date": end_date,
+                "sl_atr_multiplier_values": sorted(set(req.sl_atr_multiplier_values)),
+                "target_rr_values": sorted(set(req.target_rr_values)),
+                "min_signal_strength_values": sorted(set(req.min_signal_strength_values)),
+                "max_hold_bars_values": sorted(set(req.max_hold_bars_values)),
+                "no_timeout": req.no_timeout,
+                "include_short": req.include_short,
+                "rank_by": req.rank_by,
+                "min_trades": req.min_trades,
+            },
+            "combinations": len(combos),
+            "distinct_evaluations": len(exit_keys),
+            "symbols_tested": len(frames),
+            "failed_symbols": failed_symbols,
+            "results": rows[:req.top_n],
+            "generated_at": datetime.utcnow().isoformat(),
+        }
+
+    # ── Walk-forward optimisation ─────────────────────────────────────────────
+
+    async def run_walk_forward(self, req: WalkForwardRequest) -> Dict:
+        """
+        Rolling walk-forward: for each fold, rank the parameter grid on the
+        train window, then trade the best combination on the following test
+        window. Test windows don't overlap, so their trades stitch into one
+        out-of-sample equity curve.
+
+        Each worker process prepares its symbols once over the full history
+        and evaluates every fold from those arrays. A window is simulated on
+        the bars before its end date only, so train results never see test
+        data.
+        """
+        self.validate(req)
+        end_date = req.end_date or (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+        folds = self._walk_forward_folds(req.start_date, end_date, req.train_months, req.test_months)
+        combos = self._walk_forward_combos(req)
+        exit_keys = sorted({(rr, strength, 0 if req.no_timeout else hold) for rr, strength, hold in combos})
+
+        symbols = req.symbols if req.symbols else NIFTY_UNIVERSE
+        fetch_start = (
+            datetime.strptime(req.start_date, "%Y-%m-%d") - timedelta(days=self._WARMUP_BARS * 2)
+        ).strftime("%Y-%m-%d")
+        logger.info(
+            f"[Backtest] Walk-forward: {len(symbols)} symbols | {req.start_date} → {end_date} | "
+            f"{len(folds)} folds ({req.train_months}m train / {req.test_months}m test) | "
+            f"{len(exit_keys)} combinations"
+        )
+
+        frames, failed_symbols = await self._fetch_frames(symbols, fetch_start, end_date)
+        base = BacktestRequest(
+            no_timeout=req.no_timeout,
+            include_short=req.include_short,
+            include_trades_detail=False,
+        )
+        shards = await self._run_sharded(frames, _walk_forward_shard, folds, base, exit_keys)
+
+        def merged(f: int, phase: int, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            """All shards' trades for one fold/phase/key, in exit-date order."""
+            parts = [shard[f][phase][k] for shard in shards]
+            pnls, outcomes, days = _concat_trades(parts)
+            order = np.argsort(days, kind="stable")
+            return pnls[order], outcomes[order], days[order]
+
+        fold_reports = []
+        oos_parts = []
+        for f, (train_start, train_end, test_start, test_end) in enumerate(folds):
+            rows = []
+            for k, (rr, strength, hold) in enumerate(exit_keys):
+                pnls, outcomes, _ = merged(f, 0, k)
+                rows.append({"_k": k, **self._sweep_metrics(pnls, outcomes)})
+            self._rank_rows(rows, req.rank_by, req.min_trades)
+            best_k = rows[0]["_k"]
+            rr, strength, hold = exit_keys[best_k]
+
+            test = merged(f, 1, best_k)
+            oos_parts.append(test)
+            train_metrics = {k: v for k, v in rows[0].items() if k not in ("_k", "rank")}
+            fold_reports.append({
+                "fold": f + 1,
+                "train_start": train_start,
+                "train_end": train_end,
+                "test_start": test_start,
+                "test_end": test_end,
+                "best_params": {
+                    "target_rr": rr,
+                    "min_signal_strength": strength,
+                    "max_hold_bars": None if req.no_timeout else hold,
+                },
+                "train": train_metrics,
+                "test": self._sweep_metrics(test[0], test[1]),
+            })
+
+        oos_pnls, oos_outcomes, oos_days = _concat_trades(oos_parts)
+        equity_curve = []
+        if len(oos_days):
+            day_keys, inverse = np.unique(oos_days, return_inverse=True)
+            equity = np.cumsum(np.bincount(inverse, weights=oos_pnls))
+            equity_curve = [
+                {"date": str(d), "equity_pct": round(float(e), 3)} for d, e in zip(day_keys, equity)
+            ]
+
+        oos = self._sweep_metrics(oos_pnls, oos_outcomes)
+        logger.info(
+            f"[Backtest] Walk-forward done: {oos['total_trades']} OOS trades | "
+            f"PF {oos['profit_factor']} | total {oos['total_pnl_pct']}%"
+        )
+
+        return {
+            "parameters": {
+                "symbols": symbols,
+                "start_date": req.start_date,
+                "end_date": end_date,
+                "train_months": req.train_months,
+                "test_months": req.test_months,
+                "target_rr_values": sorted(set(req.target_rr_values)),
+                "min_signal_strength_values": sorted(set(req.min_signal_strength_values)),
+                "max_hold_bars_values": sorted(set(req.max_hold_bars_values)),
+                "no_timeout": req.no_timeout,
+                "include_short": req.include_short,
+                "rank_by": req.rank_by,
+                "min_trades": req.min_trades,
+            },
+            "folds": fold_reports,
+            "out_of_sample": oos,
+            "equity_curve": equity_curve,
+            "symbols_tested": len(frames),
+            "failed_symbols": failed_symbols,
+            "generated_at": datetime.utcnow().isoformat(),
+        }
+
+    @staticmethod
+    def _sweep_combos(req: SweepRequest) -> List[Tuple[float, float, int, int]]:
+        return list(itertools.product(
+            sorted(set(req.sl_atr_multiplier_values)),
+            sorted(set(req.target_rr_values)),
+            sorted(set(req.min_signal_strength_values)),
+            sorted(set(req.max_hold_bars_values)),
+        ))
+
+    @staticmethod
+    def _walk_forward_combos(req: WalkForwardRequest) -> List[Tuple[float, int, int]]:
+        return list(itertools.product(
+            sorted(set(req.target_rr_values)),
+            sorted(set(req.min_signal_strength_values)),
+            sorted(set(req.max_hold_bars_values)),
+        ))
+
+    @staticmethod
+    def _walk_forward_folds(
+        start_date: str, end_date: str, train_months: int, test_months: int
+    ) -> List[Tuple[str, str, str, str]]:
+        """(train_start, train_end, test_start, test_end) per fold; ends are exclusive."""
+        folds = []
+        end = pd.Timestamp(end_date)
+        train_start = pd.Timestamp(start_date)
+        while True:
+            train_end = train_start + pd.DateOffset(months=train_months)
+            if train_end >= end:
+                break
+            test_end = min(train_end + pd.DateOffset(months=test_months), end)
+            folds.append(tuple(t.strftime("%Y-%m-%d") for t in (train_start, train_end, train_end, test_end)))
+            train_start += pd.DateOffset(months=test_months)
+        return folds
+
+    # ── Portfolio backtest ────────────────────────────────────────────────────
+
+    async def run_portfolio_backtest(self, req: PortfolioBacktestRequest) -> Dict:
+        """
+        Shared-capital replay of every symbol's signals.
+
+        Per symbol (on the worker processes): every bar that could open a
+        trade, with its exit already resolved — exits don't depend on the
+        portfolio. The candidates from all symbols are then merged into one
+        time-ordered stream and replayed with an exit heap (see
+        _portfolio_replay), applying max_positions, max_trades_per_day and
+        RiskEngine sizing with the 10% capital cap, as UserTradingAgent does.
+        """
+        self.validate(req)
+        symbols = req.symbols if req.symbols else NIFTY_UNIVERSE
+        end_date = req.end_date or (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+        fetch_start = (
+            datetime.strptime(req.start_date, "%Y-%m-%d") - timedelta(days=self._WARMUP_BARS * 2)
+        ).strftime("%Y-%m-%d")
+        logger.info(
+            f"[Backtest] Portfolio: {len(symbols)} symbols | {req.start_date} → {end_date} | "
+            f"capital ₹{req.initial_capital:,.0f} | max_positions={req.max_positions} | "
+            f"max_trades/day={req.max_trades_per_day} | risk={req.risk_percent}% | {req.leverage}x"
+        )
+
+        frames, failed_symbols = await self._fetch_frames(symbols, fetch_start, end_date)
+        strategy = BacktestRequest(
+            target_rr=req.target_rr,
+            min_signal_strength=req.min_signal_strength,
+            max_hold_bars=req.max_hold_bars,
+            no_timeout=req.no_timeout,
+            include_short=req.include_short,
+        )
+        shards = await self._run_sharded(frames, _portfolio_candidates_shard, req.start_date, strategy)
+
+        names = [sym for sym, _ in frames]
+        sym_ids = {sym: k for k, sym in enumerate(names)}
+        parts = [
+            {**cands, "symbol_id": np.full(len(cands["signal_idx"]), sym_ids[sym], dtype=np.int32)}
+            for shard in shards for sym, cands in shard
+        ]
+        candidates = {
+            col: np.concatenate([p[col] for p in parts]) for col in (parts[0] if parts else {})
+        }
+
+        result = await self._in_process_pool(
+            _portfolio_replay, candidates, names, replace(req, end_date=end_date)
+        )
+        logger.info(
+            f"[Backtest] Portfolio done: {result['summary'].get('total_trades', 0)} trades | "
+            f"final equity ₹{result['summary'].get('final_equity', req.initial_capital):,.0f}"
+        )
+
+        result["summary"]["symbols_tested"] = len(frames)
+        result["summary"]["failed_symbols"] = failed_symbols
+        result["parameters"] = {
+            "symbols": symbols,
+            "start_date": req.start_date,
+            "end_date": end_date,
+            "target_rr": req.target_rr,
+            "min_signal_strength": req.min_signal_strength,
+            "max_hold_bars": req.max_hold_bars,
+            "no_timeout": req.no_timeout,
+            "include_short": req.include_short,
+            "initial_capital": req.initial_capital,
+            "max_positions": req.max_positions,
+            "max_trades_per_day": req.max_trades_per_day,
+            "risk_percent": req.risk_percent,
+            "leverage": req.leverage,
+            "capital_cap_pct": req.capital_cap_pct,
+        }
+        result["generated_at"] = datetime.utcnow().isoformat()
+        return result
+
+    def _trade_candidates(
+        self, prep: _PreparedSymbol, backtest_start: str, req: BacktestRequest
+    ) -> Dict[str, np.ndarray]:
+        """
+        Every trade the symbol could take ignoring its own cooldown — one per
+        candidate bar, with stops and exit resolved like _walk_trades does.
+        """
+        a, n = prep.a, len(prep.days)
+        cands = self._candidate_bars(prep, backtest_start, req.min_signal_strength, req.include_short)
+        shorts = (prep.direction[cands] < 0).tolist()
+        levels = [
+            self._stop_and_target(float(a["open"][i + 1]), float(a["atr_14"][i]), float(a["ema50"][i]), sh, req.target_rr)
+            for i, sh in zip(cands, shorts)
+        ]
+        keep = [j for j, lv in enumerate(levels) if lv is not None]
+        cands = np.asarray(cands, dtype=np.int64)[keep]
+        shorts = [shorts[j] for j in keep]
+        levels = [levels[j] for j in keep]
+
+        horizon = n if req.no_timeout else req.max_hold_bars
+        first, sl_first = self._first_crossings(prep, cands.tolist(), shorts, levels, horizon)
+        first, sl_first = np.asarray(first, dtype=np.int64), np.asarray(sl_first, dtype=bool)
+
+        entry_idx = cands + 1
+        stop = np.array([lv[0] for lv in levels], dtype=np.float64)
+        target = np.array([lv[1] for lv in levels], dtype=np.float64)
+        max_hold = (n - entry_idx - 1) if req.no_timeout else np.full(len(cands), req.max_hold_bars)
+        hit = (first >= 0) & (first <= max_hold)
+        exit_idx = np.where(hit, entry_idx + first, np.minimum(entry_idx + max_hold, n - 1))
+        days = prep.days.astype("datetime64[D]")
+
+        return {
+            "signal_idx": cands,
+            "exit_idx": exit_idx,
+            "entry_day": days[entry_idx],
+            "exit_day": days[exit_idx],
+            "entry_price": a["open"][entry_idx],
+            "stop_loss": stop,
+            "target": target,
+            "exit_price": np.where(hit, np.where(sl_first, stop, target), a["close"][exit_idx]),
+            "outcome": np.where(hit, np.where(sl_first, -1, 1), 0).astype(np.int8),
+            "is_short": np.asarray(shorts, dtype=bool),
+            "strength": prep.strength[cands].astype(np.int16),
+            "score": prep.score[cands].astype(np.int32),
+        }
+
+    # ── Intraday (5-minute) backtest ──────────────────────────────────────────
+
+    async def run_intraday_backtest(self, req: IntradayBacktestRequest) -> Dict:
+        """
+        Replay stored 5-minute sessions through the autonomous agent's rules.
+
+        Per symbol (on the worker processes), every session is one row of a
+        sessions × bars panel: the intraday indicators and signal are
+        evaluated as of every bar in one vectorized pass, and the bars where a
+        scan would have found a qualifying signal are returned. Each day is
+        then replayed as UserTradingAgent trades it:
+
+          • scans every scan_interval_minutes from 10:00 until 20 minutes
+            before the 15:10 squareoff; the first scan that opens a position
+            takes the best-scoring signals up to max_positions and ends
+            scanning for the day
+          • SL / T1 / T2 at 1.5 / 1.5 / 3 ATR, risk-based quantity capped at
+            10% of capital, entries below 1:2 risk-reward skipped
+          • 50% out at T1 (SL → breakeven), 25% at T2 (SL → T1), the stop
+            trails 1.5 ATR behind the best price once it is 1 ATR in profit,
+            and whatever is left is squared off at 15:10
+
+        Entries fill at the open of the bar after the scan. Within a bar the
+        stop is checked before targets. The live screener's universe
+        selection and the Nifty trend filter are not replayed.
+        """
+        self.validate(req)
+        symbols = req.symbols if req.symbols else NIFTY_UNIVERSE
+        end_date = req.end_date or (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+        logger.info(
+            f"[Backtest] Intraday: {len(symbols)} symbols | {req.start_date} → {end_date} | "
+            f"capital ₹{req.initial_capital:,.0f} | max_positions={req.max_positions} | "
+            f"min_strength={req.min_signal_strength} | scan every {req.scan_interval_minutes}m"
+        )
+
+        frames, failed_symbols = await self._fetch_frames(
+            symbols, req.start_date, end_date, fetch=self._fetch_intraday_symbol_data
+        )
+        shards = await self._run_sharded(frames, _intraday_signals_shard, req)
+        signals = {sym: sig for shard in shards for sym, sig in shard}
+        result = self._intraday_replay(frames, signals, req)
+        logger.info(
+            f"[Backtest] Intraday done: {result['summary']['total_trades']} trades over "
+            f"{result['summary']['sessions']} sessions | final equity ₹{result['summary']['final_equity']:,.0f}"
+        )
+
+        result["summary"]["symbols_tested"] = len(frames)
+        result["summary"]["failed_symbols"] = failed_symbols
+        result["parameters"] = {
+            "symbols": symbols,
+            "start_date": req.start_date,
+            "end_date": end_date,
+            "min_signal_strength": req.min_signal_strength,
+            "include_short": req.include_short,
+            "initial_capital": req.initial_capital,
+            "max_positions": req.max_positions,
+            "max_trades_per_day": req.max_trades_per_day,
+            "risk_percent": req.risk_percent,
+            "leverage": req.leverage,
+            "scan_interval_minutes": req.scan_interval_minutes,
+        }
+        result["generated_at"] = datetime.utcnow().isoformat()
+        return result
+
+    def _intraday_signal_bars(self, df: pd.DataFrame, req: IntradayBacktestRequest) -> Dict[str, np.ndarray]:
+        """
+        Bars of one symbol where a scan would have found a qualifying signal.
+
+        Sessions become rows of left-aligned panels, so indicator and signal
+        at [session, k] see exactly bars 0…k of that day — what a scan at
+        the close of bar k computes from today's candles.
+        """
+        ts = df.index.values.astype("datetime64[s]").astype(np.int64)
+        minute = (ts % 86400) // 60
+        rows = np.flatnonzero((minute >= _SESSION_OPEN_MIN) & (minute < _SESSION_CLOSE_MIN))
+        day = ts[rows] // 86400
+        new_day = np.r_[True, day[1:] != day[:-1]]
+        session = np.cumsum(new_day) - 1
+        pos = np.arange(len(rows)) - np.flatnonzero(new_day)[session]
+        shape = (int(new_day.sum()), int(pos.max()) + 1 if len(pos) else 0)
+
+        def panel(col: str) -> np.ndarray:
+            out = np.full(shape, np.nan)
+            out[session, pos] = df[col].to_numpy(dtype=np.float64)[rows]
+            return out
+
+        series = indicator_engine.compute_session_series(
+            panel("High"), panel("Low"), panel("Close"), panel("Volume")
+        )
+        sig = strategy_engine.generate_intraday_signals(series)
+        direction = sig["signal"][session, pos]
+        strength = sig["strength"][session, pos]
+
+        # A scan at the close of bar k enters at the open of bar k+1 (same day)
+        scan_min = minute[rows] + 5
+        has_next = np.r_[~new_day[1:], False]
+        keep = (
+            (pos >= 4)                                  # indicators need 5 bars
+            & has_next
+            & (scan_min >= _FIRST_SCAN_MIN)
+            & (scan_min < _LAST_SCAN_MIN)
+            & ((scan_min - _FIRST_SCAN_MIN) % req.scan_interval_minutes == 0)
+            & (direction != 0)
+            & (strength >= req.min_signal_strength)
+        )
+        if not req.include_short:
+            keep &= direction > 0
+        idx = np.flatnonzero(keep)
+        return {
+            "entry_bar": rows[np.minimum(idx + 1, len(rows) - 1)],
+            "day": day[idx],
+            "scan_min": scan_min[idx],
+            "direction": direction[idx],
+            "strength": strength[idx].astype(np.int16),
+            "score": sig["score"][session, pos][idx].astype(np.int32),
+        }
+
+    def _intraday_replay(
+        self,
+        frames: List[Tuple[str, pd.DataFrame]],
+        signals: Dict[str, Dict[str, np.ndarray]],
+        req: IntradayBacktestRequest,
+    ) -> Dict:
+        """Day-by-day scan/entry replay over every symbol's qualifying bars."""
+        names = [sym for sym, _ in frames]
+        bars = [
+            (
+                df.index.values.astype("datetime64[s]").astype(np.int64),
+                df["Open"].to_numpy(dtype=np.float64),
+                df["High"].to_numpy(dtype=np.float64),
+                df["Low"].to_numpy(dtype=np.float64),
+                df["Close"].to_numpy(dtype=np.float64),
+            )
+            for _, df in frames
+        ]
+        sessions = np.unique(np.concatenate([b[0] // 86400 for b in bars])).size if bars else 0
+
+        parts = [(k, signals[sym]) for k, sym in enumerate(names) if sym in signals]
+        cols = ("entry_bar", "day", "scan_min", "direction", "strength", "score")
+        c = {col: np.concatenate([p[col] for _, p in parts]) if parts else np.empty(0, np.int64) for col in cols}
+        sym_id = np.concatenate([np.full(len(p["day"]), k) for k, p in parts]) if parts else np.empty(0, np.int64)
+        # Within a scan: best score first (ties keep symbol order), as _run_scan
+        # sorts — and only the top max_positions of each scan are ever tried.
+        order = np.lexsort((sym_id, -c["score"], c["scan_min"], c["day"]))
+        key = c["day"][order] * 1440 + c["scan_min"][order]
+        group_start = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        rank = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+        considered, order = len(order), order[rank < req.max_positions]
+
+        day_l, scan_l = c["day"].tolist(), c["scan_min"].tolist()
+        equity = float(req.initial_capital)
+        trades: List[Dict] = []
+        curve: List[Tuple[int, float]] = []
+        skipped = {"risk_reward": 0, "max_trades_per_day": 0, "insufficient_capital": 0}
+        done_day = None
+
+        for (day, _), group in itertools.groupby(order.tolist(), key=lambda r: (day_l[r], scan_l[r])):
+            if day == done_day:
+                continue                         # positions opened — no more scans today
+            if equity < 1000:
+                skipped["insufficient_capital"] += 1
+                continue
+            opened = []
+            for r in list(group)[:req.max_positions]:
+                if len(opened) >= req.max_trades_per_day:
+                    skipped["max_trades_per_day"] += 1
+                    break
+                trade = self._intraday_trade(bars[sym_id[r]], int(c["entry_bar"][r]), c["direction"][r] < 0, equity, req)
+                if trade is None:
+                    skipped["risk_reward"] += 1
+                    continue
+                opened.append({
+                    "symbol": names[sym_id[r]],
+                    **trade,
+                    "signal_strength": int(c["strength"][r]),
+                    "signal_score": int(c["score"][r]),
+                })
+            if opened:
+                done_day = day
+                equity += sum(t["pnl"] for t in opened)
+                curve.append((day, equity))
+                trades.extend(opened)
+
+        return self._intraday_report(trades, curve, sessions, considered, skipped, req)
+
+    def _intraday_trade(
+        self, bars: Tuple[np.ndarray, ...], entry_i: int, is_short: bool, capital: float,
+        req: IntradayBacktestRequest,
+    ) -> Optional[Dict]:
+        """Size and replay one agent entry; None when its risk-reward is below 1:2."""
+        ts, o, h, l, cl = bars
+        ltp = float(o[entry_i])
+        # The agent reads indicators["atr_14"], which 5-minute indicators don't
+        # carry, so live levels use its 1%-of-LTP fallback — replayed as is.
+        atr = ltp * 0.01
+        if not is_short:
+            stop_loss, t1, target = round(ltp - 1.5 * atr, 2), round(ltp + 1.5 * atr, 2), round(ltp + 3.0 * atr, 2)
+            if not (stop_loss < ltp < t1 < target):
+                stop_loss, t1, target = round(ltp * 0.985, 2), round(ltp * 1.015, 2), round(ltp * 1.03, 2)
+        else:
+            stop_loss, t1, target = round(ltp + 1.5 * atr, 2), round(ltp - 1.5 * atr, 2), round(ltp - 3.0 * atr, 2)
+            if not (target < t1 < ltp < stop_loss):
+                stop_loss, t1, target = round(ltp * 1.015, 2), round(ltp * 0.985, 2), round(ltp * 0.97, 2)
+
+        risk = abs(ltp - stop_loss)
+        if (abs(target - ltp) / risk if risk > 0 else 0) < 2.0:
+            return None
+
+        quantity = max(1, risk_engine.risk_quantity(ltp, stop_loss, req.risk_percent, capital, req.leverage))
+        max_by_capital = int((capital * 0.10) / ltp) if ltp > 0 else 1
+        quantity = min(quantity, max(1, max_by_capital))
+        t1_qty = max(1, quantity // 2)
+        t2_qty = max(1, (quantity - t1_qty) // 2) if (quantity - t1_qty) >= 2 else 0
+        targets = [{"label": "T1", "price": t1, "qty": t1_qty, "new_sl": ltp}]
+        if t2_qty > 0:
+            targets.append({"label": "T2", "price": target, "qty": t2_qty, "new_sl": t1})
+
+        day_end = int(np.searchsorted(ts, (ts[entry_i] // 86400 + 1) * 86400))
+        legs, trail_moves = _replay_intraday_position(
+            ts, o, h, l, cl, entry_i, day_end, is_short, ltp, stop_loss, targets, quantity, atr
+        )
+        side = -1.0 if is_short else 1.0
+        pnl = sum(side * (price - ltp) * qty for _, _, price, qty in legs)
+        return {
+            "date": str(np.datetime64(int(ts[entry_i]), "s").astype("datetime64[D]")),
+            "action": "SELL" if is_short else "BUY",
+            "entry_time": _bar_clock(ts[entry_i]),
+            "entry_price": round(ltp, 2),
+            "quantity": quantity,
+            "stop_loss": stop_loss,
+            "t1": t1,
+            "t2": target,
+            "exits": [
+                {"label": label, "time": _bar_clock(ts[i]), "price": round(price, 2), "quantity": qty}
+                for label, i, price, qty in legs
+            ],
+            "trail_moves": trail_moves,
+            "pnl": round(pnl, 2),
+            "pnl_pct": round(pnl / (quantity * ltp) * 100, 3),
+        }
+
+    def _intraday_report(
+        self,
+        trades: List[Dict],
+        curve: List[Tuple[int, float]],
+        sessions: int,
+        considered: int,
+        skipped: Dict[str, int],
+        req: IntradayBacktestRequest,
+    ) -> Dict:
+        initial = float(req.initial_capital)
+        pnls = np.array([t["pnl"] for t in trades], dtype=np.float64)
+        total = len(trades)
+        equity = np.array([e for _, e in curve], dtype=np.float64)
+        max_dd = max_dd_pct = 0.0
+        if total:
+            peak = np.maximum.accumulate(np.concatenate([[initial], equity]))[1:]
+            max_dd = float((peak - equity).max())
+            max_dd_pct = float(((peak - equity) / peak).max() * 100)
+        final_equity = float(equity[-1]) if len(equity) else initial
+        gross_pos = float(pnls[pnls > 0].sum())
+        gross_neg = abs(float(pnls[pnls < 0].sum()))
+
+        exits: Dict[str, int] = {}
+        by_sym: Dict[str, List[float]] = {}
+        for t in trades:
+            for leg in t["exits"]:
+                exits[leg["label"]] = exits.get(leg["label"], 0) + 1
+            by_sym.setdefault(t["symbol"], []).append(t["pnl"])
+        by_symbol = sorted(
+            (
+                {
+                    "symbol": sym,
+                    "trades": len(p),
+                    "wins": sum(1 for x in p if x > 0),
+                    "win_rate_pct": round(sum(1 for x in p if x > 0) / len(p) * 100, 2),
+                    "total_pnl": round(sum(p), 2),
+                }
+                for sym, p in by_sym.items()
+            ),
+            key=lambda x: x["total_pnl"],
+            reverse=True,
+        )
+
+        summary = {
+            "initial_capital": round(initial, 2),
+            "final_equity": round(final_equity, 2),
+            "total_pnl": round(final_equity - initial, 2),
+            "total_return_pct": round((final_equity / initial - 1) * 100, 3),
+            "max_drawdown": round(max_dd, 2),
+            "max_drawdown_pct": round(max_dd_pct, 3),
+            "total_trades": total,
+            "win_trades": int((pnls > 0).sum()),
+            "loss_trades": int((pnls < 0).sum()),
+            "win_rate_pct": round(int((pnls > 0).sum()) / total * 100, 2) if total else 0.0,
+            "profit_factor": round(gross_pos / gross_neg, 3) if gross_neg > 0 else float("inf"),
+            "avg_pnl_per_trade": round(float(pnls.mean()), 2) if total else 0.0,
+            "sessions": sessions,
+            "days_traded": len(curve),
+            "exits": exits,
+            "signals_considered": considered,
+            "signals_skipped": skipped,
+        }
+        report = {
+            "summary": summary,
+            "by_symbol": by_symbol,
+            "equity_curve": [
+                {"date": str(np.datetime64(int(d), "D")), "equity": round(e, 2)} for d, e in curve
+            ],
+        }
+        if req.include_trades_detail:
+            report["trades"] = trades
+        return report
+
+    @staticmethod
+    def _rank_rows(rows: List[Dict], rank_by: str, min_trades: int) -> None:
+        """Sort metric rows best-first in place (too few trades → last) and number them."""
+        higher_better = SWEEP_RANK_KEYS[rank_by]
+        rows.sort(key=lambda r: (
+            r["total_trades"] < min_trades,
+            -r[rank_by] if higher_better else r[rank_by],
+        ))
+        for rank, row in enumerate(rows, start=1):
+            row["rank"] = rank
+
+    @staticmethod
+    def _exit_key(combo: Tuple[float, float, int, int], no_timeout: bool) -> Tuple[float, int, int]:
+        """(target_rr, min_signal_strength, max_hold_bars) — the params that change trades."""
+        _, rr, strength, hold = combo
+        return (rr, strength, 0 if no_timeout else hold)
+
+    def _sweep_prepared(
+        self,
+        prep: _PreparedSymbol,
+        backtest_start: str,
+        base: BacktestRequest,
+        exit_keys: List[Tuple[float, int, int]],
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        (pnl_pct, outcome code, exit bar index) arrays per exit key.
+
+        Same trades as _walk_trades, but the first SL/target crossing of each
+        candidate bar is searched once per target_rr (over the longest hold in
+        the grid) and every max_hold_bars / min_signal_strength combination is
+        then replayed from those cached crossings.
+        """
+        empty = (np.empty(0), np.empty(0, np.int8), np.empty(0, np.int64))
+        a, n = prep.a, len(prep.days)
+        opens, closes = a["open"], a["close"]
+        cands = self._candidate_bars(prep, backtest_start, min(k[1] for k in exit_keys), base.include_short)
+        if not cands:
+            return [empty] * len(exit_keys)
+
+        cand_strength = prep.strength[cands].tolist()
+        cand_short = (prep.direction[cands] < 0).tolist()
+        horizon = n if base.no_timeout else max(k[2] for k in exit_keys)
+
+        # Per target_rr: stops per candidate + first crossing within `horizon`
+        crossings: Dict[float, Tuple[List, List[int], List[bool]]] = {}
+        for rr in sorted({k[0] for k in exit_keys}):
+            levels = [
+                self._stop_and_target(
+                    float(opens[i + 1]), float(a["atr_14"][i]), float(a["ema50"][i]), short, rr
+                )
+                for i, short in zip(cands, cand_short)
+            ]
+            first, sl_first = self._first_crossings(prep, cands, cand_short, levels, horizon)
+            crossings[rr] = (levels, first, sl_first)
+
+        out = []
+        for rr, strength, hold in exit_keys:
+            levels, first, sl_first = crossings[rr]
+            pnls: List[float] = []
+            outcomes: List[int] = []
+            exits: List[int] = []
+            last_trade_bar = -999
+            for j, i in enumerate(cands):
+                if cand_strength[j] < strength or i - last_trade_bar < 3 or levels[j] is None:
+                    continue
+                stop_loss, target = levels[j]
+                entry_idx = i + 1
+                entry_price = float(opens[entry_idx])
+                max_hold = (n - entry_idx - 1) if base.no_timeout else hold
+                k = first[j]
+                if 0 <= k <= max_hold:
+                    exit_bar_idx = entry_idx + k
+                    outcome = -1 if sl_first[j] else 1
+                    exit_price = stop_loss if sl_first[j] else target
+                else:
+                    exit_bar_idx = min(entry_idx + max_hold, n - 1)
+                    outcome = 0
+                    exit_price = float(closes[exit_bar_idx])
+                if cand_short[j]:
+                    pnls.append(round((entry_price - exit_price) / entry_price * 100, 3))
+                else:
+                    pnls.append(round((exit_price - entry_price) / entry_price * 100, 3))
+                outcomes.append(outcome)
+                exits.append(exit_bar_idx)
+                last_trade_bar = exit_bar_idx
+            out.append((
+                np.array(pnls, dtype=np.float64),
+                np.array(outcomes, dtype=np.int8),
+                np.array(exits, dtype=np.int64),
+            ))
+        return out
+
+    def _first_crossings(
+        self,
+        prep: _PreparedSymbol,
+        cands: List[int],
+        is_short: List[bool],
+        levels: List[Optional[Tuple[float, float]]],
+        horizon: int,
+    ) -> Tuple[List[int], List[bool]]:
+        """
+        Offset (from the entry bar) of the first SL/target hit within `horizon`
+        bars for every candidate at once, or -1; plus whether that hit is the
+        stop (SL wins ties, as in _simulate_exit). Bars past the end are NaN-padded.
+        """
+        width = horizon + 1
+        highs = np.append(prep.a["high"], np.full(width, np.nan))
+        lows = np.append(prep.a["low"], np.full(width, np.nan))
+        high_win = np.lib.stride_tricks.sliding_window_view(highs, width)
+        low_win = np.lib.stride_tricks.sliding_window_view(lows, width)
+
+        entries = np.asarray(cands) + 1
+        short = np.asarray(is_short)
+        stop = np.array([lv[0] if lv else np.nan for lv in levels])
+        target = np.array([lv[1] if lv else np.nan for lv in levels])
+
+        first = np.full(len(cands), -1)
+        sl_first = np.zeros(len(cands), dtype=bool)
+        chunk = max(1, 4_000_000 // width)       # bound the (candidates × window) matrices
+        for lo in range(0, len(cands), chunk):
+            sel = slice(lo, lo + chunk)
+            hw, lw = high_win[entries[sel]], low_win[entries[sel]]
+            sh = short[sel, None]
+            sl_hit = np.where(sh, hw >= stop[sel, None], lw <= stop[sel, None])
+            tgt_hit = np.where(sh, lw <= target[sel, None], hw >= target[sel, None])
+            hit = sl_hit | tgt_hit
+            k = hit.argmax(axis=1)
+            rows = np.arange(len(k))
+            found = hit[rows, k]
+            first[sel] = np.where(found, k, -1)
+            sl_first[sel] = found & sl_hit[rows, k]
+        return first.tolist(), sl_first.tolist()
+
+    @staticmethod
+    def _sweep_metrics(pnls: np.ndarray, outcomes: np.ndarray) -> Dict:
+        """Headline stats for one combination, same definitions as _build_report."""
+        total = len(pnls)
+        if total == 0:
+            return {
+                "total_trades": 0, "win_rate_pct": 0.0, "profit_factor": 0.0,
+                "sharpe_ratio": 0.0, "max_drawdown_pct": 0.0, "total_pnl_pct": 0.0,
+                "avg_pnl_per_trade_pct": 0.0,
+            }
+        gross_pos = float(pnls[pnls > 0].sum())
+        gross_neg = abs(float(pnls[pnls < 0].sum()))
+        cum = np.cumsum(pnls)
+        std = pnls.std()
+        total_pnl = round(float(pnls.sum()), 3)
+        return {
+            "total_trades": total,
+            "win_rate_pct": round(int((outcomes == 1).sum()) / total * 100, 2),
+            "profit_factor": round(gross_pos / gross_neg, 3) if gross_neg > 0 else float("inf"),
+            "sharpe_ratio": round(float(pnls.mean() / std), 3) if std > 0 else 0.0,
+            "max_drawdown_pct": round(float((np.maximum.accumulate(cum) - cum).max()), 3),
+            "total_pnl_pct": total_pnl,
+            "avg_pnl_per_trade_pct": round(total_pnl / total, 3),
+        }
+
+    # ── Parallel simulation ───────────────────────────────────────────────────
+
+    async def _simulate_parallel(
+        self,
+        frames: List[Tuple[str, pd.DataFrame]],
+        backtest_start: str,
+        req: BacktestRequest,
+        resume: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> Dict[str, Optional[List[TradeResult]]]:
+        """
+        Per-symbol simulation on the worker-process pool → {symbol: trades},
+        None for a symbol whose simulation failed. `resume` maps a symbol to
+        (first candidate bar, last exit bar) to continue an earlier walk.
+        """
+        shards = await self._run_sharded(frames, _simulate_shard, backtest_start, req, resume or {})
+        return {sym: trades for shard in shards for sym, trades in shard}
+
+    # ── Result cache ──────────────────────────────────────────────────────────
+
+    async def _simulate_cached(
+        self,
+        frames: List[Tuple[str, pd.DataFrame]],
+        backtest_start: str,
+        req: BacktestRequest,
+        digests: Dict[str, str],
+    ) -> Tuple[List[TradeResult], Dict[str, int]]:
+        """
+        Trades for every frame, reusing per-symbol trade lists from earlier runs
+        with the same simulation parameters. A symbol whose cached input is a
+        prefix of the current frame (same bars, same values) keeps its completed
+        trades and only walks the bars after the old boundary, starting with any
+        trade that was still open there. Trades in symbol order.
+        """
+        sim_key = _sim_key(req, backtest_start)
+        kept: Dict[str, List[TradeResult]] = {}
+        resume: Dict[str, Tuple[int, int]] = {}
+        to_run: List[Tuple[str, pd.DataFrame]] = []
+        stats = {"symbols_cached": 0, "symbols_extended": 0, "symbols_simulated": 0}
+
+        for sym, df in frames:
+            plan = self._resume_plan(symbol_trade_cache.get(sim_key, sym), df, digests[sym], req)
+            if plan is None:
+                to_run.append((sym, df))
+                stats["symbols_simulated"] += 1
+                continue
+            kept[sym], resume_at = plan
+            if resume_at is None:
+                stats["symbols_cached"] += 1
+            else:
+                resume[sym] = resume_at
+                to_run.append((sym, df))
+                stats["symbols_extended"] += 1
+
+        simulated = await self._simulate_parallel(to_run, backtest_start, req, resume) if to_run else {}
+
+        all_trades: List[TradeResult] = []
+        for sym, df in frames:
+            new = simulated.get(sym, [])
+            trades = kept.get(sym, []) + (new or [])
+            all_trades.extend(trades)
+            if sym in simulated and new is not None:
+                self._cache_symbol(sim_key, sym, df, digests[sym], trades)
+        if to_run:
+            symbol_trade_cache.prune()
+        return all_trades, stats
+
+    def _resume_plan(
+        self,
+        entry: Optional[Dict],
+        df: pd.DataFrame,
+        digest: str,
+        req: BacktestRequest,
+    ) -> Optional[Tuple[List[TradeResult], Optional[Tuple[int, int]]]]:
+        """
+        (reusable trades, resume point) from a cached symbol entry, or None if
+        the cache does not apply. Resume point None = nothing new to simulate,
+        else (first candidate bar, exit bar of the last kept trade).
+        """
+        if entry is None:
+            return None
+        n_old = entry["n_bars"]
+        if n_old > len(df):
+            return None
+        table = entry["table"]
+        if n_old == len(df):
+            if entry["digest"] != digest:
+                return None
+            return self._table_trades(table), None
+        if entry["digest"] != _frame_digest(df, n_old):
+            return None
+
+        # A trade is still open at the old boundary if it timed out on the last
+        # old bar only because the data ran out (at most the final trade)
+        entry_bar, exit_bar = entry["entry_bar"], entry["exit_bar"]
+        cut_short = (
+            (table["outcome"] == _OUTCOME_CODES["TIMEOUT"])
+            & (exit_bar == n_old - 1)
+            & (req.no_timeout | (entry_bar + req.max_hold_bars > n_old - 1))
+        )
+        k = int(cut_short.argmax()) if cut_short.any() else len(table)
+        # Signal bar of the reopened trade, else the old last bar (no next-bar entry then)
+        first_bar = int(entry_bar[k]) - 1 if k < len(table) else n_old - 1
+        last_exit = int(exit_bar[k - 1]) if k > 0 else -999
+        return self._table_trades(table, k), (first_bar, last_exit)
+
+    @staticmethod
+    def _table_trades(table: TradeTable, n: Optional[int] = None) -> List[TradeResult]:
+        rows = table.rows(np.arange(len(table) if n is None else n))
+        return [TradeResult(**r) for r in rows]
+
+    @staticmethod
+    def _cache_symbol(sim_key: str, symbol: str, df: pd.DataFrame, digest: str, trades: List[TradeResult]) -> None:
+        days = df.index.strftime("%Y-%m-%d").to_numpy()
+        table = TradeTable.from_trades(trades)
+        symbol_trade_cache.put(
+            sim_key,
+            symbol,
+            table,
+            entry_bar=np.searchsorted(days, table["entry_date"]),
+            exit_bar=np.searchsorted(days, table["exit_date"]),
+            n_bars=len(df),
+            digest=digest,
+        )
+
+    async def _run_sharded(self, frames: List[Tuple[str, pd.DataFrame]], worker, *args) -> List:
+        """
+        Shard symbols across the worker-process pool; returns one result per shard.
+
+        All OHLCV bars are packed into one shared-memory block (ts + 5 price
+        columns, float64), so each shard ships only (symbol, row offset, rows)
+        instead of pickled DataFrames. `worker` is a module-level function
+        called as worker(shm_name, total_rows, shard, *args).
+        """
+        if not frames:
+            return []
+
+        total_rows = sum(len(df) for _, df in frames)
+        shm = shared_memory.SharedMemory(create=True, size=total_rows * len(_SHM_COLUMNS) * 8)
+        try:
+            block = np.ndarray((total_rows, len(_SHM_COLUMNS)), dtype=np.float64, buffer=shm.buf)
+            layout: List[Tuple[str, int, int]] = []
+            offset = 0
+            for sym, df in frames:
+                rows = len(df)
+                block[offset:offset + rows, 0] = df.index.values.astype("datetime64[s]").astype(np.int64)
+                block[offset:offset + rows, 1:] = df[list(_SHM_COLUMNS[1:])].to_numpy(dtype=np.float64)
+                layout.append((sym, offset, rows))
+                offset += rows
+            del block
+
+            # A few shards per worker keeps cores busy when symbol sizes differ
+            n_shards = min(len(layout), executors.process_workers * 4)
+            shards = [layout[k::n_shards] for k in range(n_shards)]
+
+            futures = [
+                asyncio.ensure_future(self._in_process_pool(worker, shm.name, total_rows, shard, *args))
+                for shard in shards
+            ]
+            self._track_progress("simulate", futures, [[sym for sym, _, _ in shard] for shard in shards])
+            try:
+                results = await asyncio.gather(*futures)
+            except BrokenProcessPool:
+                executors.reset_process_pool()
+                raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return list(results)
+
+    @staticmethod
+    async def _in_process_pool(fn, *args):
+        """fn(*args) on the shared process pool, holding a job slot for background runs."""
+        slots = backtest_process_slots.get()
+        loop = asyncio.get_event_loop()
+        if slots is None:
+            return await loop.run_in_executor(executors.process_pool(), fn, *args)
+        async with slots:
+            return await loop.run_in_executor(executors.process_pool(), fn, *args)
+
+    # ── Data fetch ────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _track_progress(stage: str, futures: List[asyncio.Future], symbols: List[List[str]]) -> None:
+        """Report each future's symbols to the run's progress listener as it completes."""
+        listener = backtest_progress.get()
+        if listener is None:
+            return
+        total = sum(len(syms) for syms in symbols)
+        listener(stage, total, [])
+        for fut, syms in zip(futures, symbols):
+            fut.add_done_callback(lambda f, syms=syms: f.cancelled() or listener(stage, total, syms))
+
+    async def _fetch_frames(
+        self, symbols: List[str], fetch_start: str, end_date: str, fetch=None
+    ) -> Tuple[List[Tuple[str, pd.DataFrame]], List[str]]:
+        """
+        Download all symbols in parallel → ([(symbol, OHLCV frame)], failed symbols).
+
+        `fetch(symbol, start, end)` defaults to daily bars (_fetch_symbol_data).
+        """
+        fetch = fetch or self._fetch_symbol_data
         loop = asyncio.get_event_loop()
+        pool = executors.pool(
+            "market-data-download", Priority.BACKGROUND if backtest_background.get() else None
+        )
         tasks = [
             loop.run_in_executor(
-                None,
-                self._fetch_symbol_data,
+                pool,
+                fetch,
                 sym,
                 fetch_start,
                 end_date,
             )
             for sym in symbols
         ]
+        self._track_progress("fetch", tasks, [[sym] for sym in symbols])
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        all_trades: List[TradeResult] = []
         failed_symbols: List[str] = []
+        frames: List[Tuple[str, pd.DataFrame]] = []
 
         for sym, result in zip(symbols, results):
             if isinstance(result, Exception):
@@ -122,40 +1442,45 @@ class BacktestEngine:
             if result is None or result.empty:
                 failed_symbols.append(sym)
                 continue
+            frames.append((sym, result))
 
-            trades = self._simulate_symbol(
-                symbol=sym,
-                df=result,
-                backtest_start=start_date,
-                req=req,
-            )
-            all_trades.extend(trades)
-
-        logger.info(
-            f"[Backtest] Simulation done: {len(all_trades)} trades from "
-            f"{len(symbols) - len(failed_symbols)} symbols. "
-            f"Failed: {failed_symbols}"
-        )
-
-        report = self._build_report(all_trades, req, symbols, end_date, failed_symbols)
-        return report
-
-    # ── Data fetch ────────────────────────────────────────────────────────────
+        return frames, failed_symbols
 
     def _fetch_symbol_data(self, symbol: str, start: str, end: str) -> Optional[pd.DataFrame]:
         try:
-            ticker = yf.Ticker(f"{symbol}.NS")
-            df = ticker.history(start=start, end=end, interval="1d", auto_adjust=True)
+            # Served from the local candle store; only bars not yet on disk
+            # are downloaded (end is exclusive, as with yfinance).
+            df = candle_store.get_range(
+                symbol,
+                datetime.strptime(start, "%Y-%m-%d").date(),
+                datetime.strptime(end, "%Y-%m-%d").date(),
+            )
             if df.empty or len(df) < self._WARMUP_BARS:
                 logger.debug(f"[Backtest] {symbol}: insufficient rows ({len(df)})")
                 return None
-            df = df[["Open", "High", "Low", "Close", "Volume"]].copy()
-            df.index = pd.to_datetime(df.index).tz_localize(None)
+            df = df.rename(columns=str.capitalize)[["Open", "High", "Low", "Close", "Volume"]].copy()
             return df
         except Exception as e:
             logger.warning(f"[Backtest] {symbol} fetch error: {e}")
             return None
 
+    def _fetch_intraday_symbol_data(self, symbol: str, start: str, end: str) -> Optional[pd.DataFrame]:
+        try:
+            df = candle_store.get_range(
+                symbol,
+                datetime.strptime(start, "%Y-%m-%d").date(),
+                datetime.strptime(end, "%Y-%m-%d").date(),
+                interval="5minute",
+                fetcher=yfinance_5minute_fetcher,
+            )
+            if df.empty:
+                logger.debug(f"[Backtest] {symbol}: no 5-minute bars stored")
+                return None
+            return df.rename(columns=str.capitalize)[["Open", "High", "Low", "Close", "Volume"]].copy()
+        except Exception as e:
+            logger.warning(f"[Backtest] {symbol} 5-minute fetch error: {e}")
+            return None
+
     # ── Indicator computation (vectorized on full series) ─────────────────────
 
     def _compute_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -333,6 +1658,53 @@ class BacktestEngine:
             "pullback_to_ema20":      bool(row["pullback"]),
         }
 
+    # ── Column arrays + bar-wise signals ──────────────────────────────────────
+
+    _FLOAT_COLUMNS = ("open", "high", "low", "close", "ema20", "ema50", "ema20_slope",
+                      "atr_14", "rsi_14", "macd_hist", "di_plus", "di_minus", "adx", "vol_ratio")
+
+    def _to_arrays(self, ind: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Contiguous NumPy column views of the indicator frame (one copy per symbol)."""
+        a = {c: np.ascontiguousarray(ind[c].to_numpy(dtype=np.float64)) for c in self._FLOAT_COLUMNS}
+        a["macd_bx"] = ind["macd_bx"].to_numpy(dtype=bool)
+        a["macd_brx"] = ind["macd_brx"].to_numpy(dtype=bool)
+        a["pullback"] = ind["pullback"].to_numpy(dtype=bool)
+        a["market_struct"] = ind["market_struct"].to_numpy(dtype=str)
+        a["candle_pattern"] = ind["candle_pattern"].to_numpy(dtype=str)
+        return a
+
+    def _daily_signal_arrays(self, a: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        strategy_engine.generate_daily_signals() over every bar at once.
+
+        Returns (direction, strength, score): direction is +1 BUY / -1 SELL / 0 NEUTRAL,
+        also 0 where a required indicator is NaN (as _row_to_indicator_dict skips them).
+        """
+        required = ("close", "ema20", "ema50", "rsi_14", "macd_hist", "di_plus", "di_minus", "adx")
+        valid = ~np.isnan(np.vstack([a[c] for c in required])).any(axis=0)
+
+        sig = strategy_engine.generate_daily_signals({
+            "last_close":             a["close"],
+            "ema_20":                 a["ema20"],
+            "ema_50":                 a["ema50"],
+            "ema20_slope":            np.nan_to_num(a["ema20_slope"], nan=0.0),
+            "rsi":                    a["rsi_14"],
+            "macd_histogram":         a["macd_hist"],
+            "macd_bullish_crossover": a["macd_bx"],
+            "macd_bearish_crossover": a["macd_brx"],
+            "di_plus":                a["di_plus"],
+            "di_minus":               a["di_minus"],
+            "adx":                    a["adx"],
+            "market_structure":       a["market_struct"],
+            "volume_ratio":           np.where(np.isnan(a["vol_ratio"]), 1.0, a["vol_ratio"]),
+            "candle_pattern":         a["candle_pattern"],
+            "pullback_to_ema20":      a["pullback"],
+        })
+        direction = np.where(valid, sig["signal"], 0)
+        strength = np.where(valid, sig["strength"], 0)
+        score = np.where(valid, sig["score"], 0)
+        return direction, strength, score
+
     # ── Per-symbol simulation ─────────────────────────────────────────────────
 
     def _simulate_symbol(
@@ -341,86 +1713,96 @@ class BacktestEngine:
         df: pd.DataFrame,
         backtest_start: str,
         req: BacktestRequest,
+        first_bar: int = 0,
+        last_trade_bar: int = -999,
     ) -> List[TradeResult]:
+        """Trades for one symbol; first_bar / last_trade_bar continue an earlier walk."""
+        prep = self._prepare_symbol(df)
+        if prep is None:
+            return []
+        candidates = self._candidate_bars(prep, backtest_start, req.min_signal_strength, req.include_short)
+        if first_bar:
+            candidates = [i for i in candidates if i >= first_bar]
+        return self._walk_trades(symbol, prep, candidates, req, last_trade_bar)
+
+    def _prepare_symbol(self, df: pd.DataFrame) -> Optional[_PreparedSymbol]:
+        """Indicators, column arrays and bar-wise signals — everything independent of exit params."""
         ind = self._compute_indicators(df)
-        trades: List[TradeResult] = []
-        n = len(ind)
-        last_trade_bar = -999  # cooldown: no new trade within 3 bars of last trade
+        if len(ind) < 2:
+            return None
+        a = self._to_arrays(ind)
+        direction, strength, score = self._daily_signal_arrays(a)
+        return _PreparedSymbol(
+            ind=ind,
+            a=a,
+            days=ind.index.strftime("%Y-%m-%d").to_numpy(),
+            direction=direction,
+            strength=strength,
+            score=score,
+        )
 
-        for i in range(self._WARMUP_BARS, n - 1):
-            # Only process bars within the requested backtest window
-            bar_date = ind.index[i]
-            if str(bar_date.date()) < backtest_start:
-                continue
+    def _candidate_bars(
+        self,
+        prep: _PreparedSymbol,
+        backtest_start: str,
+        min_signal_strength: int,
+        include_short: bool,
+    ) -> List[int]:
+        """Every bar that would open a trade if it were not in a cooldown."""
+        a, n = prep.a, len(prep.days)
+        next_open = np.append(a["open"][1:], np.nan)
+        bar = np.arange(n)
+        candidate = (
+            (bar >= self._WARMUP_BARS) & (bar < n - 1)
+            & (prep.days >= backtest_start)
+            & (prep.direction != 0)
+            & (prep.strength >= min_signal_strength)
+            & ((prep.direction > 0) | include_short)
+            & (next_open > 0)
+            & (a["atr_14"] > 0)
+            & (a["ema50"] > 0)
+        )
+        return np.flatnonzero(candidate).tolist()
 
+    def _walk_trades(
+        self,
+        symbol: str,
+        prep: _PreparedSymbol,
+        candidates: List[int],
+        req: BacktestRequest,
+        last_trade_bar: int = -999,   # cooldown: no new trade within 3 bars of last trade
+    ) -> List[TradeResult]:
+        a, days, direction, strength = prep.a, prep.days, prep.direction, prep.strength
+        opens, highs, lows, closes = a["open"], a["high"], a["low"], a["close"]
+        n = len(days)
+        trades: List[TradeResult] = []
+
+        # Only the (few) candidate bars are walked; the cooldown makes this path-dependent
+        for i in candidates:
             # 3-bar cooldown after last trade exit
             if i - last_trade_bar < 3:
                 continue
 
-            row = ind.iloc[i]
-            ind_dict = self._row_to_indicator_dict(row)
-            if ind_dict is None:
-                continue
-
-            # Use the daily swing signal (NOT the intraday 5-combo signal)
-            sig = strategy_engine.generate_daily_signal(ind_dict)
-            signal = sig["signal"]
-            strength = sig["strength"]
-            reasons = sig["reasons"]
-
-            if signal == "NEUTRAL":
-                continue
-            if strength < req.min_signal_strength:
-                continue
-            if signal == "SELL" and not req.include_short:
-                continue
-
             # Entry: next bar's open
             entry_idx = i + 1
-            if entry_idx >= n:
-                break
-
-            entry_bar = ind.iloc[entry_idx]
-            entry_price = float(entry_bar["open"])
-            if entry_price <= 0:
-                continue
+            entry_price = float(opens[entry_idx])
+            atr = float(a["atr_14"][i])
+            ema50_val = float(a["ema50"][i])
 
-            atr = float(row["atr_14"])
-            ema50_val = float(row["ema50"])
-            if atr <= 0 or math.isnan(atr) or ema50_val <= 0:
+            is_short = direction[i] < 0
+            stops = self._stop_and_target(entry_price, atr, ema50_val, is_short, req.target_rr)
+            if stops is None:
                 continue
-
-            # ── Structural SL: use EMA50 as the stop level ────────────────
-            # EMA50 break = trend invalidation = exit. This is more meaningful
-            # than an arbitrary ATR×N stop on daily candles.
-            # Floor: SL must be at least 0.5×ATR from entry (avoid zero-width stops).
-            is_short = signal == "SELL"
-            atr_floor = atr * 0.5
-
-            if is_short:
-                structural_sl = ema50_val           # cover above EMA50 for shorts
-                sl_distance = max(structural_sl - entry_price, atr_floor)
-                stop_loss = round(entry_price + sl_distance, 2)
-                target_distance = sl_distance * req.target_rr
-                target = round(entry_price - target_distance, 2)
-                if target <= 0:
-                    continue
-            else:
-                structural_sl = ema50_val           # exit below EMA50 for longs
-                sl_distance = max(entry_price - structural_sl, atr_floor)
-                stop_loss = round(entry_price - sl_distance, 2)
-                target_distance = sl_distance * req.target_rr
-                target = round(entry_price + target_distance, 2)
-                if stop_loss <= 0:
-                    continue
+            stop_loss, target = stops
 
             # Simulate exit from entry bar onwards
             # When no_timeout=True, extend max_hold to remaining bars (rely only on SL/target)
             effective_max_hold = (n - entry_idx - 1) if req.no_timeout else req.max_hold_bars
             outcome, exit_price, exit_bar_idx = self._simulate_exit(
-                ind=ind,
+                highs=highs,
+                lows=lows,
+                closes=closes,
                 entry_idx=entry_idx,
-                entry_price=entry_price,
                 stop_loss=stop_loss,
                 target=target,
                 is_short=is_short,
@@ -434,12 +1816,17 @@ class BacktestEngine:
             else:
                 pnl_pct = round((exit_price - entry_price) / entry_price * 100, 3)
 
+            # Reason strings only for bars that actually trade
+            reasons = strategy_engine.generate_daily_signal(
+                self._row_to_indicator_dict(prep.ind.iloc[i])
+            )["reasons"]
+
             trades.append(TradeResult(
                 symbol=symbol,
-                entry_date=str(ind.index[entry_idx].date()),
-                exit_date=str(ind.index[exit_bar_idx].date()),
+                entry_date=days[entry_idx],
+                exit_date=days[exit_bar_idx],
                 action="SELL" if is_short else "BUY",
-                signal_strength=strength,
+                signal_strength=int(strength[i]),
                 signal_reasons=reasons,
                 entry_price=round(entry_price, 2),
                 stop_loss=stop_loss,
@@ -454,96 +1841,124 @@ class BacktestEngine:
 
         return trades
 
+    # ── Stops ─────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _stop_and_target(
+        entry_price: float, atr: float, ema50_val: float, is_short: bool, target_rr: float
+    ) -> Optional[Tuple[float, float]]:
+        """
+        Structural SL: use EMA50 as the stop level.
+        EMA50 break = trend invalidation = exit. This is more meaningful
+        than an arbitrary ATR×N stop on daily candles.
+        Floor: SL must be at least 0.5×ATR from entry (avoid zero-width stops).
+        Returns (stop_loss, target), or None when the levels are unusable.
+        """
+        atr_floor = atr * 0.5
+
+        if is_short:
+            structural_sl = ema50_val           # cover above EMA50 for shorts
+            sl_distance = max(structural_sl - entry_price, atr_floor)
+            stop_loss = round(entry_price + sl_distance, 2)
+            target_distance = sl_distance * target_rr
+            target = round(entry_price - target_distance, 2)
+            if target <= 0:
+                return None
+        else:
+            structural_sl = ema50_val           # exit below EMA50 for longs
+            sl_distance = max(entry_price - structural_sl, atr_floor)
+            stop_loss = round(entry_price - sl_distance, 2)
+            target_distance = sl_distance * target_rr
+            target = round(entry_price + target_distance, 2)
+            if stop_loss <= 0:
+                return None
+        return stop_loss, target
+
     # ── Exit simulator ────────────────────────────────────────────────────────
 
     def _simulate_exit(
         self,
-        ind: pd.DataFrame,
+        highs: np.ndarray,
+        lows: np.ndarray,
+        closes: np.ndarray,
         entry_idx: int,
-        entry_price: float,
         stop_loss: float,
         target: float,
         is_short: bool,
         max_hold: int,
     ) -> Tuple[str, float, int]:
         """
-        Scan bars from entry_idx onward (including entry bar).
+        First SL/target crossing from entry_idx onward (including entry bar),
+        found with one vectorized comparison over the holding window.
         Returns (outcome, exit_price, bar_index_of_exit).
         """
-        n = len(ind)
-        last_possible = min(entry_idx + max_hold, n - 1)
-
-        for j in range(entry_idx, last_possible + 1):
-            bar = ind.iloc[j]
-            bar_high = float(bar["high"])
-            bar_low = float(bar["low"])
-            bar_close = float(bar["close"])
-
-            if is_short:
-                sl_hit = bar_high >= stop_loss
-                tgt_hit = bar_low <= target
-            else:
-                sl_hit = bar_low <= stop_loss
-                tgt_hit = bar_high >= target
-
-            if sl_hit and tgt_hit:
-                # Both hit on same bar — conservative: assume SL first
-                return "LOSS", stop_loss, j
-
-            if sl_hit:
-                return "LOSS", stop_loss, j
-
-            if tgt_hit:
-                return "WIN", target, j
+        last_possible = min(entry_idx + max_hold, len(closes) - 1)
+        window = slice(entry_idx, last_possible + 1)
+
+        if is_short:
+            sl_hit = highs[window] >= stop_loss
+            tgt_hit = lows[window] <= target
+        else:
+            sl_hit = lows[window] <= stop_loss
+            tgt_hit = highs[window] >= target
+
+        any_hit = sl_hit | tgt_hit
+        k = int(any_hit.argmax())
+        if any_hit[k]:
+            # Both hit on same bar — conservative: assume SL first
+            if sl_hit[k]:
+                return "LOSS", stop_loss, entry_idx + k
+            return "WIN", target, entry_idx + k
 
         # Max hold reached — exit at last bar's close
-        exit_bar = last_possible
-        exit_price = float(ind.iloc[exit_bar]["close"])
-        return "TIMEOUT", exit_price, exit_bar
+        return "TIMEOUT", float(closes[last_possible]), last_possible
 
     # ── Report builder ────────────────────────────────────────────────────────
 
     def _build_report(
         self,
-        trades: List[TradeResult],
+        table: TradeTable,
         req: BacktestRequest,
         symbols: List[str],
         end_date: str,
         failed_symbols: List[str],
     ) -> Dict:
-        if not trades:
+        if not len(table):
             return {
                 "summary": {"total_trades": 0, "message": "No trades generated."},
                 "parameters": self._params_dict(req, symbols, end_date),
                 "generated_at": datetime.utcnow().isoformat(),
             }
 
-        total = len(trades)
-        wins = [t for t in trades if t.outcome == "WIN"]
-        losses = [t for t in trades if t.outcome == "LOSS"]
-        timeouts = [t for t in trades if t.outcome == "TIMEOUT"]
+        pnls = table["pnl_pct"]
+        outcomes = table["outcome"]
+        win = outcomes == _OUTCOME_CODES["WIN"]
+        loss = outcomes == _OUTCOME_CODES["LOSS"]
+        timeout = outcomes == _OUTCOME_CODES["TIMEOUT"]
+        total = len(pnls)
+        n_wins, n_losses, n_timeouts = int(win.sum()), int(loss.sum()), int(timeout.sum())
 
-        win_rate = round(len(wins) / total * 100, 2)
-        loss_rate = round(len(losses) / total * 100, 2)
-        timeout_rate = round(len(timeouts) / total * 100, 2)
+        win_rate = round(n_wins / total * 100, 2)
+        loss_rate = round(n_losses / total * 100, 2)
+        timeout_rate = round(n_timeouts / total * 100, 2)
 
-        avg_win = round(float(np.mean([t.pnl_pct for t in wins])), 3) if wins else 0.0
-        avg_loss = round(float(np.mean([t.pnl_pct for t in losses])), 3) if losses else 0.0
-        avg_timeout = round(float(np.mean([t.pnl_pct for t in timeouts])), 3) if timeouts else 0.0
+        avg_win = round(float(pnls[win].mean()), 3) if n_wins else 0.0
+        avg_loss = round(float(pnls[loss].mean()), 3) if n_losses else 0.0
+        avg_timeout = round(float(pnls[timeout].mean()), 3) if n_timeouts else 0.0
 
         # Profit factor (all trades): gross positive P&L / gross negative P&L.
         # Including timeouts gives a realistic picture — win/loss-only PF is misleading
         # when 50%+ of trades are timeouts (as is normal for a trend-following strategy).
-        all_positive = sum(t.pnl_pct for t in trades if t.pnl_pct > 0)
-        all_negative = abs(sum(t.pnl_pct for t in trades if t.pnl_pct < 0))
+        all_positive = float(pnls[pnls > 0].sum())
+        all_negative = abs(float(pnls[pnls < 0].sum()))
         profit_factor = round(all_positive / all_negative, 3) if all_negative > 0 else float("inf")
 
         # Also keep the classic win/loss-only profit factor for reference
-        gross_profit = sum(t.pnl_pct for t in wins)
-        gross_loss = abs(sum(t.pnl_pct for t in losses))
+        gross_profit = float(pnls[win].sum())
+        gross_loss = abs(float(pnls[loss].sum()))
         win_loss_pf = round(gross_profit / gross_loss, 3) if gross_loss > 0 else float("inf")
 
-        total_pnl = round(sum(t.pnl_pct for t in trades), 3)
+        total_pnl = round(float(pnls.sum()), 3)
         avg_pnl = round(total_pnl / total, 3)
 
         # Expected value per trade
@@ -553,67 +1968,71 @@ class BacktestEngine:
         )
 
         # Max drawdown (equity curve)
-        pnls = [t.pnl_pct for t in trades]
         cum = np.cumsum(pnls)
         running_max = np.maximum.accumulate(cum)
         drawdowns = running_max - cum
-        max_dd = round(float(drawdowns.max()), 3) if len(drawdowns) > 0 else 0.0
+        max_dd = round(float(drawdowns.max()), 3)
 
         # Sharpe-like: mean / std of trade P&Ls
-        pnl_arr = np.array(pnls)
-        sharpe = round(float(pnl_arr.mean() / pnl_arr.std()), 3) if pnl_arr.std() > 0 else 0.0
+        sharpe = round(float(pnls.mean() / pnls.std()), 3) if pnls.std() > 0 else 0.0
+
+        # Group breakdowns: one bincount pass per key instead of a scan per group
+        def group_stats(keys: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+            labels, inv = np.unique(keys, return_inverse=True)
+            k = len(labels)
+            trades = np.bincount(inv, minlength=k)
+            return labels, {
+                "trades": trades,
+                "wins": np.bincount(inv, weights=win, minlength=k).astype(np.int64),
+                "losses": np.bincount(inv, weights=loss, minlength=k).astype(np.int64),
+                "timeouts": np.bincount(inv, weights=timeout, minlength=k).astype(np.int64),
+                "pnl": np.bincount(inv, weights=pnls, minlength=k),
+            }
+
+        def group_row(g: Dict[str, np.ndarray], j: int) -> Dict:
+            n = int(g["trades"][j])
+            return {
+                "trades": n,
+                "wins": int(g["wins"][j]),
+                "win_rate_pct": round(int(g["wins"][j]) / n * 100, 2),
+                "avg_pnl_pct": round(float(g["pnl"][j]) / n, 3),
+            }
 
         # By signal type
-        by_signal = {}
-        for action in ("BUY", "SELL"):
-            group = [t for t in trades if t.action == action]
-            if group:
-                g_wins = [t for t in group if t.outcome == "WIN"]
-                by_signal[action] = {
-                    "trades": len(group),
-                    "wins": len(g_wins),
-                    "win_rate_pct": round(len(g_wins) / len(group) * 100, 2),
-                    "avg_pnl_pct": round(float(np.mean([t.pnl_pct for t in group])), 3),
-                }
+        labels, g = group_stats(table["action"])
+        by_signal = {
+            str(label): group_row(g, j) for j, label in enumerate(labels) if label in ("BUY", "SELL")
+        }
 
         # By signal strength
-        by_strength = {}
-        for s in range(1, 6):
-            group = [t for t in trades if t.signal_strength == s]
-            if group:
-                g_wins = [t for t in group if t.outcome == "WIN"]
-                by_strength[str(s)] = {
-                    "trades": len(group),
-                    "wins": len(g_wins),
-                    "win_rate_pct": round(len(g_wins) / len(group) * 100, 2),
-                    "avg_pnl_pct": round(float(np.mean([t.pnl_pct for t in group])), 3),
-                }
+        labels, g = group_stats(table["signal_strength"])
+        by_strength = {
+            str(label): group_row(g, j) for j, label in enumerate(labels) if 1 <= label <= 5
+        }
 
         # By symbol
-        sym_map: Dict[str, List[TradeResult]] = {}
-        for t in trades:
-            sym_map.setdefault(t.symbol, []).append(t)
+        labels, g = group_stats(table["symbol"])
         by_symbol = []
-        for sym, sym_trades in sorted(sym_map.items()):
-            sw = [t for t in sym_trades if t.outcome == "WIN"]
+        for j, sym in enumerate(labels.tolist()):
+            n = int(g["trades"][j])
             by_symbol.append({
                 "symbol": sym,
-                "trades": len(sym_trades),
-                "wins": len(sw),
-                "losses": len([t for t in sym_trades if t.outcome == "LOSS"]),
-                "timeouts": len([t for t in sym_trades if t.outcome == "TIMEOUT"]),
-                "win_rate_pct": round(len(sw) / len(sym_trades) * 100, 2),
-                "total_pnl_pct": round(sum(t.pnl_pct for t in sym_trades), 3),
-                "avg_pnl_pct": round(float(np.mean([t.pnl_pct for t in sym_trades])), 3),
+                "trades": n,
+                "wins": int(g["wins"][j]),
+                "losses": int(g["losses"][j]),
+                "timeouts": int(g["timeouts"][j]),
+                "win_rate_pct": round(int(g["wins"][j]) / n * 100, 2),
+                "total_pnl_pct": round(float(g["pnl"][j]), 3),
+                "avg_pnl_pct": round(float(g["pnl"][j]) / n, 3),
             })
         by_symbol.sort(key=lambda x: x["total_pnl_pct"], reverse=True)
 
         report = {
             "summary": {
                 "total_trades": total,
-                "win_trades": len(wins),
-                "loss_trades": len(losses),
-                "timeout_trades": len(timeouts),
+                "win_trades": n_wins,
+                "loss_trades": n_losses,
+                "timeout_trades": n_timeouts,
                 "win_rate_pct": win_rate,
                 "loss_rate_pct": loss_rate,
                 "timeout_rate_pct": timeout_rate,
@@ -623,15 +2042,15 @@ class BacktestEngine:
                 "profit_factor": profit_factor,           # all trades (wins+losses+timeouts)
                 "win_loss_profit_factor": win_loss_pf,    # classic: only WIN vs LOSS trades
                 "timeout_profitable_pct": round(          # % of timeout trades that were profitable
-                    len([t for t in timeouts if t.pnl_pct > 0]) / len(timeouts) * 100, 2
-                ) if timeouts else 0.0,
+                    int((pnls[timeout] > 0).sum()) / n_timeouts * 100, 2
+                ) if n_timeouts else 0.0,
                 "expected_value_pct": ev,
                 "total_pnl_pct": total_pnl,
                 "avg_pnl_per_trade_pct": avg_pnl,
                 "max_drawdown_pct": max_dd,
                 "sharpe_ratio": sharpe,
-                "best_trade_pct": round(max(pnls), 3),
-                "worst_trade_pct": round(min(pnls), 3),
+                "best_trade_pct": round(float(pnls.max()), 3),
+                "worst_trade_pct": round(float(pnls.min()), 3),
                 "symbols_tested": len(symbols) - len(failed_symbols),
                 "symbols_failed": len(failed_symbols),
                 "failed_symbols": failed_symbols,
@@ -642,10 +2061,6 @@ class BacktestEngine:
             "parameters": self._params_dict(req, symbols, end_date),
             "generated_at": datetime.utcnow().isoformat(),
         }
-
-        if req.include_trades_detail:
-            report["trades"] = [asdict(t) for t in trades]
-
         return report
 
     def _params_dict(self, req: BacktestRequest, symbols: List[str], end_date: str) -> Dict:
@@ -659,7 +2074,434 @@ class BacktestEngine:
             "max_hold_bars": req.max_hold_bars,
             "no_timeout": req.no_timeout,
             "include_short": req.include_short,
+            "robustness_paths": req.robustness_paths,
+            "ruin_pct": req.ruin_pct,
         }
 
 
 backtest_engine = BacktestEngine()
+
+
+# ── Result cache keys ─────────────────────────────────────────────────────────
+
+_ENGINE_VERSION: Optional[str] = None
+
+
+def _engine_version() -> str:
+    """Hash of the simulation code (this module + the strategy engine)."""
+    global _ENGINE_VERSION
+    if _ENGINE_VERSION is None:
+        import app.engines.strategy_engine as strategy_module
+        h = hashlib.sha256()
+        for path in (__file__, strategy_module.__file__):
+            with open(path, "rb") as f:
+                h.update(f.read())
+        _ENGINE_VERSION = h.hexdigest()
+    return _ENGINE_VERSION
+
+
+def _frame_digest(df: pd.DataFrame, rows: Optional[int] = None) -> str:
+    """Hash of the first `rows` bars (timestamps + OHLCV) of a frame."""
+    part = df.iloc[:rows] if rows is not None else df
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(part.index.values.astype("datetime64[s]").astype(np.int64)).tobytes())
+    h.update(np.ascontiguousarray(part[list(_SHM_COLUMNS[1:])].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def _sim_key(req: BacktestRequest, backtest_start: str) -> str:
+    """Everything a per-symbol trade list depends on besides its input bars."""
+    params = {
+        "engine": _engine_version(),
+        "start_date": backtest_start,
+        "sl_atr_multiplier": req.sl_atr_multiplier,
+        "target_rr": req.target_rr,
+        "min_signal_strength": req.min_signal_strength,
+        "max_hold_bars": req.max_hold_bars,
+        "no_timeout": req.no_timeout,
+        "include_short": req.include_short,
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _run_key(
+    req: BacktestRequest,
+    symbols: List[str],
+    start_date: str,
+    end_date: str,
+    digests: Dict[str, str],
+    failed_symbols: List[str],
+) -> str:
+    """Content address of a /run result: parameters, engine code and input data."""
+    params = {
+        "sim": _sim_key(req, start_date),
+        "symbols": symbols,
+        "end_date": end_date,
+        "data": digests,
+        "failed": failed_symbols,
+        "robustness": [req.robustness_paths, req.ruin_pct],
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+# ── Process-pool worker ───────────────────────────────────────────────────────
+
+_SHM_COLUMNS = ("ts", "Open", "High", "Low", "Close", "Volume")
+
+
+def _shard_frames(shm_name: str, total_rows: int, shard: List[Tuple[str, int, int]]):
+    """Yield (symbol, OHLCV frame) for each (symbol, offset, rows) slice of the shared block."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((total_rows, len(_SHM_COLUMNS)), dtype=np.float64, buffer=shm.buf)
+        for sym, offset, rows in shard:
+            part = block[offset:offset + rows].copy()
+            yield sym, pd.DataFrame(
+                part[:, 1:],
+                columns=list(_SHM_COLUMNS[1:]),
+                index=pd.to_datetime(part[:, 0].astype(np.int64), unit="s"),
+            )
+        del block
+    finally:
+        shm.close()
+
+
+def _simulate_shard(
+    shm_name: str,
+    total_rows: int,
+    shard: List[Tuple[str, int, int]],
+    backtest_start: str,
+    req: BacktestRequest,
+    resume: Dict[str, Tuple[int, int]],
+) -> List[Tuple[str, Optional[List[TradeResult]]]]:
+    """Runs in a worker process: simulation for each symbol of the shard (None = failed)."""
+    out = []
+    for sym, df in _shard_frames(shm_name, total_rows, shard):
+        try:
+            out.append((sym, backtest_engine._simulate_symbol(
+                sym, df, backtest_start, req, *resume.get(sym, (0, -999))
+            )))
+        except Exception as e:
+            logger.warning(f"[Backtest] {sym}: simulation failed — {e}")
+            out.append((sym, None))
+    return out
+
+
+def _sweep_shard(
+    shm_name: str,
+    total_rows: int,
+    shard: List[Tuple[str, int, int]],
+    backtest_start: str,
+    base: BacktestRequest,
+    exit_keys: List[Tuple[float, int, int]],
+) -> List[Tuple[str, List[Tuple[np.ndarray, np.ndarray]]]]:
+    """Runs in a worker process: every sweep combination for each symbol of the shard."""
+    out = []
+    for sym, df in _shard_frames(shm_name, total_rows, shard):
+        try:
+            prep = backtest_engine._prepare_symbol(df)
+            if prep is not None:
+                results = backtest_engine._sweep_prepared(prep, backtest_start, base, exit_keys)
+                out.append((sym, [(pnls, outcomes) for pnls, outcomes, _ in results]))
+        except Exception as e:
+            logger.warning(f"[Backtest] {sym}: sweep failed — {e}")
+    return out
+
+
+def _concat_trades(parts) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Concatenate (pnl, outcome, exit day) triples; empty-safe."""
+    if not parts:
+        return np.empty(0), np.empty(0, np.int8), np.empty(0, "datetime64[D]")
+    return tuple(np.concatenate([p[i] for p in parts]) for i in range(3))
+
+
+def _walk_forward_shard(
+    shm_name: str,
+    total_rows: int,
+    shard: List[Tuple[str, int, int]],
+    folds: List[Tuple[str, str, str, str]],
+    base: BacktestRequest,
+    exit_keys: List[Tuple[float, int, int]],
+) -> List[List[List[Tuple[np.ndarray, np.ndarray, np.ndarray]]]]:
+    """
+    Runs in a worker process: [fold][train=0 / test=1][exit key] → (pnl, outcome,
+    exit day) arrays over all symbols of the shard. Indicators are computed
+    once per symbol and reused by every fold.
+    """
+    acc = [[[[] for _ in exit_keys] for _ in range(2)] for _ in folds]
+    for sym, df in _shard_frames(shm_name, total_rows, shard):
+        try:
+            prep = backtest_engine._prepare_symbol(df)
+            if prep is None:
+                continue
+            for f, (train_start, train_end, test_start, test_end) in enumerate(folds):
+                for phase, (start, end) in enumerate(((train_start, train_end), (test_start, test_end))):
+                    window = prep.head(int(np.searchsorted(prep.days, end)))
+                    if len(window.days) < 2:
+                        continue
+                    results = backtest_engine._sweep_prepared(window, start, base, exit_keys)
+                    for k, (pnls, outcomes, exits) in enumerate(results):
+                        acc[f][phase][k].append(
+                            (pnls, outcomes, window.days[exits].astype("datetime64[D]"))
+                        )
+        except Exception as e:
+            logger.warning(f"[Backtest] {sym}: walk-forward failed — {e}")
+    return [[[_concat_trades(parts) for parts in keys] for keys in phases] for phases in acc]
+
+
+def _portfolio_candidates_shard(
+    shm_name: str,
+    total_rows: int,
+    shard: List[Tuple[str, int, int]],
+    backtest_start: str,
+    req: BacktestRequest,
+) -> List[Tuple[str, Dict[str, np.ndarray]]]:
+    """Runs in a worker process: trade candidates for each symbol of the shard."""
+    out = []
+    for sym, df in _shard_frames(shm_name, total_rows, shard):
+        try:
+            prep = backtest_engine._prepare_symbol(df)
+            if prep is not None:
+                out.append((sym, backtest_engine._trade_candidates(prep, backtest_start, req)))
+        except Exception as e:
+            logger.warning(f"[Backtest] {sym}: portfolio candidates failed — {e}")
+    return out
+
+
+def _portfolio_replay(c: Dict[str, np.ndarray], symbols: List[str], req: PortfolioBacktestRequest) -> Dict:
+    """
+    Event-heap replay of all candidates against one capital pool.
+
+    Candidates are visited in (entry day, best score first) order — the live
+    agent also enters the highest-scoring signals first. Before each new
+    session, positions whose exit day has passed are popped off a min-heap
+    keyed by exit day and their margin + P&L returned to cash, so slots and
+    capital freed by a day's exits are usable from the next session on.
+    Sizing is RiskEngine's risk-based quantity on available cash × leverage,
+    capped at capital_cap_pct of cash, as in UserTradingAgent.
+    """
+    initial = float(req.initial_capital)
+    n = len(c.get("signal_idx", []))
+    cash = initial
+    open_heap: List[Tuple] = []          # (exit_day, seq, margin, pnl)
+    next_free: Dict[int, int] = {}       # symbol → first signal bar allowed (holding + 3-bar cooldown)
+    realized: List[Tuple] = []           # (exit_day, pnl)
+    taken: List[Tuple[int, int, float]] = []
+    skipped = {"max_positions": 0, "max_trades_per_day": 0, "insufficient_capital": 0}
+    max_open = 0
+
+    order = np.lexsort((-c["score"], c["entry_day"])) if n else np.empty(0, np.int64)
+    entry_day = c["entry_day"].tolist() if n else []
+    exit_day = c["exit_day"].tolist() if n else []
+    sym_id = c["symbol_id"].tolist() if n else []
+    signal_idx = c["signal_idx"].tolist() if n else []
+    exit_idx = c["exit_idx"].tolist() if n else []
+    entry_px = c["entry_price"].tolist() if n else []
+    stop_px = c["stop_loss"].tolist() if n else []
+    exit_px = c["exit_price"].tolist() if n else []
+    is_short = c["is_short"].tolist() if n else []
+
+    session = None
+    trades_today = 0
+    for r in order.tolist():
+        day = entry_day[r]
+        if day != session:
+            session, trades_today = day, 0
+            while open_heap and open_heap[0][0] < day:
+                closed_day, _, margin, pnl = heapq.heappop(open_heap)
+                cash += margin + pnl
+                realized.append((closed_day, pnl))
+
+        sym = sym_id[r]
+        if signal_idx[r] < next_free.get(sym, 0):
+            continue                    # already holding this symbol, or in its cooldown
+        if len(open_heap) >= req.max_positions:
+            skipped["max_positions"] += 1
+            continue
+        if trades_today >= req.max_trades_per_day:
+            skipped["max_trades_per_day"] += 1
+            continue
+        if cash < 1000:
+            skipped["insufficient_capital"] += 1
+            continue
+
+        entry = entry_px[r]
+        quantity = max(1, risk_engine.risk_quantity(entry, stop_px[r], req.risk_percent, cash, req.leverage))
+        max_by_capital = int((cash * req.capital_cap_pct / 100) / entry)
+        quantity = min(quantity, max(1, max_by_capital))
+        margin = quantity * entry / max(1, min(5, req.leverage))
+        if margin > cash:
+            skipped["insufficient_capital"] += 1
+            continue
+
+        move = exit_px[r] - entry
+        pnl = quantity * (-move if is_short[r] else move)
+        cash -= margin
+        heapq.heappush(open_heap, (exit_day[r], r, margin, pnl))
+        next_free[sym] = exit_idx[r] + 3
+        trades_today += 1
+        max_open = max(max_open, len(open_heap))
+        taken.append((r, quantity, pnl))
+
+    while open_heap:
+        closed_day, _, margin, pnl = heapq.heappop(open_heap)
+        cash += margin + pnl
+        realized.append((closed_day, pnl))
+
+    # ── Equity curve (realised, by exit day) ──────────────────────────────
+    equity_curve = []
+    max_dd = max_dd_pct = 0.0
+    if realized:
+        days = np.array([d for d, _ in realized], dtype="datetime64[D]")
+        pnls = np.array([p for _, p in realized], dtype=np.float64)
+        day_keys, inverse = np.unique(days, return_inverse=True)
+        equity = initial + np.cumsum(np.bincount(inverse, weights=pnls))
+        peak = np.maximum.accumulate(np.concatenate([[initial], equity]))[1:]
+        max_dd = float((peak - equity).max())
+        max_dd_pct = float(((peak - equity) / peak).max() * 100)
+        equity_curve = [
+            {"date": str(d), "equity": round(float(e), 2)} for d, e in zip(day_keys, equity)
+        ]
+
+    trade_pnls = np.array([p for _, _, p in taken], dtype=np.float64)
+    outcomes = np.array([c["outcome"][r] for r, _, _ in taken], dtype=np.int8)
+    total = len(taken)
+    gross_pos = float(trade_pnls[trade_pnls > 0].sum()) if total else 0.0
+    gross_neg = abs(float(trade_pnls[trade_pnls < 0].sum())) if total else 0.0
+    final_equity = cash
+    years = max((pd.Timestamp(req.end_date or date.today()) - pd.Timestamp(req.start_date)).days / 365.25, 1 / 365.25)
+
+    summary = {
+        "initial_capital": round(initial, 2),
+        "final_equity": round(final_equity, 2),
+        "total_pnl": round(final_equity - initial, 2),
+        "total_return_pct": round((final_equity / initial - 1) * 100, 3),
+        "cagr_pct": round(((final_equity / initial) ** (1 / years) - 1) * 100, 3) if final_equity > 0 else -100.0,
+        "max_drawdown": round(max_dd, 2),
+        "max_drawdown_pct": round(max_dd_pct, 3),
+        "total_trades": total,
+        "win_trades": int((outcomes == 1).sum()),
+        "loss_trades": int((outcomes == -1).sum()),
+        "timeout_trades": int((outcomes == 0).sum()),
+        "win_rate_pct": round(int((outcomes == 1).sum()) / total * 100, 2) if total else 0.0,
+        "profit_factor": round(gross_pos / gross_neg, 3) if gross_neg > 0 else float("inf"),
+        "avg_pnl_per_trade": round(float(trade_pnls.mean()), 2) if total else 0.0,
+        "max_concurrent_positions": max_open,
+        "signals_considered": n,
+        "signals_skipped": skipped,
+    }
+    report = {"summary": summary, "equity_curve": equity_curve}
+
+    if req.include_trades_detail:
+        report["trades"] = [
+            {
+                "symbol": symbols[sym_id[r]],
+                "action": "SELL" if is_short[r] else "BUY",
+                "quantity": quantity,
+                "entry_date": str(entry_day[r]),
+                "exit_date": str(exit_day[r]),
+                "entry_price": round(entry_px[r], 2),
+                "stop_loss": stop_px[r],
+                "target": float(c["target"][r]),
+                "exit_price": round(exit_px[r], 2),
+                "outcome": _OUTCOME_NAMES[int(c["outcome"][r])],
+                "pnl": round(pnl, 2),
+                "signal_strength": int(c["strength"][r]),
+                "signal_score": int(c["score"][r]),
+            }
+            for r, quantity, pnl in taken
+        ]
+    return report
+
+
+def _intraday_signals_shard(
+    shm_name: str,
+    total_rows: int,
+    shard: List[Tuple[str, int, int]],
+    req: IntradayBacktestRequest,
+) -> List[Tuple[str, Dict[str, np.ndarray]]]:
+    """Runs in a worker process: qualifying scan bars for each symbol of the shard."""
+    out = []
+    for sym, df in _shard_frames(shm_name, total_rows, shard):
+        try:
+            out.append((sym, backtest_engine._intraday_signal_bars(df, req)))
+        except Exception as e:
+            logger.warning(f"[Backtest] {sym}: intraday signals failed — {e}")
+    return out
+
+
+def _bar_clock(ts) -> str:
+    """HH:MM of an epoch-seconds bar time (IST wall clock)."""
+    minute = int(ts) % 86400 // 60
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def _replay_intraday_position(
+    ts: np.ndarray,
+    o: np.ndarray,
+    h: np.ndarray,
+    l: np.ndarray,
+    c: np.ndarray,
+    start: int,
+    end: int,
+    is_short: bool,
+    entry: float,
+    stop_loss: float,
+    targets: List[Dict],
+    quantity: int,
+    atr: float,
+) -> Tuple[List[Tuple[str, int, float, int]], int]:
+    """
+    Walk one position bar by bar from its entry bar to squareoff.
+
+    Mirrors UserTradingAgent._monitor_positions / _check_targets: targets
+    exit their quantity and move the stop to their `new_sl`; the stop trails
+    1.5 ATR behind the best price once that is 1 ATR past entry. Prices are
+    handled sign-flipped for shorts so one code path serves both sides.
+
+    Returns ([(label, bar index, fill price, quantity)], number of trail moves).
+    """
+    s = -1.0 if is_short else 1.0
+    sl = s * stop_loss
+    e = s * entry
+    initial_sl = sl
+    watermark = e
+    remaining = quantity
+    trail_moves = 0
+    legs: List[Tuple[str, int, float, int]] = []
+
+    for i in range(start, end):
+        if (int(ts[i]) % 86400) // 60 >= _SQUAREOFF_MIN:
+            legs.append(("SQUAREOFF", i, float(o[i]), remaining))
+            return legs, trail_moves
+        op = s * o[i]
+        hi = s * (l[i] if is_short else h[i])
+        lo = s * (h[i] if is_short else l[i])
+
+        if lo <= sl:
+            label = "STOP_LOSS" if sl == initial_sl else "TRAILING_STOP"
+            legs.append((label, i, float(s * min(op, sl)), remaining))
+            return legs, trail_moves
+
+        for tgt in targets:
+            if tgt.get("hit"):
+                continue
+            if hi < s * tgt["price"]:
+                break                       # targets are ordered — later ones can't fill first
+            tgt["hit"] = True
+            legs.append((tgt["label"], i, float(s * max(op, s * tgt["price"])), tgt["qty"]))
+            remaining -= tgt["qty"]
+            if remaining <= 0:
+                return legs, trail_moves
+            sl = s * tgt["new_sl"]
+
+        watermark = max(watermark, hi)
+        if watermark - e >= atr:
+            new_sl = round(watermark - 1.5 * atr, 2)
+            if new_sl > sl + 0.05:
+                sl = new_sl
+                trail_moves += 1
+
+    if remaining > 0 and end > start:
+        legs.append(("SQUAREOFF", end - 1, float(c[end - 1]), remaining))
+    return legs, trail_moves
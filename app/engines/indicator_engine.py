@@ -0,0 +1,338 @@
+"""
+Vectorized multi-symbol intraday indicator engine.
+
+Candles for every candidate are packed into right-aligned 2-D panels
+(symbols × bars, NaN left-padding for shorter series) and each indicator is
+computed for the whole panel with array operations. Output is the same
+per-symbol dict `AnalysisService.calculate_intraday_indicators` has always
+produced (pivot points excluded — those come from daily data):
+
+  VWAP, ATR(14), RSI(14), MACD(12/26/9), Bollinger(20, 2σ), Stochastic(14, 3),
+  EMA 9 / EMA 21 and candle-volume stats.
+
+Windows shrink to min(period, n) for short series, exactly like the per-symbol
+pandas code, so early-session results are unchanged.
+
+compute_session_series() produces the same indicators as of every bar of
+many sessions at once (sessions × bars panels), for replaying a day bar by
+bar in the intraday backtester.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.core.logging import logger
+
+_MIN_BARS = 5
+
+
+class IntradayIndicatorEngine:
+
+    # ── Public API ────────────────────────────────────────────────────────────
+
+    def compute_batch(self, frames: Sequence[pd.DataFrame]) -> List[Dict]:
+        """
+        Compute intraday indicators for many symbols at once.
+
+        `frames` are 5-minute OHLCV DataFrames (lowercase columns). Returns one
+        dict per input frame, in order; frames with fewer than 5 bars (or that
+        fail) yield {}.
+        """
+        results: List[Dict] = [{} for _ in frames]
+        rows = [
+            i for i, df in enumerate(frames)
+            if df is not None and not df.empty and len(df) >= _MIN_BARS
+        ]
+        if not rows:
+            return results
+
+        try:
+            panel = self._build_panel([frames[i] for i in rows])
+            for row, out in zip(rows, self._compute(panel)):
+                results[row] = out
+        except Exception as e:
+            logger.error(f"[IndicatorEngine] Batch indicator calculation failed: {e}")
+        return results
+
+    def compute_session_series(
+        self, high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Indicators as of every bar, for many sessions at once.
+
+        Inputs are (sessions × bars) panels, left-aligned — column 0 is each
+        session's first 5-minute bar — and NaN-padded after a session's last
+        bar. Cell [s, t] of each output equals what compute_batch() returns
+        for bars 0…t of session s, keyed and rounded the same way; label
+        outputs ("price_vs_vwap", "bb_position", "stoch_signal") are string
+        arrays. Cells for fewer than 5 bars, or in the padding, are not
+        meaningful and should be masked by the caller.
+        """
+        S, T = close.shape
+        cols = np.arange(T)
+        w14 = np.minimum(14, cols + 1)
+        w20 = np.minimum(20, cols + 1)
+
+        # ── VWAP (expanding over the session) ─────────────────────────────
+        typical = (high + low + close) / 3
+        cum_pv = np.cumsum(typical * volume, axis=1)
+        cum_v = np.cumsum(volume, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vwap = np.where(cum_v > 0, cum_pv / cum_v, close)
+
+        # ── ATR / RSI (trailing mean over min(14, bars so far)) ───────────
+        prev_close = np.concatenate([np.full((S, 1), np.nan), close[:, :-1]], axis=1)
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        atr = self._trailing_sum(tr, 14) / w14
+        delta = close - prev_close
+        valid_delta = ~np.isnan(delta)
+        avg_gain = self._trailing_sum(np.where(valid_delta & (delta > 0), delta, 0.0), 14) / w14
+        avg_loss = self._trailing_sum(np.where(valid_delta & (delta < 0), -delta, 0.0), 14) / w14
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = np.where(avg_loss == 0, np.nan, avg_gain / avg_loss)
+        rsi = 100 - 100 / (1 + rs)
+
+        # ── MACD (12/26/9) ────────────────────────────────────────────────
+        macd_line = self._ewm(close, 12) - self._ewm(close, 26)
+        signal_line = self._ewm(macd_line, 9)
+        macd_hist = macd_line - signal_line
+        prev_hist = np.concatenate([np.full((S, 1), np.nan), macd_hist[:, :-1]], axis=1)
+
+        # ── Bollinger Bands (min(20, bars so far), sample std) ────────────
+        win20 = self._trailing_windows(close, 20)
+        bb_middle = np.nansum(win20, axis=2) / w20
+        sq_dev = np.nansum((win20 - bb_middle[:, :, None]) ** 2, axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bb_std = np.where(w20 > 1, np.sqrt(sq_dev / (w20 - 1)), 0.0)
+        bb_upper = bb_middle + 2 * bb_std
+        bb_lower = bb_middle - 2 * bb_std
+
+        # ── Stochastic %K (min(14, bars so far)), %D over 3 full windows ──
+        lo = np.fmin.reduce(self._trailing_windows(low, 14), axis=2)
+        hi = np.fmax.reduce(self._trailing_windows(high, 14), axis=2)
+        rng = hi - lo
+        with np.errstate(divide="ignore", invalid="ignore"):
+            k_raw = np.where(rng != 0, 100 * (close - lo) / rng, np.nan)
+        k_prev = np.concatenate([np.full((S, 1), np.nan), k_raw[:, :-1]], axis=1)
+        k_prev2 = np.concatenate([np.full((S, 2), np.nan), k_raw[:, :-2]], axis=1)
+        # Earlier %K values only count once their own window is a full 14 bars
+        d_raw = np.where(cols >= 15, (k_raw + k_prev + k_prev2) / 3, np.nan)
+        stoch_k = np.where(np.isnan(k_raw), 50.0, k_raw)
+        stoch_d = np.where(np.isnan(d_raw), 50.0, d_raw)
+
+        return {
+            "last_close": np.round(close, 2),
+            "atr": np.round(atr, 2),
+            "vwap": np.round(vwap, 2),
+            "price_vs_vwap": np.where(close > vwap, "ABOVE", "BELOW"),
+            "rsi": np.round(rsi, 2),
+            "macd": np.round(macd_line, 4),
+            "macd_signal": np.round(signal_line, 4),
+            "macd_histogram": np.round(macd_hist, 4),
+            "macd_bullish_crossover": (prev_hist < 0) & (macd_hist > 0),
+            "macd_bearish_crossover": (prev_hist > 0) & (macd_hist < 0),
+            "bb_upper": np.round(bb_upper, 2),
+            "bb_middle": np.round(bb_middle, 2),
+            "bb_lower": np.round(bb_lower, 2),
+            "bb_position": np.where(
+                close >= bb_upper * 0.985, "NEAR_UPPER",
+                np.where(close <= bb_lower * 1.015, "NEAR_LOWER", "MIDDLE"),
+            ),
+            "stoch_k": np.round(stoch_k, 2),
+            "stoch_d": np.round(stoch_d, 2),
+            "stoch_signal": np.where(
+                (stoch_k > 80) & (stoch_d > 80), "OVERBOUGHT",
+                np.where(
+                    (stoch_k < 20) & (stoch_d < 20), "OVERSOLD",
+                    np.where(stoch_k > stoch_d, "BULLISH", "BEARISH"),
+                ),
+            ),
+            "ema_9": np.round(self._ewm(close, 9), 2),
+            "ema_21": np.round(self._ewm(close, 21), 2),
+        }
+
+    # ── Panel construction ────────────────────────────────────────────────────
+
+    @staticmethod
+    def _build_panel(frames: List[pd.DataFrame]) -> Dict[str, np.ndarray]:
+        lengths = np.array([len(df) for df in frames])
+        S, T = len(frames), int(lengths.max())
+        panel = {"n": lengths}
+        for col in ("high", "low", "close", "volume"):
+            arr = np.full((S, T), np.nan)
+            for i, df in enumerate(frames):
+                arr[i, T - lengths[i]:] = df[col].to_numpy(dtype=np.float64)
+            panel[col] = arr
+        return panel
+
+    # ── Array helpers ─────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _ewm(x: np.ndarray, span: int) -> np.ndarray:
+        """pandas ewm(span, adjust=False).mean() along axis 1, NaN-padded rows."""
+        alpha = 2.0 / (span + 1)
+        out = np.empty_like(x)
+        prev = np.full(x.shape[0], np.nan)
+        for t in range(x.shape[1]):
+            xt = x[:, t]
+            prev = np.where(np.isnan(prev), xt, (1 - alpha) * prev + alpha * xt)
+            out[:, t] = prev
+        return out
+
+    @staticmethod
+    def _trailing_windows(x: np.ndarray, width: int) -> np.ndarray:
+        """(S, T, width) view of the last `width` bars at each column, NaN before column 0."""
+        padded = np.concatenate([np.full((x.shape[0], width - 1), np.nan), x], axis=1)
+        return sliding_window_view(padded, width, axis=1)
+
+    @staticmethod
+    def _trailing_sum(x: np.ndarray, width: int) -> np.ndarray:
+        """Sum of the last min(width, t + 1) values at each column t."""
+        c = np.concatenate([np.zeros((x.shape[0], 1)), np.cumsum(x, axis=1)], axis=1)
+        t = np.arange(x.shape[1])
+        return c[:, t + 1] - c[:, np.maximum(t + 1 - width, 0)]
+
+    @staticmethod
+    def _window_mask(T: int, end: np.ndarray, width: np.ndarray) -> np.ndarray:
+        """Boolean (S, T) mask selecting columns end-width+1 … end per row."""
+        cols = np.arange(T)[None, :]
+        return (cols <= end[:, None]) & (cols > (end - width)[:, None])
+
+    # ── Indicator computation ─────────────────────────────────────────────────
+
+    def _compute(self, p: Dict[str, np.ndarray]) -> List[Dict]:
+        high, low, close, volume, n = p["high"], p["low"], p["close"], p["volume"], p["n"]
+        S, T = close.shape
+        rows = np.arange(S)
+        last = np.full(S, T - 1)
+        first = T - n                               # first valid column per row
+        last_close = close[:, -1]
+
+        # ── VWAP (typical price × volume, whole session) ──────────────────
+        typical = (high + low + close) / 3
+        cum_pv = np.nansum(typical * volume, axis=1)
+        cum_v = np.nansum(volume, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vwap = np.where(cum_v > 0, cum_pv / cum_v, last_close)
+
+        # ── ATR (rolling mean of true range over min(14, n)) ──────────────
+        prev_close = np.concatenate([np.full((S, 1), np.nan), close[:, :-1]], axis=1)
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        w14 = np.minimum(14, n)
+        m14 = self._window_mask(T, last, w14)
+        atr = np.where(m14, tr, 0.0).sum(axis=1) / w14
+
+        # ── RSI (rolling mean gain / loss over min(14, n)) ────────────────
+        delta = close - prev_close
+        valid_delta = ~np.isnan(delta)
+        gain = np.where(valid_delta & (delta > 0), delta, 0.0)
+        loss = np.where(valid_delta & (delta < 0), -delta, 0.0)
+        # The first bar has no delta; pandas fills it with 0.0 inside the
+        # window, but padding columns must not count.
+        avg_gain = np.where(m14, gain, 0.0).sum(axis=1) / w14
+        avg_loss = np.where(m14, loss, 0.0).sum(axis=1) / w14
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = np.where(avg_loss == 0, np.nan, avg_gain / avg_loss)
+        rsi = 100 - 100 / (1 + rs)
+
+        # ── MACD (12/26/9) ────────────────────────────────────────────────
+        macd_line = self._ewm(close, 12) - self._ewm(close, 26)
+        signal_line = self._ewm(macd_line, 9)
+        macd_hist_series = macd_line - signal_line
+        macd_hist = macd_hist_series[:, -1]
+        prev_hist = macd_hist_series[:, -2]
+        macd_bullish = (prev_hist < 0) & (macd_hist > 0)
+        macd_bearish = (prev_hist > 0) & (macd_hist < 0)
+
+        # ── Bollinger Bands (min(20, n), sample std) ──────────────────────
+        w20 = np.minimum(20, n)
+        m20 = self._window_mask(T, last, w20)
+        bb_middle = np.where(m20, close, 0.0).sum(axis=1) / w20
+        sq_dev = np.where(m20, (close - bb_middle[:, None]) ** 2, 0.0).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bb_std = np.where(w20 > 1, np.sqrt(sq_dev / (w20 - 1)), 0.0)
+        bb_upper = bb_middle + 2 * bb_std
+        bb_lower = bb_middle - 2 * bb_std
+
+        # ── Stochastic %K (min(14, n)) for the last 3 bars, %D = mean ─────
+        k_vals = np.full((S, 3), np.nan)
+        for k in range(3):
+            end = last - k
+            mask = self._window_mask(T, end, w14)
+            full_window = (end - w14 + 1) >= first
+            lo = np.where(mask, low, np.inf).min(axis=1)
+            hi = np.where(mask, high, -np.inf).max(axis=1)
+            rng = hi - lo
+            with np.errstate(divide="ignore", invalid="ignore"):
+                kv = np.where(rng != 0, 100 * (close[rows, end] - lo) / rng, np.nan)
+            k_vals[:, k] = np.where(full_window, kv, np.nan)
+        stoch_k = np.where(np.isnan(k_vals[:, 0]), 50.0, k_vals[:, 0])
+        d_raw = k_vals.mean(axis=1)
+        stoch_d = np.where(np.isnan(d_raw), 50.0, d_raw)
+
+        # ── EMA 9 / 21 ────────────────────────────────────────────────────
+        ema_9 = self._ewm(close, 9)[:, -1]
+        ema_21 = self._ewm(close, 21)[:, -1]
+
+        # ── Candle volume ─────────────────────────────────────────────────
+        latest_vol = volume[:, -1]
+        avg_vol = cum_v / n
+
+        out: List[Dict] = []
+        for i in range(S):
+            lc = float(last_close[i])
+            upper, lower = float(bb_upper[i]), float(bb_lower[i])
+            if lc >= upper * 0.985:
+                bb_position = "NEAR_UPPER"
+            elif lc <= lower * 1.015:
+                bb_position = "NEAR_LOWER"
+            else:
+                bb_position = "MIDDLE"
+
+            sk, sd = float(stoch_k[i]), float(stoch_d[i])
+            if sk > 80 and sd > 80:
+                stoch_signal = "OVERBOUGHT"
+            elif sk < 20 and sd < 20:
+                stoch_signal = "OVERSOLD"
+            elif sk > sd:
+                stoch_signal = "BULLISH"
+            else:
+                stoch_signal = "BEARISH"
+
+            out.append({
+                "last_close": round(lc, 2),
+                "atr": round(float(atr[i]), 2),
+                # VWAP
+                "vwap": round(float(vwap[i]), 2),
+                "price_vs_vwap": "ABOVE" if lc > float(vwap[i]) else "BELOW",
+                # RSI
+                "rsi": round(float(rsi[i]), 2),
+                # MACD
+                "macd": round(float(macd_line[i, -1]), 4),
+                "macd_signal": round(float(signal_line[i, -1]), 4),
+                "macd_histogram": round(float(macd_hist[i]), 4),
+                "macd_bullish_crossover": bool(macd_bullish[i]),
+                "macd_bearish_crossover": bool(macd_bearish[i]),
+                # Bollinger Bands
+                "bb_upper": round(upper, 2),
+                "bb_middle": round(float(bb_middle[i]), 2),
+                "bb_lower": round(lower, 2),
+                "bb_position": bb_position,
+                # Stochastic
+                "stoch_k": round(sk, 2),
+                "stoch_d": round(sd, 2),
+                "stoch_signal": stoch_signal,
+                # EMA
+                "ema_9": round(float(ema_9[i]), 2),
+                "ema_21": round(float(ema_21[i]), 2),
+                # Volume
+                "avg_candle_volume": round(float(avg_vol[i]), 0),
+                "latest_candle_volume": round(float(latest_vol[i]), 0),
+            })
+        return out
+
+
+indicator_engine = IntradayIndicatorEngine()
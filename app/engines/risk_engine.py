@@ -62,8 +62,7 @@ class RiskEngine:
                 return 0
 
         effective_capital = capital * leverage
-        total_risk_amount = effective_capital * (risk_per_trade / 100.0)
-        quantity = math.floor(total_risk_amount / risk_per_share)
+        quantity = self.risk_quantity(entry_price, stop_loss, risk_per_trade, capital, leverage)
 
         logger.info(
             f"Risk Calc [{action}]: Capital={capital}, Leverage={leverage}x, "
@@ -72,5 +71,23 @@ class RiskEngine:
         )
         return max(quantity, 1)
 
+    @staticmethod
+    def risk_quantity(
+        entry_price: float,
+        stop_loss: float,
+        risk_per_trade: float,
+        capital: float,
+        leverage: int = 1,
+    ) -> int:
+        """
+        Intraday risk-based size without logging (for bulk use, e.g. backtests).
+        floor((capital × leverage × risk%) / |entry − stop|); 0 if the stop is at entry.
+        """
+        risk_per_share = abs(entry_price - stop_loss)
+        if entry_price <= 0 or risk_per_share <= 0:
+            return 0
+        leverage = max(1, min(5, leverage))
+        return math.floor(capital * leverage * (risk_per_trade / 100.0) / risk_per_share)
+
 
 risk_engine = RiskEngine()
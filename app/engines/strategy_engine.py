@@ -208,6 +208,95 @@ class StrategyEngine:
             "score": score,
         }
 
+    # ── Intraday signal — vectorized companion ───────────────────────────────
+
+    def generate_intraday_signals(self, indicators) -> Dict[str, np.ndarray]:
+        """
+        generate_intraday_signal() evaluated over whole indicator arrays at once.
+
+        `indicators` is a DataFrame or a mapping of equal-shape arrays keyed by
+        the names the scalar version reads ("rsi", "price_vs_vwap",
+        "macd_histogram", "bb_position", "stoch_k", ...). Missing keys take the
+        scalar defaults. Votes, tie-break, weak MACD fallback and score follow
+        the scalar rules exactly, including how NaN compares.
+
+        Returns:
+            signal   : int8 array — 1 BUY, -1 SELL, 0 NEUTRAL
+            strength : agreeing combos (1 for the weak MACD-only bias)
+            score    : numeric rank (0 when NEUTRAL)
+        """
+        if isinstance(indicators, pd.DataFrame):
+            shape = (len(indicators),)
+        else:
+            shape = np.shape(next(iter(indicators.values()))) if indicators else (0,)
+
+        def col(key: str, default, dtype=np.float64) -> np.ndarray:
+            if key in indicators:
+                return np.asarray(indicators[key], dtype=dtype)
+            return np.full(shape, default, dtype=dtype)
+
+        rsi          = col("rsi", 50.0)
+        vwap_side    = col("price_vs_vwap", "ABOVE", object)
+        macd_hist    = col("macd_histogram", 0.0)
+        macd_bx      = col("macd_bullish_crossover", False, bool)
+        macd_brx     = col("macd_bearish_crossover", False, bool)
+        bb_position  = col("bb_position", "MIDDLE", object)
+        bb_middle    = col("bb_middle", 0.0)
+        stoch_k      = col("stoch_k", 50.0)
+        stoch_d      = col("stoch_d", 50.0)
+        stoch_signal = col("stoch_signal", "NEUTRAL", object)
+        ema_9        = col("ema_9", 0.0)
+        ema_21       = col("ema_21", 0.0)
+        close        = col("last_close", 0.0)
+
+        above = vwap_side == "ABOVE"
+        below = vwap_side == "BELOW"
+        bb_mid_pos = bb_position == "MIDDLE"
+
+        # ── Combos 1–5 ────────────────────────────────────────────────────
+        buy_1  = above & (rsi >= 45) & (rsi <= 75)
+        sell_1 = below & (rsi >= 25) & (rsi <= 55)
+        buy_2  = macd_bx | ((macd_hist > 0) & (rsi >= 40) & (rsi <= 75))
+        sell_2 = macd_brx | ((macd_hist < 0) & (rsi >= 25) & (rsi <= 60))
+        buy_3  = ((bb_position == "NEAR_LOWER") & (rsi < 45)) | (
+            bb_mid_pos & (close > bb_middle) & (bb_middle > 0) & (macd_hist > 0)
+        )
+        sell_3 = ((bb_position == "NEAR_UPPER") & (rsi > 55)) | (
+            bb_mid_pos & (close < bb_middle) & (bb_middle > 0) & (macd_hist < 0)
+        )
+        emas_pos = (ema_9 > 0) & (ema_21 > 0) & (close > 0)
+        buy_4  = emas_pos & (close > ema_9) & (ema_9 > ema_21)
+        sell_4 = emas_pos & ~buy_4 & (close < ema_9) & (ema_9 < ema_21)
+        buy_5  = ((stoch_k < 30) & (stoch_k > stoch_d)) | (stoch_signal == "OVERSOLD")
+        sell_5 = ((stoch_k > 70) & (stoch_k < stoch_d)) | (stoch_signal == "OVERBOUGHT")
+
+        n_buy  = buy_1.astype(np.int16) + buy_2 + buy_3 + buy_4 + buy_5
+        n_sell = sell_1.astype(np.int16) + sell_2 + sell_3 + sell_4 + sell_5
+
+        # ── Resolve: majority, VWAP tie-break, weak MACD-only bias ────────
+        tie  = (n_buy == n_sell) & (n_buy >= 1)
+        none = (n_buy == 0) & (n_sell == 0)
+        voted_buy  = (n_buy > n_sell) | (tie & above)
+        voted_sell = (n_sell > n_buy) | (tie & ~above)
+        is_buy  = voted_buy | (none & (macd_hist > 0))
+        is_sell = voted_sell | (none & (macd_hist < 0))
+
+        strength = np.where(voted_buy, n_buy, np.where(voted_sell, n_sell, (is_buy | is_sell).astype(np.int16)))
+        score = strength * 10 + np.where(
+            is_buy,
+            ((stoch_signal == "BULLISH") | (stoch_signal == "OVERSOLD")) * 3 + macd_bx * 5 + above * 2,
+            np.where(
+                is_sell,
+                ((stoch_signal == "BEARISH") | (stoch_signal == "OVERBOUGHT")) * 3 + macd_brx * 5 + below * 2,
+                0,
+            ),
+        )
+        return {
+            "signal":   is_buy.astype(np.int8) - is_sell.astype(np.int8),
+            "strength": strength,
+            "score":    score,
+        }
+
     # ── Daily swing signal v2 (backtest_engine — daily OHLCV) ───────────────────
 
     def generate_daily_signal(self, indicators: Dict) -> Dict:
@@ -360,6 +449,95 @@ class StrategyEngine:
             "score":    score,
         }
 
+    # ── Daily swing signal — vectorized companion ────────────────────────────
+
+    def generate_daily_signals(self, indicators) -> Dict[str, np.ndarray]:
+        """
+        generate_daily_signal() evaluated over whole indicator columns at once.
+
+        `indicators` is a DataFrame or a mapping of equal-length arrays, keyed
+        by the same names the scalar version reads ("last_close", "ema_20",
+        "rsi", "market_structure", ...). Missing keys take the scalar defaults.
+        Gates, combos, bonus and score follow the scalar rules exactly,
+        including how NaN compares, so both paths agree bar for bar.
+
+        Returns:
+            signal   : int8 array — 1 BUY, -1 SELL, 0 NEUTRAL
+            strength : combos + bonus points (0 when NEUTRAL)
+            score    : numeric rank (0 when NEUTRAL)
+
+        Reason strings are not built here; call generate_daily_signal() on
+        the rows that need them.
+        """
+        if isinstance(indicators, pd.DataFrame):
+            n = len(indicators)
+        else:
+            n = len(next(iter(indicators.values()))) if indicators else 0
+
+        def col(key: str, default, dtype=np.float64) -> np.ndarray:
+            if key in indicators:
+                return np.asarray(indicators[key], dtype=dtype)
+            return np.full(n, default, dtype=dtype)
+
+        close            = col("last_close", 0.0)
+        ema20            = col("ema_20", 0.0)
+        ema50            = col("ema_50", 0.0)
+        ema20_slope      = col("ema20_slope", 0.0)
+        rsi              = col("rsi", 50.0)
+        macd_hist        = col("macd_histogram", 0.0)
+        macd_bx          = col("macd_bullish_crossover", False, bool)
+        macd_brx         = col("macd_bearish_crossover", False, bool)
+        adx              = col("adx", 0.0)
+        di_plus          = col("di_plus", 0.0)
+        di_minus         = col("di_minus", 0.0)
+        market_structure = col("market_structure", "UNKNOWN", object)
+        volume_ratio     = col("volume_ratio", 1.0)
+        candle_pattern   = col("candle_pattern", "NONE", object)
+        pullback         = col("pullback_to_ema20", False, bool)
+
+        # ── Hard gates (written as negations so NaN passes, as in the scalar path)
+        gate = (market_structure != "SIDEWAYS") & ~(volume_ratio < 0.8) & ~(adx < 15)
+
+        # ── Combos 1–5 ────────────────────────────────────────────────────
+        emas_pos = (ema20 > 0) & (ema50 > 0)
+        buy_1  = emas_pos & (ema20 > ema50) & (ema20_slope > 0)
+        sell_1 = emas_pos & ~buy_1 & (ema20 < ema50) & (ema20_slope < 0)
+        buy_2  = (ema20 > 0) & (close > ema20)
+        sell_2 = (ema20 > 0) & ~(close > ema20)
+        buy_3  = (rsi >= 45) & (rsi <= 70)
+        sell_3 = ~buy_3 & (rsi >= 30) & (rsi <= 55)
+        buy_4  = macd_bx | (macd_hist > 0)
+        sell_4 = macd_brx | (macd_hist < 0)
+        buy_5  = (adx > 20) & (di_plus > di_minus)
+        sell_5 = (adx > 20) & (di_minus > di_plus)
+
+        n_buy  = buy_1.astype(np.int16) + buy_2 + buy_3 + buy_4 + buy_5
+        n_sell = sell_1.astype(np.int16) + sell_2 + sell_3 + sell_4 + sell_5
+        is_buy  = gate & (n_buy >= 3) & (n_buy > n_sell)
+        is_sell = gate & ~is_buy & (n_sell >= 3) & (n_sell > n_buy)
+        active  = is_buy | is_sell
+
+        # ── Bonus filters ─────────────────────────────────────────────────
+        bonus = (
+            (is_buy & ((candle_pattern == "HAMMER") | (candle_pattern == "BULL_ENGULF"))).astype(np.int16)
+            + (is_sell & (candle_pattern == "BEAR_ENGULF"))
+            + pullback
+            + (volume_ratio > 1.5)
+        )
+
+        base = np.where(is_buy, n_buy, n_sell)
+        score = (
+            base * 10
+            + bonus * 5
+            + np.where(adx > 25, 5, 0)
+            + np.where((macd_bx & is_buy) | (macd_brx & is_sell), 5, 0)
+        )
+        return {
+            "signal":   is_buy.astype(np.int8) - is_sell.astype(np.int8),
+            "strength": np.where(active, base + bonus, 0),
+            "score":    np.where(active, score, 0),
+        }
+
     # ── Intraday signal v2 (live 5-min candle trading) ───────────────────────
 
     def generate_intraday_signal_v2(self, indicators: Dict) -> Dict:
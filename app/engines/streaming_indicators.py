@@ -0,0 +1,380 @@
+"""
+Incremental (streaming) intraday indicators.
+
+Each instrument keeps an `IntradayIndicatorState` that is advanced one closed
+5-minute bar at a time in O(1) (amortized) — running VWAP sums, recursive
+EMAs for MACD / EMA 9 / EMA 21, rolling-window sums for ATR, RSI and
+Bollinger, and monotonic deques for the Stochastic high/low. Repeated agent
+scans therefore only pay for bars that closed since the previous scan.
+
+Snapshots produce the same dict as `IntradayIndicatorEngine.compute_batch`
+(including its min(period, n) window semantics early in the session), so the
+strategy engine sees identical inputs whichever path computed them. RSI keeps
+the pipeline's rolling-mean definition rather than Wilder smoothing so signal
+thresholds don't shift between the two paths.
+
+The still-forming bar is never committed: `snapshot(provisional=...)`
+evaluates it on a scratch copy of the state.
+"""
+
+import copy
+import math
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+import pandas as pd
+import pytz
+
+IST = pytz.timezone("Asia/Kolkata")
+
+_MIN_BARS = 5
+
+
+# ── Building blocks ───────────────────────────────────────────────────────────
+
+class RunningEMA:
+    """ewm(span, adjust=False): first value seeds the average."""
+
+    def __init__(self, span: int):
+        self.alpha = 2.0 / (span + 1)
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> float:
+        self.value = x if self.value is None else (1 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+
+class RollingWindow:
+    """Last `size` values with running sum / sum of squares."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values: deque = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, x: float) -> None:
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        if len(self.values) > self.size:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    def mean(self) -> float:
+        return self.total / len(self.values)
+
+    def sample_std(self) -> float:
+        w = len(self.values)
+        if w < 2:
+            return 0.0
+        var = (self.total_sq - self.total * self.total / w) / (w - 1)
+        return math.sqrt(max(var, 0.0))
+
+
+class MonotonicExtrema:
+    """Rolling min and max over the last `size` values via monotonic deques."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.index = -1
+        self._min: deque = deque()   # (index, value), values increasing
+        self._max: deque = deque()   # (index, value), values decreasing
+
+    def update(self, low: float, high: float) -> None:
+        self.index += 1
+        while self._min and self._min[-1][1] >= low:
+            self._min.pop()
+        self._min.append((self.index, low))
+        while self._max and self._max[-1][1] <= high:
+            self._max.pop()
+        self._max.append((self.index, high))
+        cutoff = self.index - self.size
+        while self._min[0][0] <= cutoff:
+            self._min.popleft()
+        while self._max[0][0] <= cutoff:
+            self._max.popleft()
+
+    @property
+    def low(self) -> float:
+        return self._min[0][1]
+
+    @property
+    def high(self) -> float:
+        return self._max[0][1]
+
+
+# ── Per-instrument state ──────────────────────────────────────────────────────
+
+class IntradayIndicatorState:
+    """All intraday indicators for one instrument, advanced one closed bar at a time."""
+
+    def __init__(self, session: Optional[date] = None):
+        self.session = session
+        self.last_bar_at: Optional[datetime] = None
+        self.n = 0
+        self.last_close: Optional[float] = None
+        self.last_volume = 0.0
+        # VWAP / volume
+        self.cum_pv = 0.0
+        self.cum_v = 0.0
+        # ATR / RSI / Bollinger windows
+        self.tr = RollingWindow(14)
+        self.gain = RollingWindow(14)
+        self.loss = RollingWindow(14)
+        self.bb = RollingWindow(20)
+        # MACD / EMAs
+        self.ema_12 = RunningEMA(12)
+        self.ema_26 = RunningEMA(26)
+        self.macd_signal = RunningEMA(9)
+        self.ema_9 = RunningEMA(9)
+        self.ema_21 = RunningEMA(21)
+        self.macd_hist: Optional[float] = None
+        self.prev_macd_hist: Optional[float] = None
+        # Stochastic — 14-bar extrema plus session extrema for n < 14
+        self.extrema = MonotonicExtrema(14)
+        self.session_low = math.inf
+        self.session_high = -math.inf
+        self.stoch_k_hist: deque = deque(maxlen=3)   # full-window %K only
+
+    def update(self, high: float, low: float, close: float, volume: float,
+               bar_at: Optional[datetime] = None) -> None:
+        prev_close = self.last_close
+        self.n += 1
+
+        self.cum_pv += (high + low + close) / 3 * volume
+        self.cum_v += volume
+
+        if prev_close is None:
+            tr, delta = high - low, 0.0
+        else:
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            delta = close - prev_close
+        self.tr.update(tr)
+        self.gain.update(delta if delta > 0 else 0.0)
+        self.loss.update(-delta if delta < 0 else 0.0)
+        self.bb.update(close)
+
+        macd = self.ema_12.update(close) - self.ema_26.update(close)
+        signal = self.macd_signal.update(macd)
+        self.prev_macd_hist, self.macd_hist = self.macd_hist, macd - signal
+        self.ema_9.update(close)
+        self.ema_21.update(close)
+
+        self.extrema.update(low, high)
+        self.session_low = min(self.session_low, low)
+        self.session_high = max(self.session_high, high)
+        if self.n >= 14:
+            rng = self.extrema.high - self.extrema.low
+            self.stoch_k_hist.append(100 * (close - self.extrema.low) / rng if rng != 0 else math.nan)
+
+        self.last_close = close
+        self.last_volume = volume
+        if bar_at is not None:
+            self.last_bar_at = bar_at
+
+    def snapshot(self, provisional: Optional[Dict] = None) -> Dict:
+        """
+        Indicator dict for the committed bars, or — if `provisional` (a bar
+        dict with high/low/close/volume) is given — as if that forming bar
+        had closed. The live state is not modified.
+        """
+        if provisional is not None:
+            scratch = copy.deepcopy(self)
+            scratch.update(
+                float(provisional["high"]), float(provisional["low"]),
+                float(provisional["close"]), float(provisional["volume"]),
+            )
+            return scratch.snapshot()
+
+        if self.n < _MIN_BARS:
+            return {}
+
+        last_close = self.last_close
+        vwap = self.cum_pv / self.cum_v if self.cum_v > 0 else last_close
+
+        avg_loss = self.loss.mean()
+        rsi = math.nan if avg_loss == 0 else 100 - 100 / (1 + self.gain.mean() / avg_loss)
+
+        macd = self.ema_12.value - self.ema_26.value
+        macd_signal = self.macd_signal.value
+        macd_hist = self.macd_hist
+        prev_hist = self.prev_macd_hist
+
+        bb_middle = self.bb.mean()
+        bb_std = self.bb.sample_std()
+        bb_upper = bb_middle + 2 * bb_std
+        bb_lower = bb_middle - 2 * bb_std
+        if last_close >= bb_upper * 0.985:
+            bb_position = "NEAR_UPPER"
+        elif last_close <= bb_lower * 1.015:
+            bb_position = "NEAR_LOWER"
+        else:
+            bb_position = "MIDDLE"
+
+        if self.n >= 14:
+            stoch_k = self.stoch_k_hist[-1]
+        else:
+            rng = self.session_high - self.session_low
+            stoch_k = 100 * (last_close - self.session_low) / rng if rng != 0 else math.nan
+        if math.isnan(stoch_k):
+            stoch_k = 50.0
+        if len(self.stoch_k_hist) == 3 and not any(math.isnan(k) for k in self.stoch_k_hist):
+            stoch_d = sum(self.stoch_k_hist) / 3
+        else:
+            stoch_d = 50.0
+
+        if stoch_k > 80 and stoch_d > 80:
+            stoch_signal = "OVERBOUGHT"
+        elif stoch_k < 20 and stoch_d < 20:
+            stoch_signal = "OVERSOLD"
+        elif stoch_k > stoch_d:
+            stoch_signal = "BULLISH"
+        else:
+            stoch_signal = "BEARISH"
+
+        return {
+            "last_close": round(last_close, 2),
+            "atr": round(self.tr.mean(), 2),
+            # VWAP
+            "vwap": round(vwap, 2),
+            "price_vs_vwap": "ABOVE" if last_close > vwap else "BELOW",
+            # RSI
+            "rsi": round(rsi, 2),
+            # MACD
+            "macd": round(macd, 4),
+            "macd_signal": round(macd_signal, 4),
+            "macd_histogram": round(macd_hist, 4),
+            "macd_bullish_crossover": prev_hist is not None and prev_hist < 0 < macd_hist,
+            "macd_bearish_crossover": prev_hist is not None and prev_hist > 0 > macd_hist,
+            # Bollinger Bands
+            "bb_upper": round(bb_upper, 2),
+            "bb_middle": round(bb_middle, 2),
+            "bb_lower": round(bb_lower, 2),
+            "bb_position": bb_position,
+            # Stochastic
+            "stoch_k": round(stoch_k, 2),
+            "stoch_d": round(stoch_d, 2),
+            "stoch_signal": stoch_signal,
+            # EMA
+            "ema_9": round(self.ema_9.value, 2),
+            "ema_21": round(self.ema_21.value, 2),
+            # Volume
+            "avg_candle_volume": round(self.cum_v / self.n, 0),
+            "latest_candle_volume": round(self.last_volume, 0),
+        }
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+
+class StreamingIndicatorBook:
+    """
+    Process-wide map instrument_token → IntradayIndicatorState.
+
+    Bars arrive either from REST candles (`sync`) or from the live tick
+    aggregator (`on_bar`). State resets automatically on a new session and
+    is dropped when bar_aggregator releases the token's last subscription.
+    """
+
+    BAR_MINUTES = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[int, IntradayIndicatorState] = {}
+
+    @staticmethod
+    def _to_ist_naive(ts) -> datetime:
+        ts = pd.Timestamp(ts)
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert(IST).tz_localize(None)
+        return ts.to_pydatetime()
+
+    def _state_for(self, token: int, session: date) -> IntradayIndicatorState:
+        state = self._states.get(token)
+        if state is None or state.session != session:
+            state = IntradayIndicatorState(session)
+            self._states[token] = state
+        return state
+
+    def last_bar_at(self, token: int) -> Optional[datetime]:
+        """Start time (IST, naive) of the last committed bar for today, if any."""
+        with self._lock:
+            state = self._states.get(token)
+            if state is None or state.session != datetime.now(IST).date():
+                return None
+            return state.last_bar_at
+
+    def snapshot(self, token: int) -> Dict:
+        """Indicators over today's committed bars ({} if none / too few)."""
+        with self._lock:
+            state = self._states.get(token)
+            if state is None or state.session != datetime.now(IST).date():
+                return {}
+            return state.snapshot()
+
+    def on_bar(self, token: int, bar: Dict, contiguous_only: bool = False) -> Dict:
+        """
+        Commit one closed bar (dict with date/open/high/low/close/volume).
+
+        contiguous_only=True (live feed) ignores bars that don't directly
+        follow the last committed one — a gap means the session hasn't been
+        backfilled yet and folding the bar in would corrupt the state.
+        """
+        bar_at = self._to_ist_naive(bar["date"])
+        with self._lock:
+            state = self._state_for(token, bar_at.date())
+            if contiguous_only:
+                expected = (
+                    state.last_bar_at + timedelta(minutes=self.BAR_MINUTES)
+                    if state.last_bar_at is not None
+                    else bar_at.replace(hour=9, minute=15, second=0, microsecond=0)
+                )
+                if bar_at != expected:
+                    return {}
+            if state.last_bar_at is None or bar_at > state.last_bar_at:
+                state.update(float(bar["high"]), float(bar["low"]), float(bar["close"]),
+                             float(bar["volume"]), bar_at)
+            return state.snapshot()
+
+    def sync(self, token: int, candles: pd.DataFrame, now: Optional[datetime] = None) -> Dict:
+        """
+        Feed today's 5-minute candles (full day or just the tail), committing
+        only bars newer than the last one seen that have already closed. A
+        trailing still-forming bar is included in the snapshot provisionally.
+        """
+        if candles is None or candles.empty:
+            return {}
+        now = self._to_ist_naive(now or datetime.now(IST))
+        close_cutoff = now - timedelta(minutes=self.BAR_MINUTES)
+
+        with self._lock:
+            provisional = None
+            state = None
+            for row in candles.itertuples(index=False):
+                bar_at = self._to_ist_naive(row.date)
+                state = self._state_for(token, bar_at.date())
+                if state.last_bar_at is not None and bar_at <= state.last_bar_at:
+                    continue
+                if bar_at > close_cutoff:
+                    provisional = {"high": row.high, "low": row.low,
+                                   "close": row.close, "volume": row.volume}
+                    continue
+                state.update(float(row.high), float(row.low), float(row.close),
+                             float(row.volume), bar_at)
+            if state is None:
+                return {}
+            return state.snapshot(provisional)
+
+    def drop(self, token: int) -> None:
+        with self._lock:
+            self._states.pop(token, None)
+
+
+streaming_indicators = StreamingIndicatorBook()
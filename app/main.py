@@ -9,6 +9,7 @@ from slowapi.errors import RateLimitExceeded
 from app.core.config import get_settings
 from app.api.routes import agent, performance, auth, analysis, dashboard, credentials, live_trading, backtest, portfolio, ticker, subscription
 from app.core.logging import logger
+from app.core.executors import executors
 
 settings = get_settings()
 
@@ -89,6 +90,14 @@ def create_app() -> FastAPI:
         except Exception as e:
             logger.warning(f"[Startup] Could not start expiry scheduler: {e}")
 
+        # Nightly daily-feature precompute for the screener (builds now if stale)
+        try:
+            from app.services.daily_features import daily_features
+            asyncio.create_task(daily_features.run_scheduler())
+            logger.info("[Startup] Daily feature precompute scheduler started")
+        except Exception as e:
+            logger.warning(f"[Startup] Could not start feature precompute scheduler: {e}")
+
     @app.on_event("shutdown")
     async def shutdown_event():
         logger.info("Application shutting down...")
@@ -98,11 +107,34 @@ def create_app() -> FastAPI:
             logger.info("✓ All autonomous agents stopped")
         except Exception as e:
             logger.error(f"✗ Error stopping autonomous agents: {str(e)}")
+        try:
+            from app.services.backtest_jobs import backtest_jobs
+            backtest_jobs.shutdown()
+        except Exception as e:
+            logger.error(f"✗ Error stopping backtest jobs: {str(e)}")
+        executors.shutdown(wait=False)
 
     @app.get("/health")
     async def health_check():
         return {"status": "ok", "app_name": settings.APP_NAME}
 
+    @app.get("/health/executors")
+    async def executor_stats():
+        """Queue depth / wait time per blocking-call pool."""
+        return executors.stats()
+
+    @app.get("/health/position-monitor")
+    async def position_monitor_stats():
+        """Armed trigger bands and tick/trigger counters of the shared position monitor."""
+        from app.services.position_monitor import position_monitor
+        return position_monitor.stats()
+
+    @app.get("/health/order-updates")
+    async def order_update_stats():
+        """Order-postback sessions, live feeds and pending fill waiters."""
+        from app.services.order_updates import order_updates
+        return order_updates.stats()
+
     return app
 
 app = create_app()
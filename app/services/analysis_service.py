@@ -1,7 +1,13 @@
 import asyncio
 import yfinance as yf
 from app.services.data_service import data_service
+from app.services.candle_store import candle_store
+from app.services.historical_scheduler import historical_scheduler
+from app.services.bar_aggregator import bar_aggregator
+from app.engines.indicator_engine import indicator_engine
+from app.engines.streaming_indicators import streaming_indicators
 from app.core.logging import logger
+from app.core.executors import executors
 from typing import List, Dict, Optional
 import pandas as pd
 import pytz
@@ -154,6 +160,7 @@ class AnalysisService:
         user_api_key: Optional[str] = None,
         user_access_token: Optional[str] = None,
         symbols: Optional[List[str]] = None,
+        incremental: bool = False,
     ) -> List[Dict]:
         """
         Intraday pipeline:
@@ -164,6 +171,10 @@ class AnalysisService:
           5. Calculate VWAP, BB, RSI, MACD, Stochastic, Pivot Points
           6. Generate preliminary BUY/SELL signal per stock
           7. Return top `limit` stocks sorted by signal strength + volume
+
+        incremental=True (used by the agent's repeated scans) keeps per-token
+        streaming indicator state between calls: only 5-minute bars newer
+        than the last committed bar are fetched and folded in.
         """
         from app.services.zerodha_service import ZerodhaService
         from app.engines.strategy_engine import strategy_engine
@@ -292,29 +303,73 @@ class AnalysisService:
         top_candidates = candidates[: min(35, len(candidates))]
 
         # ── Step 4: 5-minute candles + indicator calculation ───────────────
+        # All historical_data calls go through the shared per-api_key
+        # scheduler: candidates are enriched concurrently and latency is set
+        # by the 3 req/s token bucket instead of serial round-trips. Pivots
+        # and 20-day average volume come from one merged 35-day daily fetch.
         from_date = now_ist.replace(hour=9, minute=15, second=0, microsecond=0)
+        to_date = now_ist.replace(second=0, microsecond=0)
+        hist_kite = kite_instance or user_zerodha.kite
+
+        # Incremental scans stream the candidates' ticks into 5-minute bars so
+        # later scans read candles from memory; REST only backfills the part
+        # of the session before streaming began.
+        if incremental and user_api_key and user_access_token:
+            from app.services.ticker_service import ticker_service
+            try:
+                ticker_service.subscribe_bars(
+                    user_api_key, user_access_token,
+                    [c["instrument_token"] for c in top_candidates if c["instrument_token"]],
+                )
+            except Exception as e:
+                logger.debug(f"[Intraday] Live bar subscription failed: {e}")
 
-        enriched = []
-        for cand in top_candidates:
+        async def _fetch(cand: Dict) -> Optional[tuple]:
             token = cand["instrument_token"]
             symbol = cand["symbol"]
 
             if not token:
-                continue
+                return None
 
             try:
-                candles = await user_zerodha.get_historical_data(
-                    instrument_token=token,
-                    from_date=from_date.strftime("%Y-%m-%d %H:%M:%S"),
-                    to_date=now_ist.strftime("%Y-%m-%d %H:%M:%S"),
-                    interval="5minute",
-                )
+                bars_from = from_date
+                if incremental:
+                    last_bar_at = streaming_indicators.last_bar_at(token)
+                    if last_bar_at is not None:
+                        bars_from = self.IST.localize(last_bar_at + timedelta(minutes=5))
+
+                live = bar_aggregator.candles_since(token, bars_from) if incremental else None
+                if live is not None:
+                    async def _live_candles():
+                        return live.to_dict("records")
+                    candles_task = _live_candles()
+                else:
+                    candles_task = historical_scheduler.fetch(
+                        hist_kite,
+                        token,
+                        bars_from.strftime("%Y-%m-%d %H:%M:%S"),
+                        to_date.strftime("%Y-%m-%d %H:%M:%S"),
+                        "5minute",
+                    )
+                if kite_instance:
+                    candles, (pivots, avg_vol_20d) = await asyncio.gather(
+                        candles_task,
+                        historical_scheduler.fetch_daily_context(kite_instance, token),
+                    )
+                else:
+                    candles = await candles_task
+                    pivots, avg_vol_20d = {}, 0.0
 
-                if not candles or len(candles) < 5:
+                if not candles and bars_from != from_date:
+                    # Warm state and no new bar yet — reuse the committed snapshot
+                    streamed = streaming_indicators.snapshot(token)
+                    return (cand, None, pivots, avg_vol_20d, streamed) if streamed else None
+
+                if not candles or (len(candles) < 5 and bars_from == from_date):
                     logger.debug(
                         f"[Intraday] {symbol}: only {len(candles) if candles else 0} candles, skipping"
                     )
-                    continue
+                    return None
 
                 df = pd.DataFrame(candles)
                 df.columns = [c.lower() if isinstance(c, str) else c for c in df.columns]
@@ -322,20 +377,38 @@ class AnalysisService:
                     if col in df.columns:
                         df[col] = df[col].astype(float)
 
-                indicators = await self.calculate_intraday_indicators(df, cand, kite_instance=kite_instance)
+                streamed = streaming_indicators.sync(token, df, now_ist) if incremental else None
+                return cand, df, pivots, avg_vol_20d, streamed
+
+            except Exception as e:
+                logger.debug(f"[Intraday] Error fetching candles for {symbol}: {e}")
+                return None
+
+        fetched = [r for r in await asyncio.gather(*(_fetch(c) for c in top_candidates)) if r]
+
+        # Cold candidates: all indicators in one vectorized pass. Incremental
+        # scans already have theirs from the streaming state.
+        cold = [f for f in fetched if f[4] is None]
+        cold_indicators = iter(indicator_engine.compute_batch([f[1] for f in cold]))
+        batch_indicators = [f[4] if f[4] is not None else next(cold_indicators) for f in fetched]
+
+        async def _finish(cand: Dict, indicators: Dict, pivots: Dict, avg_vol_20d: float) -> Optional[Dict]:
+            symbol = cand["symbol"]
+            try:
                 if not indicators:
-                    continue
+                    return None
+                if not pivots:
+                    pivots = await self._get_pivot_points_async(symbol, cand)
+                indicators = {**indicators, **pivots}
 
                 signal_data = strategy_engine.generate_intraday_signal(indicators)
 
                 # 20-day avg volume — prefer Zerodha, fall back to yfinance
-                if kite_instance and token:
-                    avg_vol_20d = await self._get_avg_volume_zerodha(kite_instance, token)
-                else:
+                if not avg_vol_20d:
                     avg_vol_20d = await self._get_avg_volume(symbol)
                 volume_ratio = cand["volume"] / avg_vol_20d if avg_vol_20d > 0 else 1.0
 
-                enriched.append({
+                return {
                     **cand,
                     "volume_ratio": round(volume_ratio, 2),
                     "avg_volume_20d": round(avg_vol_20d, 0),
@@ -347,11 +420,17 @@ class AnalysisService:
                     "composite_score": signal_data.get("score", 0),
                     "momentum_5d_pct": cand["day_change_pct"],
                     "volatility_5d": round(indicators.get("atr", 0) / cand["last_price"] * 100, 2),
-                })
+                }
 
             except Exception as e:
                 logger.debug(f"[Intraday] Error enriching {symbol}: {e}")
-                continue
+                return None
+
+        results = await asyncio.gather(*(
+            _finish(cand, ind, pivots, avg_vol)
+            for (cand, _, pivots, avg_vol, _), ind in zip(fetched, batch_indicators)
+        ))
+        enriched = [r for r in results if r]
 
         logger.info(f"[Intraday] Enriched {len(enriched)} stocks with 5min indicators")
 
@@ -363,7 +442,7 @@ class AnalysisService:
         return enriched[:limit]
 
     async def calculate_intraday_indicators(
-        self, df: pd.DataFrame, quote_data: Dict, kite_instance=None
+        self, df: pd.DataFrame, quote_data: Dict, kite_instance=None, pivots: Optional[Dict] = None
     ) -> Dict:
         """
         Calculate intraday-specific technical indicators from 5-minute candles:
@@ -374,141 +453,25 @@ class AnalysisService:
         - Stochastic 14/3 (faster oscillator for intraday)
         - EMA 9 / EMA 21  (dynamic support/resistance)
         - ATR 14          (for stop-loss / target calculation)
-        - Pivot Points     (from previous day's OHLC)
+        - Pivot Points     (from previous day's OHLC; pass `pivots` if already fetched)
         """
         if df.empty or len(df) < 5:
             return {}
 
         try:
-            close = df["close"]
-            high = df["high"]
-            low = df["low"]
-            volume = df["volume"]
-            last_close = float(close.iloc[-1])
-            n = len(df)
-
-            # ── VWAP (typical price × volume) ─────────────────────────────
-            typical_price = (high + low + close) / 3
-            cumtp_vol = (typical_price * volume).cumsum()
-            cumvol = volume.cumsum()
-            vwap = float(cumtp_vol.iloc[-1] / cumvol.iloc[-1]) if float(cumvol.iloc[-1]) > 0 else last_close
-            price_vs_vwap = "ABOVE" if last_close > vwap else "BELOW"
-
-            # ── ATR (14-period) ────────────────────────────────────────────
-            hl = high - low
-            hc = (high - close.shift()).abs()
-            lc = (low - close.shift()).abs()
-            tr = pd.concat([hl, hc, lc], axis=1).max(axis=1)
-            atr = float(tr.rolling(min(14, n)).mean().iloc[-1])
-
-            # ── RSI (14-period) ────────────────────────────────────────────
-            delta = close.diff()
-            gain = delta.where(delta > 0, 0.0).rolling(min(14, n)).mean()
-            loss = (-delta.where(delta < 0, 0.0)).rolling(min(14, n)).mean()
-            rs = gain / loss.replace(0, float("nan"))
-            rsi = float((100 - 100 / (1 + rs)).iloc[-1])
-
-            # ── MACD (12/26/9) ─────────────────────────────────────────────
-            ema_12 = close.ewm(span=12, adjust=False).mean()
-            ema_26 = close.ewm(span=26, adjust=False).mean()
-            macd_line = ema_12 - ema_26
-            signal_line = macd_line.ewm(span=9, adjust=False).mean()
-            macd_hist_series = macd_line - signal_line
-            macd_hist = float(macd_hist_series.iloc[-1])
-            macd_val = float(macd_line.iloc[-1])
-            macd_signal_val = float(signal_line.iloc[-1])
-
-            macd_bullish_crossover = False
-            macd_bearish_crossover = False
-            if n >= 2:
-                prev_hist = float(macd_hist_series.iloc[-2])
-                macd_bullish_crossover = prev_hist < 0 < macd_hist
-                macd_bearish_crossover = prev_hist > 0 > macd_hist
-
-            # ── Bollinger Bands (20-period) ────────────────────────────────
-            bb_period = min(20, n)
-            bb_middle_s = close.rolling(bb_period).mean()
-            bb_std_s = close.rolling(bb_period).std()
-            bb_middle = float(bb_middle_s.iloc[-1])
-            bb_std = float(bb_std_s.iloc[-1]) if not pd.isna(bb_std_s.iloc[-1]) else 0.0
-            bb_upper = bb_middle + 2 * bb_std
-            bb_lower = bb_middle - 2 * bb_std
-
-            if last_close >= bb_upper * 0.985:
-                bb_position = "NEAR_UPPER"
-            elif last_close <= bb_lower * 1.015:
-                bb_position = "NEAR_LOWER"
-            else:
-                bb_position = "MIDDLE"
-
-            # ── Stochastic %K / %D (14, 3) ────────────────────────────────
-            stoch_period = min(14, n)
-            low_min = low.rolling(stoch_period).min()
-            high_max = high.rolling(stoch_period).max()
-            range_hl = (high_max - low_min).replace(0, float("nan"))
-            stoch_k_series = 100 * (close - low_min) / range_hl
-            stoch_k = float(stoch_k_series.iloc[-1]) if not pd.isna(stoch_k_series.iloc[-1]) else 50.0
-            stoch_d = float(stoch_k_series.rolling(3).mean().iloc[-1]) if not pd.isna(stoch_k_series.rolling(3).mean().iloc[-1]) else 50.0
-
-            if stoch_k > 80 and stoch_d > 80:
-                stoch_signal = "OVERBOUGHT"
-            elif stoch_k < 20 and stoch_d < 20:
-                stoch_signal = "OVERSOLD"
-            elif stoch_k > stoch_d:
-                stoch_signal = "BULLISH"
-            else:
-                stoch_signal = "BEARISH"
-
-            # ── EMA 9 and EMA 21 ───────────────────────────────────────────
-            ema_9 = float(close.ewm(span=9, adjust=False).mean().iloc[-1])
-            ema_21 = float(close.ewm(span=21, adjust=False).mean().iloc[-1])
+            indicators = indicator_engine.compute_batch([df])[0]
+            if not indicators:
+                return {}
 
             # ── Pivot Points from previous day ─────────────────────────────
             symbol = quote_data.get("symbol", "")
             token = quote_data.get("instrument_token", 0)
-            if kite_instance and token:
+            if pivots is None and kite_instance and token:
                 pivots = await self._fetch_pivot_points_zerodha(kite_instance, token)
-                if not pivots:
-                    pivots = await self._get_pivot_points_async(symbol, quote_data)
-            else:
+            if not pivots:
                 pivots = await self._get_pivot_points_async(symbol, quote_data)
 
-            # ── Volume of latest candle ────────────────────────────────────
-            latest_candle_vol = float(volume.iloc[-1])
-            avg_candle_vol = float(volume.mean())
-
-            return {
-                "last_close": round(last_close, 2),
-                "atr": round(atr, 2),
-                # VWAP
-                "vwap": round(vwap, 2),
-                "price_vs_vwap": price_vs_vwap,
-                # RSI
-                "rsi": round(rsi, 2),
-                # MACD
-                "macd": round(macd_val, 4),
-                "macd_signal": round(macd_signal_val, 4),
-                "macd_histogram": round(macd_hist, 4),
-                "macd_bullish_crossover": macd_bullish_crossover,
-                "macd_bearish_crossover": macd_bearish_crossover,
-                # Bollinger Bands
-                "bb_upper": round(bb_upper, 2),
-                "bb_middle": round(bb_middle, 2),
-                "bb_lower": round(bb_lower, 2),
-                "bb_position": bb_position,
-                # Stochastic
-                "stoch_k": round(stoch_k, 2),
-                "stoch_d": round(stoch_d, 2),
-                "stoch_signal": stoch_signal,
-                # EMA
-                "ema_9": round(ema_9, 2),
-                "ema_21": round(ema_21, 2),
-                # Volume
-                "avg_candle_volume": round(avg_candle_vol, 0),
-                "latest_candle_volume": round(latest_candle_vol, 0),
-                # Pivot Points
-                **pivots,
-            }
+            return {**indicators, **pivots}
 
         except Exception as e:
             logger.error(f"Intraday indicator calculation failed: {e}")
@@ -519,7 +482,7 @@ class AnalysisService:
     async def _get_pivot_points_async(self, symbol: str, quote_data: Dict) -> Dict:
         loop = asyncio.get_event_loop()
         try:
-            pivots = await loop.run_in_executor(None, self._fetch_pivot_points, symbol)
+            pivots = await loop.run_in_executor(executors.pool("market-data-download"), self._fetch_pivot_points, symbol)
             return pivots
         except Exception as e:
             logger.debug(f"Pivot points fetch failed for {symbol}: {e}")
@@ -533,17 +496,17 @@ class AnalysisService:
             }
 
     def _fetch_pivot_points(self, symbol: str) -> Dict:
-        """Synchronous: fetch last 5 days of daily data, use previous session for pivots."""
+        """Synchronous: read recent daily bars from the candle store, use previous session for pivots."""
         try:
-            ticker = yf.Ticker(f"{symbol}.NS")
-            hist = ticker.history(period="5d", interval="1d")
+            today = datetime.now(self.IST).date()
+            hist = candle_store.get_range(symbol, today - timedelta(days=10), today + timedelta(days=1))
             if len(hist) < 2:
                 raise ValueError("Insufficient daily data")
 
             prev = hist.iloc[-2]
-            H = float(prev["High"])
-            L = float(prev["Low"])
-            C = float(prev["Close"])
+            H = float(prev["high"])
+            L = float(prev["low"])
+            C = float(prev["close"])
 
             P = (H + L + C) / 3
             R1 = 2 * P - L
@@ -572,73 +535,19 @@ class AnalysisService:
                 if hist.empty or "Volume" not in hist.columns:
                     return 0.0
                 return float(hist["Volume"].mean())
-            return await loop.run_in_executor(None, _fetch)
+            return await loop.run_in_executor(executors.pool("market-data-download"), _fetch)
         except Exception:
             return 0.0
 
     async def _fetch_pivot_points_zerodha(self, kite_instance, token: int) -> Dict:
-        """Fetch pivot points using Zerodha historical daily data."""
-        loop = asyncio.get_event_loop()
-        try:
-            to_dt = datetime.now(self.IST)
-            from_dt = to_dt - timedelta(days=5)
-
-            def _fetch():
-                return kite_instance.historical_data(
-                    token,
-                    from_dt.replace(tzinfo=None),
-                    to_dt.replace(tzinfo=None),
-                    "day",
-                )
-
-            hist = await loop.run_in_executor(None, _fetch)
-            if not hist or len(hist) < 2:
-                return {}
-
-            prev = hist[-2]
-            H = float(prev["high"])
-            L = float(prev["low"])
-            C = float(prev["close"])
-
-            P = (H + L + C) / 3
-            R1 = 2 * P - L
-            R2 = P + (H - L)
-            S1 = 2 * P - H
-            S2 = P - (H - L)
-
-            return {
-                "pivot": round(P, 2),
-                "r1": round(R1, 2),
-                "r2": round(R2, 2),
-                "s1": round(S1, 2),
-                "s2": round(S2, 2),
-            }
-        except Exception as e:
-            logger.debug(f"_fetch_pivot_points_zerodha failed: {e}")
-            return {}
+        """Pivot points from Zerodha daily data (shared 35-day fetch via the scheduler)."""
+        pivots, _ = await historical_scheduler.fetch_daily_context(kite_instance, token)
+        return pivots
 
     async def _get_avg_volume_zerodha(self, kite_instance, token: int) -> float:
-        """Get 30-day average volume from Zerodha historical data."""
-        loop = asyncio.get_event_loop()
-        try:
-            to_dt = datetime.now(self.IST)
-            from_dt = to_dt - timedelta(days=35)
-
-            def _fetch():
-                return kite_instance.historical_data(
-                    token,
-                    from_dt.replace(tzinfo=None),
-                    to_dt.replace(tzinfo=None),
-                    "day",
-                )
-
-            hist = await loop.run_in_executor(None, _fetch)
-            if not hist:
-                return 0.0
-            volumes = [float(h.get("volume", 0)) for h in hist if h.get("volume")]
-            return sum(volumes) / len(volumes) if volumes else 0.0
-        except Exception:
-            return 0.0
+        """Average daily volume from Zerodha (shared 35-day fetch via the scheduler)."""
+        _, avg_volume = await historical_scheduler.fetch_daily_context(kite_instance, token)
+        return avg_volume
 
     # ── yfinance fallback for intraday (when Zerodha quotes unavailable) ──────
 
@@ -677,7 +586,7 @@ class AnalysisService:
             try:
                 loop = asyncio.get_event_loop()
                 df = await loop.run_in_executor(
-                    None, self._fetch_5min_yfinance, symbol
+                    executors.pool("market-data-download"), self._fetch_5min_yfinance, symbol
                 )
                 if df.empty or len(df) < 5:
                     filtered_count += 1
@@ -0,0 +1,361 @@
+"""
+Background backtest jobs.
+
+The synchronous /backtest endpoints hold a request (and a Gunicorn worker)
+for the whole run, so multi-year or full-universe runs hit the 120 s worker
+timeout. Submitted as a job instead, a backtest returns a job id at once and
+runs on a dedicated event-loop thread — its orchestration (fetch fan-out,
+report building, robustness) never shares the request/agent event loop, and
+at most BACKTEST_JOB_WORKERS jobs run at a time; the rest wait queued.
+Requests are validated at submit time, so a bad request is rejected rather
+than queued as a job that fails.
+
+Jobs share the market-data download pool and the backtest process pool with
+the synchronous endpoints and live screening. Their downloads queue at
+Priority.BACKGROUND, and together they hold at most BACKTEST_JOB_PROCESSES
+process-pool tasks (default: half the pool), so jobs never starve /run.
+
+    queued → running → done | failed | cancelled
+
+Each job keeps an event log (status changes and per-symbol progress from the
+engine's "fetch" and "simulate" stages) that /backtest/jobs/{id}/events
+streams over SSE. Job records, including results, are written to
+
+    <BACKTEST_JOBS_DIR>/<job_id>.json
+
+so any app worker can report on a job, and a finished job's result stays
+retrievable until it ages out of the newest BACKTEST_JOBS_KEEP. Cancelling a
+job owned by another worker drops a <job_id>.cancel marker its owner polls.
+Cancellation stops the job at its next await; shards already running on the
+process pool finish and are discarded.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import string
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.executors import executors
+from app.engines.backtest_engine import (
+    backtest_engine, backtest_progress, backtest_background, backtest_process_slots,
+)
+
+# Job kind → BacktestEngine coroutine
+JOB_RUNNERS = {
+    "run": "run_backtest",
+    "sweep": "run_sweep",
+    "walk_forward": "run_walk_forward",
+    "portfolio": "run_portfolio_backtest",
+    "intraday": "run_intraday_backtest",
+}
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+@dataclass
+class BacktestJob:
+    job_id: str
+    kind: str
+    params: Dict
+    status: str = "queued"
+    submitted_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    progress: Dict = field(default_factory=dict)     # stage → {"done", "total"}
+    events: List[Dict] = field(default_factory=list)
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+
+    def to_dict(self, include_result: bool = True, include_events: bool = False) -> Dict:
+        out = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {stage: dict(p) for stage, p in self.progress.items()},
+            "error": self.error,
+        }
+        if include_result:
+            out["result"] = self.result
+        if include_events:
+            out["events"] = list(self.events)
+        return out
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BacktestJob":
+        return cls(**{k: data.get(k) for k in cls.__dataclass_fields__ if k in data})
+
+
+class BacktestJobQueue:
+
+    # Progress-only updates are written to disk at most this often (seconds)
+    PERSIST_INTERVAL = 1.0
+    # How often a running job checks for a cancel marker from another worker
+    CANCEL_POLL = 1.0
+
+    def __init__(self, root: Optional[str] = None):
+        settings = get_settings()
+        if root is None:
+            root = settings.BACKTEST_JOBS_DIR or os.path.join(
+                os.path.dirname(__file__), "..", "..", "data", "backtest_jobs"
+            )
+        self.root = os.path.abspath(root)
+        self.workers = max(settings.BACKTEST_JOB_WORKERS, 1)
+        self.processes = max(settings.BACKTEST_JOB_PROCESSES or executors.process_workers // 2, 1)
+        self.keep = max(settings.BACKTEST_JOBS_KEEP, 1)
+        self._jobs: "OrderedDict[str, BacktestJob]" = OrderedDict()   # owned by this process
+        self._futures: Dict[str, "asyncio.Future"] = {}
+        self._persisted_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._process_slots: Optional[asyncio.Semaphore] = None
+
+    # ── Submit / cancel ───────────────────────────────────────────────────────
+
+    def submit(self, kind: str, req) -> Dict:
+        """
+        Queue a backtest request (one of the engine's request dataclasses).
+        Raises ValueError for an unknown kind or a request the engine rejects.
+        """
+        if kind not in JOB_RUNNERS:
+            raise ValueError(f"kind must be one of {', '.join(JOB_RUNNERS)}")
+        backtest_engine.validate(req)
+        loop = self._ensure_loop()
+        job = BacktestJob(job_id=uuid.uuid4().hex, kind=kind, params=dict(vars(req)))
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._event(job, "status", status="queued")
+            queued = job.to_dict(include_result=False)
+        self._persist(job)
+        self._futures[job.job_id] = asyncio.run_coroutine_threadsafe(self._run(job, req), loop)
+        logger.info(f"[BacktestJobs] Queued {kind} job {job.job_id}")
+        return queued
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Request cancellation; returns the job's current state, or None if unknown."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            future = self._futures.get(job_id)
+            if future is not None and job.status not in FINISHED:
+                future.cancel()
+                if job.status == "queued":
+                    # A job cancelled before the loop picks it up never runs _run
+                    self._finish(job, "cancelled")
+                    self._futures.pop(job_id, None)
+            with self._lock:
+                return job.to_dict(include_result=False)
+        job = self._read(job_id)
+        if job is None:
+            return None
+        if job.status not in FINISHED:
+            open(self._path(job_id, ".cancel"), "w").close()    # picked up by the owning worker
+        return job.to_dict(include_result=False)
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict]:
+        job = self._job(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            return job.to_dict(include_result=include_result)
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        """Most recently submitted jobs (any worker), newest first, without results."""
+        files = [f for f in glob.glob(os.path.join(self.root, "*.json")) if not f.endswith(".tmp.json")]
+        files.sort(key=os.path.getmtime, reverse=True)
+        jobs = []
+        for f in files[:limit]:
+            job = self._job(os.path.basename(f)[:-len(".json")])
+            if job is not None:
+                with self._lock:
+                    jobs.append(job.to_dict(include_result=False))
+        jobs.sort(key=lambda j: j["submitted_at"], reverse=True)
+        return jobs
+
+    async def events(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Dict]:
+        """Yield the job's events from the start until it finishes (heartbeats while idle)."""
+        sent = 0
+        idle_since = time.monotonic()
+        while True:
+            job = self._job(job_id)
+            if job is None:
+                return
+            with self._lock:
+                new_events = job.events[sent:]
+                finished = job.status in FINISHED
+            for event in new_events:
+                yield event
+                idle_since = time.monotonic()
+            sent += len(new_events)
+            if finished:
+                return
+            if time.monotonic() - idle_since >= heartbeat:
+                idle_since = time.monotonic()
+                yield {"type": "heartbeat", "timestamp": datetime.utcnow().isoformat()}
+            # Local jobs are in memory; others are read back from their job file
+            await asyncio.sleep(0.25 if job_id in self._jobs else 1.0)
+
+    def _job(self, job_id: str) -> Optional[BacktestJob]:
+        job = self._jobs.get(job_id)
+        return job if job is not None else self._read(job_id)
+
+    # ── Job loop ──────────────────────────────────────────────────────────────
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._slots = asyncio.Semaphore(self.workers)
+                self._process_slots = asyncio.Semaphore(self.processes)
+                threading.Thread(
+                    target=loop.run_forever, name="backtest-jobs", daemon=True
+                ).start()
+                self._loop = loop
+                logger.info(
+                    f"[BacktestJobs] Started job loop ({self.workers} concurrent jobs, "
+                    f"{self.processes} process-pool slots)"
+                )
+            return self._loop
+
+    async def _run(self, job: BacktestJob, req) -> None:
+        watcher = asyncio.ensure_future(self._watch_cancel_marker(job))
+        try:
+            async with self._slots:
+                with self._lock:
+                    if job.status in FINISHED:   # cancelled while queued
+                        return
+                    job.status = "running"
+                    job.started_at = datetime.utcnow().isoformat()
+                    self._event(job, "status", status="running")
+                self._persist(job)
+                backtest_progress.set(lambda stage, total, symbols: self._on_progress(job, stage, total, symbols))
+                backtest_background.set(True)
+                backtest_process_slots.set(self._process_slots)
+                result = await getattr(backtest_engine, JOB_RUNNERS[job.kind])(req)
+            self._finish(job, "done", result=result)
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            logger.error(f"[BacktestJobs] {job.kind} job {job.job_id} failed: {e}", exc_info=True)
+            self._finish(job, "failed", error=str(e))
+        finally:
+            watcher.cancel()
+            self._futures.pop(job.job_id, None)
+            self._prune()
+
+    async def _watch_cancel_marker(self, job: BacktestJob) -> None:
+        marker = self._path(job.job_id, ".cancel")
+        while True:
+            await asyncio.sleep(self.CANCEL_POLL)
+            if os.path.exists(marker):
+                future = self._futures.get(job.job_id)
+                if future is not None:
+                    future.cancel()
+                return
+
+    def _on_progress(self, job: BacktestJob, stage: str, total: int, symbols: List[str]) -> None:
+        with self._lock:
+            stage_progress = job.progress.setdefault(stage, {"done": 0, "total": total})
+            if not symbols:
+                # a new pass over this stage (e.g. a second fetch) restarts its count
+                stage_progress.update(done=0, total=total)
+            stage_progress["done"] += len(symbols)
+            self._event(job, "progress", stage=stage, symbols=symbols, **stage_progress)
+        if time.monotonic() - self._persisted_at.get(job.job_id, 0.0) >= self.PERSIST_INTERVAL:
+            self._persist(job)
+
+    def _finish(self, job: BacktestJob, status: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            if job.status in FINISHED:
+                return
+            job.status = status
+            job.finished_at = datetime.utcnow().isoformat()
+            job.result = result
+            job.error = error
+            self._event(job, "status", status=status, **({"error": error} if error else {}))
+        self._persist(job)
+        try:
+            os.remove(self._path(job.job_id, ".cancel"))
+        except OSError:
+            pass
+        logger.info(f"[BacktestJobs] {job.kind} job {job.job_id} {status}")
+
+    @staticmethod
+    def _event(job: BacktestJob, kind: str, **data) -> None:
+        job.events.append({
+            "seq": len(job.events),
+            "type": kind,
+            "timestamp": datetime.utcnow().isoformat(),
+            **data,
+        })
+
+    # ── Files ─────────────────────────────────────────────────────────────────
+
+    def _path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.root, f"{job_id}{suffix}")
+
+    def _persist(self, job: BacktestJob) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(job.job_id)
+        tmp = path + ".tmp.json"
+        with self._lock:
+            payload = json.dumps(job.to_dict(include_events=True), default=str)
+        with open(tmp, "w") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        self._persisted_at[job.job_id] = time.monotonic()
+
+    def _read(self, job_id: str) -> Optional[BacktestJob]:
+        if not job_id or any(ch not in string.hexdigits for ch in job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return BacktestJob.from_dict(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self) -> None:
+        """Keep the newest `keep` finished jobs on disk and in memory."""
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.status in FINISHED]
+            for job in finished[:-self.keep]:
+                self._jobs.pop(job.job_id, None)
+                self._persisted_at.pop(job.job_id, None)
+        files = [f for f in glob.glob(os.path.join(self.root, "*.json")) if not f.endswith(".tmp.json")]
+        files.sort(key=os.path.getmtime)
+        for f in files[:-self.keep]:
+            job = self._read(os.path.basename(f)[:-len(".json")])
+            if job is not None and job.status in FINISHED:
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
+
+    def shutdown(self) -> None:
+        """Cancel this worker's unfinished jobs and stop the job loop."""
+        for job_id, future in list(self._futures.items()):
+            future.cancel()
+            job = self._jobs.get(job_id)
+            if job is not None and job.status not in FINISHED:
+                # recorded here: the loop may stop before the job sees its cancellation
+                self._finish(job, "cancelled", error="server shutdown")
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+backtest_jobs = BacktestJobQueue()
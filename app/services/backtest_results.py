@@ -0,0 +1,291 @@
+"""
+Columnar backtest result sets, addressed by run id.
+
+A /backtest/run keeps its trades as one NumPy array per TradeResult field
+rather than a list of dicts, and persists them next to the summary report:
+
+    <BACKTEST_RESULTS_DIR>/<run_id>.npz
+        symbol, entry_date, exit_date, action     str
+        signal_strength, hold_bars                int
+        entry_price, stop_loss, target,
+        exit_price, pnl_pct                       float64
+        outcome                                   int8   (1 WIN, -1 LOSS, 0 TIMEOUT)
+        reasons, reason_offsets                   signal_reasons flattened; trade i
+                                                  owns reasons[offsets[i]:offsets[i+1]]
+        report                                    summary report, JSON
+
+Trade detail is served a page at a time from the stored columns, so the run
+response and every page stay the same size however many trades a run made.
+The most recently read runs are kept in memory; only the
+BACKTEST_RESULTS_KEEP most recently used runs are kept on disk.
+
+Runs can be saved under a caller-chosen id — the backtest engine uses a hash
+of the request, engine code and input data, so an identical request is a
+lookup. Completed per-symbol trade lists are cached alongside, so a run over
+an extended date range only simulates what is new:
+
+    <BACKTEST_RESULTS_DIR>/symbols/<sim_key>/<SYMBOL>.npz
+        trade columns as above, plus
+        entry_bar, exit_bar        bar positions of each trade in the input frame
+        n_bars, digest             length and hash of the frame the trades came from
+"""
+
+import glob
+import json
+import os
+import shutil
+import string
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.logging import logger
+
+OUTCOME_CODES = {"WIN": 1, "LOSS": -1, "TIMEOUT": 0}
+OUTCOME_NAMES = {code: name for name, code in OUTCOME_CODES.items()}
+
+_STR_COLUMNS = ("symbol", "entry_date", "exit_date", "action")
+_INT_COLUMNS = ("signal_strength", "hold_bars")
+_FLOAT_COLUMNS = ("entry_price", "stop_loss", "target", "exit_price", "pnl_pct")
+
+
+class TradeTable:
+    """Trades as column arrays (same fields as TradeResult)."""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.cols = columns
+
+    @classmethod
+    def from_trades(cls, trades: Sequence) -> "TradeTable":
+        n = len(trades)
+        cols: Dict[str, np.ndarray] = {}
+        for f in _STR_COLUMNS:
+            cols[f] = np.array([getattr(t, f) for t in trades], dtype=str)
+        for f in _INT_COLUMNS:
+            cols[f] = np.fromiter((getattr(t, f) for t in trades), np.int32, n)
+        for f in _FLOAT_COLUMNS:
+            cols[f] = np.fromiter((getattr(t, f) for t in trades), np.float64, n)
+        cols["outcome"] = np.fromiter((OUTCOME_CODES[t.outcome] for t in trades), np.int8, n)
+        cols["reasons"] = np.array([r for t in trades for r in t.signal_reasons], dtype=str)
+        cols["reason_offsets"] = np.concatenate(
+            ([0], np.cumsum([len(t.signal_reasons) for t in trades], dtype=np.int64))
+        ).astype(np.int64)
+        return cls(cols)
+
+    def __len__(self) -> int:
+        return len(self.cols["outcome"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.cols[name]
+
+    def rows(self, idx: np.ndarray) -> List[Dict]:
+        """Trade dicts (TradeResult field order) for the row positions in `idx`."""
+        c = self.cols
+        picked = {f: c[f][idx].tolist() for f in _STR_COLUMNS + _INT_COLUMNS + _FLOAT_COLUMNS}
+        offsets, reasons = c["reason_offsets"], c["reasons"]
+        out = []
+        for k, i in enumerate(idx.tolist()):
+            out.append({
+                "symbol": picked["symbol"][k],
+                "entry_date": picked["entry_date"][k],
+                "exit_date": picked["exit_date"][k],
+                "action": picked["action"][k],
+                "signal_strength": picked["signal_strength"][k],
+                "signal_reasons": reasons[offsets[i]:offsets[i + 1]].tolist(),
+                "entry_price": picked["entry_price"][k],
+                "stop_loss": picked["stop_loss"][k],
+                "target": picked["target"][k],
+                "exit_price": picked["exit_price"][k],
+                "outcome": OUTCOME_NAMES[int(c["outcome"][i])],
+                "pnl_pct": picked["pnl_pct"][k],
+                "hold_bars": picked["hold_bars"][k],
+            })
+        return out
+
+
+class BacktestResultStore:
+
+    MEMORY_RUNS = 4
+
+    def __init__(self, root: Optional[str] = None, keep_runs: Optional[int] = None):
+        settings = get_settings()
+        if root is None:
+            root = settings.BACKTEST_RESULTS_DIR or os.path.join(
+                os.path.dirname(__file__), "..", "..", "data", "backtest_results"
+            )
+        self.root = os.path.abspath(root)
+        self.keep_runs = max(keep_runs or settings.BACKTEST_RESULTS_KEEP, 1)
+        self._loaded: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    def save(self, report: Dict, table: TradeTable, run_id: Optional[str] = None) -> str:
+        """Persist a run's report + trade columns; returns the run id (also set on `report`)."""
+        run_id = run_id or uuid.uuid4().hex
+        report["run_id"] = run_id
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(run_id)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, report=np.array(json.dumps(report)), **table.cols)
+        os.replace(tmp, path)
+        with self._lock:
+            self._remember(run_id, dict(report), table)
+        self._prune()
+        logger.info(f"[BacktestResults] Stored run {run_id} ({len(table)} trades)")
+        return run_id
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    def report(self, run_id: str) -> Optional[Dict]:
+        run = self._load(run_id)
+        return dict(run[0]) if run else None
+
+    def table(self, run_id: str) -> Optional[TradeTable]:
+        run = self._load(run_id)
+        return run[1] if run else None
+
+    def trades_page(
+        self,
+        run_id: str,
+        offset: int = 0,
+        limit: int = 100,
+        symbol: Optional[str] = None,
+        outcome: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """One page of trade rows (optionally filtered), or None for an unknown run."""
+        run = self._load(run_id)
+        if run is None:
+            return None
+        table = run[1]
+        if symbol or outcome:
+            mask = np.ones(len(table), dtype=bool)
+            if symbol:
+                mask &= table["symbol"] == symbol.upper()
+            if outcome:
+                code = OUTCOME_CODES.get(outcome.upper())
+                if code is None:
+                    raise ValueError(f"outcome must be one of {', '.join(OUTCOME_CODES)}")
+                mask &= table["outcome"] == code
+            rows = np.flatnonzero(mask)
+        else:
+            rows = np.arange(len(table))
+        total = len(rows)
+        page = rows[offset:offset + limit]
+        next_offset = offset + len(page)
+        return {
+            "run_id": run_id,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": next_offset if next_offset < total else None,
+            "trades": table.rows(page),
+        }
+
+    def _load(self, run_id: str) -> Optional[tuple]:
+        if not run_id or any(ch not in string.hexdigits for ch in run_id):
+            return None
+        path = self._path(run_id)
+        try:
+            os.utime(path)           # mark as recently used for pruning
+        except OSError:
+            return None
+        with self._lock:
+            run = self._loaded.get(run_id)
+            if run is not None:
+                self._loaded.move_to_end(run_id)
+                return run
+            with np.load(path) as data:
+                report = json.loads(str(data["report"]))
+                table = TradeTable({k: data[k] for k in data.files if k != "report"})
+            return self._remember(run_id, report, table)
+
+    # ── Files / memory ────────────────────────────────────────────────────────
+
+    def _remember(self, run_id: str, report: Dict, table: TradeTable) -> tuple:
+        run = (report, table)
+        self._loaded[run_id] = run
+        self._loaded.move_to_end(run_id)
+        while len(self._loaded) > self.MEMORY_RUNS:
+            self._loaded.popitem(last=False)
+        return run
+
+    def _path(self, run_id: str) -> str:
+        return os.path.join(self.root, f"{run_id}.npz")
+
+    def _prune(self) -> None:
+        files = [f for f in glob.glob(os.path.join(self.root, "*.npz")) if not f.endswith(".tmp.npz")]
+        files.sort(key=os.path.getmtime)
+        for f in files[:-self.keep_runs]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+
+class SymbolTradeCache:
+    """Per-symbol trade lists of completed runs, keyed by simulation parameters."""
+
+    def __init__(self, root: str, keep_keys: int):
+        self.root = os.path.join(root, "symbols")
+        self.keep_keys = max(keep_keys, 1)
+
+    def get(self, sim_key: str, symbol: str) -> Optional[Dict]:
+        """{"table", "entry_bar", "exit_bar", "n_bars", "digest"} or None."""
+        path = self._path(sim_key, symbol)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                cols = {k: data[k] for k in data.files}
+        except Exception as e:
+            logger.warning(f"[BacktestResults] Unreadable symbol cache {path}: {e}")
+            return None
+        return {
+            "n_bars": int(cols.pop("n_bars")),
+            "digest": str(cols.pop("digest")),
+            "entry_bar": cols.pop("entry_bar"),
+            "exit_bar": cols.pop("exit_bar"),
+            "table": TradeTable(cols),
+        }
+
+    def put(
+        self,
+        sim_key: str,
+        symbol: str,
+        table: TradeTable,
+        entry_bar: np.ndarray,
+        exit_bar: np.ndarray,
+        n_bars: int,
+        digest: str,
+    ) -> None:
+        path = self._path(sim_key, symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            entry_bar=entry_bar.astype(np.int64),
+            exit_bar=exit_bar.astype(np.int64),
+            n_bars=np.array(n_bars),
+            digest=np.array(digest),
+            **table.cols,
+        )
+        os.replace(tmp, path)
+
+    def prune(self) -> None:
+        """Keep the most recently written parameter sets."""
+        dirs = [d for d in glob.glob(os.path.join(self.root, "*")) if os.path.isdir(d)]
+        dirs.sort(key=os.path.getmtime)
+        for d in dirs[:-self.keep_keys]:
+            shutil.rmtree(d, ignore_errors=True)
+
+    def _path(self, sim_key: str, symbol: str) -> str:
+        return os.path.join(self.root, sim_key, f"{symbol}.npz")
+
+
+backtest_results = BacktestResultStore()
+symbol_trade_cache = SymbolTradeCache(backtest_results.root, backtest_results.keep_runs)
@@ -0,0 +1,217 @@
+"""
+Live OHLCV bar aggregator fed by KiteTicker ticks.
+
+Ticks from any KiteTicker connection in the process (ticker_service's
+per-user tickers and the agent's _TickerManager) are folded into rolling
+in-memory 1-minute and 5-minute bars per instrument token. The analysis
+pipeline reads today's 5-minute candles from here; REST historical_data is
+only needed to backfill the part of the session before streaming began.
+
+Volume: MODE_QUOTE / MODE_FULL ticks carry cumulative `volume_traded` for the
+day, so a bar's volume is the increase in that counter across the bar. LTP
+ticks (no volume) still update prices.
+
+The first bar seen for a token is almost always partial (subscription began
+mid-bar), so coverage starts at the next bucket boundary; anything earlier
+must come from REST.
+"""
+
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pytz
+
+from app.core.logging import logger
+
+IST = pytz.timezone("Asia/Kolkata")
+
+_INTERVALS = {"minute": 1, "5minute": 5}
+_MAX_BARS = {"minute": 400, "5minute": 80}   # > one full NSE session
+
+
+def _bucket_start(ts: datetime, minutes: int) -> datetime:
+    return ts.replace(minute=ts.minute - ts.minute % minutes, second=0, microsecond=0)
+
+
+class _Series:
+    """Completed bars + the forming bar for one token × interval."""
+
+    def __init__(self, minutes: int, maxlen: int):
+        self.minutes = minutes
+        self.bars: deque = deque(maxlen=maxlen)
+        self.current: Optional[Dict] = None
+        self.covered_from: Optional[datetime] = None   # first complete bucket
+
+    def on_price(self, ts: datetime, price: float, cum_volume: Optional[int],
+                 prev_cum_volume: Optional[int]) -> Optional[Dict]:
+        """Apply one tick; returns the bar that just closed, if any."""
+        bucket = _bucket_start(ts, self.minutes)
+        closed = None
+        cur = self.current
+
+        if cur is not None and bucket > cur["date"]:
+            closed = cur
+            self.bars.append(cur)
+            cur = None
+        elif cur is not None and bucket < cur["date"]:
+            return None   # late tick for an already-closed bucket
+
+        if cur is None:
+            if self.covered_from is None:
+                self.covered_from = bucket + timedelta(minutes=self.minutes)
+            base = prev_cum_volume if prev_cum_volume is not None else cum_volume
+            cur = {"date": bucket, "open": price, "high": price, "low": price,
+                   "close": price, "volume": 0.0, "_vol_base": base}
+            self.current = cur
+
+        cur["high"] = max(cur["high"], price)
+        cur["low"] = min(cur["low"], price)
+        cur["close"] = price
+        if cum_volume is not None and cur["_vol_base"] is not None:
+            cur["volume"] = float(max(cum_volume - cur["_vol_base"], 0))
+        elif cum_volume is not None:
+            cur["_vol_base"] = cum_volume
+        return closed
+
+    def close_stale(self, now: datetime) -> Optional[Dict]:
+        """Close the forming bar if its bucket has ended without a new tick."""
+        cur = self.current
+        if cur is not None and now >= cur["date"] + timedelta(minutes=self.minutes):
+            self.bars.append(cur)
+            self.current = None
+            return cur
+        return None
+
+
+class BarAggregator:
+    """Process-wide tick → bar builder (thread-safe; ticks arrive on ticker threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[int, Dict[str, _Series]] = {}
+        self._last_volume: Dict[int, int] = {}
+        self._session: Optional[datetime] = None
+        self._tracked: Dict[int, int] = {}   # token → subscribers
+
+    # ── Registration ──────────────────────────────────────────────────────────
+
+    def track(self, tokens: List[int]) -> None:
+        """Start building bars for these tokens (ticks for others are ignored)."""
+        with self._lock:
+            for t in tokens:
+                self._tracked[int(t)] = self._tracked.get(int(t), 0) + 1
+
+    def untrack(self, tokens: List[int]) -> None:
+        """
+        Release one subscription per token. A token nobody tracks any more
+        loses its bars and its streaming indicator state.
+        """
+        released = []
+        with self._lock:
+            for t in tokens:
+                t = int(t)
+                refs = self._tracked.get(t, 0) - 1
+                if refs > 0:
+                    self._tracked[t] = refs
+                    continue
+                self._tracked.pop(t, None)
+                self._series.pop(t, None)
+                self._last_volume.pop(t, None)
+                released.append(t)
+        if released:
+            from app.engines.streaming_indicators import streaming_indicators
+            for t in released:
+                streaming_indicators.drop(t)
+
+    def tracked(self) -> List[int]:
+        with self._lock:
+            return list(self._tracked)
+
+    # ── Tick ingestion (called from KiteTicker threads) ──────────────────────
+
+    def on_ticks(self, ticks: List[Dict]) -> None:
+        closed_5m = []
+        now = datetime.now(IST).replace(tzinfo=None)
+        with self._lock:
+            self._roll_session(now)
+            for tick in ticks:
+                token = tick.get("instrument_token")
+                price = tick.get("last_price")
+                if token not in self._tracked or price is None:
+                    continue
+                ts = tick.get("exchange_timestamp") or tick.get("last_trade_time") or now
+                if getattr(ts, "tzinfo", None) is not None:
+                    ts = ts.astimezone(IST).replace(tzinfo=None)
+                cum_volume = tick.get("volume_traded")
+                prev_volume = self._last_volume.get(token)
+
+                series = self._series.setdefault(token, {
+                    name: _Series(minutes, _MAX_BARS[name]) for name, minutes in _INTERVALS.items()
+                })
+                for name, s in series.items():
+                    closed = s.on_price(ts, float(price), cum_volume, prev_volume)
+                    if closed is not None and name == "5minute":
+                        closed_5m.append((token, closed))
+                if cum_volume is not None:
+                    self._last_volume[token] = cum_volume
+
+        self._publish(closed_5m)
+
+    def _roll_session(self, now: datetime) -> None:
+        if self._session is None or self._session.date() != now.date():
+            self._series.clear()
+            self._last_volume.clear()
+            self._session = now
+
+    def _publish(self, closed_5m: List) -> None:
+        """Advance streaming indicators the moment a 5-minute bar closes."""
+        if not closed_5m:
+            return
+        from app.engines.streaming_indicators import streaming_indicators
+        for token, bar in closed_5m:
+            try:
+                streaming_indicators.on_bar(token, bar, contiguous_only=True)
+            except Exception as e:
+                logger.debug(f"[BarAggregator] indicator update failed for {token}: {e}")
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    def candles_since(
+        self, token: int, since: datetime, interval: str = "5minute"
+    ) -> Optional[pd.DataFrame]:
+        """
+        Bars (completed + forming) starting at or after `since` (IST, naive or
+        aware). Returns None when streaming did not cover `since` — the caller
+        must backfill that range from REST.
+        """
+        if getattr(since, "tzinfo", None) is not None:
+            since = since.astimezone(IST).replace(tzinfo=None)
+        now = datetime.now(IST).replace(tzinfo=None)
+        closed_5m = []
+        with self._lock:
+            s = self._series.get(token, {}).get(interval)
+            if s is None or s.covered_from is None or since < s.covered_from:
+                return None
+            closed = s.close_stale(now)
+            if closed is not None and interval == "5minute":
+                closed_5m.append((token, closed))
+            rows = [b for b in s.bars if b["date"] >= since]
+            if s.current is not None and s.current["date"] >= since:
+                rows.append(s.current)
+            rows = [{k: v for k, v in b.items() if not k.startswith("_")} for b in rows]
+        self._publish(closed_5m)
+        return pd.DataFrame(rows, columns=["date", "open", "high", "low", "close", "volume"])
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "tracked": len(self._tracked),
+                "streaming": len(self._series),
+                "session": self._session.isoformat() if self._session else None,
+            }
+
+
+bar_aggregator = BarAggregator()
@@ -0,0 +1,373 @@
+"""
+Persistent local OHLCV candle store.
+
+Daily history used by the screener, the swing analysis and the backtester is
+kept on local disk so repeated runs only pay for the bars they have not seen.
+5-minute bars for the intraday backtester use the same layout under
+interval "5minute" (yfinance_5minute_fetcher).
+
+Layout (one directory per symbol × interval, one flat file per column):
+
+    <CANDLE_STORE_DIR>/<interval>/<SYMBOL>/
+        ts.i8       int64   bar open time, epoch seconds (tz-naive IST wall clock)
+        open.f8     float64
+        high.f8     float64
+        low.f8      float64
+        close.f8    float64
+        volume.f8   float64
+        meta.json   {"synced_from": "YYYY-MM-DD", "synced_through": "YYYY-MM-DD"}
+
+Columns are append-only binary files read through np.memmap, so a range read
+touches only the pages it needs. Syncing a symbol/interval holds a thread lock
+plus an flock on <interval>/<SYMBOL>.lock, so Gunicorn workers sharing the
+store never append or rewrite the same series concurrently. Only completed bars (before today, IST) are
+persisted; today's still-forming bar is fetched live and merged into the
+result without being written.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pytz
+import yfinance as yf
+
+from app.core.config import get_settings
+from app.core.logging import logger
+
+IST = pytz.timezone("Asia/Kolkata")
+
+_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# Provider signature: fetch(symbol, start, end_exclusive) → DataFrame with a
+# tz-naive DatetimeIndex and lowercase open/high/low/close/volume columns.
+CandleFetcher = Callable[[str, date, date], pd.DataFrame]
+
+
+def yfinance_daily_fetcher(symbol: str, start: date, end: date) -> pd.DataFrame:
+    """Default provider: split/dividend-adjusted daily bars from yfinance."""
+    ticker = yf.Ticker(f"{symbol}.NS")
+    df = ticker.history(
+        start=start.strftime("%Y-%m-%d"),
+        end=end.strftime("%Y-%m-%d"),
+        interval="1d",
+        auto_adjust=True,
+    )
+    if df.empty:
+        return pd.DataFrame(columns=list(_COLUMNS))
+    df = df.rename(columns=str.lower)[list(_COLUMNS)].copy()
+    idx = pd.to_datetime(df.index)
+    if idx.tz is not None:
+        idx = idx.tz_convert(IST).tz_localize(None)
+    df.index = idx
+    return df
+
+
+def yfinance_5minute_fetcher(symbol: str, start: date, end: date) -> pd.DataFrame:
+    """
+    5-minute bars from yfinance (interval="5minute" in the store).
+
+    yfinance only serves the last 60 days of 5-minute history, so older
+    sessions exist only if they were stored while still in that window —
+    the store keeps every completed session it has seen. Bars are
+    unadjusted: sessions are replayed independently, and an adjustment
+    would make the store rebuild and lose sessions it can't re-download.
+    """
+    start = max(start, datetime.now(IST).date() - timedelta(days=59))
+    if start >= end:
+        return pd.DataFrame(columns=list(_COLUMNS))
+    ticker = yf.Ticker(f"{symbol}.NS")
+    df = ticker.history(
+        start=start.strftime("%Y-%m-%d"),
+        end=end.strftime("%Y-%m-%d"),
+        interval="5m",
+        auto_adjust=False,
+    )
+    if df.empty:
+        return pd.DataFrame(columns=list(_COLUMNS))
+    df = df.rename(columns=str.lower)[list(_COLUMNS)].copy()
+    idx = pd.to_datetime(df.index)
+    if idx.tz is not None:
+        idx = idx.tz_convert(IST).tz_localize(None)
+    df.index = idx
+    return df
+
+
+class CandleStore:
+    """
+    Append-only, memory-mapped OHLCV store keyed by (symbol, interval, bar time).
+
+    `get_range()` is synchronous and thread-safe; call it from an executor.
+    """
+
+    # Adjusted history shifts retroactively after splits/dividends. The tail
+    # fetch overlaps the last stored bar; if its close moved more than this,
+    # the stored series is discarded and re-downloaded.
+    _ADJUSTMENT_TOLERANCE = 0.005
+
+    def __init__(self, root: Optional[str] = None):
+        if root is None:
+            root = get_settings().CANDLE_STORE_DIR or os.path.join(
+                os.path.dirname(__file__), "..", "..", "data", "candles"
+            )
+        self.root = os.path.abspath(root)
+        self._locks: Dict[tuple, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    # ── Public API ────────────────────────────────────────────────────────────
+
+    def get_range(
+        self,
+        symbol: str,
+        start: date,
+        end: date,
+        interval: str = "day",
+        fetcher: Optional[CandleFetcher] = None,
+    ) -> pd.DataFrame:
+        """
+        Return bars with start <= bar date < end, indexed by tz-naive datetime,
+        columns open/high/low/close/volume (float64).
+
+        Missing bars are fetched from `fetcher` (yfinance daily by default):
+        only the head gap before `synced_from` and the tail from
+        `synced_through` (exclusive) onward are requested from the provider.
+        """
+        fetcher = fetcher or yfinance_daily_fetcher
+        today = datetime.now(IST).date()
+        live_tail = None
+
+        with self._locked(symbol, interval):
+            path = self._path(symbol, interval)
+            meta = self._read_meta(path)
+            synced_from = self._meta_date(meta, "synced_from")
+            synced_through = self._meta_date(meta, "synced_through")  # exclusive
+
+            # ── Head gap: requested start precedes anything synced ─────────
+            if synced_from is not None and start < synced_from:
+                head = self._safe_fetch(fetcher, symbol, start, synced_from)
+                if head is None:
+                    return self._fallback(fetcher, symbol, start, end)
+                self._rewrite(path, head, self._read_frame(path))
+                meta["synced_from"] = start.isoformat()
+                self._write_meta(path, meta)
+
+            # ── Tail gap: completed bars not yet synced, or today's live bar ─
+            if synced_through is None or synced_through < min(end, today) or end > today:
+                ts = self._load_column(path, "ts", np.int64, self._row_count(path))
+                tail_start = start if synced_through is None else synced_through
+                if len(ts):
+                    # Overlap the last stored bar to detect re-adjusted history
+                    tail_start = min(tail_start, self._ts_to_date(ts[-1]))
+                tail_end = max(end, tail_start + timedelta(days=1))
+                tail = self._safe_fetch(fetcher, symbol, tail_start, tail_end)
+                if tail is None:
+                    if not len(ts):
+                        return self._fallback(fetcher, symbol, start, end)
+                    logger.warning(f"[CandleStore] {symbol}/{interval}: tail fetch failed — serving stored bars")
+                else:
+                    if len(ts) and self._history_adjusted(path, ts, tail):
+                        logger.info(f"[CandleStore] {symbol}/{interval}: adjusted history detected — rebuilding")
+                        rebuild_from = min(start, synced_from or start)
+                        tail = self._safe_fetch(fetcher, symbol, rebuild_from, tail_end)
+                        if tail is None:
+                            return self._fallback(fetcher, symbol, start, end)
+                        self._rewrite(path, None, None)
+                        meta = {"synced_from": rebuild_from.isoformat()}
+                        ts = ts[:0]
+
+                    tail_ts = self._index_ts(tail.index)
+                    today_ts = self._date_to_ts(today)
+                    live_tail = tail[tail_ts >= today_ts]
+                    self._append(path, tail[tail_ts < today_ts], int(ts[-1]) if len(ts) else None)
+                    meta.setdefault("synced_from", start.isoformat())
+                    meta["synced_through"] = min(tail_end, today).isoformat()
+                    self._write_meta(path, meta)
+
+            df = self._read_frame(path, start, end)
+
+        if live_tail is not None and not live_tail.empty and end > today:
+            df = pd.concat([df, live_tail[list(_COLUMNS)].astype(np.float64)])
+        return df
+
+    def invalidate(self, symbol: str, interval: str = "day") -> None:
+        """Drop every stored bar for one symbol/interval."""
+        with self._locked(symbol, interval):
+            path = self._path(symbol, interval)
+            self._rewrite(path, None, None)
+            self._write_meta(path, {})
+
+    # ── Storage helpers ───────────────────────────────────────────────────────
+
+    @contextmanager
+    def _locked(self, symbol: str, interval: str) -> Iterator[None]:
+        """Exclusive access to one symbol/interval across threads and worker processes."""
+        key = (symbol, interval)
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+        with lock:
+            path = self._path(symbol, interval)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)   # released on close
+                yield
+
+    def _path(self, symbol: str, interval: str) -> str:
+        safe = symbol.replace("/", "_").replace("&", "_AND_")
+        return os.path.join(self.root, interval, safe)
+
+    def _read_meta(self, path: str) -> Dict:
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _meta_date(meta: Dict, key: str) -> Optional[date]:
+        value = meta.get(key)
+        return date.fromisoformat(value) if value else None
+
+    def _write_meta(self, path: str, meta: Dict) -> None:
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def _column_file(self, path: str, name: str) -> str:
+        return os.path.join(path, f"{name}.i8" if name == "ts" else f"{name}.f8")
+
+    def _load_column(self, path: str, name: str, dtype, rows: Optional[int] = None) -> np.ndarray:
+        fname = self._column_file(path, name)
+        try:
+            size = os.path.getsize(fname) // np.dtype(dtype).itemsize
+        except OSError:
+            return np.empty(0, dtype=dtype)
+        if rows is not None:
+            size = min(size, rows)
+        if size == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(fname, dtype=dtype, mode="r", shape=(size,))
+
+    def _row_count(self, path: str) -> int:
+        """Rows present in every column (guards against a torn append)."""
+        counts = []
+        for name, dtype in (("ts", np.int64),) + tuple((c, np.float64) for c in _COLUMNS):
+            try:
+                counts.append(os.path.getsize(self._column_file(path, name)) // np.dtype(dtype).itemsize)
+            except OSError:
+                return 0
+        return min(counts)
+
+    def _read_frame(
+        self, path: str, start: Optional[date] = None, end: Optional[date] = None
+    ) -> pd.DataFrame:
+        rows = self._row_count(path)
+        ts = self._load_column(path, "ts", np.int64, rows)
+        lo = 0 if start is None else int(np.searchsorted(ts, self._date_to_ts(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, self._date_to_ts(end), side="left"))
+        data = {
+            c: np.array(self._load_column(path, c, np.float64, rows)[lo:hi]) for c in _COLUMNS
+        }
+        index = pd.to_datetime(np.array(ts[lo:hi]), unit="s")
+        return pd.DataFrame(data, index=index, columns=list(_COLUMNS))
+
+    def _append(self, path: str, df: pd.DataFrame, last_ts: Optional[int]) -> None:
+        if df is None or df.empty:
+            return
+        ts = self._index_ts(df.index)
+        if last_ts is not None:
+            keep = ts > last_ts
+            df, ts = df[keep], ts[keep]
+        if not len(ts):
+            return
+        os.makedirs(path, exist_ok=True)
+        with open(self._column_file(path, "ts"), "ab") as f:
+            f.write(ts.astype(np.int64).tobytes())
+        for c in _COLUMNS:
+            with open(self._column_file(path, c), "ab") as f:
+                f.write(df[c].to_numpy(dtype=np.float64).tobytes())
+
+    def _rewrite(
+        self, path: str, head: Optional[pd.DataFrame], body: Optional[pd.DataFrame]
+    ) -> None:
+        """Replace the stored series with head + body (either may be None)."""
+        frames = [f for f in (head, body) if f is not None and not f.empty]
+        today_ts = self._date_to_ts(datetime.now(IST).date())
+        os.makedirs(path, exist_ok=True)
+        if frames:
+            df = pd.concat(frames)
+            df = df[self._index_ts(df.index) < today_ts]
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+        else:
+            df = pd.DataFrame(columns=list(_COLUMNS))
+        columns = {"ts": self._index_ts(df.index).astype(np.int64)}
+        columns.update({c: df[c].to_numpy(dtype=np.float64) for c in _COLUMNS})
+        for name, arr in columns.items():
+            fname = self._column_file(path, name)
+            with open(fname + ".tmp", "wb") as f:
+                f.write(arr.tobytes())
+            os.replace(fname + ".tmp", fname)
+
+    def _history_adjusted(self, path: str, ts: np.ndarray, tail: pd.DataFrame) -> bool:
+        last_ts = int(ts[-1])
+        tail_ts = self._index_ts(tail.index)
+        hits = np.nonzero(tail_ts == last_ts)[0]
+        if not len(hits):
+            return False
+        stored_close = float(self._load_column(path, "close", np.float64, len(ts))[-1])
+        fresh_close = float(tail["close"].iloc[hits[0]])
+        if stored_close <= 0:
+            return False
+        return abs(fresh_close - stored_close) / stored_close > self._ADJUSTMENT_TOLERANCE
+
+    # ── Provider helpers ──────────────────────────────────────────────────────
+
+    def _safe_fetch(
+        self, fetcher: CandleFetcher, symbol: str, start: date, end: date
+    ) -> Optional[pd.DataFrame]:
+        try:
+            df = fetcher(symbol, start, end)
+        except Exception as e:
+            logger.warning(f"[CandleStore] {symbol}: provider fetch {start}→{end} failed: {e}")
+            return None
+        if df is None:
+            return None
+        if df.empty:
+            return pd.DataFrame(columns=list(_COLUMNS))
+        df = df.dropna(subset=["close"])
+        return df[~df.index.duplicated(keep="last")].sort_index()
+
+    def _fallback(
+        self, fetcher: CandleFetcher, symbol: str, start: date, end: date
+    ) -> pd.DataFrame:
+        """Store unusable for this request — return whatever the provider gives."""
+        df = self._safe_fetch(fetcher, symbol, start, end)
+        if df is None:
+            return pd.DataFrame(columns=list(_COLUMNS))
+        return df[list(_COLUMNS)].astype(np.float64)
+
+    # ── Time helpers ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _date_to_ts(d: date) -> int:
+        return int((datetime(d.year, d.month, d.day) - datetime(1970, 1, 1)).total_seconds())
+
+    @staticmethod
+    def _ts_to_date(ts) -> date:
+        return (datetime(1970, 1, 1) + timedelta(seconds=int(ts))).date()
+
+    @staticmethod
+    def _index_ts(index) -> np.ndarray:
+        return np.asarray(pd.DatetimeIndex(index).values.astype("datetime64[s]"), dtype=np.int64)
+
+
+candle_store = CandleStore()
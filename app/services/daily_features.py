@@ -0,0 +1,235 @@
+"""
+Precomputed daily features for the whole NSE equity universe.
+
+A nightly job (weekdays after the close) reads completed daily bars for every
+symbol from the candle store and writes one compact columnar table per
+session:
+
+    <DAILY_FEATURES_DIR>/features_YYYYMMDD.npz   (YYYYMMDD = last session in the data)
+
+Per symbol:
+    prev_close                 last completed session close
+    close_5d_ago               close five sessions back (momentum reference)
+    avg_volume_5d / _20d       mean daily volume
+    atr_14                     mean true range, last 14 sessions
+    volatility_5d              std of the last 5 daily returns, %
+    pivot, r1, r2, s1, s2      classic pivots from the last session
+    high_52w, low_52w          over the last 252 sessions
+
+At request time the screener joins live quotes against this table
+(vectorized filter + rank) instead of downloading history per request.
+"""
+
+import asyncio
+import fcntl
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from app.core.config import get_settings
+from app.core.executors import executors
+from app.core.logging import logger
+from app.services.candle_store import candle_store
+
+IST = pytz.timezone("Asia/Kolkata")
+
+FEATURE_COLUMNS = (
+    "prev_close", "close_5d_ago", "avg_volume_5d", "avg_volume_20d", "atr_14",
+    "volatility_5d", "pivot", "r1", "r2", "s1", "s2", "high_52w", "low_52w",
+)
+
+_HISTORY_DAYS = 380      # calendar days → ≥252 sessions for the 52-week range
+_MIN_SESSIONS = 6
+
+
+def compute_features(df: pd.DataFrame) -> Optional[Dict[str, float]]:
+    """Feature row from completed daily bars (lowercase OHLCV), or None if too short."""
+    df = df.dropna(subset=["close"])
+    if len(df) < _MIN_SESSIONS:
+        return None
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    close = df["close"].to_numpy(dtype=np.float64)
+    volume = df["volume"].to_numpy(dtype=np.float64)
+
+    prev = close[:-1]
+    tr = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - prev), np.abs(low[1:] - prev)))
+    returns = np.diff(close[-6:]) / close[-6:-1]
+
+    H, L, C = high[-1], low[-1], close[-1]
+    P = (H + L + C) / 3
+    return {
+        "prev_close": C,
+        "close_5d_ago": close[-5],
+        "avg_volume_5d": volume[-5:].mean(),
+        "avg_volume_20d": volume[-20:].mean(),
+        "atr_14": tr[-14:].mean(),
+        "volatility_5d": float(np.std(returns, ddof=1) * 100),
+        "pivot": P,
+        "r1": 2 * P - L,
+        "r2": P + (H - L),
+        "s1": 2 * P - H,
+        "s2": P - (H - L),
+        "high_52w": high[-252:].max(),
+        "low_52w": low[-252:].min(),
+    }
+
+
+class DailyFeatureStore:
+
+    BUILD_HOUR_IST = 18
+    BUILD_MINUTE_IST = 30
+    BUILD_WORKERS = 8
+
+    def __init__(self, root: Optional[str] = None):
+        if root is None:
+            root = get_settings().DAILY_FEATURES_DIR or os.path.join(
+                os.path.dirname(__file__), "..", "..", "data", "features"
+            )
+        self.root = os.path.abspath(root)
+        self._table: Optional[pd.DataFrame] = None
+        self._table_path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    def table(self) -> Optional[pd.DataFrame]:
+        """Latest feature table (index = symbol), reloaded when a newer file lands."""
+        latest = self._latest_on_disk()
+        if latest is None:
+            return None
+        with self._lock:
+            if latest != self._table_path:
+                with np.load(latest) as data:
+                    self._table = pd.DataFrame(
+                        {c: data[c] for c in FEATURE_COLUMNS},
+                        index=pd.Index(data["symbol"], name="symbol"),
+                    )
+                self._table_path = latest
+                logger.info(f"[DailyFeatures] Loaded {len(self._table)} symbols from {os.path.basename(latest)}")
+            return self._table
+
+    def as_of(self) -> Optional[date]:
+        latest = self._latest_on_disk()
+        return self._day_of(latest) if latest else None
+
+    # ── Build ─────────────────────────────────────────────────────────────────
+
+    def build_sync(self, symbols: List[str]) -> Optional[str]:
+        """
+        Compute features for `symbols` from completed daily bars and write the
+        table. Returns the written path (None if another process holds the
+        build lock or nothing could be computed).
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".build.lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logger.info("[DailyFeatures] Build already running in another worker")
+                return None
+
+            today = datetime.now(IST).date()
+            start = today - timedelta(days=_HISTORY_DAYS)
+
+            def _one(symbol: str):
+                try:
+                    df = candle_store.get_range(symbol, start, today)
+                    row = compute_features(df)
+                    return (symbol, row, df.index[-1].date()) if row else None
+                except Exception as e:
+                    logger.debug(f"[DailyFeatures] {symbol} skipped: {e}")
+                    return None
+
+            with ThreadPoolExecutor(max_workers=self.BUILD_WORKERS) as pool:
+                rows = [r for r in pool.map(_one, symbols) if r is not None]
+            if not rows:
+                logger.warning("[DailyFeatures] No features computed — table not written")
+                return None
+
+            session = max(r[2] for r in rows)
+            rows = [r for r in rows if r[2] == session]    # drop symbols with stale data
+            columns = {
+                c: np.fromiter((r[1][c] for r in rows), np.float64, len(rows))
+                for c in FEATURE_COLUMNS
+            }
+            columns["symbol"] = np.array([r[0] for r in rows], dtype=str)
+
+            path = os.path.join(self.root, f"features_{session.strftime('%Y%m%d')}.npz")
+            tmp = path + ".tmp.npz"
+            np.savez(tmp, **columns)
+            os.replace(tmp, path)
+            for f in glob.glob(os.path.join(self.root, "features_*.npz")):
+                if f != path:
+                    os.remove(f)
+            logger.info(f"[DailyFeatures] Wrote {len(rows)}/{len(symbols)} symbols for session {session}")
+            return path
+
+    async def build(self, symbols: List[str]) -> Optional[str]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executors.pool("market-data-download"), self.build_sync, symbols)
+
+    # ── Nightly scheduler ─────────────────────────────────────────────────────
+
+    async def run_scheduler(self):
+        """Build on startup if the table is missing/stale, then every weekday evening."""
+        from app.services.data_service import DataService
+
+        logger.info("[DailyFeatures] Nightly precompute scheduler started")
+        while True:
+            try:
+                if self._is_stale():
+                    universe = await DataService().get_nse_universe()
+                    await self.build(universe)
+                await self._sleep_until_next_build()
+            except asyncio.CancelledError:
+                logger.info("[DailyFeatures] Scheduler cancelled")
+                break
+            except Exception as e:
+                logger.error(f"[DailyFeatures] Scheduler error: {e}")
+                await asyncio.sleep(3600)
+
+    def _is_stale(self) -> bool:
+        as_of = self.as_of()
+        return as_of is None or as_of < self._last_completed_session()
+
+    def _last_completed_session(self) -> date:
+        """Most recent weekday whose bars are final by the nightly build time."""
+        now = datetime.now(IST)
+        day = now.date()
+        if (now.hour, now.minute) < (self.BUILD_HOUR_IST, self.BUILD_MINUTE_IST):
+            day -= timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day
+
+    async def _sleep_until_next_build(self):
+        now = datetime.now(IST)
+        target = now.replace(hour=self.BUILD_HOUR_IST, minute=self.BUILD_MINUTE_IST, second=0, microsecond=0)
+        if now >= target:
+            target += timedelta(days=1)
+        while target.weekday() >= 5:
+            target += timedelta(days=1)
+        secs = (target - now).total_seconds()
+        logger.info(f"[DailyFeatures] Next precompute in {secs/3600:.1f}h")
+        await asyncio.sleep(secs)
+
+    # ── Files ─────────────────────────────────────────────────────────────────
+
+    def _latest_on_disk(self) -> Optional[str]:
+        files = sorted(glob.glob(os.path.join(self.root, "features_*.npz")))
+        return files[-1] if files else None
+
+    @staticmethod
+    def _day_of(path: str) -> date:
+        return datetime.strptime(os.path.basename(path)[9:17], "%Y%m%d").date()
+
+
+daily_features = DailyFeatureStore()
@@ -2,11 +2,21 @@ import yfinance as yf
 import requests
 import asyncio
 import io
+import heapq
 import statistics
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional
+from datetime import date, datetime, timedelta
+from app.core.config import get_settings
+from app.core.executors import executors
 from app.core.logging import logger
+from app.services.candle_store import candle_store, IST
+from app.services.daily_features import daily_features
+from app.services.historical_scheduler import historical_scheduler
+from app.services.instrument_master import instrument_master
+from app.services.quote_cache import quote_cache
 
 # ─── Sector → NSE index mapping (for sector-based filtering) ────────────────
 SECTOR_INDEX_MAP = {
@@ -82,10 +92,9 @@ class DataService:
         "STARCEMENT", "BIRLACORPN", "DALBHARAT", "JKPAPER", "TNPL",
     ]
 
-    # Class-level instrument token cache — shared across all instances
+    # Class-level view of instrument_master's NSE equity map — shared across all instances
     _zerodha_instrument_tokens: Dict[str, int] = {}   # symbol → token
-    _tokens_fetched_at: Optional[datetime] = None
-    _tokens_ttl_hours = 24
+    _tokens_fetched_at: Optional[date] = None          # trading day of the master it came from
 
     def __init__(self):
         self._nse_universe: Optional[List[str]] = None  # cached base symbols
@@ -111,7 +120,7 @@ class DataService:
 
         if cache_stale:
             loop = asyncio.get_event_loop()
-            symbols = await loop.run_in_executor(None, self._download_nse_csv)
+            symbols = await loop.run_in_executor(executors.pool("market-data-download"), self._download_nse_csv)
             self._nse_universe = symbols
             self._universe_fetched_at = now
             logger.info(f"NSE universe loaded: {len(symbols)} symbols")
@@ -142,6 +151,9 @@ class DataService:
                   Filter by: volume > 200K (500K for intraday), price ₹10–₹10000
           Pass 2: Score by composite (hold-duration-aware)
                   Return top `limit` candidates enriched with metadata.
+        When the nightly feature table exists, the whole universe is ranked
+        from today's snapshot joined against it (no sampling, no per-request
+        history); otherwise a random `max_candidates` sample is screened.
         If kite_instance is provided, delegates to Zerodha-based screener.
         """
         if kite_instance is not None:
@@ -152,6 +164,27 @@ class DataService:
             )
 
         universe = await self.get_nse_universe(sectors)
+        is_intraday = hold_duration_days == 0
+        min_volume = 500_000 if is_intraday else 200_000
+
+        # Full-universe path: today's snapshot joined with the nightly feature table
+        features = daily_features.table()
+        if features is not None:
+            symbols = [s for s in universe if s in features.index]
+            batches = [symbols[i:i+200] for i in range(0, len(symbols), 200)]
+            rows: List[Dict] = []
+            calls = [partial(self._snapshot_batch, batch) for batch in batches]
+            async for batch in self._fan_out(calls, get_settings().SCREEN_YF_CONCURRENCY, "Screen", "market-data-download"):
+                rows.extend(batch)
+            logger.info(f"Screener snapshot: {len(rows)}/{len(symbols)} symbols (feature table {daily_features.as_of()})")
+            if rows:
+                quotes = pd.DataFrame(rows).set_index("symbol")
+                candidates = self._rank_with_features(quotes, features, is_intraday, min_volume, "yfinance")
+                if sectors and "NIFTY 50" not in sectors and "ALL" not in sectors:
+                    candidates = self._filter_by_sector(candidates, sectors)
+                top = candidates[:limit]
+                logger.info(f"Top {len(top)} movers selected for LLM analysis")
+                return top
 
         # Limit universe size to avoid very long waits
         # Shuffle to get variety across sectors on each run
@@ -161,22 +194,15 @@ class DataService:
 
         logger.info(f"Screening {len(universe)} symbols in batches of {batch_size}…")
 
-        # Parallel batch fetch
-        loop = asyncio.get_event_loop()
+        # Parallel batch fetch (bounded fan-out, results consumed as they land)
         batches = [universe[i:i+batch_size] for i in range(0, len(universe), batch_size)]
 
-        is_intraday = hold_duration_days == 0
-        min_volume = 500_000 if is_intraday else 200_000
-
-        tasks = [
-            loop.run_in_executor(None, self._screen_batch, batch, min_volume, is_intraday)
+        calls = [
+            partial(self._screen_batch, batch, min_volume, is_intraday, raise_errors=True)
             for batch in batches
         ]
-        batch_results = await asyncio.gather(*tasks)
-
-        # Flatten
         candidates = []
-        for batch in batch_results:
+        async for batch in self._fan_out(calls, get_settings().SCREEN_YF_CONCURRENCY, "Screen", "market-data-download"):
             candidates.extend(batch)
 
         logger.info(f"Screener pass 1: {len(candidates)} stocks passed basic filters")
@@ -198,12 +224,20 @@ class DataService:
     ) -> pd.DataFrame:
         """
         Fetch historical OHLCV data for a symbol (base NSE symbol, no .NS suffix).
+        Daily bars are served from the local candle store (only the missing
+        tail is downloaded); intraday timeframes go straight to yfinance.
         Runs in executor to avoid blocking the event loop.
         """
-        yf_symbol = symbol if symbol.endswith(".NS") else f"{symbol}.NS"
         loop = asyncio.get_event_loop()
+        if timeframe == "day" and period.endswith("d") and period[:-1].isdigit():
+            base = symbol[:-3] if symbol.endswith(".NS") else symbol
+            return await loop.run_in_executor(
+                executors.pool("market-data-download"), self._fetch_daily_from_store, base, int(period[:-1])
+            )
+
+        yf_symbol = symbol if symbol.endswith(".NS") else f"{symbol}.NS"
         df = await loop.run_in_executor(
-            None, self._fetch_yfinance_data, yf_symbol, timeframe, period
+            executors.pool("market-data-download"), self._fetch_yfinance_data, yf_symbol, timeframe, period
         )
         return df
 
@@ -211,31 +245,12 @@ class DataService:
     # Zerodha-native data methods
     # ─────────────────────────────────────────────────────────────────────────
 
-    def _populate_token_cache(self, kite_instance) -> None:
-        """Fetch NSE instrument list from Zerodha and build symbol→token map."""
-        try:
-            instruments = kite_instance.instruments("NSE")
-            token_map = {}
-            for inst in instruments:
-                if inst.get("instrument_type") in ("EQ",) and inst.get("tradingsymbol"):
-                    token_map[inst["tradingsymbol"]] = inst["instrument_token"]
-            self.__class__._zerodha_instrument_tokens = token_map
-            self.__class__._tokens_fetched_at = datetime.utcnow()
-            logger.info(f"NSE instrument token cache built: {len(token_map)} symbols")
-        except Exception as e:
-            logger.warning(f"Instrument token cache build failed: {e}")
-
     async def _ensure_token_cache(self, kite_instance) -> None:
-        """Refresh token cache if stale (>24h)."""
-        now = datetime.utcnow()
-        is_stale = (
-            not self._zerodha_instrument_tokens
-            or self._tokens_fetched_at is None
-            or (now - self._tokens_fetched_at).total_seconds() > self._tokens_ttl_hours * 3600
-        )
-        if is_stale:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._populate_token_cache, kite_instance)
+        """Point the symbol→token map at the process-wide instrument master (refreshed daily)."""
+        await instrument_master.ensure_loaded(kite_instance)
+        if instrument_master.loaded_for != self._tokens_fetched_at:
+            self.__class__._zerodha_instrument_tokens = instrument_master.equity_tokens("NSE")
+            self.__class__._tokens_fetched_at = instrument_master.loaded_for
 
     async def screen_top_movers_zerodha(
         self,
@@ -249,12 +264,42 @@ class DataService:
         Steps:
           1. Ensure instrument token cache is built.
           2. Take universe of symbols from our FALLBACK_SYMBOLS + NSE CSV (cached).
-          3. Call kite.quote() in batches of 450 for live OHLC + volume.
-          4. Filter by volume/price.
-          5. For top 60 filtered candidates: fetch 5-day daily candles for momentum/volatility.
+          3. Call kite.quote() in batches of 450 for live OHLC + volume — fresh
+             quotes come from the shared quote cache, the rest fan out concurrently.
+          4. Filter each batch by volume/price as it arrives.
+          5. For the running top 60 by volume: fetch 5-day daily candles for
+             momentum/volatility (started while later quote batches are in flight).
           6. Score and rank.
         """
         await self._ensure_token_cache(kite_instance)
+        is_intraday = hold_duration_days == 0
+        min_volume = 500_000 if is_intraday else 200_000
+
+        # Full-universe path: live quotes joined with the nightly feature table
+        features = daily_features.table()
+        if features is not None:
+            symbols = [s for s in features.index if s in self._zerodha_instrument_tokens]
+            logger.info(f"[Zerodha-Screen] Quoting {len(symbols)} symbols against feature table {daily_features.as_of()}")
+            rows = []
+            async for quotes in self._stream_quotes(kite_instance, symbols):
+                for key, q in quotes.items():
+                    ohlc = q.get("ohlc", {})
+                    last_price = float(q.get("last_price", 0))
+                    rows.append({
+                        "symbol": key[4:],
+                        "last_price": last_price,
+                        "volume": float(q.get("volume", 0)),
+                        "prev_close": float(ohlc.get("close", last_price)),
+                        "open": float(ohlc.get("open", last_price)),
+                        "high": float(ohlc.get("high", last_price)),
+                        "low": float(ohlc.get("low", last_price)),
+                    })
+            if rows:
+                quotes_df = pd.DataFrame(rows).set_index("symbol")
+                ranked = self._rank_with_features(quotes_df, features, is_intraday, min_volume, "zerodha")
+                logger.info(f"[Zerodha-Screen] {len(ranked)} candidates after volume/price filter")
+                logger.info(f"[Zerodha-Screen] Returning {min(limit, len(ranked))} stocks")
+                return ranked[:limit]
 
         # Get symbol universe (use cached NSE list or fallback)
         universe = list(self._nse_universe) if self._nse_universe else self.FALLBACK_SYMBOLS[:]
@@ -270,81 +315,15 @@ class DataService:
 
         logger.info(f"[Zerodha-Screen] Fetching live quotes for {len(universe)} symbols via Zerodha")
 
-        is_intraday = hold_duration_days == 0
-        min_volume = 500_000 if is_intraday else 200_000
-
-        # Batch kite.quote() — max 500 symbols per call
-        batch_size = 450
-        all_quotes: Dict = {}
-        loop = asyncio.get_event_loop()
-
-        def _fetch_quotes(syms):
-            keys = [f"NSE:{s}" for s in syms]
-            try:
-                return kite_instance.quote(keys)
-            except Exception as ex:
-                logger.warning(f"[Zerodha-Screen] quote batch failed: {ex}")
-                return {}
-
-        for i in range(0, len(universe), batch_size):
-            batch = universe[i:i+batch_size]
-            q = await loop.run_in_executor(None, _fetch_quotes, batch)
-            all_quotes.update(q)
-
-        logger.info(f"[Zerodha-Screen] Received quotes for {len(all_quotes)} symbols")
-
-        # Filter pass 1: volume + price
-        candidates = []
-        for sym in universe:
-            key = f"NSE:{sym}"
-            q = all_quotes.get(key, {})
-            if not q:
-                continue
-            last_price = float(q.get("last_price", 0))
-            volume = int(q.get("volume", 0))
-            ohlc = q.get("ohlc", {})
-            prev_close = float(ohlc.get("close", last_price))
-
-            if last_price < 10 or last_price > 10_000:
-                continue
-            if volume < min_volume:
-                continue
-
-            day_change_pct = ((last_price - prev_close) / prev_close * 100) if prev_close > 0 else 0.0
-            token = self._zerodha_instrument_tokens.get(sym, 0)
-
-            candidates.append({
-                "symbol": sym,
-                "company_name": sym,
-                "last_price": last_price,
-                "volume": volume,
-                "instrument_token": token,
-                "prev_close": prev_close,
-                "today_open": float(ohlc.get("open", last_price)),
-                "today_high": float(ohlc.get("high", last_price)),
-                "today_low": float(ohlc.get("low", last_price)),
-                "day_change_pct": round(day_change_pct, 2),
-            })
-
-        logger.info(f"[Zerodha-Screen] {len(candidates)} candidates after volume/price filter")
-
-        # Sort by volume, enrich top 60 with 5-day history for momentum
-        candidates.sort(key=lambda x: x["volume"], reverse=True)
-        top_candidates = candidates[:min(60, len(candidates))]
-
-        to_dt = datetime.utcnow()
+        to_dt = datetime.utcnow().replace(second=0, microsecond=0)
         from_dt = to_dt - timedelta(days=10)  # 10 days to ensure 5 trading days
 
-        enriched = []
-        for c in top_candidates:
+        async def _enrich(c: Dict) -> Dict:
             token = c["instrument_token"]
             sym = c["symbol"]
-            # Zerodha historical_data: max 3 req/sec — sleep between calls
-            await asyncio.sleep(0.38)
             try:
-                def _hist(tok, fd, td):
-                    return kite_instance.historical_data(tok, fd, td, "day")
-                hist = await loop.run_in_executor(None, _hist, token, from_dt, to_dt)
+                # Zerodha historical_data: max 3 req/sec — paced by the shared scheduler
+                hist = await historical_scheduler.fetch(kite_instance, token, from_dt, to_dt, "day")
 
                 if not hist or len(hist) < 2:
                     c.update({
@@ -357,8 +336,7 @@ class DataService:
                         "open": c["today_open"],
                         "composite_score": self._compute_score(c, is_intraday, 1.0, c["day_change_pct"], 1.0),
                     })
-                    enriched.append(c)
-                    continue
+                    return c
 
                 closes = [float(h["close"]) for h in hist]
                 volumes = [int(h["volume"]) for h in hist]
@@ -384,7 +362,7 @@ class DataService:
                     "open": float(hist[-1]["open"]),
                     "composite_score": round(composite_score, 4),
                 })
-                enriched.append(c)
+                return c
 
             except Exception as e:
                 logger.debug(f"[Zerodha-Screen] {sym} history failed: {e}")
@@ -397,7 +375,41 @@ class DataService:
                     "open": c["today_open"],
                     "composite_score": self._compute_score(c, is_intraday, 1.0, c["day_change_pct"], 1.0),
                 })
-                enriched.append(c)
+                return c
+
+        # Stream: filter each quote batch as it lands and keep a running top-60
+        # by volume; members start history enrichment immediately and are
+        # cancelled if a later batch pushes them out.
+        top_n = 60
+        rank = {sym: i for i, sym in enumerate(universe)}
+        heap: List[tuple] = []                    # (volume, -universe_rank, symbol)
+        tasks: Dict[str, asyncio.Task] = {}
+        received = passed = 0
+
+        try:
+            async for quotes in self._stream_quotes(kite_instance, universe):
+                received += len(quotes)
+                for key, q in quotes.items():
+                    c = self._quote_candidate(key[4:], q, min_volume)
+                    if c is None:
+                        continue
+                    passed += 1
+                    entry = (c["volume"], -rank.get(c["symbol"], 0), c["symbol"])
+                    if len(heap) >= top_n:
+                        if entry <= heap[0]:
+                            continue
+                        _, _, dropped = heapq.heapreplace(heap, entry)
+                        tasks.pop(dropped).cancel()
+                    else:
+                        heapq.heappush(heap, entry)
+                    tasks[c["symbol"]] = asyncio.ensure_future(_enrich(c))
+
+            logger.info(f"[Zerodha-Screen] Received quotes for {received} symbols")
+            logger.info(f"[Zerodha-Screen] {passed} candidates after volume/price filter")
+            enriched = list(await asyncio.gather(*tasks.values()))
+        finally:
+            for t in tasks.values():
+                t.cancel()
 
         enriched.sort(key=lambda x: x.get("composite_score", 0), reverse=True)
         logger.info(f"[Zerodha-Screen] Returning {min(limit, len(enriched))} stocks")
@@ -409,6 +421,202 @@ class DataService:
         else:
             return (volume_ratio * 0.5 + max(momentum_5d, 0) * 0.3 + max(c.get("day_change_pct", 0), 0) * 0.2) / max(volatility, 0.1)
 
+    def _rank_with_features(
+        self, quotes: pd.DataFrame, features: pd.DataFrame,
+        is_intraday: bool, min_volume: int, source: str,
+    ) -> List[Dict]:
+        """
+        Join a live snapshot (index = symbol; last_price, volume, prev_close,
+        open, high, low) with the feature table, filter and rank vectorized.
+        `source` picks the composite formula of the matching legacy screener.
+        Ties break on symbol, so results are deterministic.
+        """
+        df = quotes.join(features.drop(columns="prev_close"), how="inner")
+        df = df[(df["last_price"] >= 10) & (df["last_price"] <= 10_000) & (df["volume"] >= min_volume)]
+        if df.empty:
+            return []
+
+        ltp, prev_close = df["last_price"], df["prev_close"]
+        day_change = np.where(prev_close > 0, (ltp - prev_close) / prev_close * 100, 0.0)
+        ref = df["close_5d_ago"]
+        momentum = np.where(ref > 0, (ltp - ref) / ref * 100, 0.0)
+        avg_vol = df["avg_volume_5d"]
+        volume_ratio = np.where(avg_vol > 0, df["volume"] / avg_vol, 1.0)
+        volatility = df["volatility_5d"].fillna(1.0).to_numpy()
+
+        if is_intraday and source == "zerodha":
+            score = volume_ratio * 0.5 + np.maximum(np.abs(day_change), 0.1) * 0.3 + np.maximum(volume_ratio, 0.1) * 0.2
+        elif is_intraday:
+            score = volume_ratio * 0.5 + np.maximum(volatility, 0.1) * 0.3 + np.maximum(day_change, 0) * 0.2
+        else:
+            score = (
+                volume_ratio * 0.5 + np.maximum(momentum, 0) * 0.3 + np.maximum(day_change, 0) * 0.2
+            ) / np.maximum(volatility, 0.1)
+
+        df = df.assign(
+            day_change_pct=np.round(day_change, 2),
+            momentum_5d_pct=np.round(momentum, 2),
+            volume_ratio=np.round(volume_ratio, 2),
+            volatility_5d=np.round(volatility, 2),
+            composite_score=np.round(score, 4),
+        ).sort_index().sort_values("composite_score", ascending=False, kind="mergesort")
+
+        tokens = self._zerodha_instrument_tokens
+        return [
+            {
+                "symbol": sym,
+                "company_name": sym,
+                "last_price": r.last_price,
+                "volume": int(r.volume),
+                "instrument_token": tokens.get(sym, 0),
+                "prev_close": r.prev_close,
+                "today_open": r.open,
+                "today_high": r.high,
+                "today_low": r.low,
+                "open": r.open,
+                "high": r.high,
+                "low": r.low,
+                "day_change_pct": r.day_change_pct,
+                "momentum_5d_pct": r.momentum_5d_pct,
+                "volatility_5d": r.volatility_5d,
+                "avg_volume_5d": round(r.avg_volume_5d, 0),
+                "avg_volume_20d": round(r.avg_volume_20d, 0),
+                "volume_ratio": r.volume_ratio,
+                "atr_14": round(r.atr_14, 2),
+                "pivot_points": {
+                    "pivot": round(r.pivot, 2), "r1": round(r.r1, 2), "r2": round(r.r2, 2),
+                    "s1": round(r.s1, 2), "s2": round(r.s2, 2),
+                },
+                "high_52w": round(r.high_52w, 2),
+                "low_52w": round(r.low_52w, 2),
+                "composite_score": r.composite_score,
+            }
+            for sym, r in zip(df.index, df.itertuples(index=False))
+        ]
+
+    async def _stream_quotes(self, kite_instance, symbols: List[str]) -> AsyncIterator[Dict]:
+        """
+        NSE quotes for `symbols`: fresh ones from the shared quote cache first,
+        then kite.quote() batches of 450 fanned out concurrently, each yielded
+        as it lands.
+        """
+        batch_size = 450
+        cached, missing = quote_cache.get_many(f"NSE:{s}" for s in symbols)
+        if cached:
+            yield cached
+        calls = [
+            partial(kite_instance.quote, missing[i:i+batch_size])
+            for i in range(0, len(missing), batch_size)
+        ]
+        async for q in self._fan_out(calls, get_settings().SCREEN_QUOTE_CONCURRENCY, "Zerodha-Screen", "broker-data"):
+            quote_cache.put_many(q)
+            yield q
+
+    def _snapshot_batch(self, symbols: List[str]) -> List[Dict]:
+        """Today's (or the latest) daily bar + previous close per symbol from yfinance. Raises on download failure."""
+        yf_symbols = [f"{s}.NS" for s in symbols]
+        raw = yf.download(
+            tickers=" ".join(yf_symbols),
+            period="5d",
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=True,
+            progress=False,
+            threads=True,
+        )
+        rows = []
+        for sym, yf_sym in zip(symbols, yf_symbols):
+            if len(yf_symbols) == 1:
+                df = raw
+            elif yf_sym in raw.columns.get_level_values(0):
+                df = raw[yf_sym]
+            else:
+                continue
+            df = df.dropna(subset=["Close", "Volume"])
+            if len(df) < 2:
+                continue
+            last, prev = df.iloc[-1], df.iloc[-2]
+            rows.append({
+                "symbol": sym,
+                "last_price": float(last["Close"]),
+                "volume": float(last["Volume"]),
+                "prev_close": float(prev["Close"]),
+                "open": float(last["Open"]),
+                "high": float(last["High"]),
+                "low": float(last["Low"]),
+            })
+        return rows
+
+    def _quote_candidate(self, sym: str, q: Dict, min_volume: int) -> Optional[Dict]:
+        """Screening candidate from a kite.quote entry, or None if it fails volume/price filters."""
+        if not q:
+            return None
+        last_price = float(q.get("last_price", 0))
+        volume = int(q.get("volume", 0))
+        ohlc = q.get("ohlc", {})
+        prev_close = float(ohlc.get("close", last_price))
+
+        if last_price < 10 or last_price > 10_000:
+            return None
+        if volume < min_volume:
+            return None
+
+        day_change_pct = ((last_price - prev_close) / prev_close * 100) if prev_close > 0 else 0.0
+        token = self._zerodha_instrument_tokens.get(sym, 0)
+
+        return {
+            "symbol": sym,
+            "company_name": sym,
+            "last_price": last_price,
+            "volume": volume,
+            "instrument_token": token,
+            "prev_close": prev_close,
+            "today_open": float(ohlc.get("open", last_price)),
+            "today_high": float(ohlc.get("high", last_price)),
+            "today_low": float(ohlc.get("low", last_price)),
+            "day_change_pct": round(day_change_pct, 2),
+        }
+
+    async def _fan_out(
+        self, calls: List[Callable[[], Any]], concurrency: int, label: str, pool: str,
+    ) -> AsyncIterator[Any]:
+        """
+        Run blocking batch calls on the named executor pool, at most
+        `concurrency` at a time, retrying each with exponential backoff.
+        Results are yielded in completion order; batches that still fail
+        after retries are skipped.
+        """
+        loop = asyncio.get_event_loop()
+        sem = asyncio.Semaphore(max(concurrency, 1))
+        retries = get_settings().SCREEN_BATCH_RETRIES
+
+        async def _run(call):
+            delay = 0.5
+            for attempt in range(retries + 1):
+                async with sem:
+                    try:
+                        return await loop.run_in_executor(executors.pool(pool), call)
+                    except Exception as ex:
+                        err = ex
+                # Permission errors won't fix themselves — don't retry
+                if attempt < retries and "permission" not in str(err).lower():
+                    logger.warning(f"[{label}] batch failed (attempt {attempt+1}): {err} — retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    delay *= 2
+                else:
+                    logger.warning(f"[{label}] batch failed: {err}")
+                    return None
+
+        tasks = [asyncio.ensure_future(_run(call)) for call in calls]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                result = await fut
+                if result is not None:
+                    yield result
+        finally:
+            for t in tasks:
+                t.cancel()
+
     async def get_candle_data_zerodha(
         self,
         kite_instance,
@@ -440,7 +648,7 @@ class DataService:
             def _fetch():
                 return kite_instance.historical_data(token, from_dt, to_dt, kite_interval)
 
-            raw = await loop.run_in_executor(None, _fetch)
+            raw = await loop.run_in_executor(executors.pool("market-data-download"), _fetch)
             if not raw:
                 return pd.DataFrame()
 
@@ -511,10 +719,14 @@ class DataService:
             logger.warning(f"NSE CSV download failed ({e}), using fallback list")
             return self.FALLBACK_SYMBOLS
 
-    def _screen_batch(self, symbols: List[str], min_volume: int = 200_000, is_intraday: bool = False) -> List[Dict]:
+    def _screen_batch(
+        self, symbols: List[str], min_volume: int = 200_000, is_intraday: bool = False,
+        raise_errors: bool = False,
+    ) -> List[Dict]:
         """
         Fetch a batch of symbols using yfinance and apply basic filters.
-        Returns list of dicts with screening metrics.
+        Returns list of dicts with screening metrics. With raise_errors, a
+        failed download raises (so the caller can retry) instead of returning [].
         """
         results = []
         yf_symbols = [f"{s}.NS" for s in symbols]
@@ -531,6 +743,8 @@ class DataService:
                 threads=True,
             )
         except Exception as e:
+            if raise_errors:
+                raise
             logger.warning(f"Batch download failed: {e}")
             return results
 
@@ -639,6 +853,18 @@ class DataService:
         # If too few pass the keyword filter, return all (sector data is approximate)
         return filtered if len(filtered) >= 3 else candidates
 
+    def _fetch_daily_from_store(self, symbol: str, period_days: int) -> pd.DataFrame:
+        """Sync read of the last `period_days` calendar days (incl. today) via the candle store."""
+        today = datetime.now(IST).date()
+        df = candle_store.get_range(
+            symbol, today - timedelta(days=period_days), today + timedelta(days=1)
+        )
+        if df.empty:
+            return pd.DataFrame()
+        df = df.rename_axis("date").reset_index()
+        logger.info(f"Loaded {len(df)} daily candles for {symbol} (candle store)")
+        return df
+
     def _fetch_yfinance_data(
         self, yf_symbol: str, timeframe: str, period: str = "60d"
     ) -> pd.DataFrame:
@@ -0,0 +1,179 @@
+"""
+Shared Zerodha historical_data scheduler.
+
+Kite Connect allows 3 historical_data requests per second per api_key. Instead
+of each caller sleeping between serial calls, every request goes through one
+scheduler per api_key that:
+
+  • enforces the rate with a token bucket (bursts up to capacity, then paced),
+  • dedupes identical in-flight requests (same token/range/interval → one call),
+  • runs as many requests concurrently as the bucket allows.
+
+Usage:
+    candles = await historical_scheduler.fetch(kite, token, from_dt, to_dt, "5minute")
+    pivots, avg_volume = await historical_scheduler.fetch_daily_context(kite, token)
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import pytz
+
+from app.core.logging import logger
+from app.core.executors import executors
+
+IST = pytz.timezone("Asia/Kolkata")
+
+
+class _TokenBucket:
+    """Async token bucket: `rate` tokens/second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _KeyScheduler:
+    """Rate limiter + in-flight table for a single api_key."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.bucket = _TokenBucket(rate, capacity)
+        self.in_flight: Dict[tuple, asyncio.Future] = {}
+        self.requests = 0
+        self.deduped = 0
+
+
+class HistoricalDataScheduler:
+    """Per-api_key async scheduler for kite.historical_data."""
+
+    RATE_PER_SECOND = 3
+    BURST = 3
+    # One daily fetch covers both pivots (previous session) and the ~20-session
+    # average volume that used to be two separate requests.
+    DAILY_CONTEXT_DAYS = 35
+
+    def __init__(self):
+        self._schedulers: Dict[str, _KeyScheduler] = {}
+
+    def _scheduler_for(self, kite_instance) -> _KeyScheduler:
+        api_key = getattr(kite_instance, "api_key", None) or "default"
+        sched = self._schedulers.get(api_key)
+        if sched is None:
+            sched = _KeyScheduler(self.RATE_PER_SECOND, self.BURST)
+            self._schedulers[api_key] = sched
+        return sched
+
+    async def fetch(
+        self,
+        kite_instance,
+        instrument_token: int,
+        from_date,
+        to_date,
+        interval: str,
+    ) -> List[Dict]:
+        """
+        Rate-limited kite.historical_data(). Identical concurrent requests for
+        the same api_key share a single network call. Raises on API errors.
+        """
+        sched = self._scheduler_for(kite_instance)
+        key = (int(instrument_token), str(from_date), str(to_date), interval)
+
+        existing = sched.in_flight.get(key)
+        if existing is not None:
+            sched.deduped += 1
+            try:
+                return await asyncio.shield(existing)
+            except asyncio.CancelledError:
+                if not existing.cancelled():
+                    raise
+                # The owning request was cancelled, not us — fetch it ourselves
+                return await self.fetch(kite_instance, instrument_token, from_date, to_date, interval)
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        sched.in_flight[key] = future
+        try:
+            await sched.bucket.acquire()
+            sched.requests += 1
+            data = await loop.run_in_executor(
+                executors.pool("broker-data"),
+                lambda: kite_instance.historical_data(instrument_token, from_date, to_date, interval),
+            )
+            future.set_result(data or [])
+        except asyncio.CancelledError:
+            # Caller gave up (e.g. candidate dropped); release deduped waiters too
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            sched.in_flight.pop(key, None)
+
+        # Consume the exception locally so an un-awaited shared future doesn't
+        # log "exception was never retrieved"; re-raise for this caller.
+        if future.exception() is not None:
+            raise future.exception()
+        return future.result()
+
+    async def fetch_daily_context(self, kite_instance, instrument_token: int) -> Tuple[Dict, float]:
+        """
+        Single 35-day daily fetch → (pivot points from the previous session,
+        average daily volume). Returns ({}, 0.0) on failure.
+        """
+        today = datetime.now(IST).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+        from_dt = today - timedelta(days=self.DAILY_CONTEXT_DAYS)
+        to_dt = today + timedelta(days=1)
+        try:
+            hist = await self.fetch(kite_instance, instrument_token, from_dt, to_dt, "day")
+        except Exception as e:
+            logger.debug(f"[HistScheduler] daily context failed for {instrument_token}: {e}")
+            return {}, 0.0
+
+        pivots: Dict = {}
+        if len(hist) >= 2:
+            prev = hist[-2]
+            H = float(prev["high"])
+            L = float(prev["low"])
+            C = float(prev["close"])
+
+            P = (H + L + C) / 3
+            pivots = {
+                "pivot": round(P, 2),
+                "r1": round(2 * P - L, 2),
+                "r2": round(P + (H - L), 2),
+                "s1": round(2 * P - H, 2),
+                "s2": round(P - (H - L), 2),
+            }
+
+        volumes = [float(h.get("volume", 0)) for h in hist if h.get("volume")]
+        avg_volume = sum(volumes) / len(volumes) if volumes else 0.0
+        return pivots, avg_volume
+
+    def stats(self) -> Dict:
+        return {
+            api_key[:6]: {
+                "requests": s.requests,
+                "deduped": s.deduped,
+                "in_flight": len(s.in_flight),
+            }
+            for api_key, s in self._schedulers.items()
+        }
+
+
+historical_scheduler = HistoricalDataScheduler()
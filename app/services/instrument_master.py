@@ -0,0 +1,269 @@
+"""
+Process-wide Zerodha instrument master.
+
+NSE + NFO + BSE instrument dumps (~100k rows) are downloaded once per IST
+trading day and kept as a compact columnar table (one NumPy array per field),
+persisted to disk as .npz so restarts and other workers reuse the same file.
+
+Indexes built on load:
+  • (exchange, tradingsymbol) → row     O(1)
+  • instrument_token → row              O(1)
+  • (name, "FUT") → rows sorted by expiry
+  • (name, expiry, strike, "CE"/"PE") → row
+  • name → sorted option expiries
+
+Usage:
+    await instrument_master.ensure_loaded(kite)
+    token = instrument_master.token("RELIANCE")
+    fut   = instrument_master.nearest_future("NIFTY", date.today())
+    exp   = instrument_master.nearest_option_expiry("NIFTY", date.today())
+    opt   = instrument_master.option("NIFTY", exp, 24000, "CE")
+"""
+
+import asyncio
+import bisect
+import glob
+import os
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pytz
+
+from app.core.config import get_settings
+from app.core.executors import executors
+from app.core.logging import logger
+
+IST = pytz.timezone("Asia/Kolkata")
+
+EXCHANGES = ("NSE", "NFO", "BSE")
+
+_STR_FIELDS = ("tradingsymbol", "name", "exchange", "segment", "instrument_type")
+
+
+class _Snapshot:
+    """Immutable columnar table + indexes for one trading day."""
+
+    def __init__(self, day: date, columns: Dict[str, np.ndarray]):
+        self.day = day
+        self.cols = columns
+        tokens = columns["instrument_token"].tolist()
+        symbols = columns["tradingsymbol"].tolist()
+        exchanges = columns["exchange"].tolist()
+        names = columns["name"].tolist()
+        types = columns["instrument_type"].tolist()
+        expiries = columns["expiry"]
+        strikes = columns["strike"].tolist()
+
+        self.by_token: Dict[int, int] = {t: i for i, t in enumerate(tokens)}
+        self.by_symbol: Dict[tuple, int] = {(e, s): i for i, (e, s) in enumerate(zip(exchanges, symbols))}
+        self.futures: Dict[str, List[int]] = {}
+        self.options: Dict[tuple, int] = {}
+        option_expiries: Dict[str, set] = {}
+        for i, (name, itype) in enumerate(zip(names, types)):
+            if itype == "FUT":
+                self.futures.setdefault(name, []).append(i)
+            elif itype in ("CE", "PE"):
+                exp = expiries[i]
+                if not np.isnat(exp):
+                    exp = exp.astype(object)
+                    self.options[(name, exp, float(strikes[i]), itype)] = i
+                    option_expiries.setdefault(name, set()).add(exp)
+        for name, rows in self.futures.items():
+            rows.sort(key=lambda r: expiries[r])
+        self.option_expiries: Dict[str, List[date]] = {
+            name: sorted(days) for name, days in option_expiries.items()
+        }
+        self._eq_maps: Dict[str, Dict[str, int]] = {}
+
+    def row(self, i: int) -> Dict:
+        c = self.cols
+        expiry = c["expiry"][i]
+        return {
+            "instrument_token": int(c["instrument_token"][i]),
+            "exchange_token": int(c["exchange_token"][i]),
+            "tradingsymbol": str(c["tradingsymbol"][i]),
+            "name": str(c["name"][i]),
+            "exchange": str(c["exchange"][i]),
+            "segment": str(c["segment"][i]),
+            "instrument_type": str(c["instrument_type"][i]),
+            "expiry": None if np.isnat(expiry) else expiry.astype(object),
+            "strike": float(c["strike"][i]),
+            "lot_size": int(c["lot_size"][i]),
+            "tick_size": float(c["tick_size"][i]),
+        }
+
+    def eq_map(self, exchange: str) -> Dict[str, int]:
+        m = self._eq_maps.get(exchange)
+        if m is None:
+            c = self.cols
+            mask = (c["exchange"] == exchange) & (c["instrument_type"] == "EQ")
+            m = dict(zip(c["tradingsymbol"][mask].tolist(), c["instrument_token"][mask].tolist()))
+            self._eq_maps[exchange] = m
+        return m
+
+
+class InstrumentMaster:
+
+    def __init__(self, root: Optional[str] = None):
+        if root is None:
+            root = get_settings().INSTRUMENT_MASTER_DIR or os.path.join(
+                os.path.dirname(__file__), "..", "..", "data", "instruments"
+            )
+        self.root = os.path.abspath(root)
+        self._snap: Optional[_Snapshot] = None
+        self._load_lock = threading.Lock()
+
+    # ── Loading ───────────────────────────────────────────────────────────────
+
+    @property
+    def loaded_for(self) -> Optional[date]:
+        return self._snap.day if self._snap else None
+
+    async def ensure_loaded(self, kite_instance=None) -> bool:
+        """Make today's master available (disk → memory, else download once)."""
+        if self._snap is not None and self._snap.day == datetime.now(IST).date():
+            return True
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executors.pool("market-data-download"), self.load_sync, kite_instance)
+
+    def load_sync(self, kite_instance=None) -> bool:
+        today = datetime.now(IST).date()
+        with self._load_lock:
+            if self._snap is not None and self._snap.day == today:
+                return True
+
+            path = self._path_for(today)
+            if os.path.exists(path):
+                self._snap = self._read(path, today)
+                logger.info(f"[InstrumentMaster] Loaded {len(self._snap.by_token)} instruments from disk")
+                return True
+
+            if kite_instance is not None:
+                try:
+                    columns = self._download(kite_instance)
+                    self._write(path, columns)
+                    self._snap = _Snapshot(today, columns)
+                    self._prune(keep=path)
+                    logger.info(f"[InstrumentMaster] Downloaded {len(self._snap.by_token)} instruments ({', '.join(EXCHANGES)})")
+                    return True
+                except Exception as e:
+                    logger.warning(f"[InstrumentMaster] Download failed: {e}")
+
+            # Stale-but-usable: equity tokens don't change day to day
+            if self._snap is None:
+                latest = self._latest_on_disk()
+                if latest:
+                    day = datetime.strptime(os.path.basename(latest)[12:20], "%Y%m%d").date()
+                    self._snap = self._read(latest, day)
+                    logger.info(f"[InstrumentMaster] Using stale master from {day}")
+            return self._snap is not None
+
+    def _download(self, kite_instance) -> Dict[str, np.ndarray]:
+        rows: List[Dict] = []
+        for exchange in EXCHANGES:
+            rows.extend(kite_instance.instruments(exchange))
+        n = len(rows)
+        columns = {
+            "instrument_token": np.fromiter((r["instrument_token"] for r in rows), np.int64, n),
+            "exchange_token": np.fromiter((int(r.get("exchange_token") or 0) for r in rows), np.int64, n),
+            "strike": np.fromiter((float(r.get("strike") or 0) for r in rows), np.float64, n),
+            "lot_size": np.fromiter((int(r.get("lot_size") or 0) for r in rows), np.int32, n),
+            "tick_size": np.fromiter((float(r.get("tick_size") or 0) for r in rows), np.float64, n),
+            "expiry": np.array([r.get("expiry") or "NaT" for r in rows], dtype="datetime64[D]"),
+        }
+        for f in _STR_FIELDS:
+            columns[f] = np.array([r.get(f) or "" for r in rows], dtype=str)
+        return columns
+
+    def _path_for(self, day: date) -> str:
+        return os.path.join(self.root, f"instruments_{day.strftime('%Y%m%d')}.npz")
+
+    def _latest_on_disk(self) -> Optional[str]:
+        files = sorted(glob.glob(os.path.join(self.root, "instruments_*.npz")))
+        return files[-1] if files else None
+
+    def _read(self, path: str, day: date) -> _Snapshot:
+        with np.load(path) as data:
+            columns = {k: data[k] for k in data.files}
+        return _Snapshot(day, columns)
+
+    def _write(self, path: str, columns: Dict[str, np.ndarray]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **columns)
+        os.replace(tmp, path)
+
+    def _prune(self, keep: str) -> None:
+        for f in glob.glob(os.path.join(self.root, "instruments_*.npz")):
+            if f != keep:
+                try:
+                    os.remove(f)
+                except OSError:
+                    pass
+
+    # ── Lookups ───────────────────────────────────────────────────────────────
+
+    def token(self, tradingsymbol: str, exchange: str = "NSE") -> Optional[int]:
+        snap = self._snap
+        if snap is None:
+            return None
+        i = snap.by_symbol.get((exchange, tradingsymbol))
+        return int(snap.cols["instrument_token"][i]) if i is not None else None
+
+    def get(self, instrument_token: int) -> Optional[Dict]:
+        snap = self._snap
+        if snap is None:
+            return None
+        i = snap.by_token.get(int(instrument_token))
+        return snap.row(i) if i is not None else None
+
+    def lookup(self, tradingsymbol: str, exchange: str = "NSE") -> Optional[Dict]:
+        snap = self._snap
+        if snap is None:
+            return None
+        i = snap.by_symbol.get((exchange, tradingsymbol))
+        return snap.row(i) if i is not None else None
+
+    def equity_tokens(self, exchange: str = "NSE") -> Dict[str, int]:
+        """tradingsymbol → token for all EQ instruments (built once per load)."""
+        snap = self._snap
+        return snap.eq_map(exchange) if snap is not None else {}
+
+    def futures(self, name: str) -> List[Dict]:
+        snap = self._snap
+        if snap is None:
+            return []
+        return [snap.row(i) for i in snap.futures.get(name, [])]
+
+    def nearest_future(self, name: str, on_or_after: Optional[date] = None) -> Optional[Dict]:
+        """Nearest-expiry FUT for an underlying with expiry >= on_or_after."""
+        snap = self._snap
+        if snap is None:
+            return None
+        cutoff = np.datetime64(on_or_after or datetime.now(IST).date(), "D")
+        for i in snap.futures.get(name, []):
+            if snap.cols["expiry"][i] >= cutoff:
+                return snap.row(i)
+        return None
+
+    def option(self, name: str, expiry: date, strike: float, opt_type: str) -> Optional[Dict]:
+        """CE/PE contract for an underlying at an exact expiry and strike."""
+        snap = self._snap
+        if snap is None:
+            return None
+        i = snap.options.get((name, expiry, float(strike), opt_type))
+        return snap.row(i) if i is not None else None
+
+    def nearest_option_expiry(self, name: str, on_or_after: Optional[date] = None) -> Optional[date]:
+        """Nearest option expiry for an underlying that is >= on_or_after."""
+        snap = self._snap
+        if snap is None:
+            return None
+        expiries = snap.option_expiries.get(name, [])
+        i = bisect.bisect_left(expiries, on_or_after or datetime.now(IST).date())
+        return expiries[i] if i < len(expiries) else None
+
+
+instrument_master = InstrumentMaster()
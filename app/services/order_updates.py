@@ -0,0 +1,291 @@
+"""
+Per-session order state fed by KiteTicker order postbacks.
+
+Every KiteTicker connection in the process (ticker_service's per-user
+tickers and the live-trading agents' own tickers) forwards on_order_update
+postbacks here, keyed by the session's api_key. The store keeps the latest
+state of each order and resolves awaitables as orders reach a terminal
+status, so a caller waiting for a fill reacts on the postback rather than
+on its next poll:
+
+    order_updates.is_live(api_key)                  feed connected and reconciled
+    await order_updates.wait(api_key, oid, 300)     terminal order dict, or None
+    order_updates.add_listener(api_key, cb, loop)   cb(order) on every change
+
+Postbacks sent while no feed was connected are lost, so each (re)connect
+replays the REST order book once through the same path before the session
+counts as live again. Until then — and for sessions without any feed —
+is_live() is False and callers fall back to REST polling.
+
+Updates are ordered by exchange_update_timestamp (order_timestamp as a
+fallback), so a REST snapshot fetched before a postback cannot roll the order
+back, and a terminal state is final. Terminal orders from earlier trading
+days are evicted.
+"""
+
+import asyncio
+import threading
+from datetime import date, datetime
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import pytz
+
+from app.core.executors import executors, Priority
+from app.core.logging import logger
+
+IST = pytz.timezone("Asia/Kolkata")
+
+TERMINAL_STATUSES = ("COMPLETE", "CANCELLED", "REJECTED")
+
+
+def _is_terminal(order: Dict) -> bool:
+    return (order.get("status") or "").upper() in TERMINAL_STATUSES
+
+
+def _parse_time(ts) -> Optional[datetime]:
+    """Naive IST datetime (REST gives datetimes, postbacks strings)."""
+    if isinstance(ts, str):
+        try:
+            return datetime.strptime(ts[:19], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return None
+    if isinstance(ts, datetime):
+        return ts.astimezone(IST).replace(tzinfo=None) if ts.tzinfo else ts
+    return None
+
+
+def _update_time(order: Dict) -> Optional[datetime]:
+    return _parse_time(order.get("exchange_update_timestamp")) or _parse_time(order.get("order_timestamp"))
+
+
+def _is_stale(new: Dict, known: Dict) -> bool:
+    """True if `new` carries no newer state than `known`."""
+    if _is_terminal(known):
+        return True
+    new_t, known_t = _update_time(new), _update_time(known)
+    if new_t is not None and known_t is not None and new_t != known_t:
+        return new_t < known_t
+    new_filled = new.get("filled_quantity") or 0
+    known_filled = known.get("filled_quantity") or 0
+    if new_filled != known_filled:
+        return new_filled < known_filled
+    return new.get("status") == known.get("status")
+
+
+class _Session:
+    """Order state for one api_key."""
+
+    def __init__(self):
+        self.orders: Dict[str, Dict] = {}                                  # order_id → latest order
+        self.waiters: Dict[str, List[Tuple[object, asyncio.Future]]] = {}  # order_id → [(loop, future)]
+        self.listeners: List[Tuple[Callable[[Dict], None], object]] = []   # [(callback, loop)]
+        self.feeds: Set[Hashable] = set()                                  # connected ticker feeds
+        self.stale = True                                                  # reconcile pending
+        self.pruned_on: Optional[date] = None                              # IST day of last eviction
+
+
+class OrderUpdateStore:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, _Session] = {}
+        # Metrics
+        self.updates_received = 0
+        self.reconciles = 0
+
+    def _session(self, api_key: str) -> _Session:
+        s = self._sessions.get(api_key)
+        if s is None:
+            s = self._sessions[api_key] = _Session()
+        return s
+
+    # ── Feed lifecycle (KiteTicker threads) ───────────────────────────────────
+
+    def connected(self, api_key: str, feed: Hashable, fetch_orders: Callable[[], List[Dict]]) -> None:
+        """A feed (re)connected: replay the REST order book once, then go live."""
+        with self._lock:
+            s = self._session(api_key)
+            s.feeds.add(feed)
+            s.stale = True
+        executors.pool("broker-data", Priority.HIGH).submit(self._reconcile, api_key, fetch_orders)
+
+    def disconnected(self, api_key: str, feed: Hashable) -> None:
+        with self._lock:
+            s = self._sessions.get(api_key)
+            if s is None:
+                return
+            s.feeds.discard(feed)
+            if s.feeds:
+                return
+            s.stale = True
+            woken = self._pop_waiters(s)
+        for loop, fut in woken:
+            self._resolve(loop, fut, None)   # waiters fall back to polling
+        logger.info(f"[OrderUpdates] Feed lost for {api_key[:8]}… — REST reconcile on reconnect")
+
+    def on_order_update(self, api_key: str, order: Dict) -> None:
+        """KiteTicker on_order_update postback."""
+        with self._lock:
+            self.updates_received += 1
+        self._apply(api_key, [order])
+
+    def _reconcile(self, api_key: str, fetch_orders: Callable[[], List[Dict]]) -> None:
+        try:
+            orders = fetch_orders() or []
+        except Exception as e:
+            logger.warning(f"[OrderUpdates] Reconcile failed for {api_key[:8]}… ({e}) — REST polling stays on")
+            with self._lock:
+                s = self._session(api_key)
+                woken = self._pop_waiters(s)
+            for loop, fut in woken:
+                self._resolve(loop, fut, None)
+            return
+        changed = self._apply(api_key, orders)
+        with self._lock:
+            s = self._session(api_key)
+            s.stale = not s.feeds
+            self.reconciles += 1
+        logger.info(
+            f"[OrderUpdates] Reconciled {len(orders)} order(s) for {api_key[:8]}… "
+            f"({changed} changed while disconnected)"
+        )
+
+    # ── State ─────────────────────────────────────────────────────────────────
+
+    def _apply(self, api_key: str, orders: List[Dict]) -> int:
+        """Merge order dicts into the session; notify listeners/waiters. Returns #changed."""
+        notify: List[Tuple[Callable, object, Dict]] = []
+        woken: List[Tuple[object, asyncio.Future, Dict]] = []
+        changed = 0
+        with self._lock:
+            s = self._session(api_key)
+            for order in orders:
+                oid = str(order.get("order_id") or "")
+                if not oid:
+                    continue
+                known = s.orders.get(oid)
+                # Postbacks and REST snapshots can arrive out of order
+                if known is not None and _is_stale(order, known):
+                    continue
+                order = dict(order)
+                s.orders[oid] = order
+                changed += 1
+                notify += [(cb, loop, order) for cb, loop in s.listeners]
+                if _is_terminal(order):
+                    woken += [(loop, fut, order) for loop, fut in s.waiters.pop(oid, [])]
+            self._prune(s)
+
+        for loop, fut, order in woken:
+            self._resolve(loop, fut, dict(order))
+        for cb, loop, order in notify:
+            try:
+                loop.call_soon_threadsafe(cb, dict(order))
+            except RuntimeError:
+                pass  # listener's loop already closed
+        return changed
+
+    @staticmethod
+    def _prune(s: _Session) -> None:
+        """Evict terminal orders from earlier trading days (once per IST day)."""
+        today = datetime.now(IST).date()
+        if s.pruned_on == today:
+            return
+        s.pruned_on = today
+        for oid in [
+            oid for oid, order in s.orders.items()
+            if _is_terminal(order) and (_update_time(order) or datetime.min).date() < today
+        ]:
+            del s.orders[oid]
+
+    def get(self, api_key: str, order_id: str) -> Optional[Dict]:
+        with self._lock:
+            s = self._sessions.get(api_key)
+            order = s.orders.get(str(order_id)) if s else None
+            return dict(order) if order else None
+
+    def has_feed(self, api_key: str) -> bool:
+        """A ticker feeding this session is connected (it may still be reconciling)."""
+        with self._lock:
+            s = self._sessions.get(api_key)
+            return bool(s and s.feeds)
+
+    def is_live(self, api_key: str) -> bool:
+        with self._lock:
+            s = self._sessions.get(api_key)
+            return bool(s and s.feeds and not s.stale)
+
+    # ── Waiting ───────────────────────────────────────────────────────────────
+
+    async def wait(self, api_key: str, order_id: str, timeout: float) -> Optional[Dict]:
+        """
+        The order once it is COMPLETE / CANCELLED / REJECTED. None on timeout,
+        or as soon as the session stops being live (caller should poll).
+        """
+        order_id = str(order_id)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            s = self._session(api_key)
+            order = s.orders.get(order_id)
+            if order is not None and _is_terminal(order):
+                return dict(order)
+            if not s.feeds or s.stale:
+                return None
+            fut = loop.create_future()
+            entry = (loop, fut)
+            s.waiters.setdefault(order_id, []).append(entry)
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                waiting = s.waiters.get(order_id)
+                if waiting and entry in waiting:
+                    waiting.remove(entry)
+                    if not waiting:
+                        del s.waiters[order_id]
+
+    @staticmethod
+    def _pop_waiters(s: _Session) -> List[Tuple[object, asyncio.Future]]:
+        woken = [w for ws in s.waiters.values() for w in ws]
+        s.waiters.clear()
+        return woken
+
+    @staticmethod
+    def _resolve(loop, fut: asyncio.Future, value) -> None:
+        def _set():
+            if not fut.done():
+                fut.set_result(value)
+        try:
+            loop.call_soon_threadsafe(_set)
+        except RuntimeError:
+            pass  # waiter's loop already closed
+
+    # ── Listeners ─────────────────────────────────────────────────────────────
+
+    def add_listener(self, api_key: str, callback: Callable[[Dict], None], loop) -> None:
+        """`callback(order)` runs on `loop` for every new order state of this session."""
+        with self._lock:
+            self._session(api_key).listeners.append((callback, loop))
+
+    def remove_listener(self, api_key: str, callback: Callable[[Dict], None]) -> None:
+        with self._lock:
+            s = self._sessions.get(api_key)
+            if s is not None:
+                s.listeners = [(cb, lp) for cb, lp in s.listeners if cb != callback]
+
+    # ── Stats ─────────────────────────────────────────────────────────────────
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "orders": sum(len(s.orders) for s in self._sessions.values()),
+                "live": sum(1 for s in self._sessions.values() if s.feeds and not s.stale),
+                "waiters": sum(len(w) for s in self._sessions.values() for w in s.waiters.values()),
+                "updates_received": self.updates_received,
+                "reconciles": self.reconciles,
+            }
+
+
+order_updates = OrderUpdateStore()
@@ -0,0 +1,157 @@
+"""
+Shared tick-driven trigger index for open positions.
+
+Agents used to wake every 5 s and walk every position whether or not its
+price had moved. Instead, each position arms a price band here — the nearest
+levels at which anything about it can change (stop-loss, next target,
+trailing-stop step, reversal level). Ticks from any KiteTicker feed are
+matched against per-instrument sorted trigger lists:
+
+    upper[token]   ascending levels, fire when last_price >= level
+    lower[token]   ascending levels, fire when last_price <= level
+
+so a tick inside every band costs a dict lookup and two comparisons, and a
+crossing costs a bisect plus the triggers that fired. A fired band is
+disarmed (both sides) and its callback is scheduled on the owner's event
+loop with the crossing price; the owner evaluates the position and re-arms.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.logging import logger
+
+
+@dataclass
+class _Band:
+    token: int
+    lower: Optional[float]
+    upper: Optional[float]
+    callback: Callable[[float], None]
+    loop: object                        # asyncio loop the callback runs on
+
+
+class _Levels:
+    """Sorted trigger levels for one instrument/side, with the key armed at each."""
+
+    __slots__ = ("levels", "keys")
+
+    def __init__(self):
+        self.levels: List[float] = []
+        self.keys: List[Hashable] = []
+
+    def add(self, level: float, key: Hashable) -> None:
+        i = bisect_right(self.levels, level)
+        self.levels.insert(i, level)
+        self.keys.insert(i, key)
+
+    def remove(self, level: float, key: Hashable) -> None:
+        i = bisect_left(self.levels, level)
+        while i < len(self.levels) and self.levels[i] == level:
+            if self.keys[i] == key:
+                del self.levels[i]
+                del self.keys[i]
+                return
+            i += 1
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+
+class PositionMonitor:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._upper: Dict[int, _Levels] = {}
+        self._lower: Dict[int, _Levels] = {}
+        self._bands: Dict[Hashable, _Band] = {}
+        # Metrics
+        self.ticks_seen = 0
+        self.triggers_fired = 0
+
+    # ── Arming ────────────────────────────────────────────────────────────────
+
+    def arm(
+        self,
+        key: Hashable,
+        token: int,
+        lower: Optional[float],
+        upper: Optional[float],
+        callback: Callable[[float], None],
+        loop,
+    ) -> None:
+        """(Re)place `key`'s band on `token`; `callback(price)` runs on `loop` when crossed."""
+        with self._lock:
+            self._disarm(key)
+            if lower is None and upper is None:
+                return
+            self._bands[key] = _Band(token, lower, upper, callback, loop)
+            if lower is not None:
+                self._lower.setdefault(token, _Levels()).add(lower, key)
+            if upper is not None:
+                self._upper.setdefault(token, _Levels()).add(upper, key)
+
+    def disarm(self, key: Hashable) -> None:
+        with self._lock:
+            self._disarm(key)
+
+    def _disarm(self, key: Hashable) -> None:
+        band = self._bands.pop(key, None)
+        if band is None:
+            return
+        for side, level in ((self._lower, band.lower), (self._upper, band.upper)):
+            if level is None:
+                continue
+            levels = side.get(band.token)
+            if levels is not None:
+                levels.remove(level, key)
+                if not levels:
+                    del side[band.token]
+
+    # ── Tick path (KiteTicker threads) ────────────────────────────────────────
+
+    def on_ticks(self, ticks: list) -> None:
+        fired: List[Tuple[_Band, float]] = []
+        with self._lock:
+            self.ticks_seen += len(ticks)
+            for tick in ticks:
+                token = tick.get("instrument_token")
+                price = tick.get("last_price")
+                if price is None:
+                    continue
+                keys: List[Hashable] = []
+                upper = self._upper.get(token)
+                if upper is not None and upper.levels[0] <= price:
+                    keys += upper.keys[:bisect_right(upper.levels, price)]
+                lower = self._lower.get(token)
+                if lower is not None and lower.levels[-1] >= price:
+                    keys += lower.keys[bisect_left(lower.levels, price):]
+                for key in keys:
+                    band = self._bands.get(key)
+                    if band is not None:
+                        self._disarm(key)
+                        fired.append((band, price))
+            self.triggers_fired += len(fired)
+
+        for band, price in fired:
+            try:
+                band.loop.call_soon_threadsafe(band.callback, price)
+            except RuntimeError:
+                # owner's loop already closed — nothing left to notify
+                logger.debug("[PositionMonitor] Dropped trigger for a closed event loop")
+
+    # ── Stats ─────────────────────────────────────────────────────────────────
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "armed": len(self._bands),
+                "instruments": len(set(self._upper) | set(self._lower)),
+                "ticks_seen": self.ticks_seen,
+                "triggers_fired": self.triggers_fired,
+            }
+
+
+position_monitor = PositionMonitor()
@@ -0,0 +1,116 @@
+"""
+Process-wide per-instrument quote cache.
+
+kite.quote() responses are market data — identical for every user on a Kite
+Connect plan — so quotes are cached per instrument key ("NSE:RELIANCE")
+rather than per requested symbol list. A request for any subset/superset of
+recently quoted symbols only needs to fetch the stale or missing ones.
+
+  • TTL: entries older than `ttl_seconds` are treated as missing.
+  • LRU: at most `max_entries` instruments are kept; least recently used go first.
+  • In-flight dedupe: a symbol already being fetched by another request is
+    awaited instead of fetched again.
+
+Thread-safe for reads/writes (quotes are also read from executor threads);
+in-flight futures are only touched from the event loop.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class QuoteCache:
+
+    def __init__(self, ttl_seconds: float = 120, max_entries: int = 5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    # ── Cache reads / writes ──────────────────────────────────────────────────
+
+    def get_many(
+        self, keys: Iterable[str], max_age: Optional[float] = None
+    ) -> Tuple[Dict[str, Dict], List[str]]:
+        """Return (fresh quotes by key, keys that are stale or missing)."""
+        ttl = self.ttl_seconds if max_age is None else max_age
+        now = time.monotonic()
+        fresh: Dict[str, Dict] = {}
+        missing: List[str] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] < ttl:
+                    self._entries.move_to_end(key)
+                    fresh[key] = entry[0]
+                else:
+                    missing.append(key)
+            self.hits += len(fresh)
+            self.misses += len(missing)
+        return fresh, missing
+
+    def put_many(self, quotes: Dict[str, Dict]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key, quote in quotes.items():
+                self._entries[key] = (quote, now)
+                self._entries.move_to_end(key)
+            overflow = len(self._entries) - self.max_entries
+            for _ in range(max(overflow, 0)):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Optional[Iterable[str]] = None) -> None:
+        with self._lock:
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+    # ── In-flight coordination (event loop only) ──────────────────────────────
+
+    def claim(self, keys: List[str]) -> Tuple[List[str], Dict[str, asyncio.Future]]:
+        """
+        Split `keys` into ones this caller must fetch (now registered as
+        in-flight) and futures for ones another request is already fetching.
+        """
+        to_fetch: List[str] = []
+        waiting: Dict[str, asyncio.Future] = {}
+        loop = asyncio.get_running_loop()
+        for key in keys:
+            fut = self._in_flight.get(key)
+            if fut is not None and not fut.done():
+                waiting[key] = fut
+            else:
+                self._in_flight[key] = loop.create_future()
+                to_fetch.append(key)
+        return to_fetch, waiting
+
+    def resolve(self, keys: List[str], quotes: Optional[Dict[str, Dict]]) -> None:
+        """Release claimed keys; waiters get the quote (or None on failure)."""
+        for key in keys:
+            fut = self._in_flight.pop(key, None)
+            if fut is not None and not fut.done():
+                fut.set_result(quotes.get(key) if quotes else None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        hit_rate = round(self.hits / total, 3) if total else 0.0
+        return {
+            "entries": size,
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": hit_rate,
+        }
+
+
+quote_cache = QuoteCache()
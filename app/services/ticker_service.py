@@ -24,6 +24,9 @@ import threading
 from datetime import datetime
 from typing import Dict, List, Optional, Set
 from app.core.logging import logger
+from app.services.bar_aggregator import bar_aggregator
+from app.services.order_updates import order_updates
+from app.services.position_monitor import position_monitor
 
 try:
     from kiteconnect import KiteTicker
@@ -56,6 +59,7 @@ class _UserTicker:
         self._thread: Optional[threading.Thread] = None
         self._monitoring_callbacks: Dict[int, List] = {}  # instrument_token → [async_fn(ltp)]
         self._order_callbacks: List = []                   # [async_fn(order_data)]
+        self._bar_tokens: Set[int] = set()                 # MODE_QUOTE tokens feeding bar_aggregator
 
     def start(self):
         if not KITE_TICKER_AVAILABLE:
@@ -64,6 +68,8 @@ class _UserTicker:
         self._kt = KiteTicker(self.api_key, self.access_token)  # type: ignore[attr-defined]
 
         def on_ticks(ws, ticks):
+            bar_aggregator.on_ticks(ticks)
+            position_monitor.on_ticks(ticks)
             for tick in ticks:
                 payload = {
                     "instrument_token": tick.get("instrument_token"),
@@ -89,6 +95,7 @@ class _UserTicker:
                         pass
 
         def on_order_update(ws, data):
+            order_updates.on_order_update(self.api_key, data)
             for cb in list(self._order_callbacks):
                 try:
                     asyncio.run_coroutine_threadsafe(cb(data), self._loop)
@@ -97,12 +104,18 @@ class _UserTicker:
 
         def on_connect(ws, response):
             self._connected = True
-            ws.subscribe(self.tokens)
-            ws.set_mode(ws.MODE_FULL, self.tokens)
+            order_updates.connected(self.api_key, self, self._fetch_orders)
+            if self.tokens:
+                ws.subscribe(self.tokens)
+                ws.set_mode(ws.MODE_FULL, self.tokens)
             extra = [t for t in self._monitoring_callbacks if t not in self.tokens]
             if extra:
                 ws.subscribe(extra)
                 ws.set_mode(ws.MODE_LTP, extra)
+            bar_only = [t for t in self._bar_tokens if t not in self.tokens]
+            if bar_only:
+                ws.subscribe(bar_only)
+                ws.set_mode(ws.MODE_QUOTE, bar_only)
             logger.info(
                 f"[TickerService] Connected for {self.api_key[:8]}… "
                 f"subscribed to {self.tokens}"
@@ -110,6 +123,7 @@ class _UserTicker:
 
         def on_close(ws, code, reason):
             self._connected = False
+            order_updates.disconnected(self.api_key, self)
             logger.info(
                 f"[TickerService] Disconnected ({code}): {reason}"
             )
@@ -129,6 +143,13 @@ class _UserTicker:
         self._thread.start()
         logger.info(f"[TickerService] Ticker thread started for {self.api_key[:8]}…")
 
+    def _fetch_orders(self) -> List[Dict]:
+        """REST order book — replayed into order_updates after each (re)connect."""
+        from kiteconnect import KiteConnect
+        kite = KiteConnect(api_key=self.api_key, timeout=15)
+        kite.set_access_token(self.access_token)
+        return kite.orders()
+
     def subscribe_monitoring(self, token: int, callback):
         self._monitoring_callbacks.setdefault(token, []).append(callback)
         # Dynamically add to subscription if already connected
@@ -147,6 +168,31 @@ class _UserTicker:
         if not cbs and self._connected and self._kt:
             self._kt.unsubscribe([token])
 
+    def subscribe_full(self, tokens: List[int]):
+        """Add MODE_FULL tokens to a running ticker."""
+        new = [t for t in tokens if t not in self.tokens]
+        if not new:
+            return
+        self.tokens.extend(new)
+        if self._connected and self._kt:
+            self._kt.subscribe(new)
+            self._kt.set_mode(self._kt.MODE_FULL, new)
+
+    def subscribe_quotes(self, tokens: List[int]):
+        """Stream MODE_QUOTE ticks (price + cumulative volume) for bar building."""
+        new = [t for t in tokens if t not in self._bar_tokens and t not in self.tokens]
+        self._bar_tokens.update(tokens)
+        if new and self._connected and self._kt:
+            self._kt.subscribe(new)
+            self._kt.set_mode(self._kt.MODE_QUOTE, new)
+
+    def unsubscribe_quotes(self, tokens: List[int]):
+        """Stop streaming bar-only tokens (index/monitored tokens stay subscribed)."""
+        self._bar_tokens.difference_update(tokens)
+        gone = [t for t in tokens if t not in self.tokens and t not in self._monitoring_callbacks]
+        if gone and self._connected and self._kt:
+            self._kt.unsubscribe(gone)
+
     def add_order_callback(self, callback):
         self._order_callbacks.append(callback)
 
@@ -156,6 +202,14 @@ class _UserTicker:
         except ValueError:
             pass
 
+    @property
+    def is_idle(self) -> bool:
+        """No SSE queues, monitoring/order callbacks or bar tokens depend on this ticker."""
+        return not (
+            self._queues or self._order_callbacks or self._bar_tokens
+            or any(self._monitoring_callbacks.values())
+        )
+
     def add_queue(self) -> asyncio.Queue:
         q: asyncio.Queue = asyncio.Queue(maxsize=200)
         self._queues.append(q)
@@ -174,6 +228,7 @@ class _UserTicker:
             except Exception:
                 pass
         self._connected = False
+        order_updates.disconnected(self.api_key, self)
         logger.info(f"[TickerService] Stopped for {self.api_key[:8]}…")
 
     @property
@@ -198,6 +253,8 @@ class TickerService:
 
     def __init__(self):
         self._tickers: Dict[str, _UserTicker] = {}
+        # Order-only tickers started by acquire_order_stream: api_key → holders
+        self._order_stream_refs: Dict[str, int] = {}
 
     def start(
         self,
@@ -219,6 +276,7 @@ class TickerService:
         existing = self._tickers.get(api_key)
         if existing and existing.is_connected:
             logger.info(f"[TickerService] Already connected for {api_key[:8]}…")
+            existing.subscribe_full(tokens)  # an order-only ticker has none yet
             return True
 
         # Stop stale ticker if any
@@ -227,13 +285,62 @@ class TickerService:
 
         ut = _UserTicker(api_key, access_token, tokens)
         ut.access_token = access_token
+        if existing:
+            ut._bar_tokens = existing._bar_tokens  # still tracked in bar_aggregator
         self._tickers[api_key] = ut
         ut.start()
         return True
 
+    def _ensure_started(self, api_key: str, access_token: str) -> Optional[_UserTicker]:
+        """
+        This user's ticker, starting one only if none exists. Unlike start(),
+        never replaces a ticker that is still connecting or reconnecting (and
+        with it its callbacks and order feed).
+        """
+        if not KITE_TICKER_AVAILABLE:
+            return None
+        if api_key not in self._tickers:
+            self.start(api_key, access_token)
+        return self._tickers.get(api_key)
+
+    def acquire_order_stream(self, api_key: str, access_token: str) -> bool:
+        """
+        Make sure some ticker connection delivers this user's order postbacks
+        into order_updates. Zerodha allows only 3 WebSocket connections per
+        api_key, so an existing feed — this service's ticker or the agent's
+        _TickerManager — is reused; otherwise an order-only ticker (no
+        instrument subscriptions) is started and reference-counted.
+
+        Returns True if the caller now holds a reference and must call
+        release_order_stream() once its orders are terminal.
+        """
+        if not KITE_TICKER_AVAILABLE:
+            return False
+        if api_key in self._order_stream_refs:
+            self._order_stream_refs[api_key] += 1
+            return True
+        if api_key in self._tickers or order_updates.has_feed(api_key):
+            return False
+        self.start(api_key, access_token, tokens=[])
+        self._order_stream_refs[api_key] = 1
+        return True
+
+    def release_order_stream(self, api_key: str) -> None:
+        """Drop a reference; the order-only ticker closes with the last one."""
+        refs = self._order_stream_refs.get(api_key, 0) - 1
+        if refs > 0:
+            self._order_stream_refs[api_key] = refs
+            return
+        self._order_stream_refs.pop(api_key, None)
+        ut = self._tickers.get(api_key)
+        if ut is not None and ut.is_idle:
+            logger.info(f"[TickerService] Closing order-only ticker for {api_key[:8]}…")
+            self.stop(api_key)
+
     def stop(self, api_key: str):
         ut = self._tickers.pop(api_key, None)
         if ut:
+            bar_aggregator.untrack(list(ut._bar_tokens))
             ut.stop()
 
     async def stream(self, api_key: str, access_token: str, tokens: Optional[List[int]] = None):
@@ -319,6 +426,29 @@ class TickerService:
         if ut:
             ut.unsubscribe_monitoring(token, callback)
 
+    def subscribe_bars(self, api_key: str, access_token: str, tokens: List[int]) -> bool:
+        """
+        Stream live quotes for `tokens` into bar_aggregator so the intraday
+        pipeline can read today's 5-minute bars without REST calls.
+
+        `tokens` replaces this user's previous bar subscription: tokens that
+        dropped out are released, and their bars and streaming indicator
+        state go with them once no other user tracks them.
+        """
+        if not KITE_TICKER_AVAILABLE or not tokens:
+            return False
+        ut = self._ensure_started(api_key, access_token)
+        if ut is None:
+            return False
+        previous = set(ut._bar_tokens)
+        released = [t for t in previous if t not in tokens]
+        if released:
+            ut.unsubscribe_quotes(released)
+            bar_aggregator.untrack(released)
+        bar_aggregator.track([t for t in set(tokens) if t not in previous])
+        ut.subscribe_quotes(tokens)
+        return True
+
     def add_order_callback(self, api_key: str, access_token: str, callback) -> bool:
         if not KITE_TICKER_AVAILABLE:
             return False
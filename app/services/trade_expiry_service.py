@@ -104,7 +104,7 @@ class TradeExpiryService:
 
                 # Get live LTP for GTT last_price
                 try:
-                    quotes = await zerodha_service.get_quote([symbol])
+                    quotes = await zerodha_service.get_quote([symbol], max_age=0)  # GTT last_price must be live
                     nse_key = f"NSE:{symbol}"
                     ltp = float(quotes.get(nse_key, {}).get("last_price", fill_price))
                 except Exception:
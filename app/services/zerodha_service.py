@@ -1,17 +1,16 @@
 from kiteconnect import KiteConnect
 from app.core.config import get_settings
+from app.core.executors import executors
 from app.core.logging import logger
+from app.services.quote_cache import quote_cache
 import asyncio
 from typing import List, Dict, Any, Optional
-import hashlib
-from datetime import datetime, timedelta
 
 settings = get_settings()
 
 class ZerodhaService:
-    # Quote cache: {symbol_list_hash: (quotes, timestamp)}
-    _quote_cache = {}
-    _cache_ttl_seconds = 120  # Cache quotes for 2 minutes
+    # kite.quote accepts at most 500 instruments per call
+    QUOTE_BATCH_SIZE = 500
 
     def __init__(self):
         # Use app's registered credentials if available (for backward compatibility)
@@ -71,7 +70,7 @@ class ZerodhaService:
             loop = asyncio.get_event_loop()
             from functools import partial
             data = await loop.run_in_executor(
-                None,
+                executors.pool("broker-data"),
                 partial(self.kite.generate_session, request_token, api_secret=self.api_secret)
             )
             self.kite.set_access_token(data["access_token"])
@@ -100,7 +99,7 @@ class ZerodhaService:
             loop = asyncio.get_event_loop()
             from functools import partial
             data = await loop.run_in_executor(
-                None,
+                executors.pool("broker-data"),
                 partial(kite.generate_session, request_token, api_secret=api_secret)
             )
             logger.info(f"Session generated successfully for user: {data['user_id']}")
@@ -121,7 +120,7 @@ class ZerodhaService:
         """Get user profile."""
         try:
             loop = asyncio.get_event_loop()
-            profile = await loop.run_in_executor(None, self.kite.profile)
+            profile = await loop.run_in_executor(executors.pool("broker-data"), self.kite.profile)
             return profile
         except Exception as e:
             logger.error(f"Error fetching profile: {e}")
@@ -131,7 +130,7 @@ class ZerodhaService:
         """Logout and invalidate access token."""
         try:
             loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, self.kite.invalidate_access_token)
+            result = await loop.run_in_executor(executors.pool("broker-data"), self.kite.invalidate_access_token)
             logger.info("Session invalidated successfully")
             return True
         except Exception as e:
@@ -144,7 +143,7 @@ class ZerodhaService:
         # KiteConnect is synchronous, so we run it in a thread
         try:
             loop = asyncio.get_event_loop()
-            instruments = await loop.run_in_executor(None, self.kite.instruments, exchange)
+            instruments = await loop.run_in_executor(executors.pool("market-data-download"), self.kite.instruments, exchange)
             return instruments
         except Exception as e:
             logger.error(f"Error fetching instruments: {e}")
@@ -156,7 +155,7 @@ class ZerodhaService:
         try:
             loop = asyncio.get_event_loop()
             data = await loop.run_in_executor(
-                None, 
+                executors.pool("broker-data"), 
                 self.kite.historical_data, 
                 instrument_token, 
                 from_date, 
@@ -173,7 +172,7 @@ class ZerodhaService:
         """Fetch account margins."""
         try:
             loop = asyncio.get_event_loop()
-            margins = await loop.run_in_executor(None, self.kite.margins)
+            margins = await loop.run_in_executor(executors.pool("broker-data"), self.kite.margins)
             return margins
         except Exception as e:
             logger.error(f"Error fetching margins: {e}")
@@ -202,25 +201,50 @@ class ZerodhaService:
                 params["price"] = price  # SL-limit needs both price and trigger_price
 
             loop = asyncio.get_event_loop()
-            order_id = await loop.run_in_executor(None, lambda: self.kite.place_order(**params))
+            order_id = await loop.run_in_executor(executors.pool("broker-orders"), lambda: self.kite.place_order(**params))
             logger.info(f"Order placed successfully. ID: {order_id}")
             return order_id
         except Exception as e:
             logger.error(f"Error placing order: {e}")
             raise
 
-    async def get_quote(self, symbols: List[str]) -> Dict:
-        """Get real-time quotes for given symbols with caching and retry logic."""
-        # Check cache first
-        cache_key = self._get_cache_key(symbols)
-        if cache_key in self._quote_cache:
-            cached_quotes, cached_time = self._quote_cache[cache_key]
-            age = datetime.now() - cached_time
-            if age < timedelta(seconds=self._cache_ttl_seconds):
-                logger.info(f"[get_quote-CACHE] Returning cached quotes (age: {age.total_seconds():.0f}s)")
-                return cached_quotes
-
-        # Try fetching with retry logic
+    async def get_quote(self, symbols: List[str], max_age: Optional[float] = None) -> Dict:
+        """
+        Get real-time quotes for given symbols.
+
+        Served from the shared per-instrument quote cache: only stale or missing
+        instruments are fetched (in kite.quote batches of up to 500) and merged
+        with the cached ones. `max_age` overrides the cache TTL in seconds
+        (0 forces a fresh fetch).
+        """
+        keys = list(dict.fromkeys(s if ":" in s else f"NSE:{s}" for s in symbols))
+        quotes, missing = quote_cache.get_many(keys, max_age)
+        if not missing:
+            logger.info(f"[get_quote-CACHE] All {len(keys)} quotes served from cache")
+            return quotes
+
+        to_fetch, waiting = quote_cache.claim(missing)
+        if len(missing) < len(keys):
+            logger.info(f"[get_quote-CACHE] {len(keys) - len(missing)}/{len(keys)} quotes from cache, fetching {len(to_fetch)}")
+
+        fetched: Dict[str, Dict] = {}
+        try:
+            for i in range(0, len(to_fetch), self.QUOTE_BATCH_SIZE):
+                batch = to_fetch[i:i + self.QUOTE_BATCH_SIZE]
+                fetched.update(await self._fetch_quote_batch(batch))
+            quote_cache.put_many(fetched)
+        finally:
+            quote_cache.resolve(to_fetch, fetched)
+
+        quotes.update(fetched)
+        for key, fut in waiting.items():
+            quote = await asyncio.shield(fut)
+            if quote is not None:
+                quotes[key] = quote
+        return quotes
+
+    async def _fetch_quote_batch(self, formatted_symbols: List[str]) -> Dict:
+        """One kite.quote call (≤500 instruments) with retry on timeouts/connection errors."""
         max_retries = 2
         retry_delay = 1  # seconds
 
@@ -231,18 +255,12 @@ class ZerodhaService:
                 token_mask = f"{current_token[:10]}...{current_token[-10:]}" if current_token else "NONE"
 
                 attempt_msg = f" (attempt {attempt+1}/{max_retries+1})" if attempt > 0 else ""
-                logger.info(f"[get_quote] Fetching {len(symbols)} quotes with token: {token_mask}, api_key length: {len(self.api_key) if self.api_key else 0}{attempt_msg}")
-
-                loop = asyncio.get_event_loop()
-                # Format symbols with exchange prefix for quote API
-                formatted_symbols = [f"NSE:{symbol}" for symbol in symbols]
+                logger.info(f"[get_quote] Fetching {len(formatted_symbols)} quotes with token: {token_mask}, api_key length: {len(self.api_key) if self.api_key else 0}{attempt_msg}")
                 logger.debug(f"[get_quote] Formatted symbols: {formatted_symbols[:5]}...")
 
-                quotes = await loop.run_in_executor(None, self.kite.quote, formatted_symbols)
+                loop = asyncio.get_event_loop()
+                quotes = await loop.run_in_executor(executors.pool("broker-data"), self.kite.quote, formatted_symbols)
                 logger.info(f"[get_quote] Successfully fetched quotes for {len(quotes)} symbols")
-
-                # Cache the quotes
-                self._quote_cache[cache_key] = (quotes, datetime.now())
                 return quotes
 
             except Exception as e:
@@ -254,7 +272,7 @@ class ZerodhaService:
                 logger.error(f"[get_quote] Timeout detected: {is_timeout}")
                 logger.error(f"[get_quote] Current token: {f'{self.kite.access_token[:10]}...{self.kite.access_token[-10:]}' if hasattr(self.kite, 'access_token') and self.kite.access_token else 'NONE'}")
                 logger.error(f"[get_quote] API key length: {len(self.api_key) if self.api_key else 0}")
-                logger.error(f"[get_quote] Attempted {len(symbols)} symbols (showing first 5): {symbols[:5]}")
+                logger.error(f"[get_quote] Attempted {len(formatted_symbols)} symbols (showing first 5): {formatted_symbols[:5]}")
                 logger.debug(f"[get_quote] Full traceback: {traceback.format_exc()}")
 
                 # Don't retry on permission errors (won't help)
@@ -278,13 +296,13 @@ class ZerodhaService:
         """
         formatted = [f"NSE:{s}" if not s.startswith("NSE:") else s for s in symbols]
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: self.kite.ltp(formatted))
+        return await loop.run_in_executor(executors.pool("broker-data"), lambda: self.kite.ltp(formatted))
 
     async def cancel_order(self, order_id: str, variety: str = "regular") -> str:
         """Cancel a pending order."""
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            None,
+            executors.pool("broker-orders"),
             lambda: self.kite.cancel_order(variety=variety, order_id=order_id),
         )
         logger.info(f"Order {order_id} cancelled. Result: {result}")
@@ -298,25 +316,18 @@ class ZerodhaService:
         """
         formatted = [f"NSE:{s}" if not s.startswith("NSE:") else s for s in symbols]
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: self.kite.ohlc(formatted))
-
-    @staticmethod
-    def _get_cache_key(symbols: List[str]) -> str:
-        """Generate cache key from symbol list."""
-        sorted_symbols = sorted(symbols)
-        key_str = ",".join(sorted_symbols)
-        return hashlib.md5(key_str.encode()).hexdigest()
+        return await loop.run_in_executor(executors.pool("broker-data"), lambda: self.kite.ohlc(formatted))
 
     async def get_order_status(self, order_id: str) -> Dict:
-        """Get status of a specific order."""
+        """Get the latest state of a specific order (its order history, not the whole order book)."""
         try:
             loop = asyncio.get_event_loop()
-            orders = await loop.run_in_executor(None, self.kite.orders)
-            # Find the specific order
-            order = next((o for o in orders if o['order_id'] == order_id), None)
-            if not order:
+            history = await loop.run_in_executor(
+                executors.pool("broker-data"), lambda: self.kite.order_history(order_id)
+            )
+            if not history:
                 raise ValueError(f"Order {order_id} not found")
-            return order
+            return history[-1]
         except Exception as e:
             logger.error(f"Error fetching order status: {e}")
             raise
@@ -327,7 +338,7 @@ class ZerodhaService:
             if access_token:
                 self.kite.set_access_token(access_token)
             loop = asyncio.get_event_loop()
-            orders = await loop.run_in_executor(None, self.kite.orders)
+            orders = await loop.run_in_executor(executors.pool("broker-data"), self.kite.orders)
             return orders or []
         except Exception as e:
             logger.error(f"Error fetching orders: {e}")
@@ -339,7 +350,7 @@ class ZerodhaService:
             if access_token:
                 self.kite.set_access_token(access_token)
             loop = asyncio.get_event_loop()
-            positions = await loop.run_in_executor(None, self.kite.positions)
+            positions = await loop.run_in_executor(executors.pool("broker-data"), self.kite.positions)
             return positions or {"day": [], "net": []}
         except Exception as e:
             logger.error(f"Error fetching positions: {e}")
@@ -351,7 +362,7 @@ class ZerodhaService:
             if access_token:
                 self.kite.set_access_token(access_token)
             loop = asyncio.get_event_loop()
-            trades = await loop.run_in_executor(None, self.kite.trades)
+            trades = await loop.run_in_executor(executors.pool("broker-data"), self.kite.trades)
             return trades or []
         except Exception as e:
             logger.error(f"Error fetching tradebook: {e}")
@@ -363,7 +374,7 @@ class ZerodhaService:
             if access_token:
                 self.kite.set_access_token(access_token)
             loop = asyncio.get_event_loop()
-            gtts = await loop.run_in_executor(None, self.kite.get_gtts)
+            gtts = await loop.run_in_executor(executors.pool("broker-data"), self.kite.get_gtts)
             return gtts or []
         except Exception as e:
             logger.error(f"Error fetching GTTs: {e}")
@@ -376,7 +387,7 @@ class ZerodhaService:
         Requires paid Kite Connect plan.
         """
         loop = asyncio.get_event_loop()
-        holdings = await loop.run_in_executor(None, self.kite.holdings)
+        holdings = await loop.run_in_executor(executors.pool("broker-data"), self.kite.holdings)
         return holdings or []
 
     async def get_order_margins(self, orders: List[Dict]) -> List[Dict]:
@@ -389,7 +400,7 @@ class ZerodhaService:
         """
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            None, lambda: self.kite.order_margins(orders)
+            executors.pool("broker-data"), lambda: self.kite.order_margins(orders)
         )
         return result or []
 
@@ -400,7 +411,7 @@ class ZerodhaService:
         """
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            None, lambda: self.kite.basket_order_margins(orders)
+            executors.pool("broker-data"), lambda: self.kite.basket_order_margins(orders)
         )
         return result or {}
 
@@ -432,7 +443,7 @@ class ZerodhaService:
 
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            None, lambda: self.kite.modify_order(**params)
+            executors.pool("broker-orders"), lambda: self.kite.modify_order(**params)
         )
         logger.info(f"Order {order_id} modified. Result: {result}")
         return str(result)
@@ -456,7 +467,7 @@ class ZerodhaService:
         """
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            None,
+            executors.pool("broker-orders"),
             lambda: self.kite.convert_position(
                 tradingsymbol=tradingsymbol,
                 exchange=exchange,
@@ -479,7 +490,7 @@ class ZerodhaService:
         """
         loop = asyncio.get_event_loop()
         history = await loop.run_in_executor(
-            None, lambda: self.kite.order_history(order_id)
+            executors.pool("broker-data"), lambda: self.kite.order_history(order_id)
         )
         return history or []
 
@@ -497,7 +508,7 @@ class ZerodhaService:
             else:
                 formatted.append(s)
         loop = asyncio.get_event_loop()
-        quotes = await loop.run_in_executor(None, lambda: self.kite.quote(formatted))
+        quotes = await loop.run_in_executor(executors.pool("broker-data"), lambda: self.kite.quote(formatted))
         # Extract just the depth + ohlc + last_price for each symbol
         result = {}
         for sym, data in quotes.items():
@@ -553,7 +564,7 @@ class ZerodhaService:
 
             loop = asyncio.get_event_loop()
             result = await loop.run_in_executor(
-                None,
+                executors.pool("broker-orders"),
                 lambda: self.kite.place_gtt(**gtt_params)
             )
             # kite.place_gtt() returns {'trigger_id': <int>} — extract the id
@@ -16,6 +16,7 @@ from typing import List, Optional, Any
 import json
 
 from app.core.config import get_settings
+from app.core.executors import executors
 from app.core.logging import logger
 
 settings = get_settings()
@@ -103,7 +104,7 @@ class Database:
     """
     Async wrapper around Azure SQL.
 
-    Pattern: every method does `await loop.run_in_executor(None, _sync_fn)` so
+    Pattern: every method does `await loop.run_in_executor(executors.pool("db"), _sync_fn)` so
     the FastAPI event loop is never blocked by pyodbc I/O.
     """
 
@@ -585,7 +586,7 @@ class Database:
             return
         try:
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._sync_save_swing_position, data)
+            await loop.run_in_executor(executors.pool("db"), self._sync_save_swing_position, data)
             logger.info(
                 f"[DB] swing position saved: {data.get('stock_symbol')} "
                 f"hold={data.get('hold_duration_days')}d"
@@ -617,7 +618,7 @@ class Database:
             return []
         try:
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, self._sync_get_expired_swing_positions)
+            return await loop.run_in_executor(executors.pool("db"), self._sync_get_expired_swing_positions)
         except Exception as e:
             logger.error(f"[DB] get_expired_swing_positions failed: {e}")
             return []
@@ -649,7 +650,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(
-                None, self._sync_update_swing_position_status, position_id, "EXITING"
+                executors.pool("db"), self._sync_update_swing_position_status, position_id, "EXITING"
             )
         except Exception as e:
             logger.error(f"[DB] mark_swing_position_exiting failed: {e}")
@@ -661,7 +662,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(
-                None, self._sync_update_swing_position_status,
+                executors.pool("db"), self._sync_update_swing_position_status,
                 position_id, "EXPIRED", exit_order_id, None
             )
             logger.info(f"[DB] swing position {position_id} marked EXPIRED, exit={exit_order_id}")
@@ -675,7 +676,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(
-                None, self._sync_update_swing_position_status,
+                executors.pool("db"), self._sync_update_swing_position_status,
                 position_id, "ERROR", None, error
             )
         except Exception as e:
@@ -689,7 +690,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(
-                None, self._sync_update_swing_position_status,
+                executors.pool("db"), self._sync_update_swing_position_status,
                 position_id, "HOLD_ENDED", None, None
             )
             logger.info(f"[DB] swing position {position_id} marked HOLD_ENDED")
@@ -717,7 +718,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             return await loop.run_in_executor(
-                None, self._sync_get_open_swing_positions_by_api_key, api_key
+                executors.pool("db"), self._sync_get_open_swing_positions_by_api_key, api_key
             )
         except Exception as e:
             logger.error(f"[DB] get_open_swing_positions_by_api_key failed: {e}")
@@ -761,7 +762,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             return await loop.run_in_executor(
-                None, self._sync_get_swing_expiry_by_api_key, api_key
+                executors.pool("db"), self._sync_get_swing_expiry_by_api_key, api_key
             )
         except Exception as e:
             logger.error(f"[DB] get_swing_expiry_by_api_key failed: {e}")
@@ -791,7 +792,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             return await loop.run_in_executor(
-                None, self._sync_get_closed_swing_positions_for_month, api_key, year, month
+                executors.pool("db"), self._sync_get_closed_swing_positions_for_month, api_key, year, month
             )
         except Exception as e:
             logger.error(f"[DB] get_closed_swing_positions_for_month failed: {e}")
@@ -821,7 +822,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             return await loop.run_in_executor(
-                None, self._sync_get_closed_swing_positions_for_year, api_key, year
+                executors.pool("db"), self._sync_get_closed_swing_positions_for_year, api_key, year
             )
         except Exception as e:
             logger.error(f"[DB] get_closed_swing_positions_for_year failed: {e}")
@@ -873,7 +874,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             return await loop.run_in_executor(
-                None, self._sync_get_monthly_pnl_history, api_key, months
+                executors.pool("db"), self._sync_get_monthly_pnl_history, api_key, months
             )
         except Exception as e:
             logger.error(f"[DB] get_monthly_pnl_history failed: {e}")
@@ -902,7 +903,7 @@ class Database:
             return []
         try:
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, self._sync_get_amo_pending_positions)
+            return await loop.run_in_executor(executors.pool("db"), self._sync_get_amo_pending_positions)
         except Exception as e:
             logger.error(f"[DB] get_amo_pending_positions failed: {e}")
             return []
@@ -928,7 +929,7 @@ class Database:
         try:
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(
-                None, self._sync_mark_swing_position_active, position_id, fill_price, gtt_id
+                executors.pool("db"), self._sync_mark_swing_position_active, position_id, fill_price, gtt_id
             )
             logger.info(f"[DB] swing position {position_id} activated: fill={fill_price}, gtt={gtt_id}")
         except Exception as e:
@@ -1042,7 +1043,7 @@ class Database:
             return {"vt_user_id": str(_uuid.uuid4()), "is_new_user": True}
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
-            None,
+            executors.pool("db"),
             self._sync_upsert_user_by_firebase_uid,
             firebase_uid,
             phone_number,
@@ -1098,7 +1099,7 @@ class Database:
             return
         loop = asyncio.get_event_loop()
         await loop.run_in_executor(
-            None,
+            executors.pool("db"),
             self._sync_link_zerodha_to_user,
             zerodha_user_id,
             vt_user_id,
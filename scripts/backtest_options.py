@@ -17,6 +17,30 @@ Usage:
         --capital 200000
         --expiry 2025-04-17   (default: same as --date)
 
+Batch mode (a date range × an ATM ± N strike ladder):
+    python scripts/backtest_options.py \\
+        --index NIFTY \\
+        --from-date 2025-01-01 --to-date 2025-03-31 \\
+        --strikes 2 \\
+        --api-key YOUR_API_KEY \\
+        --access-token YOUR_ACCESS_TOKEN
+
+    Each session's index, futures and option candles are fetched once and
+    cached under data/options_backtest/ (--refresh re-fetches). ATM is the
+    day's open rounded to the strike step (--strike-step), expiry is the
+    contract in force on that session by the exchange's weekly/monthly
+    expiry rule (EXPIRY_RULES). Days are replayed in a process pool
+    (--workers); the day's first signal is simulated on every strike of the
+    ladder, and the report shows per-day / per-strike P&L and hit rates.
+
+    Expired contracts: option tokens come from today's instrument dump, which
+    only lists live contracts. Sessions whose expiry has already passed get
+    no option candles, so their trades fall back to estimated premiums. Such
+    days are not cached, so a later run with a dump that lists the contract
+    fetches them properly. The expiry rule does not know exchange holidays;
+    when an expiry day is a holiday the listed (earlier) expiry is used if
+    the dump still has it, otherwise the rule's date is kept.
+
 Note on April 13 2025:
     April 13 2025 is a Sunday — not a trading day.
     The closest trading session is April 14 2025 (Monday).
@@ -25,18 +49,26 @@ Note on April 13 2025:
 How it works:
     1. Fetch full-day NIFTY 5-min candles (9:15 AM → 3:30 PM)
     2. Fetch NIFTY FUT near-month candles for volume ratio
-    3. Walk forward one candle at a time starting from candle 4 (9:30 AM)
+    3. Walk forward one candle at a time starting from candle 4 (9:30 AM).
+       The day's DataFrame is built once; each step sees a prefix view of it,
+       and the futures volume ratio is kept as a rolling window (DayReplay)
     4. At each step run: regime → breakout → retest → levels
     5. First valid signal fires the simulated trade
     6. Replay remaining candles → check SL / 1R-partial / target / time exit
     7. If a strike is given, also fetch the historical option premium candles
-       to report actual premium P&L (not just index-point P&L)
+       to report actual premium P&L (not just index-point P&L); premiums are
+       looked up by binary search on candle time (OptionPremiums)
     8. Print a colour-coded trade report
 """
 
 import argparse
+import multiprocessing
+import pickle
 import sys
 import os
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime, time, timedelta
 from typing import Dict, List, Optional, Tuple
 import math
@@ -49,6 +81,7 @@ ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT)
 
 from app.services.zerodha_service import zerodha_service
+from app.services.instrument_master import instrument_master
 from app.engines.options_engine import (
     OptionsEngine, BreakoutResult, MarketRegime,
     NO_TRADE_BEFORE, NO_TRADE_AFTER, EXPIRY_CUTOFF,
@@ -127,21 +160,13 @@ def fetch_prev_day_ohlc(index: str, trade_date: date) -> Dict:
     return {"high": 0.0, "low": 0.0, "open": 0.0, "close": 0.0}
 
 
-def fetch_fut_volume_ratio(index: str, trade_date: date, instruments: List[Dict]) -> float:
+def fetch_fut_volume_ratio(index: str, trade_date: date) -> float:
     """Return last 5-min candle volume / avg of previous 10 for front-month futures."""
-    index_upper = index.upper()
-    futs = [
-        i for i in instruments
-        if i.get("name") == index_upper
-        and i.get("instrument_type") == "FUT"
-        and i.get("expiry") and i["expiry"] >= trade_date
-    ]
-    if not futs:
+    near = instrument_master.nearest_future(index.upper(), trade_date)
+    if not near:
         print(f"  {YELLOW}No futures found — volume check will be skipped{RESET}")
         return 0.0
 
-    futs.sort(key=lambda x: x["expiry"])
-    near = futs[0]
     token = near["instrument_token"]
     print(f"  Fetching {near.get('tradingsymbol')} futures volume…")
     try:
@@ -160,37 +185,35 @@ def fetch_fut_volume_ratio(index: str, trade_date: date, instruments: List[Dict]
         return 0.0
 
 
+def fetch_fut_candles(index: str, trade_date: date) -> List[Dict]:
+    """Fetch the session's 5-min candles for the front-month futures contract."""
+    near = instrument_master.nearest_future(index.upper(), trade_date)
+    if not near:
+        print(f"  {YELLOW}No futures found — volume check will be skipped{RESET}")
+        return []
+
+    print(f"  Fetching {near.get('tradingsymbol')} futures candles…")
+    try:
+        from_dt = datetime.combine(trade_date, time(9, 15))
+        to_dt   = datetime.combine(trade_date, time(15, 30))
+        return _fetch_candles(near["instrument_token"], from_dt, to_dt, "5minute")
+    except Exception as e:
+        print(f"  {YELLOW}Futures candle fetch failed: {e}{RESET}")
+        return []
+
+
 def fetch_option_candles(
     index: str, trade_date: date, expiry_date: date,
-    strike: int, opt_type: str, instruments: List[Dict],
+    strike: int, opt_type: str,
 ) -> List[Dict]:
     """Fetch 5-min candles for the historical option contract."""
-    sym = f"{index.upper()}{expiry_date.strftime('%y%b').upper()}{strike}{opt_type}"
-    matches = [
-        i for i in instruments
-        if i.get("tradingsymbol") == sym
-        and i.get("instrument_type") == opt_type
-        and i.get("expiry") == expiry_date
-    ]
-    if not matches:
-        # Try alternate formats (Zerodha symbol format)
-        day_str = str(expiry_date.day).zfill(2) if expiry_date.day >= 10 else str(expiry_date.day)
-        for i in instruments:
-            ts = i.get("tradingsymbol", "")
-            if (
-                ts.startswith(index.upper())
-                and ts.endswith(f"{strike}{opt_type}")
-                and i.get("expiry") == expiry_date
-                and i.get("instrument_type") == opt_type
-            ):
-                matches.append(i)
-
-    if not matches:
-        print(f"  {YELLOW}No option contract found for {sym} / expiry={expiry_date}{RESET}")
+    contract = instrument_master.option(index.upper(), expiry_date, strike, opt_type)
+    if not contract:
+        print(f"  {YELLOW}No option contract found for {index.upper()} {strike}{opt_type} / expiry={expiry_date}{RESET}")
         return []
 
-    token = matches[0]["instrument_token"]
-    print(f"  Fetching {matches[0]['tradingsymbol']} premium candles…")
+    token = contract["instrument_token"]
+    print(f"  Fetching {contract['tradingsymbol']} premium candles…")
     try:
         from_dt = datetime.combine(trade_date, time(9, 15))
         to_dt   = datetime.combine(trade_date, time(15, 30))
@@ -200,6 +223,62 @@ def fetch_option_candles(
         return []
 
 
+# ═════════════════════════════════════════════════════════════════════════════
+# Walk-forward state
+# ═════════════════════════════════════════════════════════════════════════════
+
+def candles_frame(candles: List[Dict]) -> pd.DataFrame:
+    """OHLCV DataFrame in the shape the engine expects (lowercase, float)."""
+    df = pd.DataFrame(candles)
+    df.columns = [c.lower() for c in df.columns]
+    if "date" in df.columns:
+        df = df.rename(columns={"date": "timestamp"})
+    for col in ("open", "high", "low", "close", "volume"):
+        df[col] = df[col].astype(float)
+    return df
+
+
+class DayReplay:
+    """
+    Walk-forward state for one session, advanced once per candle.
+
+    The index DataFrame is built once for the whole day and each step hands
+    the engine a prefix view of it; the futures volume ratio (last candle /
+    mean of the previous 10) is carried in a rolling window instead of being
+    recomputed from the full list every step.
+    """
+
+    FUT_LOOKBACK = 10
+
+    def __init__(self, index_candles: List[Dict], fut_candles: List[Dict]):
+        self.candles = index_candles
+        self.frame   = candles_frame(index_candles)
+        self.step    = -1
+        self.fut_volume_ratio = 0.0
+        self._fut_vols   = [c["volume"] for c in fut_candles]
+        self._fut_window: deque = deque(maxlen=self.FUT_LOOKBACK)
+
+    def __len__(self) -> int:
+        return len(self.candles)
+
+    def advance(self) -> Dict:
+        """Move to the next candle, update rolling state and return the candle."""
+        self.step += 1
+        if self.step < len(self._fut_vols):
+            vol = self._fut_vols[self.step]
+            window = self._fut_window
+            avg_vol = sum(window) / len(window) if window else 0.0
+            self.fut_volume_ratio = round(vol / avg_vol, 2) if avg_vol > 0 else 0.0
+            window.append(vol)
+        else:
+            self.fut_volume_ratio = 0.0
+        return self.candles[self.step]
+
+    def prefix(self) -> pd.DataFrame:
+        """Candles up to and including the current step (a view, not a copy)."""
+        return self.frame.iloc[: self.step + 1]
+
+
 # ═════════════════════════════════════════════════════════════════════════════
 # Walk-forward engine wrapper (bypasses live-time gates)
 # ═════════════════════════════════════════════════════════════════════════════
@@ -216,7 +295,7 @@ class BacktestEngine:
 
     def run_at(
         self,
-        candles: List[Dict],   # candles up to and including current step
+        df: pd.DataFrame,      # candles up to and including current step
         candle_time: time,     # the timestamp of the last candle
         index: str,
         expiry_date: date,
@@ -225,7 +304,7 @@ class BacktestEngine:
         prev_day_low: float,
         fut_volume_ratio: float,
     ) -> BreakoutResult:
-        """Run the full pipeline on `candles` as if the time is `candle_time`."""
+        """Run the full pipeline on `df` as if the time is `candle_time`."""
         result = BreakoutResult()
 
         # ── Simulated time gates ──────────────────────────────────────────────
@@ -247,20 +326,12 @@ class BacktestEngine:
             )
             return result
 
-        if len(candles) < 10:
+        if len(df) < 10:
             result.failed_filters.append(
-                f"Only {len(candles)} candles — need ≥ 10"
+                f"Only {len(df)} candles — need ≥ 10"
             )
             return result
 
-        # ── Convert to DataFrame ──────────────────────────────────────────────
-        df = pd.DataFrame(candles)
-        df.columns = [c.lower() for c in df.columns]
-        if "date" in df.columns:
-            df = df.rename(columns={"date": "timestamp"})
-        for col in ("open", "high", "low", "close", "volume"):
-            df[col] = df[col].astype(float)
-
         # ── Phases (delegate to engine's private methods) ─────────────────────
         regime, regime_reasons, or_high, or_low, indicators = \
             self._engine._detect_regime(df, prev_day_high, prev_day_low)
@@ -322,19 +393,29 @@ class BacktestEngine:
 # Trade simulator
 # ═════════════════════════════════════════════════════════════════════════════
 
-def get_option_premium_at(opt_candles: List[Dict], ts: datetime) -> float:
-    """Return the option close price at or just after `ts`."""
-    for c in opt_candles:
-        if c["timestamp"] >= ts:
-            return c["close"]
-    return opt_candles[-1]["close"] if opt_candles else 0.0
+class OptionPremiums:
+    """Option candle closes indexed by timestamp (binary-search lookups)."""
+
+    def __init__(self, opt_candles: List[Dict]):
+        self._ts    = [c["timestamp"] for c in opt_candles]
+        self._close = [c["close"] for c in opt_candles]
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    def at(self, ts: datetime) -> float:
+        """Return the option close price at or just after `ts`."""
+        i = bisect_left(self._ts, ts)
+        if i < len(self._ts):
+            return self._close[i]
+        return self._close[-1] if self._close else 0.0
 
 
 def simulate_trade(
     signal: str,
     entry_candle_idx: int,
     index_candles: List[Dict],
-    opt_candles: List[Dict],
+    premiums: OptionPremiums,
     entry_index: float,
     sl_index: float,
     target_index: float,
@@ -384,7 +465,7 @@ def simulate_trade(
             exit_reason    = "TIME EXIT (3:00 PM)"
             exit_time      = ts
             exit_idx_price = cls
-            exit_premium   = get_option_premium_at(opt_candles, ts) if opt_candles else 0.0
+            exit_premium   = premiums.at(ts) if premiums else 0.0
             break
 
         # ── Structure trailing SL ─────────────────────────────────────────────
@@ -410,7 +491,7 @@ def simulate_trade(
             exit_reason    = "SL HIT"
             exit_time      = ts
             exit_idx_price = current_sl_idx
-            exit_premium   = get_option_premium_at(opt_candles, ts) if opt_candles else 0.0
+            exit_premium   = premiums.at(ts) if premiums else 0.0
             break
 
         # ── Partial exit at 1R ────────────────────────────────────────────────
@@ -419,7 +500,7 @@ def simulate_trade(
                           (not is_ce and lo <= entry_index - risk_idx)
             if partial_hit:
                 half_qty    = quantity // 2
-                p_pnl       = (partial_premium - entry_premium) * half_qty if opt_candles else \
+                p_pnl       = (partial_premium - entry_premium) * half_qty if premiums else \
                               risk_idx * ATM_DELTA * half_qty
                 partial_pnl = round(p_pnl, 2)
                 qty_remaining = quantity - half_qty
@@ -441,7 +522,7 @@ def simulate_trade(
             exit_reason    = "TARGET HIT (2R)"
             exit_time      = ts
             exit_idx_price = entry_index + (2 * risk_idx if is_ce else -2 * risk_idx)
-            exit_premium   = get_option_premium_at(opt_candles, ts) if opt_candles else 0.0
+            exit_premium   = premiums.at(ts) if premiums else 0.0
             break
 
     else:
@@ -450,10 +531,10 @@ def simulate_trade(
         exit_reason    = "END OF DAY"
         exit_time      = last["timestamp"]
         exit_idx_price = last["close"]
-        exit_premium   = get_option_premium_at(opt_candles, last["timestamp"]) if opt_candles else 0.0
+        exit_premium   = premiums.at(last["timestamp"]) if premiums else 0.0
 
     # ── P&L calculation ───────────────────────────────────────────────────────
-    if opt_candles and exit_premium and exit_premium > 0:
+    if premiums and exit_premium and exit_premium > 0:
         # Use actual option premium P&L
         remaining_pnl  = round((exit_premium - entry_premium) * qty_remaining, 2)
         total_pnl      = round(partial_pnl + remaining_pnl, 2)
@@ -488,6 +569,86 @@ def simulate_trade(
     }
 
 
+# ═════════════════════════════════════════════════════════════════════════════
+# Day replay
+# ═════════════════════════════════════════════════════════════════════════════
+
+def walk_forward(
+    engine: BacktestEngine,
+    replay: DayReplay,
+    index: str,
+    expiry_date: date,
+    trade_date: date,
+    prev_day: Dict,
+) -> Tuple[BreakoutResult, Optional[int], List[str]]:
+    """
+    Advance `replay` one candle at a time (from candle 4) until the first
+    signal. Returns (result, signal step, gate log); with no signal the step
+    is None and the result is the engine's verdict on the full day.
+    """
+    candle_log: List[str] = []
+    while replay.step + 1 < len(replay):
+        current_candle = replay.advance()
+        if replay.step < 4:
+            continue
+        ts   = current_candle["timestamp"]
+        ctime = ts.time() if isinstance(ts, datetime) else time(ts.hour, ts.minute)
+
+        result = engine.run_at(
+            df            = replay.prefix(),
+            candle_time   = ctime,
+            index         = index,
+            expiry_date   = expiry_date,
+            trade_date    = trade_date,
+            prev_day_high = prev_day["high"],
+            prev_day_low  = prev_day["low"],
+            fut_volume_ratio = replay.fut_volume_ratio,
+        )
+
+        close = current_candle["close"]
+        if result.signal != "NO_TRADE":
+            entry_tag = f"{GREEN}{BOLD}SIGNAL: {result.signal}{RESET}"
+        elif result.failed_filters:
+            short = result.failed_filters[-1][:60]
+            entry_tag = f"{YELLOW}NO_TRADE: {short}{RESET}"
+        else:
+            entry_tag = f"{YELLOW}NO_TRADE{RESET}"
+
+        candle_log.append(
+            f"  {ts.strftime('%H:%M')}  close={close:.2f}  regime={result.regime.value:<14}  "
+            + entry_tag
+        )
+
+        if result.signal != "NO_TRADE":
+            return result, replay.step, candle_log
+
+    result = engine.run_at(
+        df            = replay.frame,
+        candle_time   = replay.candles[-1]["timestamp"].time(),
+        index         = index,
+        expiry_date   = expiry_date,
+        trade_date    = trade_date,
+        prev_day_high = prev_day["high"],
+        prev_day_low  = prev_day["low"],
+        fut_volume_ratio = 0.0,
+    )
+    return result, None, candle_log
+
+
+def entry_premium_at(
+    premiums: OptionPremiums, ts: datetime, result: BreakoutResult,
+) -> Tuple[float, bool]:
+    """
+    Option premium at the signal candle. Without premium data, returns a
+    rough ATM estimate from the index risk and ATM delta (second value True).
+    """
+    entry_premium = premiums.at(ts) if premiums else 0.0
+    if entry_premium > 0:
+        return entry_premium, False
+    risk_pts = abs(result.entry_index_price - result.sl_index_price)
+    return round(risk_pts * ATM_DELTA * 1.2, 2), True
+
+
 # ═════════════════════════════════════════════════════════════════════════════
 # Report printer
 # ═════════════════════════════════════════════════════════════════════════════
@@ -613,21 +774,273 @@ def print_report(
 
 
 # ═════════════════════════════════════════════════════════════════════════════
-# Main
+# Batch mode — date range × strike ladder
 # ═════════════════════════════════════════════════════════════════════════════
 
-def main():
-    parser = argparse.ArgumentParser(description="Backtest options ORB strategy")
-    parser.add_argument("--index",        default="NIFTY",   help="NIFTY or BANKNIFTY")
-    parser.add_argument("--date",         required=True,     help="Trade date YYYY-MM-DD")
-    parser.add_argument("--strike",       type=int, default=0, help="Option strike (0 = skip premium fetch)")
-    parser.add_argument("--expiry",       default=None,      help="Expiry date YYYY-MM-DD (default = trade date)")
-    parser.add_argument("--lots",         type=int, default=1)
-    parser.add_argument("--capital",      type=float, default=200000)
-    parser.add_argument("--api-key",      required=True)
-    parser.add_argument("--access-token", required=True)
-    args = parser.parse_args()
+STRIKE_STEPS = {
+    "NIFTY":     50,
+    "BANKNIFTY": 100,
+}
+
+# (effective from, expiry weekday Mon=0, monthly-only) — latest rule last
+EXPIRY_RULES = {
+    "NIFTY": [
+        (date.min,          3, False),   # weekly Thursday
+        (date(2025, 9, 1),  1, False),   # weekly Tuesday
+    ],
+    "BANKNIFTY": [
+        (date.min,          3, False),   # weekly Thursday
+        (date(2023, 9, 4),  2, False),   # weekly Wednesday
+        (date(2024, 11, 20), 3, True),   # weeklies discontinued — last Thursday
+        (date(2025, 9, 1),  1, True),    # last Tuesday
+    ],
+}
+
+CACHE_DIR = os.path.join(ROOT, "data", "options_backtest")
+
+
+def trading_days(start: date, end: date) -> List[date]:
+    """Weekdays in [start, end]; exchange holidays drop out when no candles come back."""
+    days, d = [], start
+    while d <= end:
+        if d.weekday() < 5:
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    """Last `weekday` of a calendar month."""
+    d = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+
+def session_expiry(index: str, trade_date: date) -> date:
+    """
+    Option expiry in force on a historical session, from EXPIRY_RULES. A
+    listed expiry that falls between the session and the rule's date (a
+    holiday-shifted expiry still in the dump) wins over the rule.
+    """
+    rules = EXPIRY_RULES.get(index, EXPIRY_RULES["NIFTY"])
+    _, weekday, monthly = [r for r in rules if r[0] <= trade_date][-1]
+    if monthly:
+        expiry = _last_weekday(trade_date.year, trade_date.month, weekday)
+        if expiry < trade_date:
+            nxt = trade_date.replace(day=28) + timedelta(days=4)
+            expiry = _last_weekday(nxt.year, nxt.month, weekday)
+    else:
+        expiry = trade_date + timedelta(days=(weekday - trade_date.weekday()) % 7)
+
+    listed = instrument_master.nearest_option_expiry(index, trade_date)
+    return listed if listed and listed <= expiry else expiry
+
+
+def strike_ladder(atm: int, width: int, step: int) -> List[int]:
+    """ATM ± `width` strikes, lowest first."""
+    return [atm + k * step for k in range(-width, width + 1)]
 
+
+def load_day(
+    index: str, trade_date: date, width: int, step: int,
+    cache_dir: str, refresh: bool = False,
+) -> Optional[Dict]:
+    """
+    Index, futures and option candles for one session, fetched once and
+    pickled to `cache_dir`. Later runs read the cache and only fetch strikes
+    the cached ladder does not cover yet. ATM is the day's opening price
+    rounded to `step`; expiry comes from session_expiry(). Days where an
+    option contract could not be resolved are not written to the cache, and
+    cached days with a different expiry are re-fetched. Returns None for
+    sessions with no index candles (holidays).
+    """
+    path = os.path.join(cache_dir, f"{index}_{trade_date.strftime('%Y%m%d')}.pkl")
+    expiry = session_expiry(index, trade_date)
+    day = None
+    if not refresh and os.path.exists(path):
+        with open(path, "rb") as f:
+            day = pickle.load(f)
+        # Older caches stored the nearest expiry in today's dump
+        if day["index"] and day.get("expiry") != expiry:
+            day = None
+
+    dirty = False
+    if day is None:
+        print(f"  {trade_date}:")
+        index_candles = fetch_index_candles(index, trade_date)
+        day = {"index": index_candles, "options": {}}
+        if index_candles:
+            day["prev_day"] = fetch_prev_day_ohlc(index, trade_date)
+            day["fut"]      = fetch_fut_candles(index, trade_date)
+            day["expiry"]   = expiry
+            day["atm"]      = int(round(index_candles[0]["open"] / step) * step)
+        dirty = True
+
+    missing = 0
+    if day["index"]:
+        for strike in strike_ladder(day["atm"], width, step):
+            for opt_type in ("CE", "PE"):
+                if (strike, opt_type) not in day["options"]:
+                    candles = fetch_option_candles(
+                        index, trade_date, day["expiry"], strike, opt_type
+                    )
+                    if candles:
+                        day["options"][(strike, opt_type)] = candles
+                        dirty = True
+                    else:
+                        missing += 1
+
+    if missing:
+        print(f"  {YELLOW}{trade_date}: {missing} option contract(s) unresolved "
+              f"(expiry {day['expiry']}) — day not cached{RESET}")
+
+    # Today's session is still forming — never cache it
+    if dirty and not missing and trade_date < datetime.now(IST).date():
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(day, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    return day if day["index"] else None
+
+
+def run_day(index: str, trade_date: date, day: Dict, width: int, step: int, lots: int) -> Dict:
+    """
+    Replay one cached session (runs in a worker process). The day's first
+    signal is simulated once per strike in the ladder, using that strike's
+    CE or PE premiums.
+    """
+    engine = BacktestEngine()
+    replay = DayReplay(day["index"], day["fut"])
+    result, signal_step, _ = walk_forward(
+        engine, replay, index, day["expiry"], trade_date, day["prev_day"]
+    )
+
+    out = {
+        "date":        trade_date,
+        "atm":         day["atm"],
+        "regime":      result.regime.value,
+        "signal":      result.signal,
+        "signal_time": None,
+        "reason":      result.failed_filters[-1] if result.failed_filters else "",
+        "trades":      {},   # ladder offset → trade summary
+    }
+    if signal_step is None:
+        return out
+
+    ts = day["index"][signal_step]["timestamp"]
+    out["signal_time"] = ts
+    opt_type = "CE" if result.signal == "BUY_CE" else "PE"
+    for offset, strike in enumerate(strike_ladder(day["atm"], width, step), -width):
+        premiums = OptionPremiums(day["options"].get((strike, opt_type), []))
+        entry_premium, estimated = entry_premium_at(premiums, ts, result)
+        trade = simulate_trade(
+            signal           = result.signal,
+            entry_candle_idx = signal_step,
+            index_candles    = day["index"],
+            premiums         = premiums,
+            entry_index      = result.entry_index_price,
+            sl_index         = result.sl_index_price,
+            target_index     = result.target_index_price,
+            entry_premium    = entry_premium,
+            lots             = lots,
+            lot_size         = LOT_SIZES.get(index, 75),
+        )
+        out["trades"][offset] = {
+            "strike":        strike,
+            "entry_premium": entry_premium,
+            "estimated":     estimated,
+            "exit_reason":   trade["exit_reason"],
+            "pnl":           trade["total_pnl"],
+            "pnl_source":    trade["pnl_source"],
+        }
+    return out
+
+
+def _offset_label(offset: int) -> str:
+    return "ATM" if offset == 0 else f"ATM{offset:+d}"
+
+
+def _pnl(value: float, width: int = 9) -> str:
+    colour = GREEN if value >= 0 else RED
+    return f"{colour}{value:>+{width}.0f}{RESET}"
+
+
+def print_batch_report(
+    index: str,
+    start: date,
+    end: date,
+    width: int,
+    step: int,
+    results: List[Dict],
+    holidays: List[date],
+):
+    offsets = list(range(-width, width + 1))
+
+    print()
+    print(BOLD + _sep("═") + RESET)
+    print(BOLD + f"  BATCH REPORT — {index} {start} → {end}  (ATM ±{width}, step {step})" + RESET)
+    print(BOLD + _sep("═") + RESET)
+
+    # ── Per-day ───────────────────────────────────────────────────────────────
+    print()
+    print(BOLD + "PER-DAY P&L" + RESET)
+    print(_sep())
+    print(f"  {'date':<10}  {'signal':<8}  {'time':<5}  {'ATM':>6}  "
+          + "  ".join(f"{_offset_label(o):>9}" for o in offsets))
+    for r in results:
+        if not r["trades"]:
+            print(f"  {r['date']}  {YELLOW}{'NO_TRADE':<8}{RESET}  {'—':<5}  {r['atm']:>6}  "
+                  f"{YELLOW}{r['reason'][:50]}{RESET}")
+            continue
+        cells = "  ".join(
+            _pnl(r["trades"][o]["pnl"]) if o in r["trades"] else f"{'—':>9}" for o in offsets
+        )
+        print(f"  {r['date']}  {r['signal']:<8}  {r['signal_time'].strftime('%H:%M')}  "
+              f"{r['atm']:>6}  {cells}")
+
+    # ── Per-strike ────────────────────────────────────────────────────────────
+    print()
+    print(BOLD + "PER-STRIKE SUMMARY" + RESET)
+    print(_sep())
+    print(f"  {'strike':<7}  {'trades':>6}  {'wins':>5}  {'hit rate':>8}  "
+          f"{'total P&L':>10}  {'avg P&L':>9}  {'premium data':>12}")
+    for o in offsets:
+        trades = [r["trades"][o] for r in results if o in r["trades"]]
+        if not trades:
+            continue
+        wins  = sum(1 for t in trades if t["pnl"] > 0)
+        total = sum(t["pnl"] for t in trades)
+        real  = sum(1 for t in trades if t["pnl_source"] == "option premium")
+        print(f"  {_offset_label(o):<7}  {len(trades):>6}  {wins:>5}  "
+              f"{wins / len(trades) * 100:>7.1f}%  {_pnl(total, 10)}  "
+              f"{_pnl(total / len(trades))}  {real:>5}/{len(trades):<6}")
+
+    # ── Sessions ──────────────────────────────────────────────────────────────
+    traded = [r for r in results if r["trades"]]
+    print()
+    print(BOLD + "SESSIONS" + RESET)
+    print(_sep())
+    print(f"  Sessions replayed:  {len(results)}"
+          + (f"   (no data / holiday: {len(holidays)})" if holidays else ""))
+    print(f"  Signal days:        {len(traded)}")
+    print(f"  No-trade days:      {len(results) - len(traded)}")
+    atm_trades = [(r["date"], r["trades"][0]["pnl"]) for r in traded if 0 in r["trades"]]
+    if atm_trades:
+        best  = max(atm_trades, key=lambda x: x[1])
+        worst = min(atm_trades, key=lambda x: x[1])
+        print(f"  Best day (ATM):     {best[0]}  {_pnl(best[1], 0).strip()}")
+        print(f"  Worst day (ATM):    {worst[0]}  {_pnl(worst[1], 0).strip()}")
+
+    print()
+    print(BOLD + _sep("═") + RESET)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# Main
+# ═════════════════════════════════════════════════════════════════════════════
+
+def run_single(args):
     index      = args.index.upper()
     trade_date = date.fromisoformat(args.date)
     expiry_date= date.fromisoformat(args.expiry) if args.expiry else trade_date
@@ -666,41 +1079,28 @@ def main():
     print(f"  {GREEN}✓ Prev-day H={prev_day['high']:.2f} L={prev_day['low']:.2f}{RESET}")
 
     # Instruments for futures + option lookup
-    opt_candles = []
-    fut_volume_ratio_by_step: Dict[int, float] = {}
+    fut_candles_full: List[Dict] = []
+    opt_candles_ce:   List[Dict] = []
+    opt_candles_pe:   List[Dict] = []
     try:
-        instruments = zerodha_service.kite.instruments("NFO")
-        print(f"  {GREEN}✓ {len(instruments)} NFO instruments cached{RESET}")
-
-        # Compute fut volume ratio for each candle step (recomputed at each step)
-        # For simplicity: fetch once and compute ratio per step
-        futs = [
-            i for i in instruments
-            if i.get("name") == index
-            and i.get("instrument_type") == "FUT"
-            and i.get("expiry") and i["expiry"] >= trade_date
-        ]
-        if futs:
-            futs.sort(key=lambda x: x["expiry"])
-            token = futs[0]["instrument_token"]
-            from_dt = datetime.combine(trade_date, time(9, 15))
-            to_dt   = datetime.combine(trade_date, time(15, 30))
-            fut_candles_full = _fetch_candles(token, from_dt, to_dt, "5minute")
+        if not instrument_master.load_sync(zerodha_service.kite):
+            raise RuntimeError("instrument master unavailable")
+        print(f"  {GREEN}✓ Instrument master loaded ({instrument_master.loaded_for}){RESET}")
+
+        # Fetched once; the per-step volume ratio is rolled forward by DayReplay
+        fut_candles_full = fetch_fut_candles(index, trade_date)
+        if fut_candles_full:
             print(f"  {GREEN}✓ {len(fut_candles_full)} futures candles{RESET}")
-        else:
-            fut_candles_full = []
 
         if strike:
-            opt_type_guess = "CE"   # will be updated once signal fires
             opt_candles_ce = fetch_option_candles(
-                index, trade_date, expiry_date, strike, "CE", instruments
+                index, trade_date, expiry_date, strike, "CE"
             )
             opt_candles_pe = fetch_option_candles(
-                index, trade_date, expiry_date, strike, "PE", instruments
+                index, trade_date, expiry_date, strike, "PE"
             )
     except Exception as e:
         print(f"  {YELLOW}NFO instrument fetch failed: {e}{RESET}")
-        instruments       = []
         fut_candles_full  = []
         opt_candles_ce    = []
         opt_candles_pe    = []
@@ -708,100 +1108,41 @@ def main():
     # ── Walk-forward simulation ───────────────────────────────────────────────
     print()
     print("Running walk-forward simulation…")
-    engine     = BacktestEngine()
-    candle_log = []
-    signal_fired = False
-    final_result = BreakoutResult()
+    engine = BacktestEngine()
+    replay = DayReplay(index_candles, fut_candles_full)
+    final_result, signal_step, candle_log = walk_forward(
+        engine, replay, index, expiry_date, trade_date, prev_day
+    )
+
     signal_candle = None
     trade_result  = None
+    if signal_step is not None:
+        signal_candle = index_candles[signal_step]
+        ts = signal_candle["timestamp"]
 
-    for step in range(4, len(index_candles)):
-        candles_so_far = index_candles[: step + 1]
-        current_candle = index_candles[step]
-        ts   = current_candle["timestamp"]
-        ctime = ts.time() if isinstance(ts, datetime) else time(ts.hour, ts.minute)
-
-        # Compute futures volume ratio at this step
-        if fut_candles_full and step < len(fut_candles_full):
-            fut_vols = [c["volume"] for c in fut_candles_full[: step + 1]]
-            last_vol = fut_vols[-1]
-            lookback = fut_vols[max(0, len(fut_vols) - 11): len(fut_vols) - 1]
-            avg_vol  = sum(lookback) / len(lookback) if lookback else 0.0
-            fut_vol_ratio = round(last_vol / avg_vol, 2) if avg_vol > 0 else 0.0
-        else:
-            fut_vol_ratio = 0.0
-
-        result = engine.run_at(
-            candles       = candles_so_far,
-            candle_time   = ctime,
-            index         = index,
-            expiry_date   = expiry_date,
-            trade_date    = trade_date,
-            prev_day_high = prev_day["high"],
-            prev_day_low  = prev_day["low"],
-            fut_volume_ratio = fut_vol_ratio,
-        )
-
-        close = current_candle["close"]
-        if result.signal != "NO_TRADE":
-            entry_tag = f"{GREEN}{BOLD}SIGNAL: {result.signal}{RESET}"
-        elif result.failed_filters:
-            short = result.failed_filters[-1][:60]
-            entry_tag = f"{YELLOW}NO_TRADE: {short}{RESET}"
-        else:
-            entry_tag = f"{YELLOW}NO_TRADE{RESET}"
-
-        candle_log.append(
-            f"  {ts.strftime('%H:%M')}  close={close:.2f}  regime={result.regime.value:<14}  "
-            + entry_tag
-        )
-
-        if result.signal != "NO_TRADE" and not signal_fired:
-            signal_fired  = True
-            final_result  = result
-            signal_candle = current_candle
-
-            opt_type = "CE" if result.signal == "BUY_CE" else "PE"
-            opt_candles = opt_candles_ce if opt_type == "CE" else opt_candles_pe
-
-            # Get entry premium from option candles at signal time
-            entry_premium = 0.0
-            if opt_candles:
-                entry_premium = get_option_premium_at(opt_candles, ts)
-            if entry_premium <= 0:
-                # Estimate via ATM delta
-                risk_pts = abs(result.entry_index_price - result.sl_index_price)
-                entry_premium = round(risk_pts * ATM_DELTA * 1.2, 2)  # rough ATM estimate
-                print(f"  {YELLOW}No option premium data — estimating ₹{entry_premium:.2f}{RESET}")
-
-            print(f"  {GREEN}SIGNAL at {ts.strftime('%H:%M')} — {result.signal} "
-                  f"entry≈₹{entry_premium:.2f} option premium{RESET}")
-
-            # Simulate the trade on remaining candles
-            trade_result = simulate_trade(
-                signal         = result.signal,
-                entry_candle_idx = step,
-                index_candles  = index_candles,
-                opt_candles    = opt_candles,
-                entry_index    = result.entry_index_price,
-                sl_index       = result.sl_index_price,
-                target_index   = result.target_index_price,
-                entry_premium  = entry_premium,
-                lots           = lots,
-                lot_size       = lot_size,
-            )
-            break   # one trade per day
-
-    if not signal_fired:
-        final_result  = engine.run_at(
-            candles       = index_candles,
-            candle_time   = index_candles[-1]["timestamp"].time(),
-            index         = index,
-            expiry_date   = expiry_date,
-            trade_date    = trade_date,
-            prev_day_high = prev_day["high"],
-            prev_day_low  = prev_day["low"],
-            fut_volume_ratio = 0.0,
+        opt_type = "CE" if final_result.signal == "BUY_CE" else "PE"
+        premiums = OptionPremiums(opt_candles_ce if opt_type == "CE" else opt_candles_pe)
+
+        # Get entry premium from option candles at signal time
+        entry_premium, estimated = entry_premium_at(premiums, ts, final_result)
+        if estimated:
+            print(f"  {YELLOW}No option premium data — estimating ₹{entry_premium:.2f}{RESET}")
+
+        print(f"  {GREEN}SIGNAL at {ts.strftime('%H:%M')} — {final_result.signal} "
+              f"entry≈₹{entry_premium:.2f} option premium{RESET}")
+
+        # Simulate the trade on remaining candles (one trade per day)
+        trade_result = simulate_trade(
+            signal         = final_result.signal,
+            entry_candle_idx = signal_step,
+            index_candles  = index_candles,
+            premiums       = premiums,
+            entry_index    = final_result.entry_index_price,
+            sl_index       = final_result.sl_index_price,
+            target_index   = final_result.target_index_price,
+            entry_premium  = entry_premium,
+            lots           = lots,
+            lot_size       = lot_size,
         )
 
     # ── Print full report ─────────────────────────────────────────────────────
@@ -817,5 +1158,92 @@ def main():
     )
 
 
+def run_batch(args):
+    index    = args.index.upper()
+    start    = date.fromisoformat(args.from_date)
+    end      = date.fromisoformat(args.to_date)
+    width    = args.strikes
+    step     = args.strike_step or STRIKE_STEPS.get(index, 50)
+    workers  = args.workers or os.cpu_count() or 1
+    if end < start:
+        print(f"{RED}Error: --to-date {end} is before --from-date {start}.{RESET}")
+        sys.exit(1)
+    days = trading_days(start, end)
+
+    print()
+    print(BOLD + f"{'═'*70}" + RESET)
+    print(BOLD + f"  Options Backtester (batch) — {index} {start} → {end}  "
+                 f"ATM ±{width} × {step}" + RESET)
+    print(BOLD + f"{'═'*70}" + RESET)
+    print()
+
+    # ── Auth + instruments (once for the whole batch) ─────────────────────────
+    zerodha_service.set_credentials(args.api_key, args.access_token)
+    if not instrument_master.load_sync(zerodha_service.kite):
+        print(f"{RED}Instrument master unavailable — cannot resolve futures/options.{RESET}")
+        sys.exit(1)
+    print(f"  {GREEN}✓ Instrument master loaded ({instrument_master.loaded_for}){RESET}")
+
+    # ── Fetch (or read cached) days and replay them in worker processes ───────
+    # Days are submitted as soon as their data is in, so replay overlaps fetching.
+    print(f"Loading {len(days)} sessions (cache: {args.cache_dir})…")
+    holidays: List[date] = []
+    pending = []
+    # spawn: the parent already runs kiteconnect's HTTP threads
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        for d in days:
+            try:
+                day = load_day(index, d, width, step, args.cache_dir, refresh=args.refresh)
+            except Exception as e:
+                print(f"  {YELLOW}{d}: data fetch failed: {e}{RESET}")
+                continue
+            if day is None:
+                holidays.append(d)
+                continue
+            pending.append((d, pool.submit(run_day, index, d, day, width, step, args.lots)))
+
+        print(f"Replaying {len(pending)} sessions on {workers} workers…")
+        results = []
+        for d, fut in pending:
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                print(f"  {YELLOW}{d}: replay failed: {e}{RESET}")
+
+    print_batch_report(index, start, end, width, step, results, holidays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest options ORB strategy")
+    parser.add_argument("--index",        default="NIFTY",   help="NIFTY or BANKNIFTY")
+    parser.add_argument("--date",         default=None,      help="Trade date YYYY-MM-DD (single-day mode)")
+    parser.add_argument("--strike",       type=int, default=0, help="Option strike (0 = skip premium fetch)")
+    parser.add_argument("--expiry",       default=None,      help="Expiry date YYYY-MM-DD (default = trade date)")
+    parser.add_argument("--lots",         type=int, default=1)
+    parser.add_argument("--capital",      type=float, default=200000)
+    parser.add_argument("--api-key",      required=True)
+    parser.add_argument("--access-token", required=True)
+    # Batch mode
+    parser.add_argument("--from-date",    default=None,      help="Batch start date YYYY-MM-DD")
+    parser.add_argument("--to-date",      default=None,      help="Batch end date YYYY-MM-DD (inclusive)")
+    parser.add_argument("--strikes",      type=int, default=2, help="Batch strike ladder: ATM ± N strikes")
+    parser.add_argument("--strike-step",  type=int, default=0, help="Strike interval (default 50 NIFTY / 100 BANKNIFTY)")
+    parser.add_argument("--workers",      type=int, default=0, help="Replay processes (default = CPU count)")
+    parser.add_argument("--cache-dir",    default=CACHE_DIR, help="Per-day candle cache directory")
+    parser.add_argument("--refresh",      action="store_true", help="Ignore cached days and re-fetch")
+    args = parser.parse_args()
+
+    if args.from_date or args.to_date:
+        if not (args.from_date and args.to_date):
+            parser.error("batch mode needs both --from-date and --to-date")
+        run_batch(args)
+    elif args.date:
+        run_single(args)
+    else:
+        parser.error("give --date for one session or --from-date/--to-date for a batch")
+
+
 if __name__ == "__main__":
     main()